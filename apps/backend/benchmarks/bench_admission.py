@@ -0,0 +1,131 @@
+"""
+Benchmark de goodput bajo sobrecarga con y sin control de admision.
+
+Llama directamente a una app ASGI minima (sin servidor ni red) cuyas peticiones
+esperan E/S (`--io-ms`, un `await`) y luego bloquean el event loop (`--cpu-ms`,
+como una consulta sincrona dentro de un `async def`). La capacidad del worker
+es por tanto ~1000 / cpu-ms peticiones por segundo.
+
+Las llegadas son de lazo abierto (Poisson) a multiplos de esa capacidad: los
+clientes no esperan a que el servidor se desocupe. Una respuesta cuenta como
+goodput si es 200 y llega antes de `--timeout-ms` (despues el cliente ya se
+fue). Un `--critical` de las peticiones va a `/auth/login` y el resto navega
+`/products`.
+
+Sin admision la cola crece, la latencia supera el timeout y el goodput se
+desploma pasada la saturacion; con `AdmissionMiddleware` la navegacion se
+rechaza con 503 y el goodput se mantiene cerca de la capacidad.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_admission.py [--loads 0.5,1,1.5,2,3] [--duration 3] [--cpu-ms 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from shared.admission import AdmissionController, AdmissionMiddleware
+from shared.metrics import MetricsRegistry, monitor_event_loop_lag
+
+
+def make_endpoint(io_seconds: float, cpu_seconds: float):
+    async def endpoint(scope, receive, send):
+        await asyncio.sleep(io_seconds)
+        time.sleep(cpu_seconds)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    return endpoint
+
+
+async def request(app, path: str, method: str, scheduled: float, results: list) -> None:
+    status = [0]
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+
+    await app({"type": "http", "method": method, "path": path, "headers": []}, receive, send)
+    results.append((path, status[0], time.perf_counter() - scheduled))
+
+
+async def run_level(app, rate: float, args, registry: MetricsRegistry) -> dict:
+    rng = random.Random(args.seed)
+    registry.reset()
+    monitor = asyncio.create_task(monitor_event_loop_lag(args.lag_interval_ms / 1000, registry))
+    results, tasks = [], []
+
+    start = time.perf_counter()
+    scheduled = start
+    while scheduled - start < args.duration:
+        scheduled += rng.expovariate(rate)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        critical = rng.random() < args.critical
+        path, method = ("/auth/login", "POST") if critical else ("/products", "GET")
+        tasks.append(asyncio.create_task(request(app, path, method, scheduled, results)))
+    await asyncio.gather(*tasks)
+    monitor.cancel()
+
+    timeout = args.timeout_ms / 1000
+    good = [r for r in results if r[1] == 200 and r[2] <= timeout]
+    latencies = sorted(r[2] for r in results if r[1] == 200)
+    return {
+        "offered_rps": round(len(results) / args.duration, 1),
+        "goodput_rps": round(len(good) / args.duration, 1),
+        "critical_goodput_rps": round(sum(r[0] == "/auth/login" for r in good) / args.duration, 1),
+        "shed": sum(r[1] == 503 for r in results),
+        "late": sum(r[1] == 200 and r[2] > timeout for r in results),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else 0.0,
+    }
+
+
+async def run(args) -> dict:
+    endpoint = make_endpoint(args.io_ms / 1000, args.cpu_ms / 1000)
+    registry = MetricsRegistry()
+    controller = AdmissionController(
+        max_in_flight=args.max_in_flight,
+        max_loop_lag=args.max_loop_lag_ms / 1000,
+        registry=registry
+    )
+    modes = {"without_admission": endpoint, "with_admission": AdmissionMiddleware(endpoint, controller)}
+
+    capacity = 1000 / args.cpu_ms
+    results = []
+    for load in (float(value) for value in args.loads.split(",")):
+        level = {"load": load}
+        for name, app in modes.items():
+            controller.reset()
+            level[name] = await run_level(app, capacity * load, args, registry)
+        results.append(level)
+    return {"capacity_rps": round(capacity, 1), "timeout_ms": args.timeout_ms, "levels": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", default="0.5,1,1.5,2,3", help="Multiplos de la capacidad")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--io-ms", type=float, default=20.0)
+    parser.add_argument("--cpu-ms", type=float, default=5.0)
+    parser.add_argument("--timeout-ms", type=float, default=1000.0)
+    parser.add_argument("--critical", type=float, default=0.2, help="Fraccion de peticiones criticas")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--max-loop-lag-ms", type=float, default=100.0)
+    parser.add_argument("--lag-interval-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
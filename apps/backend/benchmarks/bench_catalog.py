@@ -0,0 +1,120 @@
+"""
+Benchmark del catalogo en memoria contra la consulta a la base de datos.
+
+Siembra productos en SQLite (en memoria por defecto), construye el
+`CatalogSnapshot` y mide consultas por segundo de cada escenario de navegacion
+con `CatalogSnapshot.query` y con `ProductRepository.list_products`, que es lo
+que el servicio usa cuando el catalogo esta viejo.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_catalog.py [--products 100000] [--seconds 2] [--database-url ...]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import seed as dataset
+
+SCENARIOS = {
+    "list": lambda rng: {},
+    "price_range_sorted": lambda rng: {
+        "min_price": (low := rng.randint(100, 400_000)), "max_price": low + 20_000, "sort": "price_asc"
+    },
+    "in_stock_cheapest": lambda rng: {"in_stock": True, "sort": "price_asc"},
+    "most_expensive": lambda rng: {"sort": "price_desc"},
+    "search": lambda rng: {"search": rng.choice(dataset.SEARCH_TERMS)},
+}
+
+
+def qps(call, seconds: float, seed_value: int) -> float:
+    rng = random.Random(seed_value)
+    calls = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        call(rng)
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from products.catalog import CatalogSnapshot
+    from products.models import Product
+    from products.repository import ProductRepository
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    dataset.seed(engine, users=1, products=args.products, seed_value=args.seed, reset=args.database_url is None)
+    db = sessionmaker(bind=engine)()
+    # Historial realista: la marca de agua (el producto mas reciente) queda lejos del
+    # resto, y el refresco incremental solo lee lo que cambia despues
+    now = datetime.utcnow()
+    db.query(Product).update({"updated_at": now - timedelta(hours=1)})
+    newest = db.query(Product).order_by(Product.id.desc()).first()
+    newest.updated_at = now - timedelta(minutes=30)
+    db.commit()
+
+    snapshot = CatalogSnapshot()
+    start = time.perf_counter()
+    snapshot.refresh(db)
+    build_seconds = time.perf_counter() - start
+    repository = ProductRepository(db)
+
+    results = {}
+    for name, make_filters in SCENARIOS.items():
+        def from_snapshot(rng):
+            snapshot.query(0, args.limit, **make_filters(rng))
+
+        def from_database(rng):
+            repository.list_products(0, args.limit, active_only=True, **make_filters(rng))
+            db.expunge_all()
+
+        snapshot_qps = qps(from_snapshot, args.seconds, args.seed)
+        database_qps = qps(from_database, args.seconds, args.seed)
+        results[name] = {
+            "snapshot_qps": round(snapshot_qps, 1),
+            "database_qps": round(database_qps, 1),
+            "speedup": round(snapshot_qps / database_qps, 1),
+        }
+
+    changed = db.query(Product).order_by(Product.id).limit(100).all()
+    for product in changed:
+        product.price += 1
+    db.commit()
+    start = time.perf_counter()
+    read = snapshot.refresh(db)
+    delta_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        "products": len(snapshot),
+        "snapshot_build_seconds": round(build_seconds, 2),
+        "delta_refresh": {"rows": read, "ms": round(delta_ms, 2)},
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark de arranque en frio basado en `python -X importtime`.
+
+Importa `main` en un proceso nuevo varias veces y reporta la mediana del tiempo
+acumulado de importacion, los modulos mas costosos y si algun modulo que debe
+cargarse de forma diferida se importo antes de tiempo.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_cold_start.py [--runs 5] [--budget-ms 3000]
+
+Sale con codigo 1 si la mediana supera el presupuesto.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Modulos que no deben importarse al importar `main` (se construyen en el lifespan
+# o solo cuando se usan)
+DEFERRED_MODULES = ("passlib.context", "psycopg2", "cryptography")
+
+DEFAULT_ENV = {
+    "DEBUG": "false",
+    "POSTGRESQL_USER": "postgres",
+    "POSTGRESQL_PASSWORD": "postgres",
+    "POSTGRESQL_SERVER": "localhost",
+    "POSTGRESQL_PORT": "5432",
+    "POSTGRESQL_NAME": "ecommerce",
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_API_KEY": "bench",
+    "SUPABASE_BUCKET_NAME": "bench",
+    "SECRET_KEY": "bench",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+}
+
+
+def run_importtime(module: str = "main") -> dict:
+    """
+        Importa `module` en un proceso nuevo con `-X importtime`.
+
+        Returns:
+            dict: {"total_us": int, "modules": {nombre: (self_us, cumulative_us)}}
+    """
+    env = {**DEFAULT_ENV, **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        modules[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+
+    return {"total_us": modules.get(module, (0, 0))[1], "modules": modules}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("COLD_START_BUDGET_MS", 3000)))
+    args = parser.parse_args()
+
+    runs = [run_importtime() for _ in range(args.runs)]
+    totals = [run["total_us"] for run in runs]
+    median_ms = statistics.median(totals) / 1000
+
+    last = runs[-1]["modules"]
+    top = sorted(last.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    leaked = [name for name in DEFERRED_MODULES if any(m == name or m.startswith(name + ".") for m in last)]
+
+    report = {
+        "runs": args.runs,
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "max_ms": round(max(totals) / 1000, 1),
+        "budget_ms": args.budget_ms,
+        "deferred_modules_imported": leaked,
+        "top_self_us": [{"module": name, "self_us": s, "cumulative_us": c} for name, (s, c) in top],
+    }
+    print(json.dumps(report, indent=2))
+
+    if median_ms > args.budget_ms or leaked:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
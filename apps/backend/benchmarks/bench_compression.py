@@ -0,0 +1,142 @@
+"""
+Benchmark de compresion de respuestas: ancho de banda y CPU por pagina de 100 elementos.
+
+Serializa una pagina de 100 `ProductListResponse` y otra de 100
+`UserListResponse` (datos sinteticos) y, para cada codificacion disponible
+(gzip siempre; brotli y zstd si estan instalados), mide:
+
+- bytes enviados y relacion de compresion;
+- CPU por compresion (`time.process_time`);
+- CPU por peticion a traves de `CompressionMiddleware` con y sin la cache de
+  cuerpos comprimidos (respuesta con ETag fuerte).
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_compression.py [--items 100] [--iterations 500]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+WORDS = ["cafe", "te", "chocolate", "galletas", "organico", "premium", "molido", "grano", "verde", "pack"]
+
+
+def product_page(rng, items: int) -> bytes:
+    from pydantic import TypeAdapter
+    from products.schemas import ProductListResponse
+
+    page = [
+        ProductListResponse(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            name=" ".join(rng.choice(WORDS) for _ in range(3)).title(),
+            price=rng.randint(100, 500_000),
+            image_url=f"/media/products/{rng.getrandbits(256):064x}/large.webp",
+            stock=rng.randint(0, 200),
+            is_active=True,
+        )
+        for _ in range(items)
+    ]
+    return TypeAdapter(List[ProductListResponse]).dump_json(page)
+
+
+def user_page(rng, items: int) -> bytes:
+    from pydantic import TypeAdapter
+    from users.schemas import UserListResponse
+
+    start = datetime(2024, 1, 1)
+    page = [
+        UserListResponse(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            name=f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+            email=f"user{index}@example.com",
+            role=rng.choice(["client", "client", "admin"]),
+            is_active=True,
+            is_verified=rng.random() < 0.8,
+            created_at=start + timedelta(minutes=rng.randint(0, 500_000)),
+        )
+        for index in range(items)
+    ]
+    return TypeAdapter(List[UserListResponse]).dump_json(page)
+
+
+def cpu_us(call, iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        call()
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+async def middleware_cpu_us(body: bytes, encoding: str, encoders, use_cache: bool, iterations: int) -> float:
+    from shared.middleware import CompressedBodyCache, CompressionMiddleware
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"etag", b'"page-v1"'),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    middleware = CompressionMiddleware(
+        app, encoders={encoding: encoders[encoding]}, offload_size=len(body) + 1,
+        cache=CompressedBodyCache() if use_cache else None
+    )
+    scope = {"type": "http", "headers": [(b"accept-encoding", encoding.encode())]}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.process_time()
+    for _ in range(iterations):
+        await middleware(scope, receive, send)
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from shared.middleware import available_encoders
+
+    rng = random.Random(args.seed)
+    encoders = available_encoders()
+    pages = {"products": product_page(rng, args.items), "users": user_page(rng, args.items)}
+
+    results = {}
+    for page_name, body in pages.items():
+        page = {"identity_bytes": len(body)}
+        for name, encoder in encoders.items():
+            compressed = encoder.compress(body)
+            page[name] = {
+                "bytes": len(compressed),
+                "ratio": round(len(body) / len(compressed), 2),
+                "compress_cpu_us": round(cpu_us(lambda: encoder.compress(body), args.iterations), 1),
+                "middleware_cpu_us": round(asyncio.run(
+                    middleware_cpu_us(body, name, encoders, False, args.iterations)
+                ), 1),
+                "middleware_cached_cpu_us": round(asyncio.run(
+                    middleware_cpu_us(body, name, encoders, True, args.iterations)
+                ), 1),
+            }
+        results[page_name] = page
+
+    print(json.dumps({"items": args.items, "encodings": list(encoders), "pages": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
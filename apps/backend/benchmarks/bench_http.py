@@ -0,0 +1,217 @@
+"""
+Benchmark de carga de la API HTTP sin servidor ni herramientas externas.
+
+Levanta `main.app` con su lifespan, la maneja con un cliente `httpx` asincrono
+sobre ASGI (sin red) y ejecuta cada escenario a niveles fijos de concurrencia.
+Reporta throughput y latencias p50/p95/p99 en JSON junto con el commit actual,
+para comparar corridas entre commits (`--compare anterior.json`).
+
+La base se toma de la configuracion de la app (`.env`) o de `--database-url`;
+si esta vacia se carga con `benchmarks/seed.py`.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_http.py --database-url sqlite:///bench.db --products 100000 \\
+        [--concurrency 1,10,50] [--requests 2000] [--scenarios me,products_list] \\
+        [--output resultados.json] [--compare base.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import seed as dataset
+
+# Cuantos usuarios distintos inician sesion antes de medir (tokens para `/me`)
+TOKEN_POOL = 50
+
+
+async def login(client, context, rng):
+    email = dataset.user_email(rng.randrange(context["users"]))
+    return await client.post("/auth/login", json={"email": email, "password": dataset.BENCH_PASSWORD})
+
+
+async def me(client, context, rng):
+    return await client.get("/me", headers=rng.choice(context["user_headers"]))
+
+
+async def products_list(client, context, rng):
+    skip = rng.randrange(max(1, min(context["products"], 10_000) - 20))
+    return await client.get("/products", params={"skip": skip, "limit": 20})
+
+
+async def products_search(client, context, rng):
+    return await client.get("/products", params={"search": rng.choice(dataset.SEARCH_TERMS), "limit": 20})
+
+
+async def admin_slow_queries(client, context, rng):
+    return await client.get("/admin/queries/slow", headers=context["admin_headers"])
+
+
+async def admin_n_plus_one(client, context, rng):
+    return await client.get("/admin/queries/n-plus-one", headers=context["admin_headers"])
+
+
+SCENARIOS = {
+    "login": login,
+    "me": me,
+    "products_list": products_list,
+    "products_search": products_search,
+    "admin_slow_queries": admin_slow_queries,
+    "admin_n_plus_one": admin_n_plus_one,
+}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """ Percentil por rango mas cercano sobre una lista ordenada """
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def run_level(client, scenario, context, concurrency: int, requests: int, seed_value: int) -> dict:
+    latencies = []
+    errors = [0]
+    remaining = [requests]
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed_value * 1000 + worker_id)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.perf_counter()
+            response = await scenario(client, context, rng)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def authenticate(client, email: str) -> dict:
+    response = await client.post("/auth/login", json={"email": email, "password": dataset.BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(args) -> dict:
+    import httpx
+    from main import app
+    from shared.database import get_engine
+
+    seeded = dataset.seed(get_engine(), args.users, args.categories, args.products, args.seed)
+
+    context = {"users": args.users, "products": args.products}
+    results = {}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            context["user_headers"] = [
+                await authenticate(client, dataset.user_email(index))
+                for index in range(min(args.users, TOKEN_POOL))
+            ]
+            context["admin_headers"] = await authenticate(client, dataset.ADMIN_EMAIL)
+
+            for name in args.scenarios:
+                scenario = SCENARIOS[name]
+                # Calentamiento (caches de rutas, pool de conexiones, sentencias)
+                await run_level(client, scenario, context, 1, min(50, args.requests), args.seed)
+                results[name] = [
+                    await run_level(client, scenario, context, concurrency, args.requests, args.seed)
+                    for concurrency in args.concurrency
+                ]
+
+    return {
+        "commit": current_commit(),
+        "python": sys.version.split()[0],
+        "dataset": {"users": args.users, "categories": args.categories, "products": args.products,
+                    "seeded_now": not seeded.get("skipped", False)},
+        "results": results,
+    }
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """ Cambio relativo de throughput y p95 respecto de otra corrida (positivo = peor en p95) """
+    changes = {}
+    for name, levels in report["results"].items():
+        previous = {level["concurrency"]: level for level in baseline.get("results", {}).get(name, [])}
+        for level in levels:
+            old = previous.get(level["concurrency"])
+            if not old or not old["throughput_rps"] or not old["p95_ms"]:
+                continue
+            changes[f"{name}@{level['concurrency']}"] = {
+                "throughput_change": round(level["throughput_rps"] / old["throughput_rps"] - 1, 3),
+                "p95_change": round(level["p95_ms"] / old["p95_ms"] - 1, 3),
+            }
+    return {"baseline_commit": baseline.get("commit"), "changes": changes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Reemplaza la base configurada en .env")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", default="1,10,50",
+                        type=lambda value: [int(level) for level in value.split(",")])
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por nivel de concurrencia")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [name for name in value.split(",") if name])
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    # Los logs por peticion distorsionan la medicion
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    report = run_report = asyncio.run(run(args))
+    if args.compare:
+        with open(args.compare) as baseline:
+            report = {**run_report, "comparison": compare(run_report, json.load(baseline))}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Benchmark de subidas concurrentes de imagenes de productos.
+
+Levanta `main.app` con su lifespan sobre una base SQLite y un almacenamiento
+local temporales, inicia sesion como administrador y envia `--uploads` subidas
+simultaneas de `--size-mb` MB a `PUT /products/{id}/image` con un cliente
+`httpx` sobre ASGI. Cada cuerpo se genera en streaming a partir de una unica
+imagen JPEG en memoria (con un sufijo distinto tras el marcador de fin para que
+el SHA-256 cambie), asi que el cliente no suma memoria por subida.
+
+Mientras corre muestrea el RSS del proceso; el resultado muestra que el pico
+crece muy por debajo del volumen subido (los cuerpos van a disco por trozos y
+las variantes se generan en el pool de procesos, cuyo pico se reporta aparte).
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_image_uploads.py [--uploads 100] [--size-mb 5] [--duplicates 0]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import seed as dataset
+
+CHUNK = 64 * 1024
+BOUNDARY = "bench-image-boundary"
+
+
+def status_kb(pid, field: str) -> int:
+    """ Campo de /proc/<pid>/status en KB (0 si no esta disponible) """
+    try:
+        with open(f"/proc/{pid}/status") as handle:
+            for line in handle:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def current_rss_mb() -> float:
+    rss = status_kb("self", "VmRSS")
+    if rss == 0:
+        # Sin /proc: el maximo historico es lo mejor disponible
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024
+
+
+def make_jpeg(size_mb: float, seed_value: int) -> bytes:
+    """ JPEG de ruido (comprime mal, asi que pesa de verdad) rellenado hasta `size_mb` """
+    from PIL import Image
+
+    rng = random.Random(seed_value)
+    side = 1600
+    noise = Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3))
+    buffer = io.BytesIO()
+    noise.save(buffer, "JPEG", quality=95)
+    content = buffer.getvalue()
+    target = int(size_mb * 1024 * 1024)
+    # Los decodificadores ignoran lo que sigue al marcador EOI
+    return content + bytes(max(0, target - len(content)))
+
+
+async def multipart_body(image: memoryview, suffix: bytes):
+    yield (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="foto.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    for offset in range(0, len(image), CHUNK):
+        yield bytes(image[offset:offset + CHUNK])
+    yield suffix
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def run(args, workdir: str) -> dict:
+    import httpx
+    from main import app
+    from products.images import get_image_pipeline
+    from products.models import Product
+    from shared.database import SessionLocal, get_engine
+
+    dataset.seed(get_engine(), users=1, categories=1, products=args.uploads, seed_value=args.seed)
+    db = SessionLocal()
+    product_ids = [row.id for row in db.query(Product.id).limit(args.uploads)]
+    db.close()
+
+    image = memoryview(make_jpeg(args.size_mb, args.seed))
+    samples = []
+    sampling = True
+
+    async def sample_rss():
+        while sampling:
+            samples.append(current_rss_mb())
+            await asyncio.sleep(0.01)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            login = await client.post(
+                "/auth/login", json={"email": dataset.ADMIN_EMAIL, "password": dataset.BENCH_PASSWORD}
+            )
+            login.raise_for_status()
+            headers = {
+                "Authorization": f"Bearer {login.json()['access_token']}",
+                "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+            }
+
+            async def upload(index: int, suffix: bytes = None):
+                # Las primeras `duplicates` subidas repiten la misma imagen
+                if suffix is None:
+                    suffix = b"" if index < args.duplicates else index.to_bytes(4, "big")
+                start = time.perf_counter()
+                response = await client.put(
+                    f"/products/{product_ids[index]}/image",
+                    content=multipart_body(image, suffix),
+                    headers=headers,
+                )
+                return response, time.perf_counter() - start
+
+            # Calienta el pool de procesos (arranque de los workers) fuera de la medicion
+            await upload(0, b"warmup")
+
+            baseline = current_rss_mb()
+            sampler = asyncio.create_task(sample_rss())
+            start = time.perf_counter()
+            outcomes = await asyncio.gather(*(upload(index) for index in range(args.uploads)))
+            elapsed = time.perf_counter() - start
+            sampling = False
+            await sampler
+
+            pool = get_image_pipeline().pool
+            worker_peaks = [status_kb(pid, "VmHWM") / 1024 for pid in getattr(pool, "_processes", {}) or {}]
+
+    latencies = sorted(seconds for _, seconds in outcomes)
+    uploaded_mb = args.uploads * len(image) / (1024 * 1024)
+    peak = max(samples + [baseline])
+    return {
+        "uploads": args.uploads,
+        "size_mb": round(len(image) / (1024 * 1024), 2),
+        "uploaded_mb": round(uploaded_mb, 1),
+        "errors": sum(1 for response, _ in outcomes if response.status_code != 200),
+        "deduplicated": sum(
+            1 for response, _ in outcomes if response.status_code == 200 and response.json()["deduplicated"]
+        ),
+        "seconds": round(elapsed, 2),
+        "throughput_mb_s": round(uploaded_mb / elapsed, 1),
+        "p50_s": round(latencies[len(latencies) // 2], 2),
+        "max_s": round(latencies[-1], 2),
+        "rss_baseline_mb": round(baseline, 1),
+        "rss_peak_mb": round(peak, 1),
+        "rss_growth_mb": round(peak - baseline, 1),
+        "image_worker_peak_rss_mb": [round(value, 1) for value in worker_peaks],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--size-mb", type=float, default=5.0)
+    parser.add_argument("--duplicates", type=int, default=0, help="Subidas que repiten la misma imagen")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-images-") as workdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ["OBJECT_STORE_PATH"] = os.path.join(workdir, "store")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ.setdefault("CATALOG_SNAPSHOT_ENABLED", "false")
+        result = asyncio.run(run(args, workdir))
+
+    print(json.dumps(result, indent=2))
+    if result["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de verificacion de tokens JWT por segundo en un solo nucleo.
+
+Compara el llavero cacheado (`shared.keys.KeyRing`) para HS256, ES256 y EdDSA
+contra la ruta anterior de python-jose (HS256, llave re-parseada en cada llamada).
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_jwt.py [--seconds 2]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jose import jwt
+
+from shared.keys import KeyRing, VerificationKey
+
+
+def measure(label: str, verify, seconds: float) -> dict:
+    # Calentamiento para que el cache de cabeceras quede poblado
+    for _ in range(100):
+        verify()
+
+    count = 0
+    start = time.process_time()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            verify()
+        count += 100
+    cpu = time.process_time() - start
+
+    return {"case": label, "verified": count, "per_second_per_core": round(count / cpu)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    claims = {"sub": "1", "email": "bench@example.com", "role": "client", "exp": int(time.time()) + 3600}
+    results = []
+
+    secret = "bench-secret"
+    jose_token = jwt.encode(claims, secret, algorithm="HS256")
+    results.append(measure(
+        "python-jose HS256",
+        lambda: jwt.decode(jose_token, secret, algorithms=["HS256"]),
+        args.seconds
+    ))
+
+    hs_ring = KeyRing(
+        "HS256",
+        signing_key=secret.encode(),
+        verification_keys={None: VerificationKey("HS256", secret.encode())}
+    )
+    hs_token = hs_ring.sign(claims)
+    results.append(measure("KeyRing HS256", lambda: hs_ring.verify(hs_token), args.seconds))
+
+    es_ring = KeyRing.from_keys("ES256", signing_key=ec.generate_private_key(ec.SECP256R1()), kid="es")
+    es_token = es_ring.sign(claims)
+    results.append(measure("KeyRing ES256", lambda: es_ring.verify(es_token), args.seconds))
+
+    ed_ring = KeyRing.from_keys("EdDSA", signing_key=ed25519.Ed25519PrivateKey.generate(), kid="ed")
+    ed_token = ed_ring.sign(claims)
+    results.append(measure("KeyRing EdDSA", lambda: ed_ring.verify(ed_token), args.seconds))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
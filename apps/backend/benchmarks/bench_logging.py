@@ -0,0 +1,109 @@
+"""
+Benchmark del costo del logging en `ProductRepository.get_by_id`.
+
+Ejecuta la misma busqueda contra SQLite en memoria con tres configuraciones:
+
+- `disabled`: logger raiz en WARNING (produccion tipica para estos modulos).
+- `structured`: INFO con `configure_logging` (cola + listener) y muestreo.
+- `legacy_fstring`: el patron anterior, `logger.info(f"...")` con un
+  `StreamHandler` sincrono, para comparar.
+
+Reporta microsegundos por llamada. La salida de los logs se descarta.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_logging.py [--calls 20000]
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from categories.models import Category
+from products.models import Product
+from products.repository import ProductRepository
+from shared.database import Base
+from shared.log import configure_logging, stop_logging
+
+
+class NullStream(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+
+def make_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    category = Category(name="Bebidas")
+    db.add(category)
+    db.flush()
+    product = Product(name="Cafe", price=100, stock=5, category_id=category.id)
+    db.add(product)
+    db.commit()
+    return db, product.id
+
+
+async def run(repository, product_id, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        await repository.get_by_id(product_id)
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+async def run_legacy(db, product_id, calls: int) -> float:
+    """ Misma consulta con el logging anterior (f-strings evaluados siempre) """
+    logger = logging.getLogger("products.repository.legacy")
+    start = time.perf_counter()
+    for _ in range(calls):
+        logger.info(f"Buscando producto por ID: {product_id}")
+        product = db.query(Product).filter(Product.id == product_id).first()
+        logger.info(f"Producto encontrado: {product.id}")
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    db, product_id = make_session()
+    repository = ProductRepository(db)
+    loop = asyncio.new_event_loop()
+    root = logging.getLogger()
+
+    root.setLevel(logging.WARNING)
+    loop.run_until_complete(run(repository, product_id, 1000))
+    disabled_us = loop.run_until_complete(run(repository, product_id, args.calls))
+
+    configure_logging("INFO", json_output=True, sample_every=100, stream=NullStream())
+    structured_us = loop.run_until_complete(run(repository, product_id, args.calls))
+    stop_logging()
+    root.handlers.clear()
+
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.StreamHandler(NullStream()))
+    legacy_us = loop.run_until_complete(run_legacy(db, product_id, args.calls))
+    root.handlers.clear()
+    loop.close()
+
+    print(json.dumps({
+        "calls": args.calls,
+        "disabled_us_per_call": round(disabled_us, 2),
+        "structured_us_per_call": round(structured_us, 2),
+        "legacy_fstring_us_per_call": round(legacy_us, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
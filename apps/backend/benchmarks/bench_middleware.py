@@ -0,0 +1,80 @@
+"""
+Benchmark del costo por peticion de `InstrumentationMiddleware`.
+
+Llama directamente a una app ASGI minima (sin servidor ni red) con y sin el
+middleware y reporta la diferencia en microsegundos por peticion. El objetivo
+es mantenerla por debajo de 50 µs.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_middleware.py [--requests 50000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from shared.metrics import MetricsRegistry
+from shared.middleware import InstrumentationMiddleware
+
+OVERHEAD_BUDGET_US = 50
+
+
+class FakeRoute:
+    path = "/products/{product_id}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = FakeRoute
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"id": 1, "name": "producto"}'})
+
+
+async def run(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/products/1", "headers": []}
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50_000)
+    args = parser.parse_args()
+
+    instrumented = InstrumentationMiddleware(endpoint, registry=MetricsRegistry())
+
+    loop = asyncio.new_event_loop()
+    # Calentamiento
+    loop.run_until_complete(run(endpoint, 1000))
+    loop.run_until_complete(run(instrumented, 1000))
+
+    bare_us = loop.run_until_complete(run(endpoint, args.requests))
+    instrumented_us = loop.run_until_complete(run(instrumented, args.requests))
+    loop.close()
+
+    overhead_us = instrumented_us - bare_us
+    print(json.dumps({
+        "requests": args.requests,
+        "bare_us_per_request": round(bare_us, 2),
+        "instrumented_us_per_request": round(instrumented_us, 2),
+        "overhead_us_per_request": round(overhead_us, 2),
+        "budget_us": OVERHEAD_BUDGET_US,
+        "within_budget": overhead_us < OVERHEAD_BUDGET_US,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark de las consultas por precio sobre un catalogo grande.
+
+Siembra productos (1M por defecto) y compara, con consultas por segundo:
+
+- `unbounded_range`: la consulta anterior, todo el rango sin LIMIT.
+- `keyset_page`: una pagina de `get_by_price_range` con cursor sobre `(price, id)`.
+- `category_keyset_page`: lo mismo filtrando por categoria y stock (`(category_id, price, id)`).
+- `most_expensive`: top-N con el indice recorrido al reves.
+- `histogram_per_bucket` / `histogram_one_pass`: un COUNT por bucket contra un GROUP BY.
+- `snapshot_*`: las mismas consultas con `bisect` sobre el indice del catalogo en memoria.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_price_queries.py [--products 1000000] [--seconds 2] [--database-url ...]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import seed as dataset
+
+RANGE_WIDTH = 20_000
+BUCKET_SIZE = 50_000
+
+
+def qps(call, seconds: float, seed_value: int) -> float:
+    rng = random.Random(seed_value)
+    calls = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        call(rng)
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    from sqlalchemy import create_engine, func
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from products.catalog import CatalogSnapshot
+    from products.models import Product
+    from products.repository import ProductRepository
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    start = time.perf_counter()
+    dataset.seed(engine, users=1, products=args.products, seed_value=args.seed, reset=args.database_url is None)
+    seed_seconds = time.perf_counter() - start
+
+    db = sessionmaker(bind=engine)()
+    repository = ProductRepository(db)
+    categories = [row[0] for row in db.query(Product.category_id).distinct()]
+    max_price = db.query(func.max(Product.price)).scalar()
+    cursors = [(row.price, row.id) for row in db.query(Product.price, Product.id).limit(1000)]
+
+    snapshot = CatalogSnapshot()
+    start = time.perf_counter()
+    snapshot.refresh(db)
+    build_seconds = time.perf_counter() - start
+
+    def run(result):
+        if asyncio.iscoroutine(result):
+            result = asyncio.run(result)
+        db.expunge_all()
+        return result
+
+    def random_range(rng):
+        low = rng.randint(0, max_price)
+        return low, low + RANGE_WIDTH
+
+    def unbounded_range(rng):
+        low, high = random_range(rng)
+        db.query(Product).filter(Product.price >= low, Product.price <= high).all()
+        db.expunge_all()
+
+    def histogram_per_bucket(rng):
+        for bucket in range(max_price // BUCKET_SIZE + 1):
+            db.query(func.count(Product.id)).filter(
+                Product.is_active == True,  # noqa: E712
+                Product.price >= bucket * BUCKET_SIZE,
+                Product.price < (bucket + 1) * BUCKET_SIZE
+            ).scalar()
+
+    scenarios = {
+        "unbounded_range": unbounded_range,
+        "keyset_page": lambda rng: run(repository.get_by_price_range(
+            *random_range(rng), limit=args.limit, after=rng.choice(cursors)
+        )),
+        "category_keyset_page": lambda rng: run(repository.get_by_price_range(
+            *random_range(rng), category_id=rng.choice(categories), in_stock=True, limit=args.limit
+        )),
+        "most_expensive": lambda rng: run(repository.get_most_expensive(args.limit)),
+        "histogram_per_bucket": histogram_per_bucket,
+        "histogram_one_pass": lambda rng: run(repository.price_histogram(BUCKET_SIZE)),
+        "snapshot_keyset_page": lambda rng: snapshot.price_range(
+            *random_range(rng), limit=args.limit, after=rng.choice(cursors)
+        ),
+        "snapshot_category_keyset_page": lambda rng: snapshot.price_range(
+            *random_range(rng), category_ids={rng.choice(categories)}, in_stock=True, limit=args.limit
+        ),
+        "snapshot_histogram": lambda rng: snapshot.price_histogram(BUCKET_SIZE),
+    }
+
+    results = {name: round(qps(call, args.seconds, args.seed), 1) for name, call in scenarios.items()}
+
+    print(json.dumps({
+        "products": args.products,
+        "seed_seconds": round(seed_seconds, 1),
+        "snapshot_build_seconds": round(build_seconds, 2),
+        "qps": results,
+        "speedup": {
+            "keyset_vs_unbounded": round(results["keyset_page"] / results["unbounded_range"], 1),
+            "histogram_one_pass_vs_per_bucket": round(
+                results["histogram_one_pass"] / results["histogram_per_bucket"], 1
+            ),
+            "snapshot_vs_database_page": round(results["snapshot_keyset_page"] / results["keyset_page"], 1),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
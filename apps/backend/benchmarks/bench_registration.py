@@ -0,0 +1,153 @@
+"""
+Benchmark de registros por segundo: INSERT ... ON CONFLICT contra consultar y luego insertar.
+
+Lanza `--registrations` registros con `--concurrency` en vuelo (cada uno con
+su propia sesion, como una peticion) y una fraccion `--duplicates` de correos
+repetidos, por dos caminos:
+
+- `single_insert`: `UserAuthService.create_user` (bcrypt en un hilo y un solo
+  `INSERT ... ON CONFLICT (email) DO NOTHING RETURNING`).
+- `check_then_insert`: el camino anterior (SELECT en el servicio, SELECT en
+  el repositorio, bcrypt en el event loop, INSERT y SELECT del refresh).
+
+Mide registros por segundo, sentencias por registro, duplicados rechazados,
+errores de integridad y el mayor retraso del event loop (un tick cada 10 ms):
+con bcrypt en el loop ese retraso es lo que esperan las demas peticiones.
+
+`--rounds` baja el costo de bcrypt para medir solo la base de datos.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_registration.py [--registrations 200] [--concurrency 16] [--rounds 12]
+    python benchmarks/bench_registration.py --database-url postgresql://...
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+PASSWORD = "ClaveSegura1"
+
+
+async def check_then_insert(session, user_data) -> None:
+    """ Registro como era antes de `INSERT ... ON CONFLICT` """
+    from auth.models import User
+    from shared.security import hash_password
+    from users.exceptions import EmailAlreadyExistsException
+
+    for _ in range(2):
+        if session.query(User).filter(User.email == user_data.email).first():
+            raise EmailAlreadyExistsException(user_data.email)
+    user = User(name=user_data.name, email=user_data.email, password=hash_password(user_data.password),
+                role=user_data.role)
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+
+
+async def single_insert(session, user_data) -> None:
+    from auth.repository import UserAuthRepository
+    from auth.service import UserAuthService
+
+    await UserAuthService(UserAuthRepository(session)).create_user(user_data)
+
+
+async def watch_loop(stop: asyncio.Event, lags: list) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(0.01)
+        lags.append(loop.time() - start - 0.01)
+
+
+async def run_case(register, session_factory, emails, concurrency: int) -> dict:
+    from users.exceptions import EmailAlreadyExistsException
+
+    counts = {"created": 0, "duplicates": 0, "integrity_errors": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(email):
+        from auth.schemas import UserRegister
+
+        async with semaphore:
+            session = session_factory()
+            try:
+                await register(session, UserRegister(name="Bench", email=email, password=PASSWORD))
+                counts["created"] += 1
+            except EmailAlreadyExistsException:
+                counts["duplicates"] += 1
+            except IntegrityError:
+                session.rollback()
+                counts["integrity_errors"] += 1
+            finally:
+                session.close()
+
+    stop, lags = asyncio.Event(), []
+    watcher = asyncio.create_task(watch_loop(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(email) for email in emails))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await watcher
+
+    return {**counts, "per_second": round(len(emails) / elapsed, 1),
+            "max_loop_lag_ms": round(max(lags, default=0) * 1000, 1)}
+
+
+async def run(args) -> dict:
+    import shared.security
+    from passlib.context import CryptContext
+    from auth.models import Base
+
+    if args.rounds is not None:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+        shared.security.get_pwd_context = lambda: context
+
+    results = {}
+    for name, register in (("single_insert", single_insert), ("check_then_insert", check_then_insert)):
+        with tempfile.TemporaryDirectory() as directory:
+            url = args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            engine = create_engine(url, connect_args={"timeout": 30} if url.startswith("sqlite") else {})
+            Base.metadata.create_all(engine)
+            statements = []
+            event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+            # Una fraccion de correos repetidos, mezclados con los nuevos
+            unique = [f"{uuid.uuid4().hex}@bench.example.com" for _ in range(args.registrations)]
+            repeated = int(args.registrations * args.duplicates)
+            emails = unique[:args.registrations - repeated] + unique[:repeated]
+
+            result = await run_case(register, sessionmaker(bind=engine), emails, args.concurrency)
+            result["statements_per_registration"] = round(len(statements) / len(emails), 2)
+            results[name] = result
+            if args.database_url:
+                Base.metadata.drop_all(engine)
+            engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Base real (se crean y borran las tablas)")
+    parser.add_argument("--registrations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Fraccion de correos repetidos")
+    parser.add_argument("--rounds", type=int, default=None, help="Rondas de bcrypt (por defecto las de passlib)")
+    args = parser.parse_args()
+
+    print(json.dumps({"registrations": args.registrations, "concurrency": args.concurrency,
+                      "results": asyncio.run(run(args))}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Microbenchmark de los repositorios contra SQLite en memoria (o una base real).
+
+Ejecuta cada metodo de `ProductRepository`, `UserRepository` y
+`UserAuthRepository` sobre un conjunto de datos sembrado con
+`benchmarks/seed.py` y mide por llamada:
+
+- sentencias SQL ejecutadas (eventos del engine),
+- filas materializadas como objetos ORM (evento `load` de los modelos),
+- memoria asignada (pico de `tracemalloc`, en una pasada aparte),
+- tiempo de pared y de CPU.
+
+Con `--check` compara contra `benchmarks/repository_budgets.json` y sale con
+codigo 1 si un metodo ejecuta mas sentencias, materializa mas filas o asigna
+mas memoria (con tolerancia) que su presupuesto. `--update-budgets` reescribe
+el archivo con los valores actuales.
+
+Los tipos `UUID` de PostgreSQL se emulan en SQLite como CHAR(32), asi que los
+modelos se usan sin cambios.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_repositories.py [--iterations 200] [--check] [--update-budgets]
+    python benchmarks/bench_repositories.py --database-url postgresql://... --check
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import seed as dataset
+
+BUDGETS_PATH = os.path.join(BENCH_DIR, "repository_budgets.json")
+
+# Margen sobre el presupuesto de memoria (las asignaciones varian entre versiones)
+ALLOCATION_TOLERANCE = 0.25
+
+DATASET = {"users": 20, "categories": 5, "products": 2000}
+
+
+def product_cases(repos, data):
+    repo = repos["products"]
+    return {
+        "ProductRepository.get_by_id": lambda: repo.get_by_id(data["product_id"]),
+        "ProductRepository.get_by_name": lambda: repo.get_by_name(data["product_name"]),
+        "ProductRepository.check_stock": lambda: repo.check_stock(data["product_id"]),
+        "ProductRepository.get_in_stock": lambda: repo.get_in_stock(0, 10),
+        "ProductRepository.get_out_of_stock": lambda: repo.get_out_of_stock(0, 10),
+        "ProductRepository.low_stock": lambda: repo.low_stock(5),
+        "ProductRepository.list_products": lambda: repo.list_products(0, 20),
+        "ProductRepository.list_products[search]": lambda: repo.list_products(0, 20, "cafe"),
+        "ProductRepository.count_products": lambda: repo.count_products(),
+        "ProductRepository.get_by_price_range": lambda: repo.get_by_price_range(1000, 2000),
+        "ProductRepository.get_by_price_range[cursor]": lambda: repo.get_by_price_range(
+            limit=20, after=data["price_cursor"]
+        ),
+        "ProductRepository.price_histogram": lambda: repo.price_histogram(5000),
+        "ProductRepository.get_most_expensive": lambda: repo.get_most_expensive(10),
+    }
+
+
+def user_cases(repos, data):
+    repo = repos["users"]
+    return {
+        "UserRepository.get_by_id": lambda: repo.get_by_id(data["user_id"]),
+        "UserRepository.get_by_email": lambda: repo.get_by_email(data["user_email"]),
+        "UserRepository.list_users": lambda: repo.list_users(0, 10),
+        "UserRepository.list_users[search]": lambda: repo.list_users(0, 10, "user1"),
+    }
+
+
+def auth_cases(repos, data):
+    from auth.schemas import UserRegister
+
+    repo = repos["auth"]
+    expires_at = datetime.utcnow() + timedelta(days=1)
+    return {
+        "UserAuthRepository.get_by_email": lambda: repo.get_by_email(data["user_email"]),
+        "UserAuthRepository.create_refresh_token": lambda: repo.create_refresh_token(
+            data["user_id"], uuid.uuid4().hex, uuid.uuid4(), expires_at
+        ),
+        "UserAuthRepository.revoke_access_token": lambda: repo.revoke_access_token(uuid.uuid4().hex, expires_at),
+        # Hash fijo: se mide el INSERT, no bcrypt
+        "UserAuthRepository.create_user": lambda: repo.create_user(
+            UserRegister(name="Bench", email=f"{uuid.uuid4().hex}@bench.example.com", password="x" * 8),
+            data["user_password"]
+        ),
+    }
+
+
+class Counters:
+    """ Sentencias y objetos ORM cargados mientras esta activo """
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+
+    def on_execute(self, *args):
+        self.statements += 1
+
+    def on_load(self, *args):
+        self.rows += 1
+
+
+def install_counters(engine, counters: Counters) -> None:
+    from sqlalchemy import event
+    from shared.database import Base
+
+    event.listen(engine, "before_cursor_execute", counters.on_execute)
+    event.listen(Base, "load", counters.on_load, propagate=True)
+
+
+async def call(factory):
+    result = factory()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def measure(session, counters: Counters, factory, iterations: int) -> dict:
+    # Calentamiento: cache de sentencias compiladas y de mappers
+    for _ in range(3):
+        session.expunge_all()
+        await call(factory)
+
+    statements = rows = 0
+    wall = cpu = 0.0
+    for _ in range(iterations):
+        # Sin identity map, cada llamada materializa sus filas como en una peticion nueva
+        session.expunge_all()
+        counters.statements = counters.rows = 0
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        await call(factory)
+        wall += time.perf_counter() - wall_start
+        cpu += time.process_time() - cpu_start
+        statements = max(statements, counters.statements)
+        rows = max(rows, counters.rows)
+
+    session.expunge_all()
+    tracemalloc.start()
+    await call(factory)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "statements": statements,
+        "rows": rows,
+        "allocated_kb": round(peak / 1024, 1),
+        "wall_us": round(wall / iterations * 1_000_000, 1),
+        "cpu_us": round(cpu / iterations * 1_000_000, 1),
+    }
+
+
+def check(results: dict, budgets: dict) -> list:
+    """ Metodos que superan su presupuesto de sentencias, filas o memoria """
+    failures = []
+    for name, result in results.items():
+        budget = budgets.get(name)
+        if budget is None:
+            failures.append(f"{name}: sin presupuesto (ejecutar con --update-budgets)")
+            continue
+        for metric in ("statements", "rows"):
+            if result[metric] > budget[metric]:
+                failures.append(f"{name}: {metric} {result[metric]} > {budget[metric]}")
+        allowed_kb = budget["allocated_kb"] * (1 + ALLOCATION_TOLERANCE)
+        if result["allocated_kb"] > allowed_kb:
+            failures.append(f"{name}: allocated_kb {result['allocated_kb']} > {allowed_kb:.1f}")
+    return failures
+
+
+def make_engine(database_url):
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+
+    if database_url:
+        return create_engine(database_url)
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+async def run(args) -> dict:
+    from sqlalchemy.orm import sessionmaker
+    from auth.models import User
+    from auth.repository import UserAuthRepository
+    from products.models import Product
+    from products.repository import ProductRepository
+    from users.repository import UserRepository
+
+    engine = make_engine(args.database_url)
+    dataset.seed(engine, **DATASET, reset=args.database_url is None)
+    session = sessionmaker(bind=engine, autoflush=False)()
+
+    user = session.query(User).filter(User.email == dataset.user_email(1)).one()
+    product = session.query(Product).order_by(Product.name).first()
+    cheapest = session.query(Product).order_by(Product.price, Product.id).first()
+    data = {"user_id": user.id, "user_email": user.email, "user_password": user.password, "product_id": product.id, "product_name": product.name,
+            "price_cursor": (cheapest.price, cheapest.id)}
+    repos = {
+        "products": ProductRepository(session),
+        "users": UserRepository(session),
+        "auth": UserAuthRepository(session),
+    }
+
+    counters = Counters()
+    install_counters(engine, counters)
+
+    cases = {**product_cases(repos, data), **user_cases(repos, data), **auth_cases(repos, data)}
+    selected = {name: factory for name, factory in cases.items() if not args.only or args.only in name}
+
+    results = {}
+    for name, factory in selected.items():
+        results[name] = await measure(session, counters, factory, args.iterations)
+
+    session.close()
+    engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Base real en lugar de SQLite en memoria")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--only", default=None, help="Solo los metodos cuyo nombre contiene este texto")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--update-budgets", action="store_true")
+    args = parser.parse_args()
+
+    # Los logs de los repositorios no deben contar en tiempo ni memoria
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    results = asyncio.run(run(args))
+    report = {"dataset": DATASET, "iterations": args.iterations, "results": results}
+
+    if args.update_budgets:
+        budgets = {
+            name: {key: result[key] for key in ("statements", "rows", "allocated_kb")}
+            for name, result in results.items()
+        }
+        with open(BUDGETS_PATH, "w") as handle:
+            json.dump(budgets, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+
+    failures = []
+    if args.check:
+        with open(BUDGETS_PATH) as handle:
+            failures = check(results, json.load(handle))
+        report["failures"] = failures
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
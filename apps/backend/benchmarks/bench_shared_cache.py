@@ -0,0 +1,136 @@
+"""
+Benchmark de la cache compartida entre workers frente a una cache por proceso.
+
+Lanza N procesos (8 por defecto, como `uvicorn --workers 8`) que leen cuerpos
+de detalle de producto sinteticos (~1 KB) con popularidad Zipf. Cada fallo
+"carga" el cuerpo y lo guarda en la cache. Compara:
+
+- `local`: un `LocalCache` de `--cache-mb` por worker (N copias);
+- `shared`: un solo `SharedMemoryCache` de `--cache-mb` para todos.
+
+Reporta la tasa de aciertos total y la memoria de los workers: la suma de RSS
+cuenta las paginas compartidas una vez por proceso, la suma de PSS (Linux,
+`/proc/self/smaps_rollup`) las reparte y es la memoria real del conjunto;
+`cache_pss_mb_total` es la parte que crecio desde antes de crear la cache.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_shared_cache.py [--workers 8] [--keys 20000] [--requests 50000] [--cache-mb 16]
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def memory_kb() -> dict:
+    """ Rss y Pss del proceso en KB (0 si no hay `/proc`) """
+    values = {"rss": 0, "pss": 0}
+    try:
+        with open("/proc/self/smaps_rollup") as rollup:
+            for line in rollup:
+                name, _, rest = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    values[name.lower()] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def payload(key: int, size: int) -> bytes:
+    seed = hashlib.blake2b(str(key).encode(), digest_size=32).digest()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+def worker(backend: str, path: str, args, barrier, results) -> None:
+    from shared.cache import LocalCache, SharedMemoryCache
+
+    baseline = memory_kb()
+    cache_bytes = args.cache_mb * 1024 * 1024
+    if backend == "shared":
+        cache = SharedMemoryCache(path, cache_bytes, slot_size=args.slot_bytes)
+    else:
+        cache = LocalCache(cache_bytes)
+
+    rng = random.Random(args.seed + os.getpid())
+    cumulative, total = [], 0.0
+    for rank in range(1, args.keys + 1):
+        total += 1.0 / rank ** args.zipf
+        cumulative.append(total)
+
+    barrier.wait()
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        key = bisect.bisect_left(cumulative, rng.random() * total)
+        name = f"body:product:{key}"
+        if cache.get(name) is not None:
+            hits += 1
+        else:
+            cache.set(name, payload(key, rng.randint(args.min_bytes, args.max_bytes)))
+    elapsed = time.perf_counter() - start
+    final = memory_kb()
+    results.put({
+        "hits": hits, "elapsed": elapsed, "rss": final["rss"], "pss": final["pss"],
+        "cache_pss": final["pss"] - baseline["pss"],
+    })
+
+
+def run(backend: str, args) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(args.workers)
+    results = ctx.Queue()
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        path = os.path.join(tmp, "bench-cache")
+        processes = [
+            ctx.Process(target=worker, args=(backend, path, args, barrier, results))
+            for _ in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        rows = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    lookups = args.requests * args.workers
+    hits = sum(row["hits"] for row in rows)
+    return {
+        "hit_rate": round(hits / lookups, 4),
+        "rss_mb_total": round(sum(row["rss"] for row in rows) / 1024, 1),
+        "pss_mb_total": round(sum(row["pss"] for row in rows) / 1024, 1),
+        "cache_pss_mb_total": round(sum(row["cache_pss"] for row in rows) / 1024, 1),
+        "lookups_per_second": round(lookups / max(row["elapsed"] for row in rows)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--keys", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=50000, help="Lecturas por worker")
+    parser.add_argument("--zipf", type=float, default=1.0)
+    parser.add_argument("--min-bytes", type=int, default=600)
+    parser.add_argument("--max-bytes", type=int, default=1500)
+    parser.add_argument("--cache-mb", type=int, default=16)
+    parser.add_argument("--slot-bytes", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = {backend: run(backend, args) for backend in ("local", "shared")}
+    print(json.dumps({
+        "workers": args.workers, "keys": args.keys, "requests_per_worker": args.requests,
+        "cache_mb": args.cache_mb, "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark de suscriptores de stock en vivo: memoria y CPU con conexiones inactivas.
+
+Modo en proceso (por defecto): crea `--subscribers` conexiones simuladas
+atendidas por `serve_stock_subscriber` (mismo codigo que el endpoint, con un
+WebSocket en memoria), cada una suscrita a `--topics` productos de un catalogo
+de `--products`. Mide:
+
+- memoria por suscriptor (RSS antes y despues de conectar);
+- CPU del proceso durante `--idle` segundos sin cambios de stock;
+- una rafaga de `--burst` cambios repartidos en productos populares: ticks,
+  mensajes enviados, valores intermedios descartados y tiempo de reparto.
+
+Modo real (`--url ws://host:8000/products/stock/ws --pid <pid del worker>`):
+abre conexiones WebSocket reales contra un worker en marcha y mide el RSS y
+la CPU de ese proceso mientras estan inactivas. El limite de descriptores
+(`ulimit -n`) del cliente y del servidor debe cubrir las conexiones.
+
+Uso:
+    cd apps/backend
+    python benchmarks/bench_stock_feed.py [--subscribers 50000] [--idle 10]
+    python benchmarks/bench_stock_feed.py --url ws://localhost:8000/products/stock/ws --pid 1234 --subscribers 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+import uuid
+
+from starlette.websockets import WebSocketDisconnect
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def rss_mb(pid: str = "self") -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def cpu_seconds(pid: str = "self") -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class IdleWebSocket:
+    """ Cliente que se suscribe una vez y despues solo recibe hasta que `hang_up` se activa """
+
+    def __init__(self, subscribe, hang_up: asyncio.Event):
+        self.subscribe = subscribe
+        self.hang_up = hang_up
+        self.received = 0
+
+    async def receive_json(self):
+        if self.subscribe is not None:
+            message, self.subscribe = {"subscribe": self.subscribe}, None
+            return message
+        await self.hang_up.wait()
+        raise WebSocketDisconnect(1000)
+
+    async def send_json(self, message):
+        self.received += 1
+
+    async def close(self, code=1000):
+        pass
+
+
+async def in_process(args) -> dict:
+    from products.stock_feed import StockFeed, serve_stock_subscriber
+
+    rng = random.Random(args.seed)
+    catalog = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(args.products)]
+    stocks = {product_id: rng.randint(0, 100) for product_id in catalog}
+
+    feed = StockFeed()
+    feed.bind(asyncio.get_running_loop(), None)
+    # Sin base de datos: el stock sale del diccionario en memoria
+    feed.load = lambda product_ids: {product_id: stocks[product_id] for product_id in product_ids}
+
+    before = rss_mb()
+    hang_up = asyncio.Event()
+    sockets = [IdleWebSocket(rng.sample(catalog, args.topics), hang_up) for _ in range(args.subscribers)]
+    tasks = [asyncio.create_task(serve_stock_subscriber(ws, args.topics, 5.0, feed)) for ws in sockets]
+    while sum(ws.received for ws in sockets) < args.subscribers:
+        await asyncio.sleep(0.1)
+    # Las tareas terminan de procesar la suscripcion antes de medir la inactividad
+    await asyncio.sleep(2)
+    connected = rss_mb()
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.sleep(args.idle)
+    idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+    received_before = sum(ws.received for ws in sockets)
+    subscribers = {subscriber for topic in feed.topics.values() for subscriber in topic}
+    popular = catalog[:max(1, args.products // 100)]
+    start = time.perf_counter()
+    ticks = 0
+    for index in range(args.burst):
+        product_id = popular[index % len(popular)]
+        stocks[product_id] = max(0, stocks[product_id] - 1)
+        feed._mark(frozenset([product_id]))
+        if index % args.writes_per_tick == args.writes_per_tick - 1:
+            feed.publish(feed.load(feed.take_dirty()))
+            ticks += 1
+            await asyncio.sleep(0)
+    feed.publish(feed.load(feed.take_dirty()))
+    ticks += 1
+    while any(subscriber.pending for subscriber in subscribers):
+        await asyncio.sleep(0.01)
+    fan_out_ms = (time.perf_counter() - start) * 1000
+
+    hang_up.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {
+        "subscribers": args.subscribers,
+        "rss_mb_before": round(before, 1),
+        "rss_mb_connected": round(connected, 1),
+        "kb_per_subscriber": round((connected - before) * 1024 / args.subscribers, 2),
+        "idle_cpu_percent": round(idle_cpu * 100, 2),
+        "burst_writes": args.burst,
+        "burst_ticks": ticks,
+        "messages_sent": sum(ws.received for ws in sockets) - received_before,
+        "intermediate_values_dropped": sum(subscriber.dropped for subscriber in subscribers),
+        "fan_out_ms": round(fan_out_ms, 1),
+    }
+
+
+async def against_server(args) -> dict:
+    import websockets
+
+    rng = random.Random(args.seed)
+    product_ids = args.product_ids.split(",") if args.product_ids else []
+    connections = []
+    before = rss_mb(args.pid)
+    for _ in range(args.subscribers):
+        connection = await websockets.connect(args.url, max_queue=4)
+        if product_ids:
+            await connection.send(json.dumps({"subscribe": rng.sample(product_ids, min(args.topics, len(product_ids)))}))
+        connections.append(connection)
+    connected = rss_mb(args.pid)
+
+    cpu_start, wall_start = cpu_seconds(args.pid), time.perf_counter()
+    await asyncio.sleep(args.idle)
+    idle_cpu = (cpu_seconds(args.pid) - cpu_start) / (time.perf_counter() - wall_start)
+
+    await asyncio.gather(*(connection.close() for connection in connections), return_exceptions=True)
+    return {
+        "subscribers": args.subscribers,
+        "server_rss_mb_before": round(before, 1),
+        "server_rss_mb_connected": round(connected, 1),
+        "server_kb_per_subscriber": round((connected - before) * 1024 / args.subscribers, 2),
+        "server_idle_cpu_percent": round(idle_cpu * 100, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=50000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--topics", type=int, default=3, help="Productos por suscriptor")
+    parser.add_argument("--idle", type=float, default=10.0, help="Segundos inactivos medidos")
+    parser.add_argument("--burst", type=int, default=10000, help="Cambios de stock en la rafaga")
+    parser.add_argument("--writes-per-tick", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="Endpoint WebSocket de un worker en marcha")
+    parser.add_argument("--pid", help="PID del worker (modo real)")
+    parser.add_argument("--product-ids", help="IDs separados por coma (modo real)")
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    if args.url:
+        if not args.pid:
+            parser.error("--url requiere --pid")
+        result = asyncio.run(against_server(args))
+    else:
+        result = asyncio.run(in_process(args))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
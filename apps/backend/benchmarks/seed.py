@@ -0,0 +1,143 @@
+"""
+Carga un conjunto de datos sintetico y reproducible para los benchmarks.
+
+Crea las tablas si no existen e inserta usuarios (todos con la misma
+contrasena), un administrador, categorias y productos en lotes con
+`executemany`. Los datos dependen solo de `--seed`, asi que dos corridas con
+los mismos parametros producen la misma base.
+
+Uso:
+    cd apps/backend
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --products 1000000 [--reset]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+BENCH_PASSWORD = "Bench-Passw0rd!"
+ADMIN_EMAIL = "admin@bench.example.com"
+SEARCH_TERMS = ("cafe", "te", "chocolate", "galleta", "jugo", "queso", "pan", "arroz")
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@bench.example.com"
+
+
+def import_models():
+    """ Registra todos los modelos en `Base.metadata` """
+    import auth.models  # noqa: F401
+    import categories.models  # noqa: F401
+    import products.models  # noqa: F401
+    from shared.database import Base
+    return Base
+
+
+def seed(engine, users: int = 1000, categories: int = 50, products: int = 1_000_000,
+         seed_value: int = 42, batch_size: int = 10_000, reset: bool = False) -> dict:
+    """
+        Crea las tablas y carga el conjunto de datos si la base esta vacia.
+
+        Args:
+            engine: Engine de SQLAlchemy destino.
+            users (int): Usuarios normales (`user<i>@bench.example.com`).
+            categories (int): Numero de categorias.
+            products (int): Numero de productos.
+            seed_value (int): Semilla del generador.
+            batch_size (int): Filas por `executemany`.
+            reset (bool): Borra y recrea las tablas antes de cargar.
+
+        Returns:
+            dict: Filas por tabla y segundos empleados.
+    """
+    from auth.models import User
+    from categories.models import Category
+    from categories.repository import CategoryRepository
+    from products.models import Product
+    from shared.security import hash_password
+
+    Base = import_models()
+    if reset:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(User.__table__)).scalar():
+            return {"skipped": True}
+
+        rng = random.Random(seed_value)
+        now = datetime.utcnow()
+        # bcrypt es lento a proposito: un solo hash compartido por todos los usuarios
+        password = hash_password(BENCH_PASSWORD)
+
+        user_rows = [
+            {"id": uuid.UUID(int=rng.getrandbits(128)), "email": user_email(index), "password": password,
+             "name": f"Usuario {index}", "role": "user", "is_active": True, "is_verified": True,
+             "created_at": now, "updated_at": now}
+            for index in range(users)
+        ]
+        user_rows.append(
+            {"id": uuid.UUID(int=rng.getrandbits(128)), "email": ADMIN_EMAIL, "password": password,
+             "name": "Admin", "role": "admin", "is_active": True, "is_verified": True,
+             "created_at": now, "updated_at": now}
+        )
+        conn.execute(insert(User.__table__), user_rows)
+
+        category_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(categories)]
+        conn.execute(insert(Category.__table__), [
+            {"id": category_id, "name": f"Categoria {index}", "is_active": True, "created_at": now}
+            for index, category_id in enumerate(category_ids)
+        ])
+
+        for offset in range(0, products, batch_size):
+            conn.execute(insert(Product.__table__), [
+                {"id": uuid.UUID(int=rng.getrandbits(128)),
+                 "name": f"{rng.choice(SEARCH_TERMS)} {index}",
+                 "description": None,
+                 "price": rng.randint(100, 500_000),
+                 "stock": rng.randint(0, 200),
+                 "is_active": True,
+                 "created_at": now,
+                 "category_id": rng.choice(category_ids)}
+                for index in range(offset, min(offset + batch_size, products))
+            ])
+
+    # Las filas se insertaron sin el ORM: cierre de la jerarquia y conteos por categoria
+    with Session(engine) as session:
+        CategoryRepository(session).rebuild_hierarchy()
+
+    return {
+        "users": users + 1,
+        "categories": categories,
+        "products": products,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true")
+    args = parser.parse_args()
+
+    from shared.database import get_engine
+
+    result = seed(get_engine(), args.users, args.categories, args.products, args.seed, reset=args.reset)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
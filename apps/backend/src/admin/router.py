@@ -0,0 +1,70 @@
+"""
+Router de herramientas administrativas.
+
+Expone diagnósticos de rendimiento del proceso (consultas lentas y patrones N+1).
+Todos los endpoints requieren rol de administrador.
+"""
+
+from typing import List
+from fastapi import APIRouter, Depends, Query, status
+from auth.models import User
+from auth.dependencies import get_admin_required
+from admin.schemas import SlowQueryResponse, NPlusOneResponse
+from admin.service import AdminService, get_admin_service
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# ==================== DIAGNOSTICO DE CONSULTAS ==================== #
+
+@router.get("/queries/slow", response_model=List[SlowQueryResponse], status_code=status.HTTP_200_OK)
+async def list_slow_queries(
+    limit: int = Query(10, ge=1, le=100, description="Numero maximo de huellas"),
+    current_user: User = Depends(get_admin_required),
+    admin_service: AdminService = Depends(get_admin_service)
+):
+    """
+    Lista las consultas lentas con mayor tiempo acumulado en este worker.
+    
+    Args:
+        limit (int): Número máximo de huellas a devolver
+        current_user (User): Administrador autenticado
+        admin_service (AdminService): Servicio administrativo
+    
+    Returns:
+        List[SlowQueryResponse]: Huellas ordenadas por tiempo total
+    """
+    return admin_service.top_slow_queries(limit)
+
+@router.get("/queries/n-plus-one", response_model=List[NPlusOneResponse], status_code=status.HTTP_200_OK)
+async def list_n_plus_one(
+    limit: int = Query(10, ge=1, le=100, description="Numero maximo de patrones"),
+    current_user: User = Depends(get_admin_required),
+    admin_service: AdminService = Depends(get_admin_service)
+):
+    """
+    Lista los patrones N+1 detectados en este worker.
+    
+    Args:
+        limit (int): Número máximo de patrones a devolver
+        current_user (User): Administrador autenticado
+        admin_service (AdminService): Servicio administrativo
+    
+    Returns:
+        List[NPlusOneResponse]: Patrones ordenados por número de peticiones afectadas
+    """
+    return admin_service.top_n_plus_one(limit)
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_query_stats(
+    current_user: User = Depends(get_admin_required),
+    admin_service: AdminService = Depends(get_admin_service)
+):
+    """
+    Reinicia las estadísticas de consultas de este worker.
+    """
+    logger.info(f"Admin {current_user.id} reinicio las estadisticas de consultas")
+    admin_service.reset_query_stats()
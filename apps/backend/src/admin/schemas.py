@@ -0,0 +1,26 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Any, List, Optional
+
+class SlowQueryResponse(BaseModel):
+    """Huella de consulta lenta con sus estadisticas acumuladas"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    fingerprint: str
+    count: int
+    total_ms: float
+    max_ms: float
+    avg_ms: float
+    
+    # Forma de los parametros (tipos, sin valores) de la ejecucion mas lenta
+    parameters: Optional[Any] = None
+    call_site: List[str] = []
+
+class NPlusOneResponse(BaseModel):
+    """Huella que se repitio mas de N veces en una misma peticion"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    fingerprint: str
+    route: str
+    occurrences: int
+    max_executions: int
+    call_site: List[str] = []
@@ -0,0 +1,37 @@
+from typing import List
+from shared.profiler import QueryProfiler, query_profiler
+
+class AdminService:
+    def __init__(self, profiler: QueryProfiler) -> None:
+        self.profiler = profiler
+        
+    def top_slow_queries(self, limit: int = 10) -> List[dict]:
+        """
+        Devuelve las consultas lentas con mayor tiempo acumulado.
+        
+        Args:
+            limit (int): Número máximo de huellas.
+            
+        Returns:
+            List[dict]: Huellas ordenadas por tiempo total descendente.
+        """
+        return self.profiler.top_slow(limit)
+    
+    def top_n_plus_one(self, limit: int = 10) -> List[dict]:
+        """
+        Devuelve los patrones N+1 detectados con más ocurrencias.
+        
+        Args:
+            limit (int): Número máximo de patrones.
+            
+        Returns:
+            List[dict]: Patrones ordenados por ocurrencias descendente.
+        """
+        return self.profiler.top_n_plus_one(limit)
+    
+    def reset_query_stats(self) -> None:
+        """ Descarta las estadísticas acumuladas del perfilador """
+        self.profiler.reset()
+
+def get_admin_service() -> AdminService:
+    return AdminService(query_profiler)
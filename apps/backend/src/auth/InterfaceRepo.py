@@ -5,7 +5,7 @@ from typing import Optional
 class UserAuthInterface(ABC):
 
     @abstractmethod
-    def create_user(self, user:User) -> User:
+    def create_user(self, user_data, hashed_password: str) -> Optional[User]:
         pass
 
     @abstractmethod
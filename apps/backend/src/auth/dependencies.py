@@ -5,11 +5,71 @@ from sqlalchemy.orm import Session
 from auth.models import User
 from shared.security import verify_token
 from shared.database import get_db
+from shared.replicas import STICKY_KEY
 from auth.schemas import TokenPayload
 from auth.exceptions import UserSessionExpiredException, UserNotVerifiedException
-from shared.exceptions import UserNotFoundException, InsufficientPermissionsException
+from auth.permissions import Permission, has_permissions, permissions_for
+from auth.revocation import revocation_list, token_versions
+from shared.exceptions import UserNotFoundException, InsufficientPermissionsException, DeadlineExceededException
+import uuid
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+def verify_active_token(token: str, db: Session) -> TokenPayload:
+    """
+        Verifica el token y comprueba que no haya sido revocado ni quedado desactualizado.
+        
+        La comprobacion de revocacion se resuelve en memoria con el filtro de Bloom;
+        solo un posible positivo consulta la base de datos. La version del token
+        (`tv`) se compara en memoria con la del ultimo cambio de rol del usuario.
+        
+        Raises:
+            HTTPException: Si el token es invalido, expiro, fue revocado o es de un rol anterior
+    """
+    payload = verify_token(token)
+    
+    if revocation_list.is_revoked(payload.jti, db):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revocado",
+            headers={"WWW-Authenticate":"Bearer"}
+        )
+    
+    if token_versions.is_stale(payload.sub, payload.tv):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Los permisos cambiaron, vuelva a iniciar sesion",
+            headers={"WWW-Authenticate":"Bearer"}
+        )
+        
+    return payload
+
+def get_token_payload(token:str = Depends(oauth2_scheme),db: Session = Depends(get_db)) -> TokenPayload:
+    """ Devuelve los claims del access token vigente (sin cargar al usuario) """
+    return verify_active_token(token, db)
+
+def require_permissions(required: Permission):
+    """
+        Dependencia que exige los permisos `required` en el claim `perms` del token.
+        
+        No carga al usuario: los permisos vienen firmados en el token, asi que la
+        comprobacion es una operacion de bits sin consultas.
+        
+        Args:
+            required (Permission): Permisos necesarios (se pueden combinar con `|`).
+        
+        Returns:
+            Callable: Dependencia que devuelve los claims del token.
+    """
+    def dependency(payload: TokenPayload = Depends(get_token_payload)) -> TokenPayload:
+        if not has_permissions(payload.perms, required):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Permisos insuficientes"
+            )
+        return payload
+    
+    return dependency
+
 def get_current_user(token:str = Depends(oauth2_scheme),db: Session = Depends(get_db)) -> User:
     
     """
@@ -26,9 +86,9 @@ def get_current_user(token:str = Depends(oauth2_scheme),db: Session = Depends(ge
     """
     
     try:
-        payload = verify_token(token)
+        payload = verify_active_token(token, db)
         
-        if not payload.sub or not payload.sub:
+        if not payload.sub:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token malformado",
@@ -36,8 +96,8 @@ def get_current_user(token:str = Depends(oauth2_scheme),db: Session = Depends(ge
             )
             
         try:
-            user_id = int(payload.id)
-        except:
+            user_id = uuid.UUID(payload.sub)
+        except (TypeError, ValueError):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token malformado",
@@ -51,6 +111,9 @@ def get_current_user(token:str = Depends(oauth2_scheme),db: Session = Depends(ge
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuario no encontrado"
             )
+        
+        # Tras una escritura de este usuario sus lecturas van al primario (ver `shared.replicas`)
+        db.info[STICKY_KEY] = payload.sub
             
         return user
     except UserNotFoundException as e:
@@ -65,7 +128,7 @@ def get_current_user(token:str = Depends(oauth2_scheme),db: Session = Depends(ge
             detail="Token invalido o expirado",
             headers={"WWW-Authenticate":"Bearer"},
         )
-    except HTTPException:
+    except (HTTPException, DeadlineExceededException):
         raise
     except Exception as e:
         raise HTTPException(
@@ -87,7 +150,7 @@ async def get_admin_required(current_user:User = Depends(get_current_user)) -> U
         HTTPException: Si el usuario no tiene permisos de administrador o error interno
     """
     try:
-        if current_user.role != "admin":
+        if not has_permissions(permissions_for(current_user.role), Permission.ADMIN_PANEL):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Acceso solo para administradores"
@@ -99,5 +162,5 @@ async def get_admin_required(current_user:User = Depends(get_current_user)) -> U
     except Exception:
         raise HTTPException(
             status_code= status.HTTP_500_INTERNAL_SERVER_ERROR,
-            datail = "Error interno del servidor"
+            detail = "Error interno del servidor"
         )
\ No newline at end of file
@@ -72,4 +72,14 @@ class UserNotVerifiedException(AppBaseException):
     def __init__(self, user_id: int):
         self.user_id = user_id
         self.message = f"El usuario con ID {user_id} no ha verificado su cuenta"
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class InvalidRefreshTokenException(AppBaseException):
+    """Se lanza cuando el refresh token es inválido, expiró o ya fue usado."""
+    def __init__(self, reason: str = None):
+        self.reason = reason
+        if reason:
+            self.message = f"Refresh token inválido: {reason}"
+        else:
+            self.message = "Refresh token inválido o expirado"
+        super().__init__(self.message)
@@ -1,11 +1,9 @@
-from sqlalchemy import Column , Integer , String , DateTime,Boolean
+from sqlalchemy import Column , Integer , String , DateTime,Boolean, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
-from sqlalchemy.orm import declarative_base
+from shared.database import Base
 from datetime import datetime
 
-Base = declarative_base()
-
 """ Modelo de usuario que se va a validar """
 
 class User(Base):
@@ -29,9 +27,51 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
+    # Version de la fila para el bloqueo optimista y el ETag del perfil
+    version = Column(Integer, nullable=False, default=1)
+    
+    # Version de los access tokens: cambiar el rol la incrementa y obliga a
+    # reautenticarse a los tokens emitidos antes (ver `auth.revocation.TokenVersions`)
+    token_version = Column(Integer, nullable=False, default=1)
+    
+    __mapper_args__ = {"version_id_col": version}
+    
     # Preparado para relaciones futuras (comentadas por ahora)
     # orders = relationship("Order", back_populates="user")
     # cart = relationship("Cart", back_populates="user", uselist=False)
     
     def __repr__(self):
-        return f"<User(id={self.id}, email='{self.email}', role='{self.role}')>"
\ No newline at end of file
+        return f"<User(id={self.id}, email='{self.email}', role='{self.role}')>"
+
+""" Refresh tokens guardados del lado del servidor (solo el hash) """
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4, primary_key=True, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    
+    # Todos los tokens obtenidos por rotacion desde un mismo login comparten familia
+    family_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    replaced_by = Column(UUID(as_uuid=True), nullable=True)
+    
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<RefreshToken(id={self.id}, user_id={self.user_id}, revoked={self.revoked_at is not None})>"
+
+
+""" Access tokens revocados antes de expirar (por jti) """
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<RevokedToken(jti='{self.jti}')>"
@@ -0,0 +1,47 @@
+from enum import IntFlag
+from typing import Dict, Iterable
+
+""" Permisos por rol compilados a mascaras de bits para viajar como claim del access token """
+
+
+class Permission(IntFlag):
+    """ Un bit por permiso: el claim `perms` del token es el OR de los del rol """
+    USERS_READ = 1 << 0
+    USERS_WRITE = 1 << 1
+    USERS_ROLES = 1 << 2
+    CATALOG_WRITE = 1 << 3
+    ADMIN_PANEL = 1 << 4
+
+
+# Permisos de cada rol. Agregar un permiso a un rol solo cambia los tokens nuevos;
+# los emitidos antes lo obtienen al renovarse con el refresh token
+ROLE_GRANTS: Dict[str, Iterable[Permission]] = {
+    "client": (),
+    "user": (),
+    "moderator": (),
+    "admin": tuple(Permission),
+}
+
+
+def compile_roles(grants: Dict[str, Iterable[Permission]]) -> Dict[str, int]:
+    """ Reduce los permisos de cada rol a una mascara de bits """
+    compiled = {}
+    for role, permissions in grants.items():
+        mask = 0
+        for permission in permissions:
+            mask |= permission
+        compiled[role] = int(mask)
+    return compiled
+
+
+ROLE_PERMISSIONS = compile_roles(ROLE_GRANTS)
+
+
+def permissions_for(role: str) -> int:
+    """ Mascara de permisos del rol (0 si el rol no existe) """
+    return ROLE_PERMISSIONS.get(role, 0)
+
+
+def has_permissions(granted: int, required: Permission) -> bool:
+    """ True si `granted` incluye todos los bits de `required` """
+    return granted & required == required
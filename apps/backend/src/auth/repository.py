@@ -1,11 +1,14 @@
 from fastapi import HTTPException, status
 from pydantic import EmailStr
-from auth.models import User
+from auth.models import User, RefreshToken, RevokedToken
 from auth.InterfaceRepo import UserAuthInterface
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from typing import Optional
-from shared.security import hash_password
+from datetime import datetime
+from uuid import UUID, uuid4
+from shared.exceptions import DatabaseException
+from shared.database import apply_returned_row
 import logging
 from users.repository import UserRepository
 
@@ -52,43 +55,212 @@ class UserAuthRepository(UserAuthInterface):
 
         return bool(user_exists)
 
-    async def create_user(self, user_data: User) -> User:
+    async def create_user(self, user_data, hashed_password: str) -> Optional[User]:
         """
-        Crea un nuevo usuario en la base de datos.
+        Inserta un usuario con un solo `INSERT ... ON CONFLICT (email) DO NOTHING RETURNING`.
+
+        No consulta antes si el correo existe: la restriccion unica decide, asi
+        que dos registros simultaneos con el mismo correo no compiten entre la
+        consulta y el INSERT ni dejan un IntegrityError en el log.
 
         Args:
-            user_data (User): Datos del usuario a crear.
-            db (Session): Sesión de base de datos SQLAlchemy.
+            user_data (UserRegister): Datos del usuario a crear.
+            hashed_password (str): Contraseña ya hasheada (fuera del event loop).
+
+        Returns:
+            Optional[User]: Usuario creado, o None si el correo ya estaba registrado.
+
+        Raises:
+            DatabaseException: Si ocurre un error de base de datos.
+        """
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise ValueError(f"Dialecto sin ON CONFLICT: {dialect}")
+
+        statement = (
+            insert(User)
+            .values(name=user_data.name, email=user_data.email, password=hashed_password, role=user_data.role)
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(*User.__table__.c)
+        )
+        try:
+            row = self.db.execute(statement).first()
+            if row is None:
+                self.db.rollback()
+                logger.info(f"Registro rechazado, correo existente: {user_data.email}")
+                return None
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error de BD en registro: {str(e)}")
+            raise DatabaseException("Error al registrar el usuario") from e
+
+        new_user = User()
+        apply_returned_row(new_user, row)
+        logger.info(f"Usuario registrado exitosamente: {new_user.email}")
+        return new_user
+
+    async def update_password_hash(self, user_id: UUID, current_hash: str, new_hash: str) -> bool:
+        """
+        Reemplaza el hash de la contraseña solo si sigue siendo `current_hash`.
+
+        La condicion sobre el hash anterior evita pisar un cambio de contraseña
+        ocurrido entre el login y el rehash. Es un UPDATE directo que no toca
+        `updated_at` ni `version`: el perfil no cambia para el cliente.
+
+        Args:
+            user_id (UUID): Usuario a actualizar.
+            current_hash (str): Hash verificado en el login.
+            new_hash (str): Hash con el costo calibrado.
+
+        Returns:
+            bool: True si se actualizo la fila.
+
+        Raises:
+            DatabaseException: Si ocurre un error de base de datos.
+        """
+        try:
+            updated = (self.db.query(User)
+                       .filter(User.id == user_id)
+                       .filter(User.password == current_hash)
+                       .update({User.password: new_hash, User.updated_at: User.updated_at},
+                               synchronize_session=False))
+            self.db.commit()
+            return updated == 1
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error de BD actualizando el hash de la contraseña del usuario {user_id}: {str(e)}")
+            raise DatabaseException("Error al actualizar la contraseña") from e
+
+    async def create_refresh_token(self, user_id: UUID, token_hash: str, family_id: UUID, expires_at: datetime) -> RefreshToken:
+        """
+        Guarda un refresh token nuevo (solo su hash).
+
+        Args:
+            user_id (UUID): Dueño del token.
+            token_hash (str): Hash SHA-256 del token.
+            family_id (UUID): Familia de rotación a la que pertenece.
+            expires_at (datetime): Fecha de expiración.
+
+        Returns:
+            RefreshToken: Registro creado.
+
+        Raises:
+            DatabaseException: Si ocurre un error al guardar el token.
+        """
+        try:
+            refresh_token = RefreshToken(
+                user_id=user_id,
+                token_hash=token_hash,
+                family_id=family_id,
+                expires_at=expires_at
+            )
+            self.db.add(refresh_token)
+            self.db.commit()
+            return refresh_token
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error de BD guardando refresh token del usuario {user_id}: {str(e)}")
+            raise DatabaseException("Error al guardar el refresh token") from e
+
+    async def get_refresh_token(self, token_hash: str) -> Optional[RefreshToken]:
+        """
+        Busca un refresh token por su hash.
+
+        Args:
+            token_hash (str): Hash SHA-256 del token.
+
+        Returns:
+            Optional[RefreshToken]: El registro o None si no existe.
+        """
+        try:
+            return self.db.query(RefreshToken).filter(RefreshToken.token_hash == token_hash).first()
+        except SQLAlchemyError as e:
+            logger.error(f"Error de BD buscando refresh token: {str(e)}")
+            raise DatabaseException("Error al buscar el refresh token") from e
+
+    async def rotate_refresh_token(self, current: RefreshToken, new_hash: str, expires_at: datetime) -> Optional[RefreshToken]:
+        """
+        Revoca el refresh token actual y emite su reemplazo en la misma familia (un solo commit).
+
+        La revocacion es un UPDATE condicional (`revoked_at IS NULL`): si dos
+        peticiones presentan el mismo token a la vez, solo una cambia la fila y
+        la otra recibe None aunque ambas lo hayan leido sin revocar.
+
+        Args:
+            current (RefreshToken): Token presentado por el cliente.
+            new_hash (str): Hash del token nuevo.
+            expires_at (datetime): Expiración del token nuevo.
 
         Returns:
-            User: Usuario creado y persistido en la base de datos.
+            Optional[RefreshToken]: Token nuevo, o None si el actual ya estaba revocado.
 
         Raises:
-            HTTPException: Si ocurre un error de integridad o de base de datos.
+            DatabaseException: Si ocurre un error durante la rotación.
         """
         try:
-            await self.existing_user(user_data.email)
-            
-            hashed_password = hash_password(user_data.password)
-            
-            new_user = User(
-                name = user_data.name,
-                email= user_data.email,
-                password = hashed_password,
-                role = user_data.role
+            replacement = RefreshToken(
+                id=uuid4(),
+                user_id=current.user_id,
+                token_hash=new_hash,
+                family_id=current.family_id,
+                expires_at=expires_at
             )
-            
-            self.db.add(new_user)
+            revoked = (self.db.query(RefreshToken)
+                       .filter(RefreshToken.id == current.id)
+                       .filter(RefreshToken.revoked_at.is_(None))
+                       .update({RefreshToken.revoked_at: datetime.utcnow(), RefreshToken.replaced_by: replacement.id},
+                               synchronize_session=False))
+            if revoked == 0:
+                self.db.rollback()
+                return None
+
+            self.db.add(replacement)
             self.db.commit()
-            self.db.refresh(new_user)
-            
-            logger.info(f"Usuario registrado exitosamente: {new_user.email}")
+            return replacement
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error de BD rotando refresh token {current.id}: {str(e)}")
+            raise DatabaseException("Error al rotar el refresh token") from e
 
-            return new_user
-        except IntegrityError as e:
+    async def revoke_refresh_family(self, family_id: UUID) -> int:
+        """
+        Revoca todos los refresh tokens activos de una familia.
+
+        Args:
+            family_id (UUID): Familia a revocar.
+
+        Returns:
+            int: Número de tokens revocados.
+        """
+        try:
+            revoked = (self.db.query(RefreshToken)
+                       .filter(RefreshToken.family_id == family_id)
+                       .filter(RefreshToken.revoked_at.is_(None))
+                       .update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False))
+            self.db.commit()
+            return revoked
+        except SQLAlchemyError as e:
             self.db.rollback()
-            logger.error(f"error inesperado en registro {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error interno del servidor"
-            )
\ No newline at end of file
+            logger.error(f"Error de BD revocando familia de refresh tokens {family_id}: {str(e)}")
+            raise DatabaseException("Error al revocar los refresh tokens") from e
+
+    async def revoke_access_token(self, jti: str, expires_at: datetime) -> None:
+        """
+        Registra un access token revocado hasta su expiración.
+
+        Args:
+            jti (str): Identificador del token.
+            expires_at (datetime): Expiración del token (después ya no hace falta recordarlo).
+        """
+        try:
+            self.db.merge(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=datetime.utcnow()))
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error de BD revocando access token: {str(e)}")
+            raise DatabaseException("Error al revocar el token") from e
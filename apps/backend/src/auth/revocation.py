@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from auth.models import RevokedToken, User
+from shared.bloom import BloomFilter
+from shared.cache import Cache
+from shared.config import get_settings
+from shared.invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+# Solapamiento al leer desde la marca de agua, para no perder filas que se
+# confirmaron con un `revoked_at` ligeramente anterior a la ultima lectura
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# Cada cuantas sincronizaciones se reconstruye el filtro para descartar
+# los tokens que ya expiraron
+REBUILD_EVERY = 40
+
+# Version registrada para usuarios borrados: ningun token suyo es vigente
+DELETED_VERSION = 2 ** 31
+
+
+class RevocationList:
+    """
+        Lista de access tokens revocados (por `jti`) para el camino caliente de autenticacion.
+
+        El filtro de Bloom responde en memoria para casi todas las peticiones; solo
+        cuando indica un posible positivo se confirma contra la tabla `revoked_tokens`.
+        El filtro se sincroniza periodicamente desde la tabla, de modo que las
+        revocaciones hechas por otros workers se ven tras un intervalo de sincronizacion.
+
+        Con `cache` (la cache compartida entre workers) los positivos confirmados
+        se guardan una sola vez para todos los procesos: la revocacion hecha por
+        un worker no cuesta una consulta en cada uno de los demas.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001, cache: Optional[Cache] = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.cache = cache
+        self._filter = BloomFilter(capacity, error_rate)
+        self._confirmed = set()
+        self._watermark: Optional[datetime] = None
+        self._syncs = 0
+
+    def add(self, jti: str) -> None:
+        """ Agrega una revocacion hecha por este worker sin esperar a la siguiente sincronizacion """
+        self._filter.add(jti)
+        self._confirmed.add(jti)
+        if self.cache is not None:
+            self.cache.set(f"revoked:{jti}", b"1")
+
+    def is_revoked(self, jti: Optional[str], db: Session) -> bool:
+        """
+            Indica si un token fue revocado.
+
+            Args:
+                jti (str, optional): Identificador del token.
+                db (Session): Sesion usada solo para confirmar positivos del filtro.
+
+            Returns:
+                bool: True si el token esta revocado.
+        """
+        if not jti or not self._filter.might_contain(jti):
+            return False
+
+        if jti in self._confirmed:
+            return True
+        if self.cache is not None and self.cache.get(f"revoked:{jti}") is not None:
+            self._confirmed.add(jti)
+            return True
+
+        revoked = db.query(RevokedToken.jti).filter(RevokedToken.jti == jti).first() is not None
+        if revoked:
+            self._confirmed.add(jti)
+            if self.cache is not None:
+                self.cache.set(f"revoked:{jti}", b"1")
+        else:
+            logger.debug("Falso positivo del filtro de revocacion")
+        return revoked
+
+    def sync(self, db: Session) -> int:
+        """
+            Sincroniza el filtro con la tabla de revocaciones.
+
+            Args:
+                db (Session): Sesion de base de datos.
+
+            Returns:
+                int: Numero de revocaciones leidas.
+        """
+        now = datetime.utcnow()
+        full_rebuild = (
+            self._watermark is None
+            or self._filter.is_saturated
+            or self._syncs % REBUILD_EVERY == 0
+        )
+
+        query = db.query(RevokedToken.jti, RevokedToken.revoked_at).filter(RevokedToken.expires_at > now)
+        if not full_rebuild:
+            query = query.filter(RevokedToken.revoked_at > self._watermark - SYNC_OVERLAP)
+        rows = query.all()
+
+        if full_rebuild:
+            bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+            for jti, _ in rows:
+                bloom.add(jti)
+            # Reemplazo atomico: los lectores ven el filtro anterior o el nuevo, nunca uno a medias
+            self._filter = bloom
+            self._confirmed = set()
+        else:
+            for jti, _ in rows:
+                # El solapamiento relee filas ya agregadas: volver a contarlas
+                # saturaria el filtro antes de tiempo (sus bits ya estan puestos)
+                if not self._filter.might_contain(jti):
+                    self._filter.add(jti)
+
+        if rows:
+            newest = max(revoked_at for _, revoked_at in rows)
+            if self._watermark is None or newest > self._watermark:
+                self._watermark = newest
+        elif self._watermark is None:
+            self._watermark = now
+
+        self._syncs += 1
+        return len(rows)
+
+
+revocation_list = RevocationList()
+
+
+class TokenVersions:
+    """
+        Version de token vigente de los usuarios que cambiaron de rol hace poco.
+
+        Un access token con `tv` menor que la version registrada para su usuario
+        esta desactualizado (rol y permisos anteriores). Solo hace falta recordar
+        a los usuarios modificados dentro de la vida de un access token: los
+        tokens emitidos antes de eso ya expiraron. Asi la comprobacion es un
+        acceso a un diccionario, sin consultar al usuario en cada peticion.
+
+        Los cambios registrados localmente (`set`, `refresh`) guardan cuando se
+        hicieron y `sync` los descarta pasada la vida de un access token, igual
+        que la consulta descarta a los usuarios modificados antes.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._versions: Dict[str, int] = {}
+        # Momento (reloj de `clock`) de cada cambio registrado localmente
+        self._set_at: Dict[str, float] = {}
+
+    def set(self, user_id: str, version: int) -> None:
+        """ Registra un cambio hecho por este worker sin esperar a la siguiente sincronizacion """
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+            self._set_at[user_id] = self._clock()
+
+    def is_stale(self, user_id: Optional[str], version: int) -> bool:
+        """ True si el token se emitio antes del ultimo cambio de rol del usuario """
+        return user_id is not None and version < self._versions.get(user_id, 0)
+
+    def sync(self, db: Session, token_lifetime: timedelta) -> int:
+        """
+            Recarga las versiones de los usuarios modificados durante `token_lifetime`.
+
+            Args:
+                db (Session): Sesion de base de datos.
+                token_lifetime (timedelta): Vida de un access token.
+
+            Returns:
+                int: Numero de usuarios con version vigente mayor que 1.
+        """
+        rows = (db.query(User.id, User.token_version)
+                .filter(User.token_version > 1)
+                .filter(User.updated_at > datetime.utcnow() - token_lifetime - SYNC_OVERLAP)
+                .all())
+        versions = {str(user_id): version for user_id, version in rows}
+        # Los cambios locales posteriores a la consulta no se pierden; los mas
+        # viejos que la vida de un token ya no afectan a ningun token vigente
+        horizon = self._clock() - (token_lifetime + SYNC_OVERLAP).total_seconds()
+        self._set_at = {user_id: at for user_id, at in self._set_at.items() if at > horizon}
+        for user_id, version in self._versions.items():
+            if user_id in self._set_at and version > versions.get(user_id, 0):
+                versions[user_id] = version
+        self._versions = versions
+        return len(rows)
+
+    def refresh(self, db: Session, user_ids: Iterable[str]) -> int:
+        """
+            Relee la version de los usuarios invalidados por el bus (canal `user`).
+
+            Los que ya no existen quedan con `DELETED_VERSION`.
+
+            Args:
+                db (Session): Sesion de base de datos.
+                user_ids (Iterable[str]): IDs recibidos en la invalidacion.
+
+            Returns:
+                int: Numero de usuarios leidos.
+        """
+        ids = set()
+        for user_id in user_ids:
+            try:
+                ids.add(uuid.UUID(str(user_id)))
+            except ValueError:
+                logger.warning(f"ID de usuario invalido en la invalidacion: {user_id}")
+        if not ids:
+            return 0
+        rows = db.query(User.id, User.token_version).filter(User.id.in_(ids)).all()
+        found = {user_id: version for user_id, version in rows}
+        for user_id in ids:
+            self.set(str(user_id), found.get(user_id, DELETED_VERSION))
+        return len(rows)
+
+
+token_versions = TokenVersions()
+
+
+async def run_revocation_sync(
+    session_factory,
+    interval: float,
+    versions: TokenVersions = token_versions,
+    revocations: RevocationList = revocation_list
+) -> None:
+    """
+        Tarea de fondo que sincroniza `revocation_list` y `token_versions` cada `interval` segundos.
+
+        Los cambios de usuario publicados en el bus de invalidacion (rol,
+        desactivacion, borrado; de este worker o de otro) releen enseguida la
+        version de esos usuarios, sin esperar a la siguiente sincronizacion.
+
+        La consulta corre en un hilo para no bloquear el event loop.
+    """
+    token_lifetime = timedelta(minutes=get_settings().access_token_expire_minutes)
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    # IDs de usuario pendientes de releer; None pide una sincronizacion completa
+    pending: Optional[Set[str]] = set()
+
+    def sync_once() -> int:
+        db = session_factory()
+        try:
+            versions.sync(db, token_lifetime)
+            return revocations.sync(db)
+        finally:
+            db.close()
+
+    def refresh_once(user_ids: Set[str]) -> int:
+        db = session_factory()
+        try:
+            return versions.refresh(db, user_ids)
+        finally:
+            db.close()
+
+    def enqueue(ids) -> None:
+        nonlocal pending
+        if ids is None or pending is None:
+            pending = None
+        else:
+            pending.update(ids)
+        wakeup.set()
+
+    # El commit que publica puede correr en otro hilo
+    unsubscribe = invalidation_bus.subscribe("user", lambda ids: loop.call_soon_threadsafe(enqueue, ids))
+    next_sync = loop.time()
+    try:
+        while True:
+            wakeup.clear()
+            changed, pending = pending, set()
+            try:
+                if changed is None or loop.time() >= next_sync:
+                    await asyncio.to_thread(sync_once)
+                    next_sync = loop.time() + interval
+                if changed:
+                    await asyncio.to_thread(refresh_once, changed)
+            except SQLAlchemyError as e:
+                logger.error(f"Error sincronizando revocaciones: {str(e)}")
+                # Se reintentan en la proxima vuelta
+                if changed:
+                    pending = None if pending is None else pending | changed
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(wakeup.wait(), max(0.0, next_sync - loop.time()))
+    finally:
+        unsubscribe()
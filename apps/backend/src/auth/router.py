@@ -1,11 +1,12 @@
-from datetime import timedelta
+from typing import Optional
 from fastapi import APIRouter, HTTPException,status,Depends
 from fastapi.security import OAuth2PasswordRequestForm,OAuth2PasswordBearer
-from auth.schemas import UserLogin,UserRegister,TokenPayload,Token
+from auth.schemas import UserLogin,UserRegister,TokenPayload,Token,TokenWithRefresh,RefreshTokenRequest
+from auth.dependencies import get_token_payload
 from auth.models import User
 from auth.service import UserAuthService , get_user_service
 from users.schemas import UserResponse
-from shared.security import create_access_token
+from shared.security import get_key_ring
 from users.exceptions import *
 from auth.exceptions import *
 
@@ -26,11 +27,16 @@ async def register(user_data:UserRegister, user_service:UserAuthService = Depend
     Returns:
         UserResponse: Usuario creado exitosamente
     Raises:
-        HTTPException: Si el usuario ya existe o hay errores en la validación
+        HTTPException: 409 si el correo ya esta registrado, 400 si la contraseña es debil
     """
-    return await user_service.create_user(user_data)  
+    try:
+        return await user_service.create_user(user_data)
+    except EmailAlreadyExistsException as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.message)
+    except WeakPasswordException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
 
-@router.post("/auth/login",response_model=Token, status_code=status.HTTP_200_OK)
+@router.post("/auth/login",response_model=TokenWithRefresh, status_code=status.HTTP_200_OK)
 async def login(form_data: UserLogin, user_service: UserAuthService = Depends(get_user_service)):
     """
     Autentica un usuario y genera un token de acceso.
@@ -40,7 +46,7 @@ async def login(form_data: UserLogin, user_service: UserAuthService = Depends(ge
         user_service: Servicio de autenticación de usuarios
         
     Returns:
-        Token: Token de acceso y tipo de token
+        TokenWithRefresh: Access token de vida corta y refresh token rotativo
         
     Raises:
         HTTPException: Si las credenciales son incorrectas
@@ -53,11 +59,50 @@ async def login(form_data: UserLogin, user_service: UserAuthService = Depends(ge
             detail="Username incorrecto o contraseña"
     )
 
-    token_data = TokenPayload(sub=str(user.id),email=user.email, exp=60 * 24, role=user.role)
-    access_token = create_access_token(token_data, timedelta(minutes=token_data.exp))
+    return await user_service.issue_tokens(user)
+
+@router.post("/auth/refresh", response_model=TokenWithRefresh, status_code=status.HTTP_200_OK)
+async def refresh(request: RefreshTokenRequest, user_service: UserAuthService = Depends(get_user_service)):
+    """
+    Rota el refresh token y emite un access token nuevo.
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user_role": user.role
-    }
\ No newline at end of file
+    Args:
+        request: Refresh token vigente
+        user_service: Servicio de autenticación de usuarios
+        
+    Returns:
+        TokenWithRefresh: Nuevo par de tokens (el refresh token anterior deja de servir)
+        
+    Raises:
+        InvalidRefreshTokenException: Si el refresh token es inválido, expiró o ya fue usado
+    """
+    return await user_service.refresh_tokens(request.refresh_token)
+
+@router.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: Optional[RefreshTokenRequest] = None,
+    payload: TokenPayload = Depends(get_token_payload),
+    user_service: UserAuthService = Depends(get_user_service)
+):
+    """
+    Cierra la sesión: revoca el access token actual y la familia del refresh token.
+    
+    Args:
+        request: Refresh token de la sesión (opcional)
+        payload: Claims del access token actual
+        user_service: Servicio de autenticación de usuarios
+    """
+    await user_service.logout(payload, request.refresh_token if request else None)
+
+@router.get("/.well-known/jwks.json", status_code=status.HTTP_200_OK)
+async def jwks():
+    """
+    Publica las llaves publicas de verificacion de tokens.
+    
+    Los nodos de borde verifican tokens con este documento sin conocer
+    la llave de firma.
+    
+    Returns:
+        dict: Documento JWKS ({"keys": [...]})
+    """
+    return get_key_ring().jwks()
@@ -9,6 +9,11 @@ class TokenPayload(BaseModel):
     email: EmailStr
     role: str
     exp: Optional[int] = None
+    jti: Optional[str] = None
+    # Mascara de `auth.permissions.Permission` del rol al emitir el token
+    perms: int = 0
+    # `User.token_version` al emitir el token; si el usuario cambia de rol, los anteriores dejan de servir
+    tv: int = 1
 
 class Token(BaseModel):
     """Respuesta básica de autenticación"""
@@ -21,6 +26,16 @@ class TokenWithRefresh(Token):
     refresh_token: str
     expires_in: int
 
+class RefreshTokenRequest(BaseModel):
+    """Schema para renovar o revocar un refresh token"""
+    model_config = ConfigDict(
+        str_strip_whitespace=True,
+        extra='forbid',
+        hide_input_in_errors=True
+    )
+    
+    refresh_token: str = Field(min_length=20, max_length=255)
+
 
 class UserLogin(BaseModel):
     """Schema para login de usuario"""
@@ -1,30 +1,57 @@
-from typing import List, Optional
+import asyncio
+import contextvars
+import logging
+from typing import Callable, List, Optional, Set
+from datetime import datetime, timedelta
+import uuid
 from fastapi import Depends
 from auth.models import User
-from auth.schemas import UserRegister, UserLogin
+from auth.schemas import UserRegister, UserLogin, TokenPayload
 from auth.repository import UserAuthRepository
 from auth.exceptions import (
     InvalidCredentialsException, 
     MaxLoginAttemptsException,
     UserAccountBlockedException,
-    WeakPasswordException
+    WeakPasswordException,
+    InvalidRefreshTokenException
 )
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from shared.security import verify_password
-from shared.database import get_db
+from shared.security import (
+    hash_password,
+    verify_password_status,
+    create_access_token,
+    generate_refresh_token,
+    hash_refresh_token
+)
+from shared.config import get_settings
+from auth.permissions import permissions_for
+from auth.revocation import revocation_list
+from shared.database import SessionLocal, get_db
+from shared.metrics import metrics_registry
 from shared.exceptions import UserNotFoundException
 from users.exceptions import EmailAlreadyExistsException
 
+logger = logging.getLogger(__name__)
+
+# Referencias a los rehash en curso: el event loop solo guarda referencias debiles a las tareas
+_rehash_tasks: Set[asyncio.Task] = set()
+
 class UserAuthService:
-    def __init__(self, user_repo: UserAuthRepository) -> None:
+    def __init__(self, user_repo: UserAuthRepository, session_factory: Optional[Callable[[], Session]] = None) -> None:
         self.user_repo = user_repo
+        # Sesiones propias para el rehash, que termina despues de cerrar la de la peticion
+        self.session_factory = session_factory
         self.max_attempts = 5
         self.attempts = 0
         
     async def create_user(self, user_data: UserRegister) -> User:
         """
-        Crea un nuevo usuario después de verificar que el email no exista previamente.
+        Registra un usuario: valida la contraseña, la hashea en un hilo y hace un solo INSERT.
+
+        bcrypt es lento a proposito; en el event loop bloquearia todas las
+        peticiones del worker mientras dura. El correo duplicado lo detecta el
+        propio INSERT (`ON CONFLICT DO NOTHING`), sin consultarlo antes.
 
         Args:
             user_data (UserRegister): Datos del usuario a registrar.
@@ -33,21 +60,21 @@ class UserAuthService:
             User: Usuario creado y persistido en la base de datos.
 
         Raises:
-            ValueError: Si el email ya existe en la base de datos.
+            WeakPasswordException: Si la contraseña no cumple la politica.
+            EmailAlreadyExistsException: Si el email ya existe en la base de datos.
         """
-        existing_user = await self.user_repo.existing_user(user_data.email)
-        
-        if existing_user:
-            raise EmailAlreadyExistsException(user_data.email)
-        
-        if self.is_strong_password(user_data.password):
+        if not self.is_strong_password(user_data.password):
             raise WeakPasswordException([
                 "Minimo 8 caracteres",
                 "Al menos una mayuscula",
-                "Al menos un  numero"
+                "Al menos un numero"
             ])
-        
-        return await self.user_repo.create_user(user_data)
+
+        hashed_password = await asyncio.to_thread(hash_password, user_data.password)
+        user = await self.user_repo.create_user(user_data, hashed_password)
+        if user is None:
+            raise EmailAlreadyExistsException(user_data.email)
+        return user
 
     # Autentica a un usuario verificando su email y contraseña.
 
@@ -59,6 +86,9 @@ class UserAuthService:
 
         Returns:
             User: Usuario autenticado si las credenciales son correctas, de lo contrario None.
+
+        La verificacion corre en un hilo. Si el hash quedo por debajo del costo
+        calibrado se rehashea en segundo plano, sin sumar latencia al login.
         """
         user = await self.user_repo.get_by_email(email)
         
@@ -66,26 +96,163 @@ class UserAuthService:
             self.increment_loging_attemps(email)
             raise InvalidCredentialsException(email)
 
-        if not verify_password(password, user.password):
+        valid, needs_update = await asyncio.to_thread(verify_password_status, password, user.password)
+        if not valid:
             self.increment_login_attempts(email)
             raise InvalidCredentialsException
+
+        if needs_update and self.session_factory is not None:
+            # Contexto vacio: el rehash sigue despues del login y no hereda su tiempo limite
+            task = contextvars.Context().run(
+                asyncio.create_task, self._rehash_password(user.id, user.password, password)
+            )
+            _rehash_tasks.add(task)
+            task.add_done_callback(_rehash_tasks.discard)
         
         return user
+
+    async def _rehash_password(self, user_id: uuid.UUID, current_hash: str, password: str) -> None:
+        """ Rehashea con el costo calibrado y guarda el hash si nadie cambio la contraseña mientras tanto """
+        try:
+            new_hash = await asyncio.to_thread(hash_password, password)
+            db = self.session_factory()
+            try:
+                updated = await UserAuthRepository(db).update_password_hash(user_id, current_hash, new_hash)
+            finally:
+                db.close()
+        except Exception as e:
+            # El login ya respondio; el rehash se reintenta en el proximo
+            logger.warning(f"No se pudo rehashear la contraseña del usuario {user_id}: {str(e)}")
+            return
+
+        if updated:
+            metrics_registry.password_rehashes += 1
+            logger.info(f"Contraseña del usuario {user_id} rehasheada al costo calibrado")
     
+    async def issue_tokens(self, user: User, family_id: Optional[uuid.UUID] = None) -> dict:
+        """
+        Emite un access token de vida corta y un refresh token nuevo.
+
+        Args:
+            user (User): Usuario autenticado.
+            family_id (UUID, optional): Familia de rotación (una nueva por cada login).
+
+        Returns:
+            dict: Datos para `TokenWithRefresh`.
+        """
+        access_token, expires_in = self._create_access_token(user)
+        refresh_token = generate_refresh_token()
+
+        await self.user_repo.create_refresh_token(
+            user_id=user.id,
+            token_hash=hash_refresh_token(refresh_token),
+            family_id=family_id or uuid.uuid4(),
+            expires_at=datetime.utcnow() + timedelta(days=get_settings().refresh_token_expire_days)
+        )
+
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "user_role": user.role,
+            "refresh_token": refresh_token,
+            "expires_in": expires_in
+        }
+
+    async def refresh_tokens(self, refresh_token: str) -> dict:
+        """
+        Rota un refresh token: lo invalida y emite un par de tokens nuevo.
+
+        Presentar un refresh token ya rotado indica que fue robado, así que se
+        revoca toda su familia.
+
+        Args:
+            refresh_token (str): Refresh token presentado por el cliente.
+
+        Returns:
+            dict: Datos para `TokenWithRefresh`.
+
+        Raises:
+            InvalidRefreshTokenException: Si el token no existe, expiró o ya fue usado.
+        """
+        stored = await self.user_repo.get_refresh_token(hash_refresh_token(refresh_token))
+
+        if stored is None:
+            raise InvalidRefreshTokenException()
+
+        if stored.revoked_at is not None:
+            await self.user_repo.revoke_refresh_family(stored.family_id)
+            raise InvalidRefreshTokenException("reutilización detectada")
+
+        if stored.expires_at <= datetime.utcnow():
+            raise InvalidRefreshTokenException("expirado")
+
+        user = await self.user_repo.get_by_id(stored.user_id)
+        if user is None or not user.is_active:
+            await self.user_repo.revoke_refresh_family(stored.family_id)
+            raise InvalidRefreshTokenException("usuario no disponible")
+
+        new_refresh_token = generate_refresh_token()
+        replacement = await self.user_repo.rotate_refresh_token(
+            stored,
+            new_hash=hash_refresh_token(new_refresh_token),
+            expires_at=datetime.utcnow() + timedelta(days=get_settings().refresh_token_expire_days)
+        )
+        if replacement is None:
+            # Otra peticion lo roto entre la lectura y el UPDATE: es un reuso
+            await self.user_repo.revoke_refresh_family(stored.family_id)
+            raise InvalidRefreshTokenException("reutilización detectada")
+
+        access_token, expires_in = self._create_access_token(user)
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "user_role": user.role,
+            "refresh_token": new_refresh_token,
+            "expires_in": expires_in
+        }
+
+    async def logout(self, payload: TokenPayload, refresh_token: Optional[str] = None) -> None:
+        """
+        Revoca el access token actual y, si se envía, la familia del refresh token.
+
+        Args:
+            payload (TokenPayload): Claims del access token actual.
+            refresh_token (str, optional): Refresh token de la sesión.
+        """
+        if payload.jti:
+            expires_at = datetime.utcfromtimestamp(payload.exp) if payload.exp else datetime.utcnow()
+            await self.user_repo.revoke_access_token(payload.jti, expires_at)
+            revocation_list.add(payload.jti)
+
+        if refresh_token:
+            stored = await self.user_repo.get_refresh_token(hash_refresh_token(refresh_token))
+            if stored is not None and str(stored.user_id) == payload.sub:
+                await self.user_repo.revoke_refresh_family(stored.family_id)
+
+    def _create_access_token(self, user: User):
+        expires_in = get_settings().access_token_expire_minutes * 60
+        token_data = TokenPayload(
+            sub=str(user.id),
+            email=user.email,
+            role=user.role,
+            jti=uuid.uuid4().hex,
+            perms=permissions_for(user.role),
+            tv=user.token_version
+        )
+        return create_access_token(token_data, timedelta(seconds=expires_in)), expires_in
+
     def increment_login_attempts(self,email:str):
         self.attempts += 1
         if self.attempts >= self.max_attempts:
             raise MaxLoginAttemptsException(email)
     
-    def is_strong_password(self,password:str):
-        if len(password) < 8:
-            return True
-        
-        if  any(word.isupper() for word in password):
-            return True
-        
-        if any(word.isdigit() for word in password ):
-            return True
+    def is_strong_password(self, password: str) -> bool:
+        """ Minimo 8 caracteres, con al menos una mayuscula y un numero """
+        return (
+            len(password) >= 8
+            and any(char.isupper() for char in password)
+            and any(char.isdigit() for char in password)
+        )
 
 def get_user_service(db: Session = Depends(get_db)) -> UserAuthService:
     """
@@ -98,4 +265,4 @@ def get_user_service(db: Session = Depends(get_db)) -> UserAuthService:
         UserAuthService: Servicio de autenticación de usuario.
     """
     user_repo = UserAuthRepository(db)
-    return UserAuthService(user_repo)
+    return UserAuthService(user_repo, session_factory=SessionLocal)
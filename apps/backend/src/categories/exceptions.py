@@ -0,0 +1,16 @@
+from shared.exceptions import AppBaseException
+
+class CategoryNotFoundException(AppBaseException):
+    """ Excepcion que se lanza cuando no se encuentra una categoria"""
+    def __init__(self, category_id: str):
+        self.category_id = category_id
+        self.message = f"Categoria con ID '{category_id}' no encontrada"
+        super().__init__(self.message)
+
+class CategoryCycleException(AppBaseException):
+    """ Excepcion que se lanza al mover una categoria debajo de si misma o de una descendiente """
+    def __init__(self, category_id: str, parent_id: str):
+        self.category_id = category_id
+        self.parent_id = parent_id
+        self.message = f"La categoria '{parent_id}' esta en el subarbol de '{category_id}'"
+        super().__init__(self.message)
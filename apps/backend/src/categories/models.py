@@ -1,11 +1,10 @@
 from sqlalchemy import Column , Integer , String , DateTime,Boolean
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
-from sqlalchemy.orm import declarative_base,relationship
+from sqlalchemy.orm import relationship
+from shared.database import Base
 from datetime import datetime
-from sqlalchemy import ForeignKey
-
-Base = declarative_base()
+from sqlalchemy import ForeignKey, Index, event, insert, literal, select
 
 class Category(Base):
     __tablename__ = "categories"
@@ -15,5 +14,54 @@ class Category(Base):
     description = Column(String(500), nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Version de la fila para ETags (ver `Product.version`)
+    version = Column(Integer, nullable=False, default=1)
+    # Jerarquia: la padre directa; las consultas por subarbol usan `category_closure`.
+    # Para mover una categoria usar `CategoryRepository.move`, que reescribe el cierre
+    parent_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=True, index=True)
+    # Productos activos de la categoria y todas sus descendientes. Lo mantiene
+    # `CategoryRepository.adjust_product_counts` con UPDATEs masivos, que no
+    # incrementan `version`: el arbol cacheado tiene su propio ETag
+    active_product_count = Column(Integer, nullable=False, default=0)
+
     products = relationship("Product", back_populates="category")
+    parent = relationship("Category", remote_side=[id], back_populates="children")
+    children = relationship("Category", back_populates="parent")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class CategoryClosure(Base):
+    """
+        Tabla de cierre de la jerarquia: una fila por cada par (ancestro, descendiente),
+        incluida la categoria consigo misma a profundidad 0.
+
+        Los descendientes de una categoria son un recorrido de la clave primaria
+        `(ancestor_id, descendant_id)` y sus ancestros uno de
+        `ix_category_closure_descendant`, sin consultas recursivas por nivel.
+    """
+    __tablename__ = "category_closure"
+    __table_args__ = (
+        Index("ix_category_closure_descendant", "descendant_id", "ancestor_id"),
+    )
+
+    ancestor_id = Column(UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+
+@event.listens_for(Category, "after_insert")
+def _insert_closure(mapper, connection, category) -> None:
+    # Cualquier alta por el ORM (repositorio, seeds, tests) deja el cierre al dia en el mismo flush;
+    # la relacion `parent` garantiza que la padre se inserta antes en el mismo flush
+    category_id = literal(category.id, CategoryClosure.descendant_id.type)
+    rows = select(category_id, category_id, literal(0))
+    if category.parent_id is not None:
+        rows = rows.union_all(
+            select(CategoryClosure.ancestor_id, category_id, CategoryClosure.depth + 1)
+            .where(CategoryClosure.descendant_id == category.parent_id)
+        )
+    connection.execute(
+        insert(CategoryClosure).from_select(["ancestor_id", "descendant_id", "depth"], rows)
+    )
@@ -0,0 +1,313 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import delete, func, insert, literal, select, update
+from categories.exceptions import CategoryCycleException
+from categories.models import Category, CategoryClosure
+from products.models import Product
+from shared.exceptions import DatabaseException
+from shared.invalidation import invalidation_bus
+from typing import Optional, List, Tuple
+from uuid import UUID
+from shared.log import get_logger
+from shared.replicas import read_only
+
+logger = get_logger(__name__)
+
+class CategoryRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    @read_only
+    async def list_active(self) -> List[Category]:
+        """
+            Lista las categorias activas ordenadas por nombre.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            return (self.db.query(Category)
+                    .filter(Category.is_active == True)  # noqa: E712
+                    .order_by(Category.name, Category.id)
+                    .all())
+        except SQLAlchemyError as e:
+            logger.error("Error de BD listando categorias", error=str(e))
+            raise DatabaseException("Error al listar categorias") from e
+
+    @read_only
+    async def list_versions(self) -> List[Tuple[UUID, int]]:
+        """
+            Pares (id, version) de `list_active`, sin cargar entidades (para el ETag).
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            rows = (self.db.query(Category.id, Category.version)
+                    .filter(Category.is_active == True)  # noqa: E712
+                    .order_by(Category.name, Category.id)
+                    .all())
+            return [tuple(row) for row in rows]
+        except SQLAlchemyError as e:
+            logger.error("Error de BD listando versiones de categorias", error=str(e))
+            raise DatabaseException("Error al listar categorias") from e
+
+    @read_only
+    async def get_by_id(self, id: UUID) -> Optional[Category]:
+        """
+            Obtiene una categoria activa por su ID.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            return (self.db.query(Category)
+                    .filter(Category.id == id, Category.is_active == True)  # noqa: E712
+                    .first())
+        except SQLAlchemyError as e:
+            logger.error("Error de BD obteniendo categoria", category_id=id, error=str(e))
+            raise DatabaseException("Error al obtener la categoria") from e
+
+    async def get_for_write(self, id: UUID) -> Optional[Category]:
+        """
+            Como `get_by_id` pero siempre desde la primaria, para modificar la categoria.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            return (self.db.query(Category)
+                    .filter(Category.id == id, Category.is_active == True)  # noqa: E712
+                    .first())
+        except SQLAlchemyError as e:
+            logger.error("Error de BD obteniendo categoria", category_id=id, error=str(e))
+            raise DatabaseException("Error al obtener la categoria") from e
+
+    @read_only
+    async def get_validators(self, id: UUID) -> Optional[tuple]:
+        """
+            Version y fecha de modificacion de una categoria activa, sin cargar la entidad.
+
+            Returns:
+                Optional[tuple]: (version, updated_at), o None si no existe.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            return (self.db.query(Category.version, Category.updated_at)
+                    .filter(Category.id == id, Category.is_active == True)  # noqa: E712
+                    .first())
+        except SQLAlchemyError as e:
+            logger.error("Error de BD obteniendo version de categoria", category_id=id, error=str(e))
+            raise DatabaseException("Error al obtener la categoria") from e
+
+    @staticmethod
+    def descendants_query(id: UUID):
+        """ Subconsulta con los IDs de la categoria y todas sus descendientes (indice de `category_closure`) """
+        return select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == id)
+
+    def is_descendant(self, id: UUID, ancestor_id: UUID) -> bool:
+        """
+            True si `id` es `ancestor_id` o esta en su subarbol.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            return self.db.query(
+                select(CategoryClosure.depth)
+                .where(CategoryClosure.ancestor_id == ancestor_id, CategoryClosure.descendant_id == id)
+                .exists()
+            ).scalar()
+        except SQLAlchemyError as e:
+            logger.error("Error de BD consultando la jerarquia", category_id=id, error=str(e))
+            raise DatabaseException("Error al consultar la jerarquia de categorias") from e
+
+    def list_tree_rows(self) -> List[tuple]:
+        """
+            Todas las categorias con su padre y su conteo, en una consulta, para armar el arbol.
+
+            Lee de la primaria (no usa `read_only`): el arbol se cachea hasta la
+            proxima invalidacion y una replica atrasada lo dejaria viejo.
+
+            Returns:
+                List[tuple]: (id, parent_id, name, description, is_active, active_product_count) por nombre.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            rows = (self.db.query(Category.id, Category.parent_id, Category.name, Category.description,
+                                  Category.is_active, Category.active_product_count)
+                    .order_by(Category.name, Category.id)
+                    .all())
+            return [tuple(row) for row in rows]
+        except SQLAlchemyError as e:
+            logger.error("Error de BD leyendo el arbol de categorias", error=str(e))
+            raise DatabaseException("Error al leer el arbol de categorias") from e
+
+    async def create(self, category: Category) -> Category:
+        """
+            Crea una categoria; sus filas de `category_closure` se insertan en el mismo flush.
+
+            Raises:
+                DatabaseException: Si ocurre un error al crear la categoria.
+        """
+        try:
+            self.db.add(category)
+            self.db.flush()
+            invalidation_bus.publish(self.db, "category", [category.id])
+            self.db.commit()
+            self.db.refresh(category)
+            logger.info("Categoria creada", category_id=category.id, parent_id=category.parent_id)
+            return category
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error("Error de BD creando categoria", error=str(e))
+            raise DatabaseException("Error al crear la categoria") from e
+
+    async def move(self, category: Category, parent_id: Optional[UUID]) -> Category:
+        """
+            Mueve una categoria (con todo su subarbol) bajo `parent_id`, o a la raiz si es None.
+
+            Reescribe el cierre con sentencias por conjunto: borra los pares que
+            unian el subarbol con sus ancestros viejos, inserta el producto
+            cartesiano de los ancestros nuevos por el subarbol y traslada el
+            conteo de productos activos del subarbol de unos ancestros a otros.
+
+            Antes bloquea las categorias de los caminos hasta la raiz de la
+            categoria y de `parent_id`: dos movimientos que pudieran formar un
+            ciclo o reescribir los mismos pares se serializan, y el ciclo y el
+            conteo se vuelven a leer ya con el bloqueo tomado.
+
+            Raises:
+                CategoryCycleException: Si `parent_id` esta en el subarbol de la categoria.
+                DatabaseException: Si ocurre un error al mover la categoria.
+        """
+        try:
+            self._lock_paths([category.id] if parent_id is None else [category.id, parent_id])
+            if parent_id is not None and self.db.scalar(
+                select(CategoryClosure.depth)
+                .where(CategoryClosure.ancestor_id == category.id, CategoryClosure.descendant_id == parent_id)
+            ) is not None:
+                self.db.rollback()
+                raise CategoryCycleException(category_id=category.id, parent_id=parent_id)
+
+            subtree = [row[0] for row in self.db.execute(self.descendants_query(category.id))]
+            old_ancestors = [row[0] for row in self.db.execute(
+                select(CategoryClosure.ancestor_id)
+                .where(CategoryClosure.descendant_id == category.id, CategoryClosure.depth > 0)
+            )]
+            # El objeto cargado puede tener un conteo viejo: las altas de productos lo cambian con UPDATE
+            count = self.db.scalar(select(Category.active_product_count).where(Category.id == category.id))
+
+            self.db.execute(
+                delete(CategoryClosure)
+                .where(CategoryClosure.descendant_id.in_(subtree), CategoryClosure.ancestor_id.in_(old_ancestors))
+            )
+            self._add_to_counts(old_ancestors, -count)
+            if parent_id is not None:
+                above, below = aliased(CategoryClosure), aliased(CategoryClosure)
+                self.db.execute(insert(CategoryClosure).from_select(
+                    ["ancestor_id", "descendant_id", "depth"],
+                    select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+                    .join(below, below.ancestor_id == category.id)
+                    .where(above.descendant_id == parent_id)
+                ))
+                self._add_to_counts(self._ancestors_query(parent_id), count)
+
+            category.parent_id = parent_id
+            invalidation_bus.publish(self.db, "category", subtree)
+            self.db.commit()
+            self.db.refresh(category)
+            logger.info("Categoria movida", category_id=category.id, parent_id=parent_id, subtree=len(subtree))
+            return category
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error("Error de BD moviendo categoria", category_id=category.id, error=str(e))
+            raise DatabaseException("Error al mover la categoria") from e
+
+    def adjust_product_counts(self, id: UUID, delta: int) -> None:
+        """
+            Suma `delta` al conteo de productos activos de la categoria y sus ancestros.
+
+            Es un solo UPDATE por el indice de ancestros, en la transaccion del
+            llamador (no confirma): el alta, baja o cambio del producto y el
+            conteo se confirman juntos.
+        """
+        if delta:
+            self._add_to_counts(self._ancestors_query(id), delta)
+            invalidation_bus.publish(self.db, "category", [id])
+
+    def rebuild_hierarchy(self) -> None:
+        """
+            Reconstruye `category_closure` desde `parent_id` y recalcula los conteos.
+
+            Para cargas que no pasan por el ORM (seeds, migraciones); el cierre se
+            arma con una consulta recursiva y los conteos con una subconsulta por categoria.
+
+            Raises:
+                DatabaseException: Si ocurre un error al reconstruir.
+        """
+        try:
+            paths = select(
+                Category.id.label("ancestor_id"), Category.id.label("descendant_id"), literal(0).label("depth")
+            ).cte("paths", recursive=True)
+            paths = paths.union_all(
+                select(paths.c.ancestor_id, Category.id, paths.c.depth + 1)
+                .where(Category.parent_id == paths.c.descendant_id)
+            )
+            self.db.execute(delete(CategoryClosure))
+            self.db.execute(insert(CategoryClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"], select(paths.c.ancestor_id, paths.c.descendant_id, paths.c.depth)
+            ))
+
+            counts = (select(func.count(Product.id))
+                      .join(CategoryClosure, Product.category_id == CategoryClosure.descendant_id)
+                      .where(CategoryClosure.ancestor_id == Category.id, Product.is_active == True)  # noqa: E712
+                      .scalar_subquery())
+            self.db.execute(
+                update(Category)
+                .values(active_product_count=counts, updated_at=Category.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            invalidation_bus.publish(self.db, "category", [])
+            self.db.commit()
+            logger.info("Jerarquia de categorias reconstruida")
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error("Error de BD reconstruyendo la jerarquia", error=str(e))
+            raise DatabaseException("Error al reconstruir la jerarquia de categorias") from e
+
+    def _lock_paths(self, ids: List[UUID]) -> None:
+        """
+            Bloquea (`SELECT ... FOR UPDATE`) las categorias `ids` y todos sus ancestros.
+
+            Se bloquean en orden de ID para no trabar dos movimientos entre si; si
+            mientras se esperaba otro movimiento cambio los ancestros, se repite.
+        """
+        locked = set()
+        while True:
+            path = set(self.db.scalars(
+                select(CategoryClosure.ancestor_id).where(CategoryClosure.descendant_id.in_(ids))
+            ))
+            if path <= locked:
+                return
+            locked |= path
+            self.db.execute(
+                select(Category.id).where(Category.id.in_(locked)).order_by(Category.id).with_for_update()
+            )
+
+    @staticmethod
+    def _ancestors_query(id: UUID):
+        return select(CategoryClosure.ancestor_id).where(CategoryClosure.descendant_id == id)
+
+    def _add_to_counts(self, ids, delta: int) -> None:
+        # `updated_at` explicito: el conteo no es una modificacion de la categoria
+        self.db.execute(
+            update(Category)
+            .where(Category.id.in_(ids))
+            .values(active_product_count=Category.active_product_count + delta, updated_at=Category.updated_at)
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,194 @@
+"""
+Router para la consulta de categorías.
+
+Endpoints públicos de lectura con respuestas condicionales (ETag / 304),
+el árbol de categorías cacheado y el alta y movimiento de categorías
+(solo administradores).
+"""
+
+from typing import List
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Request, Response, status, Depends
+
+from auth.models import User
+from auth.dependencies import get_admin_required
+from shared.cache import get_cache
+from shared.http_cache import (
+    cached_body,
+    is_conditional,
+    json_response,
+    not_modified,
+    set_validators,
+    store_body,
+    strong_etag,
+    version_etag,
+)
+from categories.schemas import CategoryCreate, CategoryMove, CategoryResponse, CategoryTreeNode
+from categories.service import CategoryService, get_category_service
+from categories.exceptions import CategoryCycleException, CategoryNotFoundException
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/categories", tags=["Categories"])
+
+# ==================== ENDPOINTS CATEGORIAS ==================== #
+
+@router.get("", response_model=List[CategoryResponse], status_code=status.HTTP_200_OK)
+async def list_categories(
+    request: Request,
+    category_service: CategoryService = Depends(get_category_service)
+):
+    """
+    Lista las categorías activas.
+
+    Con la cache de cuerpos activa, el listado serializado se guarda bajo su
+    ETag y los workers lo comparten: basta consultar las versiones.
+
+    Args:
+        request (Request): Petición con las cabeceras condicionales
+        category_service (CategoryService): Servicio de categorías inyectado por dependencia
+
+    Returns:
+        List[CategoryResponse]: Categorías ordenadas por nombre (o 304 sin cuerpo)
+    """
+    if is_conditional(request) or get_cache() is not None:
+        etag = version_etag("categories", await category_service.list_versions())
+        cached = not_modified(request, etag, "categories.list")
+        if cached is not None:
+            return cached
+        body = cached_body(etag)
+        if body is not None:
+            return json_response(body, etag, "categories.list")
+
+    categories = await category_service.list_active()
+    etag = version_etag("categories", [(c.id, c.version) for c in categories])
+    return json_response(store_body(etag, List[CategoryResponse], categories), etag, "categories.list")
+
+@router.get("/tree", response_model=List[CategoryTreeNode], status_code=status.HTTP_200_OK)
+async def get_category_tree(
+    request: Request,
+    category_service: CategoryService = Depends(get_category_service)
+):
+    """
+    Árbol de categorías activas con la cantidad de productos activos de cada subárbol.
+
+    El árbol se sirve ya serializado desde memoria y se descarta con cualquier
+    cambio de categorías o de productos (en este worker o en otro); su ETag
+    depende solo del contenido, así que coincide entre workers.
+
+    Args:
+        request (Request): Petición con las cabeceras condicionales
+        category_service (CategoryService): Servicio de categorías inyectado por dependencia
+
+    Returns:
+        List[CategoryTreeNode]: Categorías raíz con sus `children` (o 304 sin cuerpo)
+    """
+    tree = await category_service.get_tree()
+    cached = not_modified(request, tree.etag, "categories.tree")
+    if cached is not None:
+        return cached
+    return json_response(tree.body, tree.etag, "categories.tree")
+
+@router.post("", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
+async def create_category(
+    category_data: CategoryCreate,
+    category_service: CategoryService = Depends(get_category_service),
+    current_user: User = Depends(get_admin_required)
+):
+    """
+    Crea una categoría, en la raíz o bajo `parent_id` (solo administradores).
+
+    Args:
+        category_data (CategoryCreate): Nombre, descripción y categoría padre
+        category_service (CategoryService): Servicio de categorías inyectado por dependencia
+        current_user (User): Administrador autenticado
+
+    Returns:
+        CategoryResponse: La categoría creada
+
+    Raises:
+        404: Si la categoría padre no existe
+    """
+    try:
+        category = await category_service.create(category_data)
+    except CategoryNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+
+    logger.info(f"Admin {current_user.id} creo la categoria {category.id}")
+    return category
+
+@router.put("/{category_id}/parent", response_model=CategoryResponse, status_code=status.HTTP_200_OK)
+async def move_category(
+    category_id: UUID,
+    move: CategoryMove,
+    category_service: CategoryService = Depends(get_category_service),
+    current_user: User = Depends(get_admin_required)
+):
+    """
+    Mueve una categoría con todo su subárbol bajo otra, o a la raíz (solo administradores).
+
+    Args:
+        category_id (UUID): ID de la categoría
+        move (CategoryMove): Nueva categoría padre (null para la raíz)
+        category_service (CategoryService): Servicio de categorías inyectado por dependencia
+        current_user (User): Administrador autenticado
+
+    Returns:
+        CategoryResponse: La categoría movida
+
+    Raises:
+        404: Si la categoría o la nueva padre no existen
+        409: Si la nueva padre está en el subárbol de la categoría
+    """
+    try:
+        category = await category_service.move(category_id, move.parent_id)
+    except CategoryNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+    except CategoryCycleException as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.message)
+
+    logger.info(f"Admin {current_user.id} movio la categoria {category_id} bajo {move.parent_id}")
+    return category
+
+@router.get("/{category_id}", response_model=CategoryResponse, status_code=status.HTTP_200_OK)
+async def get_category(
+    category_id: UUID,
+    request: Request,
+    response: Response,
+    category_service: CategoryService = Depends(get_category_service)
+):
+    """
+    Obtiene una categoría activa.
+
+    Args:
+        category_id (UUID): ID de la categoría
+        request (Request): Petición con las cabeceras condicionales
+        response (Response): Respuesta a la que se agregan ETag y Cache-Control
+        category_service (CategoryService): Servicio de categorías inyectado por dependencia
+
+    Returns:
+        CategoryResponse: La categoría (o 304 sin cuerpo)
+
+    Raises:
+        404: Si la categoría no existe o está desactivada
+    """
+    try:
+        if is_conditional(request):
+            version, updated_at = await category_service.get_validators(category_id)
+            cached = not_modified(
+                request, strong_etag("category", category_id, version), "categories.detail", updated_at
+            )
+            if cached is not None:
+                return cached
+
+        category = await category_service.get_by_id(category_id)
+    except CategoryNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+
+    set_validators(
+        response, strong_etag("category", category.id, category.version), "categories.detail", category.updated_at
+    )
+    return category
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, ConfigDict, Field
+from uuid import UUID
+from datetime import datetime
+from typing import List, Optional
+
+class CategoryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    parent_id: Optional[UUID] = None
+    is_active: bool
+    created_at: datetime
+
+class CategoryTreeNode(BaseModel):
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    # Productos activos de la categoria y todas sus descendientes
+    active_product_count: int
+    children: List["CategoryTreeNode"] = []
+
+class CategoryCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = Field(None, max_length=500)
+    parent_id: Optional[UUID] = None
+
+class CategoryMove(BaseModel):
+    # None mueve la categoria a la raiz
+    parent_id: Optional[UUID] = None
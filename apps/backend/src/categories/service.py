@@ -0,0 +1,88 @@
+from typing import List, Optional
+from uuid import UUID
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from shared.database import get_db
+from categories.models import Category
+from categories.repository import CategoryRepository
+from categories.schemas import CategoryCreate
+from categories.tree import CategoryTree, CategoryTreeCache, get_category_tree_cache
+from categories.exceptions import CategoryCycleException, CategoryNotFoundException
+import logging
+
+class CategoryService:
+
+    def __init__(self, category_repo: CategoryRepository, tree_cache: Optional[CategoryTreeCache] = None) -> None:
+        self.category_repo = category_repo
+        self.tree_cache = tree_cache if tree_cache is not None else CategoryTreeCache()
+        self.logger = logging.getLogger(__name__)
+
+    async def list_active(self) -> List[Category]:
+        """ Categorias activas ordenadas por nombre """
+        return await self.category_repo.list_active()
+
+    async def list_versions(self) -> List[tuple]:
+        """ Pares (id, version) de `list_active`, para responder condicionalmente """
+        return await self.category_repo.list_versions()
+
+    async def get_by_id(self, id: UUID) -> Category:
+        """
+            Obtiene una categoria activa.
+
+            Raises:
+                CategoryNotFoundException: Si no existe o esta desactivada.
+        """
+        category = await self.category_repo.get_by_id(id)
+        if category is None:
+            raise CategoryNotFoundException(category_id=id)
+        return category
+
+    async def get_validators(self, id: UUID) -> tuple:
+        """
+            (version, updated_at) de una categoria activa.
+
+            Raises:
+                CategoryNotFoundException: Si no existe o esta desactivada.
+        """
+        validators = await self.category_repo.get_validators(id)
+        if validators is None:
+            raise CategoryNotFoundException(category_id=id)
+        return validators
+
+    async def get_tree(self) -> CategoryTree:
+        """ Arbol de categorias activas con sus conteos (cacheado hasta el proximo cambio) """
+        return self.tree_cache.get(self.category_repo.db)
+
+    async def create(self, category_data: CategoryCreate) -> Category:
+        """
+            Crea una categoria, en la raiz o bajo `parent_id`.
+
+            Raises:
+                CategoryNotFoundException: Si la categoria padre no existe o esta desactivada.
+        """
+        if category_data.parent_id is not None:
+            await self.get_by_id(category_data.parent_id)
+        return await self.category_repo.create(Category(**category_data.model_dump()))
+
+    async def move(self, id: UUID, parent_id: Optional[UUID]) -> Category:
+        """
+            Mueve una categoria y su subarbol bajo `parent_id` (None: a la raiz).
+
+            Raises:
+                CategoryNotFoundException: Si la categoria o la nueva padre no existen.
+                CategoryCycleException: Si `parent_id` es la categoria o una de sus descendientes.
+        """
+        category = await self.category_repo.get_for_write(id)
+        if category is None:
+            raise CategoryNotFoundException(category_id=id)
+        if parent_id == category.parent_id:
+            return category
+        if parent_id is not None:
+            await self.get_by_id(parent_id)
+            # Rechazo temprano; el repositorio lo vuelve a comprobar con el bloqueo tomado
+            if self.category_repo.is_descendant(parent_id, id):
+                raise CategoryCycleException(category_id=id, parent_id=parent_id)
+        return await self.category_repo.move(category, parent_id)
+
+def get_category_service(db: Session = Depends(get_db)) -> CategoryService:
+    return CategoryService(CategoryRepository(db), get_category_tree_cache())
@@ -0,0 +1,131 @@
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+from uuid import UUID
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from categories.repository import CategoryRepository
+from categories.schemas import CategoryTreeNode
+from shared.config import get_settings
+from shared.http_cache import strong_etag
+from shared.invalidation import invalidation_bus
+
+""" Arbol de categorias cacheado en memoria: cuerpo serializado, ETag y subarboles """
+
+_TREE_ADAPTER = TypeAdapter(List[CategoryTreeNode])
+
+
+class CategoryTree:
+    """
+        Copia inmutable de la jerarquia, armada con una sola consulta.
+
+        Guarda el cuerpo JSON de `GET /categories/tree` ya serializado y su ETag
+        (derivado del contenido, igual en todos los workers), y resuelve el
+        subarbol de una categoria en memoria para filtrar el catalogo.
+    """
+
+    def __init__(self, rows: List[tuple]):
+        self.parents: Dict[UUID, Optional[UUID]] = {}
+        self.children: Dict[Optional[UUID], List[UUID]] = {}
+        self._rows = {}
+        for row in rows:
+            category_id, parent_id = row[0], row[1]
+            self.parents[category_id] = parent_id
+            self.children.setdefault(parent_id, []).append(category_id)
+            self._rows[category_id] = row
+        self._subtrees: Dict[UUID, FrozenSet[UUID]] = {}
+        self._lock = threading.Lock()
+
+        self.body = _TREE_ADAPTER.dump_json(self._nodes(None))
+        self.etag = strong_etag("category-tree", self.body)
+
+    def _nodes(self, parent_id: Optional[UUID]) -> List[CategoryTreeNode]:
+        # Filas ya ordenadas por nombre; una categoria inactiva oculta todo su subarbol
+        nodes = []
+        for category_id in self.children.get(parent_id, ()):
+            _, _, name, description, is_active, count = self._rows[category_id]
+            if is_active:
+                nodes.append(CategoryTreeNode(
+                    id=category_id, name=name, description=description,
+                    active_product_count=count, children=self._nodes(category_id)
+                ))
+        return nodes
+
+    def subtree(self, category_id: UUID) -> FrozenSet[UUID]:
+        """ La categoria y todas sus descendientes (vacio si no existe), igual que `category_closure` """
+        subtree = self._subtrees.get(category_id)
+        if subtree is None:
+            if category_id not in self.parents:
+                return frozenset()
+            found, pending = [], [category_id]
+            while pending:
+                current = pending.pop()
+                found.append(current)
+                pending.extend(self.children.get(current, ()))
+            subtree = frozenset(found)
+            with self._lock:
+                self._subtrees[category_id] = subtree
+        return subtree
+
+
+class CategoryTreeCache:
+    """
+        Mantiene el `CategoryTree` actual del proceso.
+
+        Cualquier cambio de categorias o de conteos (de este worker o de otro,
+        via el bus de invalidacion) lo descarta; la siguiente lectura lo arma de
+        nuevo. Una carga que empezo antes de una invalidacion no se guarda, asi
+        que nunca queda cacheado un arbol anterior al ultimo cambio.
+    """
+
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+        self.loads = 0
+        self._tree: Optional[CategoryTree] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, ids=None) -> None:
+        with self._lock:
+            self._tree = None
+            self._generation += 1
+
+    def get(self, db: Session) -> CategoryTree:
+        """
+            Arbol cacheado, o uno recien leido con `db` si no hay o vencio el TTL.
+
+            Raises:
+                DatabaseException: Si ocurre un error al leer las categorias.
+        """
+        tree = self._tree
+        if tree is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return tree
+        generation = self._generation
+        tree = CategoryTree(CategoryRepository(db).list_tree_rows())
+        self.loads += 1
+        with self._lock:
+            if generation == self._generation:
+                self._tree, self._loaded_at = tree, time.monotonic()
+        return tree
+
+
+@lru_cache(maxsize=None)
+def get_category_tree_cache() -> CategoryTreeCache:
+    """
+        Cache del arbol del proceso, suscrita a los cambios de categorias.
+
+        Mientras el listener de invalidaciones esta conectado el arbol se guarda
+        `CATEGORY_TREE_TTL_SECONDS`; si se desconecta vuelve al TTL corto de las consultas.
+    """
+    settings = get_settings()
+    cache = CategoryTreeCache()
+    invalidation_bus.subscribe("category", cache.invalidate)
+    invalidation_bus.on_state(lambda connected: setattr(
+        cache, "ttl",
+        settings.category_tree_ttl_seconds if connected else settings.query_cache_ttl_seconds
+    ))
+    return cache
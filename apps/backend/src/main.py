@@ -1,18 +1,117 @@
 from fastapi import FastAPI,Request,HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from auth.router import router as auth_router
 from users.router import router as users_router
-from shared.exceptions import AppBaseException
+from admin.router import router as admin_router
+from products.router import router as products_router
+from categories.router import router as categories_router
+from shared.exceptions import AppBaseException, RequestCancelledException
+from shared.security import get_key_ring, get_pwd_context
+from shared.config import get_settings
+from shared.database import SessionLocal, get_engine, dispose_engine
+from shared.replicas import get_replica_set, run_replica_health_checks
+from auth.revocation import revocation_list, run_revocation_sync
+from shared.cache import SharedMemoryCache, get_cache
+from products.catalog import run_catalog_refresh
+from products.stock_feed import run_stock_feed
+from shared.invalidation import PostgresChannel, invalidation_bus, run_invalidation_listener
+from products.images import shutdown_image_pipeline
+from shared.metrics import instrument_engine, metrics_registry, monitor_event_loop_lag
+from shared.middleware import CompressionMiddleware, InstrumentationMiddleware
+from shared.admission import AdmissionMiddleware, admission_controller
+from shared.deadline import DeadlineMiddleware, install_deadline_guard
+from shared.profiler import install_query_profiler, query_profiler
+from shared.log import configure_logging, stop_logging
+from contextlib import asynccontextmanager, suppress
+import asyncio
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Configuracion, engine, contexto de passlib y llaves JWT se construyen aqui
+    # y no al importar los modulos: importar `main` no toca la base de datos
+    settings = get_settings()
+    configure_logging(settings.log_level, settings.log_json, settings.log_sample_every)
+    engine = get_engine()
+    replicas = get_replica_set()
+    engines = [engine] + (replicas.engines if replicas else [])
+    if settings.query_profiler_enabled:
+        query_profiler.configure(settings.slow_query_threshold_ms, settings.n_plus_one_threshold)
+    admission_controller.watch_pool(engine.pool)
+    for instrumented in engines:
+        instrument_engine(instrumented)
+        install_deadline_guard(instrumented)
+        if settings.query_profiler_enabled:
+            install_query_profiler(instrumented)
+    get_pwd_context()
+    get_key_ring()
+    # El segmento compartido se abre al arrancar el worker, no en la primera peticion
+    if isinstance(get_cache(), SharedMemoryCache):
+        revocation_list.cache = get_cache()
+    
+    background_tasks = [
+        # Sincroniza el filtro de tokens revocados en segundo plano
+        asyncio.create_task(run_revocation_sync(SessionLocal, settings.revocation_sync_seconds)),
+        asyncio.create_task(monitor_event_loop_lag(settings.loop_lag_interval_ms / 1000)),
+    ]
+    if settings.catalog_snapshot_enabled:
+        background_tasks.append(
+            asyncio.create_task(run_catalog_refresh(SessionLocal, settings.catalog_refresh_seconds))
+        )
+    if settings.stock_feed_enabled:
+        background_tasks.append(
+            asyncio.create_task(run_stock_feed(SessionLocal, settings.stock_feed_tick_ms / 1000))
+        )
+    if replicas:
+        background_tasks.append(
+            asyncio.create_task(run_replica_health_checks(replicas, settings.replica_health_check_seconds))
+        )
+    if settings.invalidation_enabled and engine.dialect.name == "postgresql":
+        # Los demas workers publican sus escrituras con NOTIFY; este las escucha
+        invalidation_bus.notify_channel = settings.invalidation_channel
+        channel = PostgresChannel(
+            engine.url.set(drivername="postgresql").render_as_string(hide_password=False),
+            settings.invalidation_channel
+        )
+        background_tasks.append(asyncio.create_task(run_invalidation_listener(
+            invalidation_bus, channel, settings.invalidation_coalesce_ms / 1000,
+            settings.invalidation_reconnect_seconds
+        )))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    shutdown_image_pipeline()
+    dispose_engine()
+    stop_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 def read_root():
     return {"message": "E-commerce API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """ Metricas por ruta en formato de texto de Prometheus """
+    return PlainTextResponse(
+        metrics_registry.render_prometheus() + admission_controller.render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/admission", include_in_schema=False)
+def admission():
+    """ Estado del control de admision: presion, señales y peticiones rechazadas """
+    return admission_controller.state()
+
 app.include_router(auth_router)
+# Antes que users: sus rutas `/{user_id}` no tienen prefijo y capturarian `/products`
+app.include_router(products_router)
+app.include_router(categories_router)
 app.include_router(users_router)
+app.include_router(admin_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,9 +121,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.exception_handler
+# Dentro de la instrumentacion: los tamaños de respuesta medidos son los comprimidos
+app.add_middleware(CompressionMiddleware.from_settings)
+
+# Tiempo limite de la peticion para las sentencias SQL (504 si se agota)
+app.add_middleware(DeadlineMiddleware.from_settings)
+
+# Rechaza con 503 antes de entrar al resto de la pila cuando el worker esta saturado
+app.add_middleware(AdmissionMiddleware.from_settings)
+
+# Se agrega al final para que sea el middleware mas externo y mida toda la peticion
+app.add_middleware(InstrumentationMiddleware)
+
+@app.exception_handler(AppBaseException)
 async def custom_exception_handler(request: Request, exc: AppBaseException):
     """Handler global para todas las excepciones personalizadas"""
+    if isinstance(exc, RequestCancelledException):
+        # El cliente ya no espera respuesta: `DeadlineMiddleware` la descarta
+        raise exc
         
     # Mapeo de excepciones a códigos HTTP
     exception_status_map = {
@@ -38,6 +152,7 @@ async def custom_exception_handler(request: Request, exc: AppBaseException):
         "UserNotVerifiedException": 403,
         "InsufficientPermissionsException": 403,
         "UserSessionExpiredException": 401,
+        "InvalidRefreshTokenException": 401,
         "UserProfileIncompleteException": 400,
         "InvalidUserRoleException": 400,
         "UserDeletionNotAllowedException": 400,
@@ -45,7 +160,8 @@ async def custom_exception_handler(request: Request, exc: AppBaseException):
         "DuplicateProductNameException": 409,
         "InvalidProductPriceException": 400,
         "ProductOutOfStockException": 404,
-        "ProductIncompleteException": 400
+        "ProductIncompleteException": 400,
+        "DeadlineExceededException": 504
     }
     
     status_code = exception_status_map.get(
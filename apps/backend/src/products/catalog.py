@@ -0,0 +1,433 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from contextlib import suppress
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from products.models import Product
+from shared.invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+""" Catalogo de productos activos en memoria para la navegacion anonima """
+
+# Solapamiento al leer desde la marca de agua (filas confirmadas con un
+# `updated_at` ligeramente anterior a la ultima lectura)
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+# Cada cuantos refrescos se reconstruye todo (compacta y recoge borrados que
+# no llegaron por el bus de invalidacion)
+REBUILD_EVERY = 60
+
+# Fraccion de slots muertos a partir de la cual se reconstruye
+MAX_DEAD_FRACTION = 0.25
+
+# Separacion minima entre refrescos adelantados por invalidaciones
+MIN_REFRESH_INTERVAL = 0.5
+
+SORTS = ("price_asc", "price_desc")
+
+CatalogItem = namedtuple("CatalogItem", "id name price image_url stock is_active category_id version")
+
+
+def item_from_product(product: Product) -> CatalogItem:
+    """ Copia inmutable de un producto, desligada de la sesion que lo cargo """
+    return CatalogItem(
+        product.id, product.name, product.price, product.image_url, product.stock,
+        product.is_active, product.category_id, product.version
+    )
+
+
+_COLUMNS = (
+    Product.id, Product.name, Product.price, Product.image_url, Product.stock,
+    Product.category_id, Product.is_active, Product.updated_at, Product.version,
+)
+
+
+class CatalogSnapshot:
+    """
+        Copia en memoria de los productos activos en representacion columnar.
+
+        Precio y stock viven en `array('q')`, los textos se internan, y un indice
+        ordenado por precio (`sorted_prices` / `price_order`) resuelve rangos de
+        precio y ordenamientos con `bisect` en lugar de recorrer todo el catalogo.
+        Cada producto ocupa un slot; los productos desactivados o eliminados dejan
+        su slot muerto hasta la siguiente reconstruccion.
+
+        Se refresca con consultas incrementales sobre `updated_at`. Un borrado
+        fisico no deja fila que leer: los IDs invalidados (`invalidate`) se
+        consultan en el siguiente refresco y los que ya no existen se marcan
+        muertos. Los borrados que no pasan por el bus los recoge la
+        reconstruccion periodica. Si el ultimo
+        refresco es mas viejo que el maximo permitido, `is_fresh` devuelve False y
+        el servicio consulta la base de datos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watermark: Optional[datetime] = None
+        self._refreshes = 0
+        # IDs invalidados desde el ultimo refresco; `_invalidate_all` fuerza la reconstruccion
+        self._invalidated: Set[uuid.UUID] = set()
+        self._invalidate_all = False
+        self.refreshed_at: Optional[float] = None
+        self._load([])
+
+    def _load(self, rows) -> None:
+        """ Reemplaza el contenido con `rows` (ya ordenadas por precio) """
+        self.ids = []
+        self.names = []
+        self.search_names = []
+        self.image_urls = []
+        self.category_ids = []
+        self.prices = array("q")
+        self.stocks = array("q")
+        self.versions = array("q")
+        self.alive = bytearray()
+        self.slots: Dict = {}
+        self.dead = 0
+        for row in rows:
+            self._append(row)
+        # Las filas llegan ordenadas por (precio, id): el indice es la identidad
+        self.sorted_prices = array("q", self.prices)
+        self.price_order = array("q", range(len(self.ids)))
+
+    def _append(self, row) -> int:
+        slot = len(self.ids)
+        self.ids.append(row.id)
+        self.names.append(sys.intern(row.name))
+        self.search_names.append(sys.intern(row.name.lower()))
+        self.image_urls.append(sys.intern(row.image_url) if row.image_url else None)
+        self.category_ids.append(row.category_id)
+        self.prices.append(row.price)
+        self.stocks.append(row.stock or 0)
+        self.versions.append(row.version)
+        self.alive.append(1)
+        self.slots[row.id] = slot
+        return slot
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.dead
+
+    def is_fresh(self, max_age: float) -> bool:
+        return self.refreshed_at is not None and time.monotonic() - self.refreshed_at <= max_age
+
+    # ---------- Indice por precio ----------
+
+    def _index(self, slot: int) -> None:
+        price, product_id = self.prices[slot], self.ids[slot]
+        position = bisect_left(self.sorted_prices, price)
+        # Entre precios iguales se mantiene el orden por id, igual que el indice (price, id)
+        while (
+            position < len(self.sorted_prices)
+            and self.sorted_prices[position] == price
+            and self.ids[self.price_order[position]] < product_id
+        ):
+            position += 1
+        self.sorted_prices.insert(position, price)
+        self.price_order.insert(position, slot)
+
+    def _unindex(self, slot: int) -> None:
+        price = self.prices[slot]
+        for position in range(bisect_left(self.sorted_prices, price), bisect_right(self.sorted_prices, price)):
+            if self.price_order[position] == slot:
+                del self.sorted_prices[position]
+                del self.price_order[position]
+                return
+
+    # ---------- Refresco ----------
+
+    def invalidate(self, ids: Optional[Iterable]) -> None:
+        """ Anota productos modificados o borrados (None = todos) para el siguiente refresco """
+        with self._lock:
+            if ids is None:
+                self._invalidate_all = True
+                return
+            for product_id in ids:
+                try:
+                    self._invalidated.add(uuid.UUID(str(product_id)))
+                except ValueError:
+                    logger.warning(f"ID de producto invalido en la invalidacion del catalogo: {product_id}")
+
+    def _kill(self, product_id) -> None:
+        slot = self.slots.get(product_id)
+        if slot is not None and self.alive[slot]:
+            self._unindex(slot)
+            self.alive[slot] = 0
+            self.dead += 1
+
+    def _apply(self, row) -> None:
+        slot = self.slots.get(row.id)
+
+        if not row.is_active:
+            self._kill(row.id)
+            return
+
+        if slot is None or not self.alive[slot]:
+            if slot is not None:
+                # Reactivado: el slot viejo queda muerto y se usa uno nuevo
+                del self.slots[row.id]
+            self._index(self._append(row))
+            return
+
+        if self.prices[slot] != row.price:
+            self._unindex(slot)
+            self.prices[slot] = row.price
+            self._index(slot)
+        self.stocks[slot] = row.stock or 0
+        self.versions[slot] = row.version
+        self.names[slot] = sys.intern(row.name)
+        self.search_names[slot] = sys.intern(row.name.lower())
+        self.image_urls[slot] = sys.intern(row.image_url) if row.image_url else None
+        self.category_ids[slot] = row.category_id
+
+    def refresh(self, db: Session) -> int:
+        """
+            Sincroniza el catalogo con la tabla de productos.
+
+            Args:
+                db (Session): Sesion de base de datos.
+
+            Returns:
+                int: Numero de filas leidas.
+        """
+        with self._lock:
+            invalidated, invalidate_all = self._invalidated, self._invalidate_all
+            self._invalidated, self._invalidate_all = set(), False
+
+        full_rebuild = (
+            self._watermark is None
+            or invalidate_all
+            or self._refreshes % REBUILD_EVERY == 0
+            or self.dead > MAX_DEAD_FRACTION * max(1, len(self.ids))
+        )
+
+        try:
+            rows = self._read(db, full_rebuild, invalidated)
+        except SQLAlchemyError:
+            # Se reintentan en el proximo refresco
+            with self._lock:
+                self._invalidated |= invalidated
+                self._invalidate_all = self._invalidate_all or invalidate_all
+            raise
+
+        if full_rebuild:
+            replacement = CatalogSnapshot.__new__(CatalogSnapshot)
+            replacement._load(rows)
+            with self._lock:
+                for name in ("ids", "names", "search_names", "image_urls", "category_ids", "prices",
+                             "stocks", "versions", "alive", "slots", "dead", "sorted_prices", "price_order"):
+                    setattr(self, name, getattr(replacement, name))
+        else:
+            with self._lock:
+                for row in rows:
+                    self._apply(row)
+                # Invalidados sin fila: borrados fisicamente
+                for product_id in invalidated.difference(row.id for row in rows):
+                    self._kill(product_id)
+
+        if rows:
+            newest = max(row.updated_at for row in rows)
+            if self._watermark is None or newest > self._watermark:
+                self._watermark = newest
+        elif self._watermark is None:
+            self._watermark = datetime.utcnow()
+
+        self._refreshes += 1
+        self.refreshed_at = time.monotonic()
+        return len(rows)
+
+    def _read(self, db: Session, full_rebuild: bool, invalidated: Set[uuid.UUID]) -> list:
+        if full_rebuild:
+            return (db.query(*_COLUMNS)
+                    .filter(Product.is_active == True)  # noqa: E712
+                    .order_by(Product.price, Product.id)
+                    .all())
+        changed = Product.updated_at > self._watermark - REFRESH_OVERLAP
+        if invalidated:
+            changed = or_(changed, Product.id.in_(invalidated))
+        return db.query(*_COLUMNS).filter(changed).all()
+
+    # ---------- Consultas ----------
+
+    def query(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: Optional[bool] = None,
+        sort: Optional[str] = None
+    ) -> List[CatalogItem]:
+        """
+            Filtra y pagina el catalogo.
+
+            Args:
+                skip (int): Productos a omitir.
+                limit (int): Maximo de productos a devolver.
+                search (str, optional): Subcadena del nombre (sin distinguir mayusculas).
+                min_price (int, optional): Precio minimo (inclusive).
+                max_price (int, optional): Precio maximo (inclusive).
+                in_stock (bool, optional): Solo con stock (True) o solo agotados (False).
+                sort (str, optional): `price_asc` o `price_desc`; sin orden garantizado si es None.
+
+            Returns:
+                List[CatalogItem]: Pagina de productos.
+        """
+        with self._lock:
+            if min_price is not None or max_price is not None or sort is not None:
+                start = 0 if min_price is None else bisect_left(self.sorted_prices, min_price)
+                end = len(self.sorted_prices) if max_price is None else bisect_right(self.sorted_prices, max_price)
+                candidates = self.price_order[start:end]
+                if sort == "price_desc":
+                    candidates = reversed(candidates)
+            else:
+                candidates = (slot for slot in range(len(self.ids)) if self.alive[slot])
+
+            stocks = self.stocks
+            if in_stock is True:
+                candidates = (slot for slot in candidates if stocks[slot] > 0)
+            elif in_stock is False:
+                candidates = (slot for slot in candidates if stocks[slot] <= 0)
+
+            if search:
+                term = search.strip().lower()
+                search_names = self.search_names
+                candidates = (slot for slot in candidates if term in search_names[slot])
+
+            return [self._item(slot) for slot in islice(candidates, skip, skip + limit)]
+
+    def _price_slots(self, min_price, max_price, category_ids, in_stock, after=None):
+        """ Slots en orden (precio, id) que cumplen los filtros; requiere `self._lock` """
+        start = 0 if min_price is None else bisect_left(self.sorted_prices, min_price)
+        end = len(self.sorted_prices) if max_price is None else bisect_right(self.sorted_prices, max_price)
+
+        if after is not None:
+            after_price, after_id = after
+            start = max(start, bisect_left(self.sorted_prices, after_price))
+            ids, order = self.ids, self.price_order
+            while start < end and self.sorted_prices[start] == after_price and ids[order[start]] <= after_id:
+                start += 1
+
+        slots = self.price_order[start:end]
+        if category_ids is not None:
+            slot_categories = self.category_ids
+            slots = (slot for slot in slots if slot_categories[slot] in category_ids)
+        stocks = self.stocks
+        if in_stock is True:
+            slots = (slot for slot in slots if stocks[slot] > 0)
+        elif in_stock is False:
+            slots = (slot for slot in slots if stocks[slot] <= 0)
+        return slots
+
+    def price_range(
+        self,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        category_ids=None,
+        in_stock: Optional[bool] = None,
+        limit: int = 20,
+        after=None
+    ) -> List[CatalogItem]:
+        """
+            Igual que `ProductRepository.get_by_price_range`, resuelto con `bisect` sobre el indice por precio.
+
+            `category_ids` es el subarbol ya resuelto de la categoria filtrada (ver `CategoryTree.subtree`).
+        """
+        with self._lock:
+            slots = self._price_slots(min_price, max_price, category_ids, in_stock, after)
+            return [self._item(slot) for slot in islice(slots, limit)]
+
+    def price_histogram(
+        self,
+        bucket_size: int,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        category_ids=None,
+        in_stock: Optional[bool] = None
+    ) -> Dict[int, int]:
+        """ Igual que `ProductRepository.price_histogram`, en una pasada sobre el indice por precio """
+        with self._lock:
+            if category_ids is None and in_stock is None:
+                # Sin filtros por fila cada bucket es un rango contiguo del indice: dos bisect por bucket
+                start = 0 if min_price is None else bisect_left(self.sorted_prices, min_price)
+                end = len(self.sorted_prices) if max_price is None else bisect_right(self.sorted_prices, max_price)
+                counts = {}
+                position = start
+                while position < end:
+                    bucket = self.sorted_prices[position] // bucket_size
+                    bucket_end = min(end, bisect_left(self.sorted_prices, (bucket + 1) * bucket_size, position, end))
+                    counts[bucket] = bucket_end - position
+                    position = bucket_end
+                return counts
+
+            counts = {}
+            prices = self.prices
+            for slot in self._price_slots(min_price, max_price, category_ids, in_stock):
+                bucket = prices[slot] // bucket_size
+                counts[bucket] = counts.get(bucket, 0) + 1
+            return counts
+
+    def _item(self, slot: int) -> CatalogItem:
+        return CatalogItem(
+            self.ids[slot], self.names[slot], self.prices[slot], self.image_urls[slot],
+            self.stocks[slot], True, self.category_ids[slot], self.versions[slot]
+        )
+
+
+catalog_snapshot = CatalogSnapshot()
+
+
+async def run_catalog_refresh(session_factory, interval: float, snapshot: CatalogSnapshot = catalog_snapshot) -> None:
+    """
+        Tarea de fondo que refresca el catalogo cada `interval` segundos.
+
+        Una escritura de productos (de este worker o de otro, via el bus de
+        invalidacion) adelanta el siguiente refresco y le pasa los IDs
+        afectados, para detectar los borrados; las rafagas se agrupan en
+        un refresco cada `MIN_REFRESH_INTERVAL` segundos como mucho.
+
+        La consulta corre en un hilo para no bloquear el event loop. Si falla, el
+        catalogo envejece y las consultas pasan a la base de datos.
+    """
+    def refresh_once() -> int:
+        db = session_factory()
+        try:
+            return snapshot.refresh(db)
+        finally:
+            db.close()
+
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+
+    def on_invalidation(ids) -> None:
+        snapshot.invalidate(ids)
+        # El commit que publica puede correr en otro hilo
+        loop.call_soon_threadsafe(wakeup.set)
+
+    unsubscribe = invalidation_bus.subscribe("product", on_invalidation)
+    try:
+        while True:
+            wakeup.clear()
+            try:
+                await asyncio.to_thread(refresh_once)
+            except SQLAlchemyError as e:
+                logger.error(f"Error refrescando el catalogo: {str(e)}")
+            await asyncio.sleep(MIN_REFRESH_INTERVAL)
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(wakeup.wait(), max(0.0, interval - MIN_REFRESH_INTERVAL))
+    finally:
+        unsubscribe()
@@ -40,4 +40,24 @@ class ProductIncompleteException(AppBaseException):
     def __init__(self, product_id: str):
         self.product_id = product_id
         self.message = f"El producto con ID '{product_id}' esta incompleto"
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+class InvalidProductImageException(AppBaseException):
+    """ Excepcion que se lanza cuando la imagen subida no es valida"""
+    def __init__(self, reason: str):
+        self.reason = reason
+        self.message = f"Imagen de producto invalida: {reason}"
+        super().__init__(self.message)
+
+class ProductImageTooLargeException(AppBaseException):
+    """ Excepcion que se lanza cuando la imagen supera el tamaño permitido"""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.message = f"La imagen supera el tamaño maximo de {max_bytes} bytes"
+        super().__init__(self.message)
+
+class ProductVersionConflictException(AppBaseException):
+    """ Excepcion que se lanza cuando el producto cambio desde la version que se leyo"""
+    def __init__(self, product_id: str):
+        self.product_id = product_id
+        self.message = f"El producto con ID '{product_id}' fue modificado por otra peticion"
+        super().__init__(self.message)
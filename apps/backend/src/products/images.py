@@ -0,0 +1,320 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from fastapi import Request
+
+from shared.config import get_settings
+from shared.storage import ObjectStore, get_object_store, upload_file
+from products.exceptions import InvalidProductImageException, ProductImageTooLargeException
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+""" Subida de imagenes de productos: recepcion en streaming, variantes y almacenamiento """
+
+# Variantes WebP generadas por cada original (lado mayor en pixeles)
+VARIANTS = {"large": 1600, "thumb": 320}
+WEBP_QUALITY = 80
+
+# Limite de pixeles al decodificar (protege de imagenes "bomba")
+MAX_IMAGE_PIXELS = 50_000_000
+
+# Firmas de los formatos aceptados: (prefijo, desplazamiento, tipo MIME, extension)
+SIGNATURES = (
+    (b"\xff\xd8\xff", 0, "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png", "png"),
+    (b"WEBP", 8, "image/webp", "webp"),
+)
+SNIFF_BYTES = 12
+
+ReceivedImage = namedtuple("ReceivedImage", "path sha256 size content_type extension")
+
+
+def sniff_image_type(head: bytes):
+    """ Tipo MIME y extension segun los primeros bytes, o None si no es un formato aceptado """
+    for signature, offset, content_type, extension in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if content_type == "image/webp" and not head.startswith(b"RIFF"):
+                continue
+            return content_type, extension
+    return None
+
+
+async def receive_image(request: Request, directory: str, max_bytes: int, field_name: str = "file") -> ReceivedImage:
+    """
+        Recibe el campo `field_name` de un cuerpo multipart y lo escribe en disco a medida que llega.
+
+        Nunca se tiene el archivo completo en memoria: cada trozo del cuerpo se
+        parsea, se escribe y se agrega al hash SHA-256 (en un hilo, para no
+        bloquear el event loop) antes de leer el siguiente.
+
+        Args:
+            request (Request): Peticion con cuerpo `multipart/form-data`.
+            directory (str): Directorio temporal donde se escribe el archivo.
+            max_bytes (int): Tamaño maximo aceptado.
+            field_name (str): Nombre del campo con la imagen.
+
+        Returns:
+            ReceivedImage: Ruta, hash, tamaño y tipo del archivo recibido.
+
+        Raises:
+            InvalidProductImageException: Si el cuerpo no es multipart, falta el campo o no es una imagen aceptada.
+            ProductImageTooLargeException: Si el archivo supera `max_bytes`.
+    """
+    # Se importa aqui y no al cargar el modulo: solo hace falta con la primera subida
+    from python_multipart.multipart import MultipartParser, parse_options_header
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise InvalidProductImageException("se esperaba un cuerpo multipart/form-data")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + 64 * 1024:
+        raise ProductImageTooLargeException(max_bytes)
+
+    path = os.path.join(directory, "original")
+    digest = hashlib.sha256()
+    state = {"headers": {}, "field": b"", "value": b"", "in_file": False, "found": False, "size": 0, "head": b""}
+    pending = []
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["in_file"] = disposition.get(b"name") == field_name.encode() and not state["found"]
+        state["found"] = state["found"] or state["in_file"]
+
+    def on_part_data(data, start, end):
+        if state["in_file"]:
+            pending.append(data[start:end])
+
+    def on_part_end():
+        state["in_file"] = False
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    def write(handle, data: bytes) -> None:
+        handle.write(data)
+        digest.update(data)
+
+    with open(path, "wb") as handle:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except Exception as e:
+                raise InvalidProductImageException("cuerpo multipart malformado") from e
+            if not pending:
+                continue
+
+            data = b"".join(pending)
+            pending.clear()
+            state["size"] += len(data)
+            if state["size"] > max_bytes:
+                raise ProductImageTooLargeException(max_bytes)
+            if len(state["head"]) < SNIFF_BYTES:
+                state["head"] += data[:SNIFF_BYTES]
+                if len(state["head"]) >= SNIFF_BYTES and sniff_image_type(state["head"]) is None:
+                    raise InvalidProductImageException("formato no soportado (JPEG, PNG o WebP)")
+            await asyncio.to_thread(write, handle, data)
+
+    if not state["found"] or state["size"] == 0:
+        raise InvalidProductImageException(f"falta el campo '{field_name}'")
+    detected = sniff_image_type(state["head"])
+    if detected is None:
+        raise InvalidProductImageException("formato no soportado (JPEG, PNG o WebP)")
+
+    return ReceivedImage(path, digest.hexdigest(), state["size"], *detected)
+
+
+def render_variants(source_path: str, output_dir: str, variants: Dict[str, int] = VARIANTS) -> Dict[str, str]:
+    """
+        Genera las variantes WebP de una imagen. Corre en un proceso del pool.
+
+        Las variantes se generan de mayor a menor reutilizando la anterior, y en
+        JPEG `draft` decodifica directamente a una escala reducida.
+
+        Returns:
+            Dict[str, str]: Ruta del archivo de cada variante.
+
+        Raises:
+            ValueError: Si el archivo no es una imagen valida o es demasiado grande.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    largest = max(variants.values())
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(source_path) as image:
+                image.draft("RGB", (largest, largest))
+                image = ImageOps.exif_transpose(image)
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+                paths = {}
+                for name, size in sorted(variants.items(), key=lambda item: -item[1]):
+                    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+                    paths[name] = os.path.join(output_dir, f"{name}.webp")
+                    image.save(paths[name], "WEBP", quality=WEBP_QUALITY, method=4)
+                return paths
+    except (UnidentifiedImageError, Image.DecompressionBombError, Image.DecompressionBombWarning, OSError) as e:
+        raise ValueError(str(e)) from e
+
+
+class ImagePipeline:
+    """
+        Procesa y almacena imagenes de productos.
+
+        Las variantes se generan en un pool de procesos (la decodificacion y el
+        redimensionado no bloquean el event loop ni compiten por el GIL), y todo
+        se guarda bajo el SHA-256 del original: subir dos veces la misma imagen
+        no la procesa ni la sube de nuevo, tampoco si ambas subidas son simultaneas.
+    """
+
+    def __init__(
+        self,
+        store: ObjectStore,
+        pool: ProcessPoolExecutor,
+        part_size: int,
+        part_concurrency: int = 4,
+        max_inflight_parts: int = 8
+    ):
+        self.store = store
+        self.pool = pool
+        self.part_size = part_size
+        self.part_concurrency = part_concurrency
+        self.inflight_parts = asyncio.Semaphore(max_inflight_parts)
+        self._in_progress: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def keys(received: ReceivedImage) -> Dict[str, str]:
+        prefix = f"products/{received.sha256}"
+        keys = {name: f"{prefix}/{name}.webp" for name in VARIANTS}
+        keys["original"] = f"{prefix}/original.{received.extension}"
+        return keys
+
+    def urls(self, received: ReceivedImage) -> Dict[str, str]:
+        return {name: self.store.public_url(key) for name, key in self.keys(received).items()}
+
+    async def store_image(self, received: ReceivedImage) -> bool:
+        """
+            Genera y sube las variantes y el original, salvo que ya existan.
+
+            Returns:
+                bool: True si la imagen ya estaba almacenada (deduplicada).
+
+            Raises:
+                InvalidProductImageException: Si la imagen no se puede decodificar.
+        """
+        running = self._in_progress.get(received.sha256)
+        if running is not None:
+            await asyncio.shield(running)
+            return True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_progress[received.sha256] = future
+        try:
+            keys = self.keys(received)
+            # El original se sube al final: si existe, las variantes tambien
+            stored = await self.store.exists(keys["original"])
+            if not stored:
+                await self._process(received, keys)
+            future.set_result(None)
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita el aviso de excepcion no recuperada si nadie esperaba
+            future.exception()
+            raise
+        finally:
+            del self._in_progress[received.sha256]
+        return stored
+
+    async def _process(self, received: ReceivedImage, keys: Dict[str, str]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            variants = await loop.run_in_executor(
+                self.pool, render_variants, received.path, os.path.dirname(received.path)
+            )
+        except ValueError as e:
+            raise InvalidProductImageException("no se pudo decodificar la imagen") from e
+
+        await asyncio.gather(*(
+            self.store.put_file(keys[name], path, "image/webp") for name, path in variants.items()
+        ))
+        await upload_file(
+            self.store, keys["original"], received.path, received.content_type,
+            part_size=self.part_size, concurrency=self.part_concurrency, inflight=self.inflight_parts
+        )
+        logger.info(f"Imagen {received.sha256} almacenada ({received.size} bytes)")
+
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+_image_pipeline: Optional[ImagePipeline] = None
+# La dependencia es sincrona y corre en el threadpool: dos primeras subidas
+# simultaneas crearian dos pools de procesos
+_image_lock = threading.Lock()
+
+
+def get_image_pipeline() -> ImagePipeline:
+    """ Pipeline compartido por el proceso; el pool de procesos se crea con la primera subida """
+    global _image_pool, _image_pipeline
+    if _image_pipeline is not None:
+        return _image_pipeline
+    with _image_lock:
+        if _image_pipeline is None:
+            settings = get_settings()
+            # `spawn`: los hijos no heredan hilos ni conexiones abiertas del servidor
+            _image_pool = ProcessPoolExecutor(
+                max_workers=settings.image_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _image_pipeline = ImagePipeline(
+                get_object_store(), _image_pool, settings.upload_part_size,
+                settings.upload_part_concurrency, settings.upload_max_inflight_parts
+            )
+        return _image_pipeline
+
+
+def shutdown_image_pipeline() -> None:
+    global _image_pool, _image_pipeline
+    with _image_lock:
+        if _image_pool is not None:
+            _image_pool.shutdown(wait=True, cancel_futures=True)
+        _image_pool, _image_pipeline = None, None
+
+
+def upload_directory() -> str:
+    """ Directorio temporal para una subida; se borra con `shutil.rmtree` al terminar """
+    return tempfile.mkdtemp(prefix="product-image-")
+
+
+async def discard_directory(directory: str) -> None:
+    await asyncio.to_thread(shutil.rmtree, directory, True)
@@ -1,16 +1,23 @@
 from sqlalchemy import Column , Integer , String , DateTime,Boolean
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
-from sqlalchemy.orm import declarative_base,relationship
+from sqlalchemy.orm import relationship
+from shared.database import Base
 from datetime import datetime
-from sqlalchemy import ForeignKey
-
-Base = declarative_base()
+from sqlalchemy import ForeignKey, Index
+# Registra `Category` en el mismo Base para resolver la relacion
+import categories.models  # noqa: F401
 
 """ Modelo de usuario que se va a validar """
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Rangos y top-N por precio con paginacion por cursor (precio, id)
+        Index("ix_products_price_id", "price", "id"),
+        # Filtro combinado categoria + precio
+        Index("ix_products_category_price_id", "category_id", "price", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), default=uuid.uuid4, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
@@ -20,6 +27,17 @@ class Product(Base):
     stock = Column(Integer, default=0)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Marca de agua para los refrescos incrementales del catalogo en memoria
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+    # Version de la fila: la incrementa el mapper en cada UPDATE (ETags, ver `shared.http_cache`).
+    # Las actualizaciones masivas (`query.update`) deben incrementarla a mano
+    version = Column(Integer, nullable=False, default=1)
 
     category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False)
     category = relationship("Category", back_populates="products")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    @property
+    def category_name(self) -> str:
+        return self.category.name
@@ -0,0 +1,50 @@
+import base64
+import uuid
+from typing import List, Optional, Tuple
+
+""" Utilidades de las consultas por precio: cursores y buckets de histograma """
+
+PriceCursor = Tuple[int, uuid.UUID]
+
+
+def encode_cursor(price: int, product_id: uuid.UUID) -> str:
+    """ Cursor opaco de la ultima fila de una pagina ordenada por (precio, id) """
+    raw = f"{price}:{product_id.hex}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> PriceCursor:
+    """
+        Decodifica un cursor de `encode_cursor`.
+
+        Raises:
+            ValueError: Si el cursor no es valido.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        price, product_id = base64.urlsafe_b64decode(padded).decode("ascii").split(":")
+        return int(price), uuid.UUID(hex=product_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Cursor de paginacion invalido") from e
+
+
+def histogram_buckets(counts: dict, bucket_size: int) -> List[dict]:
+    """
+        Convierte conteos por numero de bucket (`precio // bucket_size`) en rangos.
+
+        Returns:
+            List[dict]: `min_price` (inclusive), `max_price` (exclusive) y `count`, ordenados.
+    """
+    return [
+        {"min_price": bucket * bucket_size, "max_price": (bucket + 1) * bucket_size, "count": count}
+        for bucket, count in sorted(counts.items())
+        if count
+    ]
+
+
+def next_cursor(items: list, limit: int) -> Optional[str]:
+    """ Cursor de la siguiente pagina, o None si esta fue la ultima """
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(last.price, last.id)
@@ -1,13 +1,21 @@
 from products.interface import ProductInterface
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy import func
+from sqlalchemy import func, tuple_, update
 from products.models import Product
+from categories.models import Category
+from categories.repository import CategoryRepository
 from shared.exceptions import DatabaseException
-from typing import Optional, List
-import logging 
+from shared.database import apply_returned_row
+from shared.invalidation import invalidation_bus
+from products.exceptions import ProductVersionConflictException
+from typing import Dict, Iterable, Optional, List, Tuple
+from uuid import UUID
+from shared.log import get_logger
+from shared.replicas import read_only
+from products.pricing import PriceCursor
 
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 class ProductRepository(ProductInterface):
     def __init__(self, db: Session):
@@ -24,19 +32,20 @@ class ProductRepository(ProductInterface):
                 Optional[Product]: El producto encontrado o None si no existe.
         """
         try:
-            logger.info(f"Buscando producto con ID: {id}")
-            product = self.db.query(Product).filter(Product.id == id).first()
+            logger.info_sampled("Buscando producto por ID", product_id=id)
+            # Busca primero en el mapa de identidad: el servicio relee por id antes de escribir
+            product = self.db.get(Product, id)
             
             if product:
-                logger.debug(f"Producto encontrado exitosamente: {product.id}")
+                logger.debug("Producto encontrado", product_id=product.id)
             else:
-                logger.debug(f"No se encontró ningún producto con ID: {id}")
+                logger.debug("No se encontró ningún producto", product_id=id)
             return product
         except IntegrityError as e:
-            logger.error(f"Error de integridad buscando producto por su ID {id}: {str(e)}")
+            logger.error("Error de integridad buscando producto por ID", product_id=id, error=str(e))
             raise DatabaseException("Error al buscar producto en la base de datos") from e
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD buscando producto por su ID {id}: {str(e)}")
+            logger.error("Error de BD buscando producto por ID", product_id=id, error=str(e))
             raise DatabaseException("Error al buscar producto en la base de datos") from e
         
     async def get_by_name(self,name:str) -> Optional[Product]:
@@ -50,57 +59,58 @@ class ProductRepository(ProductInterface):
                 Optional[Product]: El producto encontrado o None si no existe.
         """
         try:
-            logger.info(f"Buscando producto con nombre: {name}")
+            logger.info_sampled("Buscando producto por nombre", name=name)
             product = self.db.query(Product).filter(
                 func.lower(Product.name) == func.lower(name)
             ).first()
             
             if product:
-                logger.debug(f"Producto encontrado exitosamente: {product.name}")
+                logger.debug("Producto encontrado", name=product.name)
             else:
-                logger.debug(f"No se encontró ningún producto con nombre: {name}")
+                logger.debug("No se encontró ningún producto", name=name)
                 
             return product
         except IntegrityError as e:
-            logger.error(f"Error de integridad buscando producto por nombre {name}: {str(e)}")
+            logger.error("Error de integridad buscando producto por nombre", name=name, error=str(e))
             raise DatabaseException("Error al buscar producto en la base de datos") from e
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD buscando producto por nombre {name}: {str(e)}")
+            logger.error("Error de BD buscando producto por nombre", name=name, error=str(e))
             raise DatabaseException("Error al buscar producto en la base de datos") from e
     
+    @read_only
     async def get_in_stock(self,skip:int = 0,limit:int = 10)-> List[Product]:
         try:
-            logger.info("Obteniendo productos que tienen stock")
+            logger.info_sampled("Obteniendo productos que tienen stock", skip=skip, limit=limit)
             products = (self.db.query(Product)
                         .filter(Product.stock > 0)
                         .offset(skip)
                         .limit(limit)
                         .all())
 
-            logger.debug(f"Productos en stock obtenidos: {len(products)} productos")
+            logger.debug("Productos en stock obtenidos", count=len(products))
 
             return products
         except IntegrityError as e:
-            logger.error(f"Error de integridad al obtener productos en stock: {str(e)}")
+            logger.error("Error de integridad al obtener productos en stock", error=str(e))
             raise DatabaseException("Error al obtener productos en stock") from e
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD al obtener productos en stock: {str(e)}")
+            logger.error("Error de BD al obtener productos en stock", error=str(e))
             raise DatabaseException("Error al obtener productos en stock") from e
     
     async def get_out_of_stock(self,skip:int = 0, limit:int = 10)-> List[Product]:
         try:
-            logger.info("Obteniendo productos que no tienen stock")
+            logger.info_sampled("Obteniendo productos que no tienen stock", skip=skip, limit=limit)
             products = (self.db.query(Product)
                         .filter(Product.stock == 0)
                         .offset(skip)
                         .limit(limit)
                         .all())
             
-            logger.debug(f"Productos sin stock obtenidos: {len(products)} productos")
+            logger.debug("Productos sin stock obtenidos", count=len(products))
             return products
 
         except IntegrityError as e:
-            logger.error(f"Error de integridad al obtener productos sin stock: {str(e)}")
+            logger.error("Error de integridad al obtener productos sin stock", error=str(e))
             raise DatabaseException("Error al obtener productos sin stock") from e
         except SQLAlchemyError as e:
             raise DatabaseException("Error al obtener productos sin de estock") from e
@@ -121,38 +131,61 @@ class ProductRepository(ProductInterface):
         """
         
         try:
-            logger.info(f"Consultando stock del producto ID: {product_id}")
+            logger.info_sampled("Consultando stock del producto", product_id=product_id)
             stock = self.db.query(Product.stock).filter(Product.id == product_id).scalar()
             
             if stock is None:
                 raise DatabaseException(f"Producto con ID {product_id} no encontrado")
                 
-            logger.debug(f"Stock del producto {product_id}: {stock}")
+            logger.debug("Stock del producto", product_id=product_id, stock=stock)
             return stock
         except IntegrityError as e:
             self.db.rollback()
-            logger.error(f"Error de integridad consultando stock del producto {product_id}: {str(e)}")
+            logger.error("Error de integridad consultando stock del producto", product_id=product_id, error=str(e))
             raise DatabaseException("Error al consultar stock del producto en la base de datos") from e
         except SQLAlchemyError as e:
             self.db.rollback()
-            logger.error(f"Error de BD consultando stock del producto {product_id}: {str(e)}")
+            logger.error("Error de BD consultando stock del producto", product_id=product_id, error=str(e))
             raise DatabaseException("Error al consultar stock del producto en la base de datos") from e
-    
+
+    def get_stocks(self, product_ids: Iterable[UUID], chunk_size: int = 1000) -> Dict[UUID, int]:
+        """
+            Stock actual de varios productos, en una consulta por cada `chunk_size` IDs.
+
+            Lee del primario: se llama justo despues de una escritura y una replica
+            atrasada devolveria el valor anterior.
+
+            Args:
+                product_ids (Iterable[UUID]): IDs de los productos.
+
+            Returns:
+                Dict[UUID, int]: Stock por ID; los productos que no existen no aparecen.
+
+            Raises:
+                SQLAlchemyError: Si falla la consulta.
+        """
+        product_ids = list(product_ids)
+        stocks = {}
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = product_ids[start:start + chunk_size]
+            stocks.update(self.db.query(Product.id, Product.stock).filter(Product.id.in_(chunk)).all())
+        return stocks
+
     async def low_stock(self,threshold:int) -> List[Product]:
         try:
             products = (self.db.query(Product)
                         .filter(Product.stock < threshold)
                         .filter(Product.stock > 0)  # Excluir productos sin stock
                         .all())
-            logger.debug(f"Productos con stock bajo encontrados: {len(products)}")
+            logger.debug("Productos con stock bajo encontrados", count=len(products))
             return products
         except IntegrityError as e:
             self.db.rollback()
-            logger.error(f"Error de integridad consultando productos con stock bajo: {str(e)}")
+            logger.error("Error de integridad consultando productos con stock bajo", error=str(e))
             raise DatabaseException("Error al consultar productos con stock bajo en la base de datos") from e
         except SQLAlchemyError as e:
             self.db.rollback()
-            logger.error(f"Error de BD consultando productos con stock bajo: {str(e)}")
+            logger.error("Error de BD consultando productos con stock bajo", error=str(e))
             raise DatabaseException("Error al consultar productos con stock bajo en la base de datos") from e
 
     async def create(self, product_data: Product) -> Product:
@@ -169,52 +202,79 @@ class ProductRepository(ProductInterface):
         try: 
             
             self.db.add(product_data)
+            self.db.flush()
+            self._move_in_category_counts(None, (product_data.category_id, product_data.is_active))
+            invalidation_bus.publish(self.db, "product", [product_data.id])
             self.db.commit()
             self.db.refresh(product_data)
-            logger.info(f"Producto creado exitosamente: {product_data.id}")
+            logger.info("Producto creado exitosamente", product_id=product_data.id)
             return product_data 
         except IntegrityError as e:
-            logger.error(f"Error de integridad al crear producto: {str(e)}")
+            logger.error("Error de integridad al crear producto", error=str(e))
             self.db.rollback()
             raise DatabaseException("Error al crear producto en la base de datos") from e
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD al crear producto: {str(e)}")
+            logger.error("Error de BD al crear producto", error=str(e))
             self.db.rollback()
             raise DatabaseException("Error al crear producto en la base de datos") from e
 
-    async def update(self, product: Product, update_data: dict) -> Product:
+    async def update(self, product: Product, update_data: dict, expected_version: Optional[int] = None) -> Product:
         """
-            Actualiza un producto existente.
+            Actualiza un producto existente con un unico `UPDATE ... RETURNING`.
+
+            La version se incrementa en la misma sentencia; con `expected_version`
+            la fila solo se modifica si sigue en esa version (bloqueo optimista),
+            asi dos administradores editando a la vez no se pisan en silencio.
 
             Args:
                 product (Product): El producto a actualizar.
                 update_data (dict): Un diccionario con los campos a actualizar.
+                expected_version (int, optional): Version que el cliente leyo.
 
             Returns:
                 Product: El producto actualizado.
 
             Raises:
+                ProductVersionConflictException: Si el producto ya no esta en `expected_version`.
                 DatabaseException: Si ocurre un error al actualizar el producto.
         """
+        values = {
+            field: value for field, value in update_data.items()
+            if field in Product.__table__.c and field not in ("id", "version") and value is not None
+        }
+        statement = (
+            update(Product)
+            .where(Product.id == product.id)
+            .values(**values, version=Product.version + 1)
+            .returning(*Product.__table__.c)
+            .execution_options(synchronize_session=False)
+        )
+        if expected_version is not None:
+            statement = statement.where(Product.version == expected_version)
+
         try:
-            for field, value in update_data.items():
-                if hasattr(product, field) and value is not None:
-                    old_value = getattr(product, field)
-                    setattr(product, field, value)
-                    logger.debug(f"Campo {field} actualizado: {old_value} -> {value}")
+            row = self.db.execute(statement).first()
+            if row is None:
+                self.db.rollback()
+                logger.info("Conflicto de version actualizando producto", product_id=product.id,
+                            expected_version=expected_version)
+                raise ProductVersionConflictException(product.id)
+            self._move_in_category_counts((product.category_id, product.is_active), (row.category_id, row.is_active))
+            invalidation_bus.publish(self.db, "product", [product.id])
             self.db.commit()
-            self.db.refresh(product)
+            apply_returned_row(product, row)
             
-            logger.info(f"Producto actualizado exitosamente: {product.id}")
+            logger.debug("Campos actualizados", product_id=product.id, fields=list(values))
+            logger.info("Producto actualizado exitosamente", product_id=product.id, version=product.version)
             return product
         
         except IntegrityError as e:
             self.db.rollback()
-            logger.error(f"Error de integridad actualizando producto {product.id}: {str(e)}")
+            logger.error("Error de integridad actualizando producto", product_id=product.id, error=str(e))
             raise DatabaseException("Error al actualizar producto en la base de datos") from e
         except SQLAlchemyError as e:
             self.db.rollback()
-            logger.error(f"Error de BD actualizando producto {product.id}: {str(e)}")
+            logger.error("Error de BD actualizando producto", product_id=product.id, error=str(e))
             raise DatabaseException("Error al actualizar producto en la base de datos") from e
     
     async def update_stock(self,product:Product,stock:int) -> Product:
@@ -233,22 +293,23 @@ class ProductRepository(ProductInterface):
         """
         
         try:
-            logger.info(f"Actualizando stock del producto ID: {product.id}")
+            logger.debug("Actualizando stock del producto", product_id=product.id)
             old_stock = product.stock
             product.stock = stock
             
+            invalidation_bus.publish(self.db, "product", [product.id])
             self.db.commit()
             self.db.refresh(product)
             
-            logger.info(f"Stock actualizado exitosamente: {old_stock} -> {stock}")
+            logger.info("Stock actualizado exitosamente", product_id=product.id, old=old_stock, new=stock)
             return product
         except IntegrityError as e:
             self.db.rollback()
-            logger.error(f"Error de integridad actualizando stock del producto {product.id}: {str(e)}")
+            logger.error("Error de integridad actualizando stock del producto", product_id=product.id, error=str(e))
             raise DatabaseException("Error al actualizar stock del producto en la base de datos") from e
         except SQLAlchemyError as e:
             self.db.rollback()
-            logger.error(f"Error de BD actualizando stock del producto {product.id}: {str(e)}")
+            logger.error("Error de BD actualizando stock del producto", product_id=product.id, error=str(e))
             raise DatabaseException("Error al actualizar stock del producto en la base de datos") from e    
 
 
@@ -264,24 +325,53 @@ class ProductRepository(ProductInterface):
                 bool: True si se elimina exitosamente. False si no es asi.
         """
         try:
-            logger.info(f"Eliminando producto ID: {product.id}")
+            logger.debug("Eliminando producto", product_id=product.id)
             product_id = product.id  # Guardar ID para logging
             
             self.db.delete(product)
+            self._move_in_category_counts((product.category_id, product.is_active), None)
+            invalidation_bus.publish(self.db, "product", [product_id])
             self.db.commit()
             
-            logger.info(f"Producto eliminado exitosamente: {product_id}")
+            logger.info("Producto eliminado exitosamente", product_id=product_id)
             return True
         except IntegrityError as e:
             self.db.rollback()
-            logger.error(f"Error de integridad eliminando producto {product.id}: {str(e)}")
+            logger.error("Error de integridad eliminando producto", product_id=product.id, error=str(e))
             raise DatabaseException("Error al eliminar producto en la base de datos") from e
         except SQLAlchemyError as e:
             self.db.rollback()
-            logger.error(f"Error de BD eliminando producto {product.id}: {str(e)}")
+            logger.error("Error de BD eliminando producto", product_id=product.id, error=str(e))
             raise DatabaseException("Error al eliminar producto en la base de datos") from e
 
-    def list_products(self, skip: int = 0, limit: int = 10, search: Optional[str] = None) -> List[Product]:
+    def _move_in_category_counts(self, before: Optional[tuple], after: Optional[tuple]) -> None:
+        """
+            Mantiene `Category.active_product_count` en la transaccion de la escritura.
+
+            `before` y `after` son (category_id, is_active) del producto antes y
+            despues (None si no existia o ya no existe); solo cambia algo si el
+            producto entra o sale de los activos o cambia de categoria.
+        """
+        if before == after:
+            return
+        categories = CategoryRepository(self.db)
+        if before is not None and before[1]:
+            categories.adjust_product_counts(before[0], -1)
+        if after is not None and after[1]:
+            categories.adjust_product_counts(after[0], 1)
+
+    @read_only
+    def list_products(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: Optional[bool] = None,
+        sort: Optional[str] = None,
+        active_only: bool = False
+    ) -> List[Product]:
         """
             Da una lista de productos.
             
@@ -289,6 +379,11 @@ class ProductRepository(ProductInterface):
                 skip (int): El número de productos a omitir.
                 limit (int): El número máximo de productos a devolver.
                 search (Optional[str]): Una cadena de búsqueda para filtrar productos por nombre.
+                min_price (Optional[int]): Precio mínimo (inclusive).
+                max_price (Optional[int]): Precio máximo (inclusive).
+                in_stock (Optional[bool]): Solo con stock (True) o solo agotados (False).
+                sort (Optional[str]): `price_asc` o `price_desc`.
+                active_only (bool): Excluir productos desactivados.
 
             Returns:
                 List[Product]: Una lista de productos.
@@ -297,21 +392,121 @@ class ProductRepository(ProductInterface):
                 DatabaseException: Si ocurre un error al listar los productos.
         """
         try:
-            logger.info(f"Listando productos - skip: {skip}, limit: {limit}, search: {search}")
-            query = self.db.query(Product)
-
-            if search:
-                search_term = f"%{search.strip()}%"
-                query = query.filter(Product.name.ilike(search_term))
-                
+            logger.info_sampled("Listando productos", skip=skip, limit=limit, search=search)
+            query = self._list_query(
+                self.db.query(Product), search, min_price, max_price, in_stock, sort, active_only
+            )
             products = query.offset(skip).limit(limit).all()
-            logger.debug(f"Productos encontrados: {len(products)}")
+            logger.debug("Productos encontrados", count=len(products))
 
             return products
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD listando productos: {str(e)}")
+            logger.error("Error de BD listando productos", error=str(e))
             raise DatabaseException("Error al listar productos en la base de datos") from e
 
+    @read_only
+    def list_versions(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: Optional[bool] = None,
+        sort: Optional[str] = None,
+        active_only: bool = False
+    ) -> List[Tuple[UUID, int]]:
+        """
+            Pares (id, version) de la misma pagina que `list_products`, sin cargar entidades.
+
+            Alcanza para calcular el ETag de la pagina y responder 304 sin
+            construir objetos ORM.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            query = self._list_query(
+                self.db.query(Product.id, Product.version), search, min_price, max_price, in_stock, sort, active_only
+            )
+            return [tuple(row) for row in query.offset(skip).limit(limit).all()]
+        except SQLAlchemyError as e:
+            logger.error("Error de BD listando versiones de productos", error=str(e))
+            raise DatabaseException("Error al listar productos en la base de datos") from e
+
+    @staticmethod
+    def _list_query(query, search, min_price, max_price, in_stock, sort, active_only):
+        if search:
+            search_term = f"%{search.strip()}%"
+            query = query.filter(Product.name.ilike(search_term))
+        if active_only:
+            query = query.filter(Product.is_active == True)  # noqa: E712
+        if min_price is not None:
+            query = query.filter(Product.price >= min_price)
+        if max_price is not None:
+            query = query.filter(Product.price <= max_price)
+        if in_stock is True:
+            query = query.filter(Product.stock > 0)
+        elif in_stock is False:
+            query = query.filter(Product.stock <= 0)
+        if sort == "price_asc":
+            query = query.order_by(Product.price, Product.id)
+        elif sort == "price_desc":
+            query = query.order_by(Product.price.desc(), Product.id.desc())
+        return query
+
+    @read_only
+    async def get_detail(self, id: UUID) -> Optional[Product]:
+        """
+            Obtiene un producto activo con su categoria (una sola consulta con JOIN).
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            return (self.db.query(Product)
+                    .options(joinedload(Product.category))
+                    .filter(Product.id == id, Product.is_active == True)  # noqa: E712
+                    .first())
+        except SQLAlchemyError as e:
+            logger.error("Error de BD obteniendo detalle de producto", product_id=id, error=str(e))
+            raise DatabaseException("Error al obtener el producto") from e
+
+    @read_only
+    async def get_detail_validators(self, id: UUID) -> Optional[tuple]:
+        """
+            Versiones y fechas de modificacion del producto activo y su categoria, sin cargar entidades.
+
+            Returns:
+                Optional[tuple]: (version, category_version, updated_at, category_updated_at), o None.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            return (self.db.query(Product.version, Category.version, Product.updated_at, Category.updated_at)
+                    .join(Category, Product.category_id == Category.id)
+                    .filter(Product.id == id, Product.is_active == True)  # noqa: E712
+                    .first())
+        except SQLAlchemyError as e:
+            logger.error("Error de BD obteniendo version de producto", product_id=id, error=str(e))
+            raise DatabaseException("Error al obtener el producto") from e
+
+    async def list(self, skip: int = 0, limit: int = 10) -> List[Product]:
+        """ Implementa `ProductInterface.list` (ver `list_products`) """
+        return self.list_products(skip=skip, limit=limit)
+
+    def release_connection(self) -> None:
+        """
+            Termina la transaccion actual y devuelve la conexion al pool.
+
+            Para operaciones largas que no usan la base de datos (subidas de
+            archivos): la sesion sigue usable y vuelve a pedir una conexion en la
+            siguiente consulta. Los objetos cargados se recargan al accederlos.
+        """
+        self.db.commit()
+
+    @read_only
     def count_products(self, search: Optional[str] = None) -> int:
         """
             Cuenta el número de productos en la base de datos.
@@ -326,7 +521,7 @@ class ProductRepository(ProductInterface):
                 DatabaseException: Si ocurre un error al contar los productos.
         """
         try:
-            logger.info(f"Contando productos - search: {search}")
+            logger.info_sampled("Contando productos", search=search)
             query = self.db.query(Product)
 
             if search:
@@ -334,41 +529,121 @@ class ProductRepository(ProductInterface):
                 query = query.filter(Product.name.ilike(search_term))
 
             count = query.count()
-            logger.debug(f"Total de productos encontrados: {count}")
+            logger.debug("Total de productos encontrados", count=count)
 
             return count
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD contando productos: {str(e)}")
+            logger.error("Error de BD contando productos", error=str(e))
             raise DatabaseException("Error al contar productos en la base de datos") from e
     
-    async def get_by_price_range(self, min_price: float, max_price: float) -> List[Product]:
-        """Obtiene productos en un rango de precios específico."""
+    @read_only
+    async def get_by_price_range(
+        self,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        category_id: Optional[UUID] = None,
+        in_stock: Optional[bool] = None,
+        limit: int = 20,
+        after: Optional[PriceCursor] = None
+    ) -> List[Product]:
+        """
+            Obtiene una pagina de productos activos en un rango de precios, ordenados por (precio, id).
+
+            La paginacion es por cursor (`after` = precio e id de la ultima fila de la
+            pagina anterior), de modo que cada pagina es un recorrido acotado del
+            indice `(price, id)` o `(category_id, price, id)` sin OFFSET.
+
+            Args:
+                min_price (Optional[int]): Precio mínimo (inclusive).
+                max_price (Optional[int]): Precio máximo (inclusive).
+                category_id (Optional[UUID]): Solo productos de esta categoría o sus descendientes.
+                in_stock (Optional[bool]): Solo con stock (True) o solo agotados (False).
+                limit (int): Tamaño de la página.
+                after (Optional[PriceCursor]): Cursor de la página anterior.
+
+            Returns:
+                List[Product]: Productos de la página.
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
         try:
-            logger.info(f"Buscando productos en rango de precio: {min_price} - {max_price}")
-            products = (self.db.query(Product)
-                        .filter(Product.price >= min_price)
-                        .filter(Product.price <= max_price)
-                        .all())
+            logger.info_sampled("Buscando productos en rango de precio", min_price=min_price, max_price=max_price)
+            query = self._price_filters(self.db.query(Product), min_price, max_price, category_id, in_stock)
+            if after is not None:
+                query = query.filter(tuple_(Product.price, Product.id) > tuple_(*after))
+            products = query.order_by(Product.price, Product.id).limit(limit).all()
             
-            logger.debug(f"Productos en rango de precio encontrados: {len(products)}")
+            logger.debug("Productos en rango de precio encontrados", count=len(products))
             return products
             
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD buscando productos por rango de precio: {str(e)}")
+            logger.error("Error de BD buscando productos por rango de precio", error=str(e))
             raise DatabaseException("Error al buscar productos por rango de precio") from e
 
-    async def get_most_expensive(self, limit: int = 10) -> List[Product]:
+    @read_only
+    async def price_histogram(
+        self,
+        bucket_size: int,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        category_id: Optional[UUID] = None,
+        in_stock: Optional[bool] = None
+    ) -> dict:
+        """
+            Cuenta productos activos por bucket de precio en una sola consulta agregada.
+
+            Args:
+                bucket_size (int): Ancho de cada bucket.
+                min_price, max_price, category_id, in_stock: Mismos filtros que `get_by_price_range`.
+
+            Returns:
+                dict: Conteo por número de bucket (`precio // bucket_size`).
+
+            Raises:
+                DatabaseException: Si ocurre un error al consultar.
+        """
+        try:
+            bucket = (Product.price // bucket_size).label("bucket")
+            query = self._price_filters(
+                self.db.query(bucket, func.count()), min_price, max_price, category_id, in_stock
+            )
+            counts = dict(query.group_by(bucket).all())
+            logger.debug("Histograma de precios calculado", buckets=len(counts))
+            return counts
+        except SQLAlchemyError as e:
+            logger.error("Error de BD calculando histograma de precios", error=str(e))
+            raise DatabaseException("Error al calcular el histograma de precios") from e
+
+    @staticmethod
+    def _price_filters(query, min_price, max_price, category_id, in_stock):
+        query = query.filter(Product.is_active == True)  # noqa: E712
+        if category_id is not None:
+            # La categoria incluye sus descendientes: una subconsulta por el indice de `category_closure`
+            query = query.filter(Product.category_id.in_(CategoryRepository.descendants_query(category_id)))
+        if min_price is not None:
+            query = query.filter(Product.price >= min_price)
+        if max_price is not None:
+            query = query.filter(Product.price <= max_price)
+        if in_stock is True:
+            query = query.filter(Product.stock > 0)
+        elif in_stock is False:
+            query = query.filter(Product.stock <= 0)
+        return query
+
+    @read_only
+    def get_most_expensive(self, limit: int = 10) -> List[Product]:
         """Obtiene los productos más caros."""
         try:
-            logger.info(f"Obteniendo los {limit} productos más caros")
+            logger.info_sampled("Obteniendo los productos más caros", limit=limit)
             products = (self.db.query(Product)
-                        .order_by(Product.price.desc())
+                        .order_by(Product.price.desc(), Product.id.desc())
                         .limit(limit)
                         .all())
             
-            logger.debug(f"Productos más caros encontrados: {len(products)}")
+            logger.debug("Productos más caros encontrados", count=len(products))
             return products
             
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD obteniendo productos más caros: {str(e)}")
+            logger.error("Error de BD obteniendo productos más caros", error=str(e))
             raise DatabaseException("Error al obtener productos más caros") from e
\ No newline at end of file
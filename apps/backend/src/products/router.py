@@ -0,0 +1,376 @@
+"""
+Router para la consulta del catálogo de productos.
+
+Este módulo contiene los endpoints públicos de lectura de productos.
+"""
+
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket, status, Depends, Query
+
+from auth.models import User
+from auth.dependencies import get_admin_required
+from shared.cache import get_cache
+from shared.config import get_settings
+from shared.http_cache import (
+    cached_body,
+    check_if_match,
+    is_conditional,
+    json_response,
+    not_modified,
+    precondition_failed,
+    set_validators,
+    store_body,
+    strong_etag,
+    version_etag,
+)
+from products.schemas import (
+    ProductResponse,
+    ProductListResponse,
+    ProductPageResponse,
+    PriceBucketResponse,
+    ProductImageResponse,
+    ProductUpdate,
+)
+from products.service import ProductService, get_product_service
+from products.stock_feed import serve_stock_subscriber, stock_feed
+from products.images import ImagePipeline, discard_directory, get_image_pipeline, receive_image, upload_directory
+from products.exceptions import (
+    InvalidProductImageException,
+    ProductImageTooLargeException,
+    ProductNotFoundException,
+    ProductVersionConflictException,
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/products", tags=["Products"])
+
+# ==================== ENDPOINTS PRODUCTOS ==================== #
+
+@router.get("", response_model=List[ProductListResponse], status_code=status.HTTP_200_OK)
+async def list_products(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Numero de registros a saltar"),
+    limit: int = Query(10, ge=1, le=100, description="Numero maximo de registros"),
+    search: Optional[str] = Query(None, description="Buscar por nombre"),
+    min_price: Optional[int] = Query(None, ge=0, description="Precio minimo"),
+    max_price: Optional[int] = Query(None, ge=0, description="Precio maximo"),
+    in_stock: Optional[bool] = Query(None, description="Solo con stock (true) o solo agotados (false)"),
+    sort: Optional[Literal["price_asc", "price_desc"]] = Query(None, description="Orden por precio"),
+    product_service: ProductService = Depends(get_product_service)
+):
+    """
+    Lista los productos activos con paginación, filtros y búsqueda opcional por nombre.
+
+    Se responde desde el catálogo en memoria mientras esté fresco; si no,
+    desde la base de datos con los mismos filtros. El ETag se deriva de los
+    pares (id, version) de la página: con `If-None-Match` vigente se responde
+    304 sin cargar entidades ni serializar.
+
+    Args:
+        request (Request): Petición con las cabeceras condicionales
+        response (Response): Respuesta a la que se agregan ETag y Cache-Control
+        skip (int): Número de registros a saltar para paginación (default: 0)
+        limit (int): Número máximo de registros a retornar (default: 10, max: 100)
+        search (str, optional): Término de búsqueda para filtrar por nombre
+        min_price (int, optional): Precio mínimo (inclusive)
+        max_price (int, optional): Precio máximo (inclusive)
+        in_stock (bool, optional): Filtrar por disponibilidad
+        sort (str, optional): `price_asc` o `price_desc`
+        product_service (ProductService): Servicio de productos inyectado por dependencia
+
+    Returns:
+        List[ProductListResponse]: Página de productos
+
+    Raises:
+        422: Si los parámetros de paginación o filtros son inválidos
+
+    Example:
+        GET /products?min_price=1000&max_price=5000&in_stock=true&sort=price_asc
+    """
+    params = dict(skip=skip, limit=limit, search=search, min_price=min_price,
+                  max_price=max_price, in_stock=in_stock, sort=sort)
+    key = tuple(params.values())
+    try:
+        if is_conditional(request):
+            versions = await product_service.browse_versions(**params)
+            cached = not_modified(request, version_etag("products", versions, *key), "products.list")
+            if cached is not None:
+                return cached
+
+        products = await product_service.browse_products(**params)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    # El ETag de la respuesta sale de lo que efectivamente se devuelve
+    set_validators(response, version_etag("products", [(p.id, p.version) for p in products], *key), "products.list")
+    return products
+
+@router.websocket("/stock/ws")
+async def stock_updates(websocket: WebSocket):
+    """
+    Stock en vivo de los productos suscritos, en lugar de consultar el stock periódicamente.
+
+    El cliente envía `{"subscribe": [ids]}` y `{"unsubscribe": [ids]}`; recibe
+    `{"stock": {id: stock}}` con el valor actual al suscribirse y con cada
+    cambio. Los cambios se agrupan por tick: si un producto cambia varias veces
+    antes de que el cliente lea, solo recibe el último valor.
+
+    Args:
+        websocket (WebSocket): Conexión del cliente
+
+    Example:
+        ws://.../products/stock/ws
+        -> {"subscribe": ["3f6c..."]}
+        <- {"stock": {"3f6c...": 12}}
+    """
+    if not stock_feed.running:
+        # 1013: intentar más tarde (el worker no tiene la tarea de stock activa)
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    settings = get_settings()
+    await serve_stock_subscriber(
+        websocket, settings.stock_feed_max_topics, settings.stock_feed_send_timeout_seconds
+    )
+
+@router.get("/price-range", response_model=ProductPageResponse, status_code=status.HTTP_200_OK)
+async def get_products_by_price_range(
+    min_price: Optional[int] = Query(None, ge=0, description="Precio minimo"),
+    max_price: Optional[int] = Query(None, ge=0, description="Precio maximo"),
+    category_id: Optional[UUID] = Query(None, description="Filtrar por categoria"),
+    in_stock: Optional[bool] = Query(None, description="Filtrar por disponibilidad"),
+    limit: int = Query(20, ge=1, le=100, description="Tamaño de la pagina"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` de la pagina anterior"),
+    product_service: ProductService = Depends(get_product_service)
+):
+    """
+    Lista productos activos ordenados por precio ascendente con paginación por cursor.
+
+    Args:
+        min_price (int, optional): Precio mínimo (inclusive)
+        max_price (int, optional): Precio máximo (inclusive)
+        category_id (UUID, optional): Categoría
+        in_stock (bool, optional): Filtrar por disponibilidad
+        limit (int): Tamaño de la página (default: 20, max: 100)
+        cursor (str, optional): Cursor devuelto por la página anterior
+        product_service (ProductService): Servicio de productos inyectado por dependencia
+
+    Returns:
+        ProductPageResponse: Productos y cursor de la siguiente página
+
+    Raises:
+        422: Si el rango o el cursor son inválidos
+
+    Example:
+        GET /products/price-range?min_price=1000&max_price=5000&in_stock=true&limit=20
+    """
+    try:
+        return await product_service.get_products_by_price_range(
+            min_price=min_price, max_price=max_price, category_id=category_id,
+            in_stock=in_stock, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+@router.get("/price-histogram", response_model=List[PriceBucketResponse], status_code=status.HTTP_200_OK)
+async def get_price_histogram(
+    bucket_size: int = Query(1000, ge=1, description="Ancho de cada bucket"),
+    min_price: Optional[int] = Query(None, ge=0, description="Precio minimo"),
+    max_price: Optional[int] = Query(None, ge=0, description="Precio maximo"),
+    category_id: Optional[UUID] = Query(None, description="Filtrar por categoria"),
+    in_stock: Optional[bool] = Query(None, description="Filtrar por disponibilidad"),
+    product_service: ProductService = Depends(get_product_service)
+):
+    """
+    Cuenta los productos activos por rango de precio (facetas para filtros de la tienda).
+
+    Args:
+        bucket_size (int): Ancho de cada bucket (default: 1000)
+        min_price, max_price, category_id, in_stock: Mismos filtros que `/products/price-range`
+        product_service (ProductService): Servicio de productos inyectado por dependencia
+
+    Returns:
+        List[PriceBucketResponse]: Buckets no vacíos ordenados por precio
+
+    Example:
+        GET /products/price-histogram?bucket_size=5000&in_stock=true
+    """
+    try:
+        return await product_service.price_histogram(
+            bucket_size, min_price=min_price, max_price=max_price,
+            category_id=category_id, in_stock=in_stock
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+@router.put("/{product_id}/image", response_model=ProductImageResponse, status_code=status.HTTP_200_OK)
+async def upload_product_image(
+    product_id: UUID,
+    request: Request,
+    # Las dependencias se resuelven en orden: la autenticacion va al final para
+    # no retener una conexion mientras las demas esperan un hilo del threadpool
+    product_service: ProductService = Depends(get_product_service),
+    pipeline: ImagePipeline = Depends(get_image_pipeline),
+    current_user: User = Depends(get_admin_required)
+):
+    """
+    Sube la imagen de un producto (campo `file` de un formulario multipart).
+
+    El cuerpo se procesa en streaming hacia un archivo temporal; las variantes
+    WebP (`large` y `thumb`) se generan en un pool de procesos y todo se guarda
+    bajo el SHA-256 del original, así que una imagen repetida no se vuelve a
+    procesar ni a subir.
+
+    Args:
+        product_id (UUID): Producto al que se asigna la imagen
+        request (Request): Petición con el cuerpo multipart
+        product_service (ProductService): Servicio de productos inyectado por dependencia
+        pipeline (ImagePipeline): Procesamiento y almacenamiento de imágenes
+        current_user (User): Administrador autenticado
+
+    Returns:
+        ProductImageResponse: URLs de la imagen y sus variantes
+
+    Raises:
+        404: Si el producto no existe
+        413: Si la imagen supera el tamaño máximo
+        422: Si el cuerpo no es multipart o la imagen no es JPEG, PNG o WebP válida
+
+    Example:
+        curl -X PUT -H "Authorization: Bearer ..." -F "file=@foto.jpg" /products/{product_id}/image
+    """
+    try:
+        product = await product_service.get_by_id(product_id)
+    except ProductNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+    # La subida puede tardar segundos: no retener una conexion del pool mientras tanto
+    product_service.release_connection()
+
+    directory = upload_directory()
+    try:
+        received = await receive_image(request, directory, get_settings().upload_max_bytes)
+        return await product_service.set_image(product, received, pipeline)
+    except ProductImageTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.message)
+    except InvalidProductImageException as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.message)
+    finally:
+        await discard_directory(directory)
+
+@router.put("/{product_id}", response_model=ProductResponse, status_code=status.HTTP_200_OK)
+async def update_product(
+    product_id: UUID,
+    product_data: ProductUpdate,
+    request: Request,
+    response: Response,
+    product_service: ProductService = Depends(get_product_service),
+    current_user: User = Depends(get_admin_required)
+):
+    """
+    Actualiza los campos enviados de un producto (solo administradores).
+
+    Con `If-Match` (el ETag de `GET /products/{product_id}`) la escritura solo
+    se aplica si el producto sigue en la versión que el cliente leyó; si otro
+    administrador lo modificó antes responde 412 con el ETag actual.
+
+    Args:
+        product_id (UUID): ID del producto
+        product_data (ProductUpdate): Campos a actualizar
+        request (Request): Petición con la cabecera `If-Match`
+        response (Response): Respuesta a la que se agrega el nuevo ETag
+        product_service (ProductService): Servicio de productos inyectado por dependencia
+        current_user (User): Administrador autenticado
+
+    Returns:
+        ProductResponse: Producto actualizado
+
+    Raises:
+        404: Si el producto no existe
+        412: Si `If-Match` no coincide con la versión actual
+        422: Si los datos no son válidos
+
+    Example:
+        PUT /products/{product_id}
+        If-Match: "9f1c..."
+
+        Body:
+        {
+            "price": 12900
+        }
+    """
+    try:
+        product = await product_service.get_by_id(product_id)
+        category_version = product.category.version
+        etag = strong_etag("product", product_id, product.version, category_version)
+        expected_version = product.version if check_if_match(request, etag) else None
+
+        product = await product_service.update(product, product_data, expected_version)
+    except ProductNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+    except ProductVersionConflictException:
+        # Otra peticion lo cambio entre la lectura y el UPDATE; el rollback expiro
+        # el producto, asi que estas lecturas traen la version actual
+        raise precondition_failed(strong_etag("product", product_id, product.version, product.category.version))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    logger.info(f"Admin {current_user.id} actualizo el producto {product_id}")
+    response.headers["ETag"] = strong_etag("product", product_id, product.version, category_version)
+    return product
+
+@router.get("/{product_id}", response_model=ProductResponse, status_code=status.HTTP_200_OK)
+async def get_product(
+    product_id: UUID,
+    request: Request,
+    product_service: ProductService = Depends(get_product_service)
+):
+    """
+    Obtiene el detalle de un producto activo.
+
+    Primero consulta solo las versiones del producto y su categoría: si
+    coinciden con `If-None-Match` (o `If-Modified-Since`) responde 304 sin
+    cargar la entidad ni serializarla, y si el cuerpo de ese ETag ya está en
+    la cache (compartida entre workers con `CACHE_BACKEND=shared`) lo
+    devuelve tal cual. Sin cache, las peticiones no condicionales cargan el
+    producto directamente.
+
+    Args:
+        product_id (UUID): ID del producto
+        request (Request): Petición con las cabeceras condicionales
+        product_service (ProductService): Servicio de productos inyectado por dependencia
+
+    Returns:
+        ProductResponse: Detalle del producto (o 304 sin cuerpo)
+
+    Raises:
+        404: Si el producto no existe o está desactivado
+    """
+    try:
+        if is_conditional(request) or get_cache() is not None:
+            version, category_version, updated_at, category_updated_at = \
+                await product_service.get_detail_validators(product_id)
+            etag = strong_etag("product", product_id, version, category_version)
+            last_modified = max(updated_at, category_updated_at)
+            cached = not_modified(request, etag, "products.detail", last_modified)
+            if cached is not None:
+                return cached
+            body = cached_body(etag)
+            if body is not None:
+                return json_response(body, etag, "products.detail", last_modified)
+
+        product = await product_service.get_detail(product_id)
+    except ProductNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+
+    # El ETag del cuerpo sale de lo que efectivamente se cargo
+    etag = strong_etag("product", product.id, product.version, product.category.version)
+    return json_response(
+        store_body(etag, ProductResponse, product), etag,
+        "products.detail", max(product.updated_at, product.category.updated_at)
+    )
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict, EmailStr, Field, validator
 from uuid import UUID
 from datetime import datetime
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 
 class ProductResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -61,4 +61,25 @@ class ProductListResponse(BaseModel):
     price: int
     image_url: Optional[str] = None
     stock: int
-    is_active: bool
\ No newline at end of file
+    is_active: bool
+
+class ProductPageResponse(BaseModel):
+    """ Página de productos con paginación por cursor """
+    items: List[ProductListResponse]
+    next_cursor: Optional[str] = None
+
+class PriceBucketResponse(BaseModel):
+    """ Bucket del histograma de precios (`max_price` exclusivo) """
+    min_price: int
+    max_price: int
+    count: int
+
+class ProductImageResponse(BaseModel):
+    """ Imagen asignada a un producto y sus variantes """
+    product_id: UUID
+    image_url: str
+    thumbnail_url: str
+    original_url: str
+    sha256: str
+    size: int
+    deduplicated: bool
@@ -1,21 +1,52 @@
-from typing import Optional, List
+import asyncio
+from functools import lru_cache
+from typing import Callable, Hashable, Optional, List, TypeVar
+from uuid import UUID
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from shared.database import get_db, sibling_sessions
+from shared.config import get_settings
 from products.models import Product
 from products.schemas import ProductCreate, ProductUpdate
 from products.repository import ProductRepository
-from products.exceptions import ProductNotFoundException, ProductNotFoundByNameException,DatabaseException
-from shared.exceptions import InsufficientPermissionsException
+from products.catalog import CatalogSnapshot, catalog_snapshot, item_from_product
+from products.pricing import decode_cursor, histogram_buckets, next_cursor
+from products.images import ImagePipeline, ReceivedImage
+from products.exceptions import ProductNotFoundException, ProductNotFoundByNameException
+from shared.exceptions import DatabaseException, InsufficientPermissionsException
+from shared.singleflight import SingleFlight
+from shared.deadline import within_deadline
+from categories.tree import CategoryTreeCache, get_category_tree_cache
+from shared.invalidation import invalidation_bus
 import logging
 
+T = TypeVar("T")
+
 class ProductService:
     
-    def __init__(self,product_repo:ProductRepository) -> None:
+    def __init__(
+        self,
+        product_repo:ProductRepository,
+        catalog: Optional[CatalogSnapshot] = None,
+        catalog_max_staleness: float = 30,
+        queries: Optional[SingleFlight] = None,
+        category_tree: Optional[CategoryTreeCache] = None,
+        session_factory: Optional[Callable[[], Session]] = None
+    ) -> None:
         self.product_repo = product_repo
+        self.catalog = catalog
+        self.catalog_max_staleness = catalog_max_staleness
+        self.queries = queries
+        self.category_tree = category_tree if category_tree is not None else CategoryTreeCache()
+        # Sesiones propias para las lecturas compartidas, que pueden seguir despues
+        # de cerrar la sesion de la peticion que las inicio
+        self.session_factory = session_factory or sibling_sessions(product_repo.db)
         self.logger = logging.getLogger(__name__)
 
-    async def get_by_id(self, id: int) -> Product:
+    async def get_by_id(self, id: UUID) -> Product:
 
-        if not isinstance(id, int) or id <= 0:
-            raise ValueError("El ID del producto debe ser un entero positivo")
+        if not isinstance(id, UUID):
+            raise ValueError("El ID del producto debe ser un UUID")
         product = await self.product_repo.get_by_id(id)
             
         if product is None:
@@ -121,8 +152,24 @@ class ProductService:
         self.logger.info(f"Se encontraron {len(products)} productos con bajo stock")
         return products
 
-    async def update(self,product:Product, update_data: dict) -> Product:
-        
+    async def update(self,product:Product, update_data: dict, expected_version: Optional[int] = None) -> Product:
+        """
+            Actualiza los campos enviados de un producto.
+
+            Args:
+                product (Product): Producto a actualizar.
+                update_data (ProductUpdate): Campos a modificar.
+                expected_version (int, optional): Version validada con `If-Match`; si el
+                    producto cambio desde entonces no se modifica.
+
+            Returns:
+                Product: El producto actualizado.
+
+            Raises:
+                ProductNotFoundException: Si el producto no existe.
+                ProductVersionConflictException: Si el producto ya no esta en `expected_version`.
+                ValueError: Si el precio o el stock son negativos.
+        """
         product = await self.get_by_id(product.id)
         
         update_dict = update_data.dict(exclude_unset=True)
@@ -133,7 +180,7 @@ class ProductService:
             raise ValueError("El stock no puede ser negativo")
         
         self.logger.info(f"Actualizando producto con ID: {product.id}")
-        updated_product = await self.product_repo.update(product, update_dict)
+        updated_product = await self.product_repo.update(product, update_dict, expected_version)
 
         if updated_product is None:
             raise DatabaseException("Fallo al intentar actualizar el producto")
@@ -175,27 +222,311 @@ class ProductService:
 
         self.logger.info(f"Producto con ID: {product.id} eliminado exitosamente")
 
-    async def list_products(self, skip: int = 0, limit: int = 10, search: Optional[str] = None) -> List[Product]:
+    async def list_products(self, skip: int = 0, limit: int = 10, search: Optional[str] = None) -> List:
         """Lista productos con paginación y búsqueda opcional."""
         if skip < 0:
             raise ValueError("Skip no puede ser negativo")
         if limit <= 0 or limit > 100:
             raise ValueError("Limit debe estar entre 1 y 100")
         
-        return await self.product_repo.list_products(skip, limit, search)
+        search = self._normalize_search(search)
+        return await self._coalesced(
+            ("list_products", skip, limit, search),
+            lambda repo: [item_from_product(p) for p in repo.list_products(skip, limit, search)],
+            lambda: self.product_repo.list_products(skip, limit, search)
+        )
+
+    async def browse_products(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: Optional[bool] = None,
+        sort: Optional[str] = None
+    ) -> List:
+        """
+            Lista productos activos para la navegacion publica.
+
+            Responde desde el catalogo en memoria si esta fresco; si no (o si esta
+            deshabilitado) consulta la base de datos con los mismos filtros.
+
+            Returns:
+                List: Productos (`CatalogItem` o `Product`, ambos con los campos de `ProductListResponse`).
+        """
+        self._validate_price_range(min_price, max_price)
+
+        filters = dict(search=self._normalize_search(search), min_price=min_price, max_price=max_price,
+                       in_stock=in_stock, sort=sort)
+        if self.catalog is not None and self.catalog.is_fresh(self.catalog_max_staleness):
+            return self.catalog.query(skip, limit, **filters)
+
+        return await self._coalesced(
+            ("browse_products", skip, limit, *filters.values()),
+            lambda repo: [item_from_product(p) for p in repo.list_products(
+                skip, limit, active_only=True, **filters
+            )],
+            lambda: self.product_repo.list_products(skip, limit, active_only=True, **filters)
+        )
+
+    async def browse_versions(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: Optional[bool] = None,
+        sort: Optional[str] = None
+    ) -> List[tuple]:
+        """
+            Pares (id, version) de la pagina que devolveria `browse_products`, sin cargar entidades ORM.
+
+            Returns:
+                List[tuple]: (id, version) de cada producto de la pagina.
+        """
+        self._validate_price_range(min_price, max_price)
+
+        filters = dict(search=self._normalize_search(search), min_price=min_price, max_price=max_price,
+                       in_stock=in_stock, sort=sort)
+        if self.catalog is not None and self.catalog.is_fresh(self.catalog_max_staleness):
+            return [(item.id, item.version) for item in self.catalog.query(skip, limit, **filters)]
+
+        return await self._coalesced(
+            ("browse_versions", skip, limit, *filters.values()),
+            lambda repo: repo.list_versions(skip, limit, active_only=True, **filters)
+        )
+
+    async def get_detail(self, id: UUID) -> Product:
+        """
+            Obtiene un producto activo con su categoria.
+
+            Raises:
+                ProductNotFoundException: Si no existe o esta desactivado.
+        """
+        product = await self.product_repo.get_detail(id)
+        if product is None:
+            raise ProductNotFoundException(product_id=id)
+        return product
+
+    async def get_detail_validators(self, id: UUID) -> tuple:
+        """
+            Versiones y fechas de modificacion para responder condicionalmente al detalle.
+
+            Returns:
+                tuple: (version, category_version, updated_at, category_updated_at).
+
+            Raises:
+                ProductNotFoundException: Si no existe o esta desactivado.
+        """
+        validators = await self.product_repo.get_detail_validators(id)
+        if validators is None:
+            raise ProductNotFoundException(product_id=id)
+        return validators
 
     async def count_products(self, search: Optional[str] = None) -> int:
         """Cuenta el total de productos."""
-        count = await self.product_repo.count_products(search)
+        search = self._normalize_search(search)
+        count = await self._coalesced(("count_products", search), lambda repo: repo.count_products(search))
         if count is None:
             raise DatabaseException("Error al contar los productos")
         return count
 
-    async def get_products_by_price_range(self, min_price: float, max_price: float) -> List[Product]:
-        """Obtiene productos en un rango de precios."""
-        if min_price < 0 or max_price < 0:
+    async def get_most_expensive(self, limit: int = 10) -> List:
+        """
+            Productos más caros (precio descendente).
+
+            Raises:
+                ValueError: Si `limit` no está entre 1 y 100.
+        """
+        if limit <= 0 or limit > 100:
+            raise ValueError("Limit debe estar entre 1 y 100")
+
+        return await self._coalesced(
+            ("get_most_expensive", limit),
+            lambda repo: [item_from_product(p) for p in repo.get_most_expensive(limit)],
+            lambda: self.product_repo.get_most_expensive(limit)
+        )
+
+    async def get_products_by_price_range(
+        self,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        category_id: Optional[UUID] = None,
+        in_stock: Optional[bool] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """
+            Obtiene una página de productos por rango de precio, ordenada por (precio, id).
+
+            Usa el índice ordenado del catálogo en memoria si está fresco y, si no,
+            una consulta por cursor sobre el índice `(price, id)`.
+
+            Returns:
+                dict: `items` y `next_cursor` (None en la última página).
+
+            Raises:
+                ValueError: Si el rango o el cursor no son válidos.
+        """
+        self._validate_price_range(min_price, max_price)
+        filters = dict(min_price=min_price, max_price=max_price, category_id=category_id, in_stock=in_stock)
+        after = decode_cursor(cursor) if cursor else None
+
+        if self.catalog is not None and self.catalog.is_fresh(self.catalog_max_staleness):
+            items = self.catalog.price_range(limit=limit, after=after, **self._catalog_filters(filters))
+        else:
+            items = await self.product_repo.get_by_price_range(limit=limit, after=after, **filters)
+
+        return {"items": items, "next_cursor": next_cursor(items, limit)}
+
+    async def price_histogram(
+        self,
+        bucket_size: int,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        category_id: Optional[UUID] = None,
+        in_stock: Optional[bool] = None
+    ) -> List[dict]:
+        """
+            Histograma de precios (facetas) de los productos activos que cumplen los filtros.
+
+            Returns:
+                List[dict]: Buckets con `min_price`, `max_price` (exclusivo) y `count`.
+        """
+        if bucket_size <= 0:
+            raise ValueError("El tamaño del bucket debe ser positivo")
+        self._validate_price_range(min_price, max_price)
+        filters = dict(min_price=min_price, max_price=max_price, category_id=category_id, in_stock=in_stock)
+
+        if self.catalog is not None and self.catalog.is_fresh(self.catalog_max_staleness):
+            counts = self.catalog.price_histogram(bucket_size, **self._catalog_filters(filters))
+        else:
+            counts = await self.product_repo.price_histogram(bucket_size, **filters)
+
+        return histogram_buckets(counts, bucket_size)
+
+    def _catalog_filters(self, filters: dict) -> dict:
+        """ Filtros para el catalogo en memoria: la categoria se expande a su subarbol con el arbol cacheado """
+        filters = dict(filters)
+        category_id = filters.pop("category_id")
+        if category_id is not None:
+            filters["category_ids"] = self.category_tree.get(self.product_repo.db).subtree(category_id)
+        return filters
+
+    def release_connection(self) -> None:
+        """ Libera la conexion de la sesion antes de recibir y procesar un archivo """
+        self.product_repo.release_connection()
+
+    async def set_image(self, product: Product, received: ReceivedImage, pipeline: ImagePipeline) -> dict:
+        """
+            Almacena una imagen recibida y la asigna al producto.
+
+            Args:
+                product (Product): Producto (obtenido con `get_by_id` antes de recibir el archivo).
+                received (ReceivedImage): Archivo ya recibido en disco.
+                pipeline (ImagePipeline): Procesamiento y almacenamiento de imagenes.
+
+            Returns:
+                dict: URLs de la imagen y sus variantes, hash y si estaba deduplicada.
+
+            Raises:
+                InvalidProductImageException: Si la imagen no se puede decodificar.
+        """
+        # Si el tiempo limite se agota subiendo, se corta ahi y no despues de
+        # guardar la imagen (quedaria almacenada sin asignar a ningun producto)
+        deduplicated = await within_deadline(pipeline.store_image(received))
+        urls = pipeline.urls(received)
+
+        await self.product_repo.update(product, {"image_url": urls["large"]})
+        self.logger.info(f"Imagen {received.sha256} asignada al producto {product.id}")
+        return {
+            "product_id": product.id,
+            "image_url": urls["large"],
+            "thumbnail_url": urls["thumb"],
+            "original_url": urls["original"],
+            "sha256": received.sha256,
+            "size": received.size,
+            "deduplicated": deduplicated,
+        }
+
+    async def _coalesced(
+        self,
+        key: Hashable,
+        load: Callable[[ProductRepository], T],
+        uncached: Optional[Callable[[], T]] = None
+    ) -> T:
+        """
+            Ejecuta una lectura compartiendola con las llamadas concurrentes identicas.
+
+            `load` es sincrona y corre en un hilo, asi el event loop sigue
+            atendiendo y las llamadas con la misma `key` se suman a la consulta
+            en curso en lugar de repetirla. Recibe un repositorio con una sesion
+            propia (`session_factory`): la consulta no es de ninguna peticion y
+            sigue aunque la que la inicio se cancele y cierre su sesion. Su
+            resultado se comparte entre peticiones, por eso debe ser inmutable
+            (`CatalogItem`, tuplas, enteros) y no entidades ligadas a una sesion.
+
+            Args:
+                key (Hashable): Nombre del metodo y argumentos normalizados.
+                load (Callable): Consulta que devuelve un valor compartible.
+                uncached (Callable, optional): Consulta a usar si la coalescencia esta
+                    deshabilitada (por defecto, `load` con el repositorio de la peticion).
+
+            Returns:
+                El resultado de la consulta.
+        """
+        if self.queries is None:
+            return uncached() if uncached is not None else load(self.product_repo)
+
+        def run() -> T:
+            db = self.session_factory()
+            try:
+                return load(ProductRepository(db))
+            finally:
+                db.close()
+
+        return await self.queries.do(key, lambda: asyncio.to_thread(run))
+
+    @staticmethod
+    def _normalize_search(search: Optional[str]) -> Optional[str]:
+        # La busqueda es `ilike`: mayusculas y espacios no cambian el resultado
+        if search is None:
+            return None
+        return search.strip().lower() or None
+
+    @staticmethod
+    def _validate_price_range(min_price: Optional[int], max_price: Optional[int]) -> None:
+        if (min_price is not None and min_price < 0) or (max_price is not None and max_price < 0):
             raise ValueError("Los precios no pueden ser negativos")
-        if min_price > max_price:
+        if min_price is not None and max_price is not None and min_price > max_price:
             raise ValueError("El precio mínimo no puede ser mayor al máximo")
 
-        return await self.product_repo.get_products_by_price_range(min_price, max_price)
+@lru_cache(maxsize=None)
+def get_product_queries() -> Optional[SingleFlight]:
+    """
+        Coalescencia de lecturas de productos del proceso (None si esta deshabilitada).
+
+        Cualquier escritura de productos (de este worker o de otro, via el bus de
+        invalidacion) descarta las lecturas guardadas. Mientras el listener esta
+        conectado el TTL puede ser largo; si se desconecta vuelve al corto.
+    """
+    settings = get_settings()
+    if not settings.query_coalescing_enabled:
+        return None
+    queries = SingleFlight.from_settings(settings)
+    invalidation_bus.subscribe("product", lambda ids: queries.invalidate())
+    invalidation_bus.on_state(lambda connected: setattr(
+        queries, "ttl",
+        settings.query_cache_listening_ttl_seconds if connected else settings.query_cache_ttl_seconds
+    ))
+    return queries
+
+def get_product_service(db: Session = Depends(get_db)) -> ProductService:
+    settings = get_settings()
+    product_repo = ProductRepository(db)
+    catalog = catalog_snapshot if settings.catalog_snapshot_enabled else None
+    return ProductService(
+        product_repo, catalog, settings.catalog_max_staleness_seconds, get_product_queries(), get_category_tree_cache()
+    )
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+from uuid import UUID
+
+from fastapi import WebSocket, WebSocketDisconnect
+from sqlalchemy.exc import SQLAlchemyError
+
+from products.repository import ProductRepository
+from shared.invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+""" Stock en vivo por WebSocket: registro de suscriptores por producto y reparto agrupado por tick """
+
+# Errores pendientes por suscriptor; los mas viejos se descartan
+MAX_PENDING_ERRORS = 10
+
+
+class StockSubscriber:
+    """
+        Buzon de una conexion: el ultimo stock pendiente de enviar por producto.
+
+        El buzon esta acotado por la cantidad de productos suscritos: si llega un
+        valor nuevo antes de enviar el anterior, el anterior se descarta (a un
+        cliente lento solo le importa el stock actual, no los intermedios).
+    """
+
+    __slots__ = ("topics", "pending", "errors", "dropped", "_ready")
+
+    def __init__(self):
+        self.topics: Set[str] = set()
+        self.pending: Dict[str, int] = {}
+        self.errors: List[str] = []
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def offer(self, product_id: str, stock: int) -> None:
+        if product_id in self.pending:
+            self.dropped += 1
+        self.pending[product_id] = stock
+        self._ready.set()
+
+    def error(self, message: str) -> None:
+        self.errors = (self.errors + [message])[-MAX_PENDING_ERRORS:]
+        self._ready.set()
+
+    async def next_message(self) -> dict:
+        """ Espera y devuelve todo lo pendiente en un solo mensaje """
+        await self._ready.wait()
+        self._ready.clear()
+        message = {}
+        if self.pending:
+            message["stock"], self.pending = self.pending, {}
+        if self.errors:
+            message["errors"], self.errors = self.errors, []
+        return message
+
+
+class StockFeed:
+    """
+        Reparte cambios de stock a los suscriptores de cada producto.
+
+        Las escrituras de productos (de este worker o de otros, via el bus de
+        invalidacion) solo marcan el producto; una vez por tick se leen en una
+        consulta los stocks marcados que tienen suscriptores y se envian los que
+        cambiaron. Asi una rafaga de ventas de un producto cuesta una lectura y
+        un mensaje por suscriptor por tick, y un suscriptor inactivo no consume
+        CPU: no hay temporizadores ni sondeos por conexion.
+    """
+
+    def __init__(self):
+        self.topics: Dict[str, Set[StockSubscriber]] = {}
+        # Ultimo stock enviado por producto suscrito
+        self.last: Dict[str, int] = {}
+        self.session_factory = None
+        self.updates = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dirty: Set[str] = set()
+        self._changed: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def bind(self, loop: asyncio.AbstractEventLoop, session_factory) -> None:
+        self._loop = loop
+        self.session_factory = session_factory
+        self._changed = asyncio.Event()
+
+    def unbind(self) -> None:
+        self._loop = None
+
+    def subscribe(self, subscriber: StockSubscriber, product_ids: Iterable[str]) -> List[str]:
+        """ Suscribe a `product_ids`; devuelve los que eran nuevos para este suscriptor """
+        added = []
+        for product_id in product_ids:
+            if product_id in subscriber.topics:
+                continue
+            subscriber.topics.add(product_id)
+            self.topics.setdefault(product_id, set()).add(subscriber)
+            added.append(product_id)
+        return added
+
+    def unsubscribe(self, subscriber: StockSubscriber, product_ids: Optional[Iterable[str]] = None) -> None:
+        """ Quita las suscripciones indicadas (todas si `product_ids` es None) """
+        for product_id in list(subscriber.topics if product_ids is None else product_ids):
+            subscriber.topics.discard(product_id)
+            subscribers = self.topics.get(product_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.topics[product_id]
+                self.last.pop(product_id, None)
+                self._dirty.discard(product_id)
+
+    def mark(self, product_ids: Optional[FrozenSet[str]]) -> None:
+        """ Handler del bus: puede llamarse desde el hilo que confirmo la transaccion """
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._mark, product_ids)
+
+    def _mark(self, product_ids: Optional[FrozenSet[str]]) -> None:
+        if product_ids is None:
+            self._dirty.update(self.topics)
+        else:
+            self._dirty.update(product_id for product_id in product_ids if product_id in self.topics)
+        if self._dirty and self._changed is not None:
+            self._changed.set()
+
+    def take_dirty(self) -> Set[str]:
+        dirty, self._dirty = self._dirty, set()
+        self._changed.clear()
+        return dirty
+
+    def load(self, product_ids: Iterable[str]) -> Dict[str, int]:
+        """ Lee los stocks en una sesion propia (corre en un hilo) """
+        db = self.session_factory()
+        try:
+            stocks = ProductRepository(db).get_stocks(UUID(product_id) for product_id in product_ids)
+        finally:
+            db.close()
+        return {str(product_id): stock for product_id, stock in stocks.items()}
+
+    def publish(self, stocks: Dict[str, int]) -> None:
+        """ Envia a los suscriptores los stocks que cambiaron desde el ultimo envio """
+        for product_id, stock in stocks.items():
+            subscribers = self.topics.get(product_id)
+            if not subscribers or self.last.get(product_id) == stock:
+                continue
+            self.last[product_id] = stock
+            self.updates += 1
+            for subscriber in subscribers:
+                subscriber.offer(product_id, stock)
+
+    async def prime(self, subscriber: StockSubscriber, product_ids: List[str]) -> None:
+        """
+            Envia el stock actual de suscripciones nuevas.
+
+            Los productos que ya tienen suscriptores se responden desde `last`
+            sin consultar; el resto se lee en una consulta.
+        """
+        unknown = [product_id for product_id in product_ids if product_id not in self.last]
+        if unknown:
+            loaded = await asyncio.to_thread(self.load, unknown)
+            for product_id, stock in loaded.items():
+                # Un tick pudo publicar un valor mas nuevo mientras se leia
+                if product_id in self.topics:
+                    self.last.setdefault(product_id, stock)
+            missing = set(unknown) - set(loaded)
+            if missing:
+                subscriber.error(f"Productos no encontrados: {', '.join(sorted(missing))}")
+                self.unsubscribe(subscriber, missing)
+        for product_id in product_ids:
+            if product_id in self.last and product_id in subscriber.topics:
+                subscriber.offer(product_id, self.last[product_id])
+
+    async def wait_changed(self) -> None:
+        await self._changed.wait()
+
+
+stock_feed = StockFeed()
+
+
+async def run_stock_feed(session_factory, tick: float, feed: StockFeed = stock_feed) -> None:
+    """
+        Tarea de fondo que publica los cambios de stock a los suscriptores.
+
+        Tras la primera marca espera `tick` segundos para agrupar en una sola
+        lectura todo lo que cambie mientras tanto.
+    """
+    feed.bind(asyncio.get_running_loop(), session_factory)
+    unsubscribe = invalidation_bus.subscribe("product", feed.mark)
+    try:
+        while True:
+            await feed.wait_changed()
+            await asyncio.sleep(tick)
+            dirty = feed.take_dirty()
+            if not dirty:
+                continue
+            try:
+                feed.publish(await asyncio.to_thread(feed.load, dirty))
+            except SQLAlchemyError as e:
+                logger.error(f"Error leyendo stock para suscriptores: {str(e)}")
+    finally:
+        unsubscribe()
+        feed.unbind()
+
+
+def _product_ids(message, key: str) -> List[str]:
+    values = message.get(key) if isinstance(message, dict) else None
+    if values is None:
+        return []
+    if not isinstance(values, list):
+        raise ValueError(f"`{key}` debe ser una lista de IDs")
+    return [str(UUID(str(value))) for value in values]
+
+
+async def _send_updates(websocket: WebSocket, subscriber: StockSubscriber, send_timeout: float) -> None:
+    while True:
+        message = await subscriber.next_message()
+        try:
+            await asyncio.wait_for(websocket.send_json(message), send_timeout)
+        except asyncio.TimeoutError:
+            # El cliente no lee: se cierra en lugar de acumular mensajes
+            logger.warning("Suscriptor de stock demasiado lento, se cierra la conexion")
+            await asyncio.wait_for(websocket.close(code=1008), send_timeout)
+            return
+
+
+async def serve_stock_subscriber(
+    websocket: WebSocket,
+    max_topics: int,
+    send_timeout: float,
+    feed: StockFeed = stock_feed
+) -> None:
+    """
+        Atiende una conexion de stock en vivo hasta que el cliente se desconecta.
+
+        El cliente envia `{"subscribe": [ids]}` o `{"unsubscribe": [ids]}` y
+        recibe `{"stock": {id: stock}}` con el valor actual al suscribirse y con
+        cada cambio (agrupados por tick), y `{"errors": [...]}` si algo falla.
+
+        Args:
+            websocket (WebSocket): Conexion aceptada.
+            max_topics (int): Productos por conexion como maximo.
+            send_timeout (float): Segundos para enviar un mensaje antes de cerrar la conexion.
+    """
+    subscriber = StockSubscriber()
+    sender = asyncio.create_task(_send_updates(websocket, subscriber, send_timeout))
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+                removed = _product_ids(message, "unsubscribe")
+                requested = _product_ids(message, "subscribe")
+            except ValueError as e:
+                subscriber.error(f"Mensaje invalido: {str(e)}")
+                continue
+            feed.unsubscribe(subscriber, removed)
+            requested = [p for p in dict.fromkeys(requested) if p not in subscriber.topics]
+            room = max(0, max_topics - len(subscriber.topics))
+            if len(requested) > room:
+                subscriber.error(f"Maximo {max_topics} productos por conexion")
+            added = feed.subscribe(subscriber, requested[:room])
+            if added:
+                try:
+                    await feed.prime(subscriber, added)
+                except SQLAlchemyError as e:
+                    logger.error(f"Error leyendo stock inicial: {str(e)}")
+                    subscriber.error("No se pudo leer el stock actual")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        feed.unsubscribe(subscriber)
+        sender.cancel()
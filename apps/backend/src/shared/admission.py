@@ -0,0 +1,224 @@
+import json
+import math
+from typing import Iterable, Tuple
+
+from shared.metrics import MetricsRegistry, metrics_registry
+
+""" Control de admision: rechaza temprano las peticiones de baja prioridad cuando el worker se satura """
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+PRIORITIES = (CRITICAL, NORMAL, LOW)
+
+# Presion (1.0 = limite configurado) desde la que se rechaza cada prioridad. La
+# navegacion cede a mitad de camino: la otra mitad de peticiones en curso (o de
+# conexiones del pool) queda para escrituras y auth/checkout, que una rafaga de
+# GET del catalogo no puede agotar. Las normales ceden con un 20% de margen, y
+# las criticas solo cuando ya se esperaria (pool lleno, loop en su limite)
+SHED_AT = {LOW: 0.5, NORMAL: 0.8, CRITICAL: 1.0}
+
+# Rutas operativas que nunca se rechazan (hay que poder ver la saturacion)
+EXEMPT_PATHS = frozenset({"/", "/metrics", "/admission"})
+
+
+def _prefixes(value: str) -> Tuple[str, ...]:
+    return tuple(prefix.strip() for prefix in value.split(",") if prefix.strip())
+
+
+class AdmissionController:
+    """
+        Estado de admision del worker: peticiones en curso, retraso del event loop
+        y ocupacion del pool de conexiones, combinados en una presion.
+
+        Cada señal se divide por su limite (`max_in_flight`, `max_loop_lag` y la
+        capacidad del pool) y la presion es la mayor de las tres. Una peticion se
+        rechaza si la presion alcanza el umbral de su prioridad (`SHED_AT`), antes
+        de tocar el router o la base de datos: un 503 inmediato con `Retry-After`
+        en lugar de un timeout tras esperar en la cola.
+
+        La prioridad sale del prefijo de la ruta: `critical_prefixes` (auth,
+        checkout) es critica, los GET bajo `low_priority_prefixes` (navegacion
+        del catalogo) son de baja prioridad y el resto es normal.
+
+        El retraso del loop lo mide `shared.metrics.monitor_event_loop_lag`. El
+        pool no tiene un evento previo a esperar una conexion, asi que su espera
+        se aproxima con la ocupacion: con el pool lleno, la siguiente peticion
+        espera. Las `pool_reserved` conexiones que ocupan las tareas de fondo
+        (sincronizaciones, refresco del catalogo) no cuentan como carga, y un
+        pool sin limite de overflow no aporta señal: ahi nadie espera.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 128,
+        max_loop_lag: float = 0.25,
+        critical_prefixes: Iterable[str] = ("/auth", "/orders", "/checkout", "/cart"),
+        low_priority_prefixes: Iterable[str] = ("/products", "/categories"),
+        retry_after: int = 1,
+        registry: MetricsRegistry = metrics_registry,
+        enabled: bool = True,
+        pool_reserved: int = 0
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.critical_prefixes = tuple(critical_prefixes)
+        self.low_priority_prefixes = tuple(low_priority_prefixes)
+        self.retry_after = retry_after
+        self.registry = registry
+        self.enabled = enabled
+        self.pool_reserved = pool_reserved
+        self.in_flight = 0
+        self.admitted = dict.fromkeys(PRIORITIES, 0)
+        self.shed = dict.fromkeys(PRIORITIES, 0)
+        self._pool = None
+
+    def configure(self, settings) -> None:
+        """ Aplica la configuracion de `shared.config` (al armar la pila de middlewares) """
+        self.enabled = settings.admission_enabled
+        self.max_in_flight = settings.admission_max_in_flight
+        self.max_loop_lag = settings.admission_max_loop_lag_ms / 1000
+        self.critical_prefixes = _prefixes(settings.admission_critical_prefixes)
+        self.low_priority_prefixes = _prefixes(settings.admission_low_priority_prefixes)
+        self.retry_after = settings.admission_retry_after_seconds
+        self.pool_reserved = settings.admission_pool_reserved
+
+    def watch_pool(self, pool) -> None:
+        """ Incluye la ocupacion de `pool` en la presion (solo pools acotados, como `QueuePool`) """
+        bounded = (
+            hasattr(pool, "checkedout")
+            and hasattr(pool, "size")
+            and getattr(pool, "_max_overflow", 0) >= 0
+        )
+        self._pool = pool if bounded else None
+
+    def classify(self, method: str, path: str) -> str:
+        if path.startswith(self.critical_prefixes):
+            return CRITICAL
+        if method == "GET" and path.startswith(self.low_priority_prefixes):
+            return LOW
+        return NORMAL
+
+    def pool_saturation(self) -> float:
+        pool = self._pool
+        if pool is None:
+            return 0.0
+        capacity = pool.size() + getattr(pool, "_max_overflow", 0) - self.pool_reserved
+        if capacity <= 0:
+            return 0.0
+        return max(0, pool.checkedout() - self.pool_reserved) / capacity
+
+    def pressure(self) -> float:
+        return max(
+            self.in_flight / self.max_in_flight,
+            self.registry.loop_lag / self.max_loop_lag,
+            self.pool_saturation()
+        )
+
+    def try_admit(self, priority: str) -> bool:
+        """ Admite la peticion (y la cuenta en curso) o registra el rechazo """
+        if self.pressure() >= SHED_AT[priority]:
+            self.shed[priority] += 1
+            return False
+        self.in_flight += 1
+        self.admitted[priority] += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def retry_after_seconds(self) -> int:
+        # Con el loop muy retrasado, pedir que reintenten despues de que se recupere
+        return max(self.retry_after, math.ceil(self.registry.loop_lag))
+
+    def state(self) -> dict:
+        """ Estado actual para `GET /admission` """
+        pressure = self.pressure()
+        return {
+            "enabled": self.enabled,
+            "pressure": round(pressure, 3),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "loop_lag_ms": round(self.registry.loop_lag * 1000, 1),
+            "max_loop_lag_ms": round(self.max_loop_lag * 1000, 1),
+            "pool_saturation": round(self.pool_saturation(), 3),
+            "shedding": [priority for priority in PRIORITIES if self.enabled and pressure >= SHED_AT[priority]],
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP admission_pressure Presion del worker (1.0 = limite configurado)",
+            "# TYPE admission_pressure gauge",
+            f"admission_pressure {self.pressure()}",
+            "# HELP admission_in_flight Peticiones admitidas en curso",
+            "# TYPE admission_in_flight gauge",
+            f"admission_in_flight {self.in_flight}",
+            "# HELP admission_pool_saturation Ocupacion del pool de conexiones",
+            "# TYPE admission_pool_saturation gauge",
+            f"admission_pool_saturation {self.pool_saturation()}",
+            "# HELP admission_requests_total Peticiones por prioridad y decision",
+            "# TYPE admission_requests_total counter",
+        ]
+        for priority in PRIORITIES:
+            lines.append(f'admission_requests_total{{priority="{priority}",decision="admitted"}} {self.admitted[priority]}')
+            lines.append(f'admission_requests_total{{priority="{priority}",decision="shed"}} {self.shed[priority]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        self.in_flight = 0
+        self.admitted = dict.fromkeys(PRIORITIES, 0)
+        self.shed = dict.fromkeys(PRIORITIES, 0)
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """
+        Middleware ASGI que consulta `AdmissionController` antes de atender cada peticion.
+
+        Las rechazadas reciben 503 con `Retry-After` sin pasar por el router.
+        Va dentro de la instrumentacion, para que los rechazos aparezcan en las
+        metricas, y fuera del resto de la pila.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    @classmethod
+    def from_settings(cls, app) -> "AdmissionMiddleware":
+        """ Construye el middleware con `shared.config` (al armar la pila, no al importar) """
+        from shared.config import get_settings
+
+        admission_controller.configure(get_settings())
+        return cls(app)
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if scope["type"] != "http" or not controller.enabled or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        if not controller.try_admit(controller.classify(scope["method"], scope["path"])):
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": "Servicio saturado, reintente en unos segundos"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.controller.retry_after_seconds()).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
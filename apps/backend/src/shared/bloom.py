@@ -0,0 +1,52 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+        Filtro de Bloom en memoria.
+
+        `might_contain` nunca da falsos negativos: si devuelve False el elemento
+        seguro no fue agregado. Un True debe confirmarse contra la fuente exacta.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        if capacity <= 0:
+            raise ValueError("La capacidad debe ser mayor a 0")
+        if not 0 < error_rate < 1:
+            raise ValueError("La tasa de error debe estar entre 0 y 1")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> None:
+        bits = self._bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, item: str) -> bool:
+        bits = self._bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, item: str) -> bool:
+        return self.might_contain(item)
+
+    @property
+    def is_saturated(self) -> bool:
+        """ True cuando se agregaron mas elementos que la capacidad (la tasa de error ya no se garantiza) """
+        return self.count >= self.capacity
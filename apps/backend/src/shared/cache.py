@@ -0,0 +1,350 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from shared.config import get_settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - solo POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+""" Cache de valores serializados: por proceso o compartida entre workers en memoria mapeada """
+
+
+class Cache(ABC):
+    """
+        Interfaz comun de las caches de valores ya serializados (bytes).
+
+        Conviene que la clave identifique el contenido (un ETag fuerte, un `jti`):
+        asi un valor nunca queda viejo y no hace falta invalidarlo, ni siquiera
+        entre workers o tras reiniciar la aplicacion.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """ Guarda `value`; devuelve False si no entra en la cache """
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class LocalCache(Cache):
+    """ LRU en memoria del proceso, acotado por bytes (clave + valor) """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[1] and entry[1] <= time.monotonic()):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        cost = len(key) + len(value)
+        if cost > self.max_bytes:
+            return False
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl if ttl else 0.0)
+            self.size += cost
+            while self.size > self.max_bytes:
+                evicted, (old, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted) + len(old)
+        return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry[0])
+
+
+# Cabecera del segmento: magia, conjuntos, vias por conjunto, tamaño de slot y franjas de locks
+_HEADER = struct.Struct("<8sIIII")
+_MAGIC = b"ECMCACH1"
+# Cabecera de cada slot: hash (0 = libre), vencimiento (0 = nunca), largo del valor,
+# largo de la clave y bit de referencia del reloj
+_SLOT = struct.Struct("<QdIHBx")
+_DIGEST = struct.Struct("<Q")
+_KEY_LEN = struct.Struct("<H")
+_KEY_LEN_OFFSET = 20
+_REF_OFFSET = 22
+_ALIGN = 64
+
+
+def _align(value: int) -> int:
+    return (value + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def default_shared_cache_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "ecommerce-cache")
+
+
+class SharedMemoryCache(Cache):
+    """
+        Cache compartida por todos los workers de la maquina sobre un archivo mapeado en memoria.
+
+        Con `uvicorn --workers N` cada proceso abre el mismo archivo (en `/dev/shm`
+        no toca el disco) y ve las mismas paginas: los datos calientes se guardan
+        una sola vez y lo que carga un worker le sirve a los demas.
+
+        El segmento es una tabla asociativa por conjuntos: el hash de la clave
+        elige un conjunto de `ways` slots de tamaño fijo, sin listas ni punteros
+        que mantener entre procesos. Si el conjunto esta lleno se desaloja con el
+        algoritmo del reloj (segunda oportunidad): cada acierto marca el slot y
+        la manecilla del conjunto salta los marcados borrando la marca. Los
+        valores que no entran en un slot no se guardan.
+
+        Cada conjunto pertenece a una de `stripes` franjas protegidas por un
+        lock de registro `fcntl` (entre procesos) y un `threading.Lock` (entre
+        hilos del mismo proceso); el kernel libera el lock si un worker muere.
+
+        El nombre del archivo incluye la geometria, asi que procesos con otra
+        configuracion usan otro segmento en lugar de leer uno incompatible.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size_bytes: int = 64 * 1024 * 1024,
+        slot_size: int = 4096,
+        ways: int = 8,
+        stripes: int = 64
+    ):
+        if fcntl is None:
+            raise RuntimeError("La cache compartida requiere fcntl (POSIX)")
+        if slot_size <= _SLOT.size or not 1 <= ways <= 255:
+            raise ValueError("Geometria de cache invalida")
+
+        self.slot_size = slot_size
+        self.ways = ways
+        self.sets = max(1, size_bytes // (slot_size * ways))
+        self.stripes = min(stripes, self.sets)
+        self.path = f"{path}-{self.sets}x{ways}x{slot_size}"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+        self._hands = _HEADER.size
+        self._slots = _align(self._hands + self.sets)
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            total = self._slots + self.sets * ways * slot_size
+            self._initialize(total)
+            self._mm = mmap.mmap(self._fd, total)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _initialize(self, total: int) -> None:
+        expected = _HEADER.pack(_MAGIC, self.sets, self.ways, self.slot_size, self.stripes)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                # Primer worker: el archivo nuevo queda en ceros (todos los slots libres)
+                os.ftruncate(self._fd, total)
+                os.pwrite(self._fd, expected, 0)
+            elif size != total or os.pread(self._fd, _HEADER.size, 0) != expected:
+                raise RuntimeError(f"{self.path} no es un segmento de cache compatible")
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # Sin `contextmanager`: en el camino caliente su costo supera al de los dos syscalls
+    def _acquire(self, stripe: int) -> None:
+        self._locks[stripe].acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+        except BaseException:
+            self._locks[stripe].release()
+            raise
+
+    def _release(self, stripe: int) -> None:
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+        finally:
+            self._locks[stripe].release()
+
+    def _locate(self, key: bytes) -> Tuple[int, int]:
+        digest = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+        return digest, (digest >> 1) % self.sets
+
+    def _find(self, base: int, digest: int, key: bytes) -> Optional[int]:
+        mm = self._mm
+        for offset in range(base, base + self.ways * self.slot_size, self.slot_size):
+            if _DIGEST.unpack_from(mm, offset)[0] != digest:
+                continue
+            key_len = _KEY_LEN.unpack_from(mm, offset + _KEY_LEN_OFFSET)[0]
+            start = offset + _SLOT.size
+            if key_len == len(key) and mm[start:start + key_len] == key:
+                return offset
+        return None
+
+    def _victim(self, index: int, base: int) -> int:
+        mm = self._mm
+        now = time.time()
+        for way in range(self.ways):
+            offset = base + way * self.slot_size
+            slot_digest, expires, _, _, _ = _SLOT.unpack_from(mm, offset)
+            if slot_digest == 0 or (expires and expires <= now):
+                return offset
+
+        hand = mm[self._hands + index] % self.ways
+        while True:
+            offset = base + hand * self.slot_size
+            hand = (hand + 1) % self.ways
+            if mm[offset + _REF_OFFSET]:
+                mm[offset + _REF_OFFSET] = 0
+                continue
+            mm[self._hands + index] = hand
+            self.evictions += 1
+            return offset
+
+    def get(self, key: str) -> Optional[bytes]:
+        key_bytes = key.encode()
+        digest, index = self._locate(key_bytes)
+        base = self._slots + index * self.ways * self.slot_size
+        mm = self._mm
+        stripe = index % self.stripes
+        self._acquire(stripe)
+        try:
+            offset = self._find(base, digest, key_bytes)
+            if offset is not None:
+                _, expires, value_len, key_len, _ = _SLOT.unpack_from(mm, offset)
+                if expires and expires <= time.time():
+                    _SLOT.pack_into(mm, offset, 0, 0.0, 0, 0, 0)
+                else:
+                    mm[offset + _REF_OFFSET] = 1
+                    start = offset + _SLOT.size + key_len
+                    self.hits += 1
+                    return mm[start:start + value_len]
+        finally:
+            self._release(stripe)
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        key_bytes = key.encode()
+        if _SLOT.size + len(key_bytes) + len(value) > self.slot_size or len(key_bytes) > 0xFFFF:
+            self.rejected += 1
+            return False
+        digest, index = self._locate(key_bytes)
+        base = self._slots + index * self.ways * self.slot_size
+        mm = self._mm
+        stripe = index % self.stripes
+        self._acquire(stripe)
+        try:
+            offset = self._find(base, digest, key_bytes)
+            if offset is None:
+                offset = self._victim(index, base)
+            # El slot queda libre mientras se escribe: si el proceso muere a mitad
+            # nadie lee un valor incompleto
+            _SLOT.pack_into(mm, offset, 0, 0.0, 0, 0, 0)
+            start = offset + _SLOT.size
+            mm[start:start + len(key_bytes)] = key_bytes
+            mm[start + len(key_bytes):start + len(key_bytes) + len(value)] = value
+            # Sin marca: un valor que nunca se vuelve a leer es el primero en salir
+            _SLOT.pack_into(
+                mm, offset, digest, time.time() + ttl if ttl else 0.0, len(value), len(key_bytes), 0
+            )
+        finally:
+            self._release(stripe)
+        return True
+
+    def delete(self, key: str) -> None:
+        key_bytes = key.encode()
+        digest, index = self._locate(key_bytes)
+        base = self._slots + index * self.ways * self.slot_size
+        stripe = index % self.stripes
+        self._acquire(stripe)
+        try:
+            offset = self._find(base, digest, key_bytes)
+            if offset is not None:
+                _SLOT.pack_into(self._mm, offset, 0, 0.0, 0, 0, 0)
+        finally:
+            self._release(stripe)
+
+    def clear(self) -> None:
+        for index in range(self.sets):
+            base = self._slots + index * self.ways * self.slot_size
+            self._acquire(index % self.stripes)
+            try:
+                for way in range(self.ways):
+                    _SLOT.pack_into(self._mm, base + way * self.slot_size, 0, 0.0, 0, 0, 0)
+            finally:
+                self._release(index % self.stripes)
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+
+@lru_cache(maxsize=None)
+def get_cache() -> Optional[Cache]:
+    """
+        Cache configurada (`CACHE_BACKEND`): `local`, `shared` o `none` (devuelve None).
+
+        Si el segmento compartido no se puede abrir se usa la cache local.
+    """
+    settings = get_settings()
+    backend = settings.cache_backend
+    if backend == "none":
+        return None
+    if backend == "shared":
+        try:
+            return SharedMemoryCache(
+                settings.shared_cache_path or default_shared_cache_path(),
+                settings.shared_cache_bytes,
+                settings.shared_cache_slot_bytes,
+            )
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Cache compartida no disponible, se usa la local: {str(e)}")
+        return LocalCache(settings.local_cache_bytes)
+    if backend == "local":
+        return LocalCache(settings.local_cache_bytes)
+    raise ValueError(f"Backend de cache desconocido: {backend}")
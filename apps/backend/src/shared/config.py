@@ -1,13 +1,106 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from dotenv import load_dotenv
+from typing import Dict, Optional
+from functools import lru_cache
 
 
-load_dotenv()
 class Settings(BaseSettings):
     
     debug: bool = Field(...,env="DEBUG")
     
+    # Logging
+    
+    log_level: str = Field(default="INFO", env="LOG_LEVEL")
+    log_json: bool = Field(default=True, env="LOG_JSON")
+    log_sample_every: int = Field(default=100, env="LOG_SAMPLE_EVERY")
+    
+    # Perfilado de consultas
+    
+    query_profiler_enabled: bool = Field(default=True, env="QUERY_PROFILER_ENABLED")
+    slow_query_threshold_ms: int = Field(default=200, env="SLOW_QUERY_THRESHOLD_MS")
+    n_plus_one_threshold: int = Field(default=10, env="N_PLUS_ONE_THRESHOLD")
+    
+    # Catalogo de productos en memoria
+    
+    catalog_snapshot_enabled: bool = Field(default=True, env="CATALOG_SNAPSHOT_ENABLED")
+    catalog_refresh_seconds: int = Field(default=5, env="CATALOG_REFRESH_SECONDS")
+    catalog_max_staleness_seconds: int = Field(default=30, env="CATALOG_MAX_STALENESS_SECONDS")
+    
+    # Coalescencia de consultas de catalogo (ver `shared.singleflight.SingleFlight`)
+    
+    query_coalescing_enabled: bool = Field(default=True, env="QUERY_COALESCING_ENABLED")
+    query_cache_ttl_seconds: float = Field(default=2.0, env="QUERY_CACHE_TTL_SECONDS")
+    query_cache_stale_seconds: float = Field(default=10.0, env="QUERY_CACHE_STALE_SECONDS")
+    query_cache_beta: float = Field(default=1.0, env="QUERY_CACHE_BETA")
+    query_cache_max_entries: int = Field(default=1024, env="QUERY_CACHE_MAX_ENTRIES")
+    # TTL mientras el listener de invalidaciones esta conectado
+    query_cache_listening_ttl_seconds: float = Field(default=30.0, env="QUERY_CACHE_LISTENING_TTL_SECONDS")
+    # Arbol de categorias (ver `categories.tree`): se invalida con cada cambio, el TTL es solo un resguardo
+    category_tree_ttl_seconds: float = Field(default=300.0, env="CATEGORY_TREE_TTL_SECONDS")
+    
+    # Invalidacion de caches entre workers (ver `shared.invalidation`)
+    
+    invalidation_enabled: bool = Field(default=True, env="INVALIDATION_ENABLED")
+    invalidation_channel: str = Field(default="cache_invalidation", env="INVALIDATION_CHANNEL")
+    invalidation_coalesce_ms: int = Field(default=50, env="INVALIDATION_COALESCE_MS")
+    invalidation_reconnect_seconds: float = Field(default=5.0, env="INVALIDATION_RECONNECT_SECONDS")
+    
+    # Stock en vivo por WebSocket (ver `products.stock_feed`)
+    
+    stock_feed_enabled: bool = Field(default=True, env="STOCK_FEED_ENABLED")
+    stock_feed_tick_ms: int = Field(default=250, env="STOCK_FEED_TICK_MS")
+    stock_feed_max_topics: int = Field(default=50, env="STOCK_FEED_MAX_TOPICS")
+    stock_feed_send_timeout_seconds: float = Field(default=5.0, env="STOCK_FEED_SEND_TIMEOUT_SECONDS")
+    
+    # Cache de cuerpos serializados (ver `shared.cache`): local, shared o none
+    
+    cache_backend: str = Field(default="local", env="CACHE_BACKEND")
+    local_cache_bytes: int = Field(default=16 * 1024 * 1024, env="LOCAL_CACHE_BYTES")
+    shared_cache_path: Optional[str] = Field(default=None, env="SHARED_CACHE_PATH")
+    shared_cache_bytes: int = Field(default=64 * 1024 * 1024, env="SHARED_CACHE_BYTES")
+    shared_cache_slot_bytes: int = Field(default=4096, env="SHARED_CACHE_SLOT_BYTES")
+    
+    # Compresion de respuestas (ver `shared.middleware.CompressionMiddleware`)
+    
+    compression_min_size: int = Field(default=1024, env="COMPRESSION_MIN_SIZE")
+    compression_offload_size: int = Field(default=64 * 1024, env="COMPRESSION_OFFLOAD_SIZE")
+    compression_gzip_level: int = Field(default=6, env="COMPRESSION_GZIP_LEVEL")
+    compression_cache_bytes: int = Field(default=32 * 1024 * 1024, env="COMPRESSION_CACHE_BYTES")
+    
+    # Control de admision (ver `shared.admission`): prefijos separados por comas
+    
+    admission_enabled: bool = Field(default=True, env="ADMISSION_ENABLED")
+    admission_max_in_flight: int = Field(default=128, env="ADMISSION_MAX_IN_FLIGHT")
+    admission_max_loop_lag_ms: int = Field(default=250, env="ADMISSION_MAX_LOOP_LAG_MS")
+    admission_critical_prefixes: str = Field(default="/auth,/orders,/checkout,/cart", env="ADMISSION_CRITICAL_PREFIXES")
+    admission_low_priority_prefixes: str = Field(default="/products,/categories", env="ADMISSION_LOW_PRIORITY_PREFIXES")
+    admission_retry_after_seconds: int = Field(default=1, env="ADMISSION_RETRY_AFTER_SECONDS")
+    # Conexiones del pool que usan las tareas de fondo y no cuentan como carga de peticiones
+    admission_pool_reserved: int = Field(default=3, env="ADMISSION_POOL_RESERVED")
+    # Cada cuanto se mide el retraso del event loop (la admision reacciona con ese intervalo)
+    loop_lag_interval_ms: int = Field(default=100, env="LOOP_LAG_INTERVAL_MS")
+    
+    # Tiempo limite por peticion (ver `shared.deadline`): por prefijo de ruta en JSON
+    # (p. ej. {"/products": 3000}); la cabecera X-Request-Timeout-Ms solo puede acortarlo
+    
+    request_deadline_ms: int = Field(default=10000, env="REQUEST_DEADLINE_MS")
+    request_deadline_routes_ms: Dict[str, int] = Field(default_factory=dict, env="REQUEST_DEADLINE_ROUTES_MS")
+    
+    # Cache HTTP: Cache-Control por nombre de ruta (JSON), ver `shared.http_cache`
+    
+    http_cache_policies: Dict[str, str] = Field(default_factory=dict, env="HTTP_CACHE_POLICIES")
+    
+    # Imagenes de productos y almacenamiento de objetos
+    
+    object_store_backend: str = Field(default="local", env="OBJECT_STORE_BACKEND")
+    object_store_path: str = Field(default="storage", env="OBJECT_STORE_PATH")
+    object_store_public_url: str = Field(default="/media", env="OBJECT_STORE_PUBLIC_URL")
+    upload_max_bytes: int = Field(default=20 * 1024 * 1024, env="UPLOAD_MAX_BYTES")
+    upload_part_size: int = Field(default=5 * 1024 * 1024, env="UPLOAD_PART_SIZE")
+    upload_part_concurrency: int = Field(default=4, env="UPLOAD_PART_CONCURRENCY")
+    upload_max_inflight_parts: int = Field(default=8, env="UPLOAD_MAX_INFLIGHT_PARTS")
+    image_workers: int = Field(default=2, env="IMAGE_WORKERS")
+    
     # Postgresql
     
     postgresql_user: str = Field(..., env="POSTGRESQL_USER")
@@ -16,22 +109,63 @@ class Settings(BaseSettings):
     postgresql_port: int = Field(..., env="POSTGRESQL_PORT")
     postgresql_name: str = Field(..., env="POSTGRESQL_NAME")
     
+    # Reemplaza la URL armada con POSTGRESQL_* (benchmarks, bases locales)
+    database_url: Optional[str] = Field(default=None, env="DATABASE_URL")
+    
+    # Replicas de lectura (URLs separadas por coma)
+    
+    database_replica_urls: Optional[str] = Field(default=None, env="DATABASE_REPLICA_URLS")
+    replica_health_check_seconds: int = Field(default=5, env="REPLICA_HEALTH_CHECK_SECONDS")
+    read_your_writes_seconds: int = Field(default=5, env="READ_YOUR_WRITES_SECONDS")
+    
     # Supabase
     
     supabase_url: str = Field(..., env="SUPABASE_URL")
     supabase_api_key: str = Field(..., env="SUPABASE_API_KEY")
     supabase_bucket_name: str = Field(..., env="SUPABASE_BUCKET_NAME")
     
+    # Hash de contraseñas (ver `shared.passwords`): bcrypt, argon2 o auto
+    
+    password_hash_scheme: str = Field(default="auto", env="PASSWORD_HASH_SCHEME")
+    password_hash_target_ms: int = Field(default=250, env="PASSWORD_HASH_TARGET_MS")
+    password_hash_min_rounds: int = Field(default=10, env="PASSWORD_HASH_MIN_ROUNDS")
+    password_hash_max_rounds: int = Field(default=16, env="PASSWORD_HASH_MAX_ROUNDS")
+    # Fija el costo (rondas de bcrypt o time_cost de argon2) y omite la calibracion
+    password_hash_rounds: Optional[int] = Field(default=None, env="PASSWORD_HASH_ROUNDS")
+    password_argon2_memory_kib: int = Field(default=64 * 1024, env="PASSWORD_ARGON2_MEMORY_KIB")
+    
     # JWT
     
     secret_key: str = Field(...,env="SECRET_KEY")
     algorithm: str = Field(...,env="ALGORITHM")
     access_token_expire_minutes: int = Field(...,env="ACCESS_TOKEN_EXPIRE_MINUTES")
+    refresh_token_expire_days: int = Field(default=30, env="REFRESH_TOKEN_EXPIRE_DAYS")
+    revocation_sync_seconds: int = Field(default=15, env="REVOCATION_SYNC_SECONDS")
+    
+    # JWT asimetrico (ES256 / EdDSA)
+    
+    jwt_private_key_path: Optional[str] = Field(default=None, env="JWT_PRIVATE_KEY_PATH")
+    jwt_jwks_path: Optional[str] = Field(default=None, env="JWT_JWKS_PATH")
+    jwt_key_id: Optional[str] = Field(default=None, env="JWT_KEY_ID")
 
     class Config:
         env_file = "../.env"
         env_file_encoding = "utf-8"
-        extra = "allow" 
-        
+        extra = "allow"
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """ Construye la configuracion la primera vez que se necesita (y carga el .env) """
+    from dotenv import load_dotenv
+    
+    load_dotenv()
+    return Settings()
+
 
-settings = Settings()
\ No newline at end of file
+def __getattr__(name: str):
+    # Compatibilidad: `from shared.config import settings` sigue funcionando,
+    # pero la configuracion solo se construye cuando alguien la pide
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
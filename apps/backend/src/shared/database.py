@@ -1,18 +1,87 @@
 from typing import Generator
-from sqlalchemy import create_engine
+from functools import lru_cache
+from sqlalchemy import inspect
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
-from shared.config import settings
+from sqlalchemy.orm.attributes import set_committed_value
+from shared.config import get_settings
+from shared.replicas import RoutingSession, get_replica_set
 
-DATABASE_URL = f"postgresql://{settings.postgresql_user}:{settings.postgresql_password}@{settings.postgresql_server}:{settings.postgresql_port}/{settings.postgresql_name}"
+# La fabrica de sesiones se enlaza al engine cuando este se construye (ver `get_engine`)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+Base = declarative_base()
 
-engine = create_engine(DATABASE_URL, echo=settings.debug)
+def get_database_url() -> str:
+    settings = get_settings()
+    if settings.database_url:
+        return settings.database_url
+    return f"postgresql://{settings.postgresql_user}:{settings.postgresql_password}@{settings.postgresql_server}:{settings.postgresql_port}/{settings.postgresql_name}"
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+@lru_cache(maxsize=None)
+def get_engine():
+    """ Construye el engine la primera vez que se necesita (normalmente en el lifespan de la app) """
+    from sqlalchemy import create_engine
+    
+    url = get_database_url()
+    engine = create_engine(url, echo=get_settings().debug, connect_args=connect_args(url))
+    SessionLocal.configure(bind=engine, replicas=get_replica_set())
+    return engine
+
+def connect_args(url: str) -> dict:
+    # Las sesiones se crean en el threadpool y se usan en el event loop
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+def dispose_engine() -> None:
+    """ Cierra las conexiones del pool; el siguiente `get_engine` crea uno nuevo """
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+        get_engine.cache_clear()
+    if get_replica_set.cache_info().currsize:
+        replicas = get_replica_set()
+        if replicas is not None:
+            replicas.dispose()
+        get_replica_set.cache_clear()
+
+def apply_returned_row(instance, row) -> None:
+    """
+        Copia a `instance` la fila devuelta por un `UPDATE ... RETURNING`.
+
+        Los valores quedan como ya persistidos, asi que leer el objeto despues
+        del commit (que lo expira) no vuelve a consultar la base de datos.
+
+        Args:
+            instance: Entidad ORM actualizada.
+            row: Fila con todas las columnas de la tabla de la entidad.
+    """
+    mapper = inspect(instance).mapper
+    values = row._mapping
+    for column in mapper.local_table.columns:
+        set_committed_value(instance, mapper.get_property_by_column(column).key, values[column])
+
+def sibling_sessions(db: Session) -> sessionmaker:
+    """
+        Fabrica de sesiones nuevas con el mismo engine (y replicas) que `db`.
+
+        Para trabajo que no pertenece a la peticion y puede seguir despues de
+        que `get_db` cierre su sesion. Con la sesion de `get_db` equivale a
+        `SessionLocal`; en pruebas respeta la sesion que se inyecto.
+    """
+    options = {"bind": db.get_bind()}
+    if isinstance(db, RoutingSession):
+        options.update(class_=RoutingSession, replicas=db.replicas)
+    return sessionmaker(autocommit=False, autoflush=False, **options)
 
 def get_db() -> Generator[Session, None, None]:
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def __getattr__(name: str):
+    # Compatibilidad con `from shared.database import engine, DATABASE_URL`
+    if name == "engine":
+        return get_engine()
+    if name == "DATABASE_URL":
+        return get_database_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
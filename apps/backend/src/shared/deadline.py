@@ -0,0 +1,313 @@
+import asyncio
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+from shared.exceptions import DeadlineExceededException, RequestCancelledException
+
+logger = logging.getLogger(__name__)
+
+""" Tiempo limite por peticion, propagado a las sentencias SQL y a las llamadas salientes """
+
+# Clave de `Connection.info` con el `statement_timeout` aplicado en la transaccion actual
+TIMEOUT_KEY = "deadline_statement_timeout_ms"
+
+# Holgura antes de volver a enviar `SET LOCAL`: evita una ida y vuelta por sentencia
+TIMEOUT_SLACK_MS = 50
+
+# Instrucciones de la VM de SQLite entre comprobaciones del tiempo limite
+SQLITE_PROGRESS_STEPS = 1000
+
+
+class Deadline:
+    """
+        Momento limite de una peticion (reloj monotono) y si el cliente la cancelo.
+
+        `cancel` interrumpe las sentencias en curso de la peticion: psycopg2 envia
+        la cancelacion al servidor y SQLite la detecta en su progress handler.
+    """
+
+    __slots__ = ("timeout", "expires_at", "cancelled", "_connections")
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.cancelled = False
+        # Conexiones DBAPI con una sentencia en curso para esta peticion
+        self._connections = set()
+
+    def restart(self) -> None:
+        """ Vuelve a contar `timeout` desde ahora """
+        self.expires_at = time.monotonic() + self.timeout
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled or self.remaining() <= 0
+
+    def check(self) -> None:
+        """
+            Raises:
+                RequestCancelledException: Si el cliente se desconecto.
+                DeadlineExceededException: Si se agoto el tiempo limite.
+        """
+        if self.cancelled:
+            raise RequestCancelledException()
+        if self.remaining() <= 0:
+            raise DeadlineExceededException(f"La peticion supero su tiempo limite de {self.timeout * 1000:.0f} ms")
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        for connection in list(self._connections):
+            cancel = getattr(connection, "cancel", None)
+            if cancel is not None:
+                try:
+                    cancel()
+                except Exception as e:
+                    logger.debug(f"No se pudo cancelar la sentencia en curso: {str(e)}")
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+async def within_deadline(awaitable):
+    """ Espera `awaitable` como maximo lo que le queda a la peticion actual """
+    deadline = current_deadline.get()
+    if deadline is None:
+        return await awaitable
+    try:
+        deadline.check()
+    except (DeadlineExceededException, RequestCancelledException):
+        # No llega a ejecutarse: se cierra para que no quede sin esperar
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except asyncio.TimeoutError:
+        deadline.check()
+        raise
+
+
+""" Propagacion a la base de datos (eventos del engine) """
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    deadline = current_deadline.get()
+    if deadline is None:
+        return
+    deadline.check()
+
+    dbapi_connection = conn.connection.dbapi_connection
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        # Cada sentencia puede durar lo que le queda a la peticion; SET LOCAL
+        # vale hasta el fin de la transaccion y se renueva si quedo holgado
+        timeout_ms = max(1, int(deadline.remaining() * 1000))
+        current = conn.info.get(TIMEOUT_KEY)
+        if current is None or current > timeout_ms + TIMEOUT_SLACK_MS:
+            cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+            conn.info[TIMEOUT_KEY] = timeout_ms
+    elif dialect == "sqlite":
+        dbapi_connection.set_progress_handler(lambda: deadline.expired, SQLITE_PROGRESS_STEPS)
+
+    deadline._connections.add(dbapi_connection)
+    context._deadline = deadline
+
+
+def _release(context) -> Optional[Deadline]:
+    deadline = getattr(context, "_deadline", None)
+    if deadline is not None:
+        dbapi_connection = context.root_connection.connection.dbapi_connection
+        deadline._connections.discard(dbapi_connection)
+        if context.dialect.name == "sqlite":
+            dbapi_connection.set_progress_handler(None, 0)
+    return deadline
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _release(context)
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    deadline = _release(context) if context is not None else None
+    if deadline is not None and deadline.expired:
+        # La sentencia se interrumpio por el tiempo limite (statement_timeout,
+        # cancelacion o progress handler): se informa como tal y no como error de BD
+        try:
+            deadline.check()
+        except DeadlineExceededException as e:
+            raise e from exception_context.original_exception
+
+
+def _end_transaction(conn):
+    conn.info.pop(TIMEOUT_KEY, None)
+
+
+def _checkin(dbapi_connection, connection_record):
+    # El pool hace rollback al devolver la conexion: el SET LOCAL ya no aplica
+    if connection_record is not None:
+        connection_record.info.pop(TIMEOUT_KEY, None)
+
+
+def install_deadline_guard(engine) -> None:
+    """ Aplica el tiempo limite de la peticion actual a cada sentencia de `engine` (idempotente) """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    event.listen(engine, "commit", _end_transaction)
+    event.listen(engine, "rollback", _end_transaction)
+    event.listen(engine.pool, "checkin", _checkin)
+
+
+""" Middleware """
+
+def _has_body(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"transfer-encoding" or (name == b"content-length" and value.strip() not in (b"", b"0")):
+            return True
+    return False
+
+
+class DeadlineMiddleware:
+    """
+        Middleware ASGI que fija el tiempo limite de cada peticion en `current_deadline`.
+
+        El limite sale del prefijo de ruta mas largo de `route_timeouts` o de
+        `default_timeout`; la cabecera `X-Request-Timeout-Ms` puede acortarlo
+        pero no alargarlo (un cliente no ocupa conexiones mas de lo previsto).
+        Si se agota responde 504; si el cliente se desconecta antes de la
+        respuesta cancela la sentencia en curso y no responde.
+
+        La desconexion se vigila una vez leido el cuerpo (en peticiones sin cuerpo,
+        desde el inicio), asi que las subidas no se leen por adelantado. Al
+        terminar de leer el cuerpo el limite vuelve a contar desde cero: una
+        subida lenta no agota el tiempo del procesamiento posterior. Con
+        consultas sincronas dentro de `async def` el event loop no atiende la
+        desconexion hasta que la sentencia termina: ahi el limite lo aplica
+        `statement_timeout`.
+    """
+
+    header = b"x-request-timeout-ms"
+
+    def __init__(
+        self,
+        app,
+        default_timeout: float = 10.0,
+        route_timeouts: Optional[Dict[str, float]] = None
+    ):
+        self.app = app
+        self.default_timeout = default_timeout
+        # Prefijos mas largos primero
+        self.route_timeouts = sorted((route_timeouts or {}).items(), key=lambda item: -len(item[0]))
+
+    @classmethod
+    def from_settings(cls, app) -> "DeadlineMiddleware":
+        """ Construye el middleware con `shared.config` (al armar la pila, no al importar) """
+        from shared.config import get_settings
+
+        settings = get_settings()
+        return cls(
+            app,
+            default_timeout=settings.request_deadline_ms / 1000,
+            route_timeouts={prefix: ms / 1000 for prefix, ms in settings.request_deadline_routes_ms.items()},
+        )
+
+    def route_timeout(self, path: str) -> float:
+        for prefix, timeout in self.route_timeouts:
+            if path.startswith(prefix):
+                return timeout
+        return self.default_timeout
+
+    def timeout_for(self, scope) -> float:
+        timeout = self.route_timeout(scope["path"])
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                try:
+                    return min(max(int(value) / 1000, 0.001), timeout)
+                except ValueError:
+                    break
+        return timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(self.timeout_for(scope))
+        token = current_deadline.set(deadline)
+        response = {"started": False, "finished": False}
+        messages: asyncio.Queue = asyncio.Queue()
+        watcher: Optional[asyncio.Task] = None
+
+        async def watch_disconnect():
+            # Unico lector de `receive` desde que arranca; la app lee de `messages`
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response["finished"]:
+                        deadline.cancel()
+                    return
+
+        def start_watcher():
+            nonlocal watcher
+            watcher = asyncio.create_task(watch_disconnect())
+
+        async def receive_wrapper():
+            if watcher is not None:
+                if watcher.done() and messages.empty():
+                    return {"type": "http.disconnect"}
+                return await messages.get()
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                deadline.cancel()
+            elif not message.get("more_body", False):
+                # Lo que tarda el cliente en enviar el cuerpo no cuenta
+                deadline.restart()
+                start_watcher()
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["finished"] = True
+            await send(message)
+
+        if not _has_body(scope):
+            start_watcher()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except DeadlineExceededException as e:
+            if deadline.cancelled:
+                logger.info(f"Peticion cancelada por el cliente: {scope['method']} {scope['path']}")
+                return
+            if response["started"]:
+                raise
+            logger.warning(f"Tiempo limite agotado: {scope['method']} {scope['path']}")
+            await self._timeout_response(send, e.message)
+        finally:
+            current_deadline.reset(token)
+            if watcher is not None:
+                watcher.cancel()
+
+    async def _timeout_response(self, send, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -24,4 +24,16 @@ class InsufficientPermissionsException(AppBaseException):
             self.message = f"Usuario con ID {user_id} no tiene permisos para: {required_permission}"
         else:
             self.message = f"Usuario con ID {user_id} no tiene permisos suficientes"
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+
+class DeadlineExceededException(AppBaseException):
+    """Se lanza cuando la peticion agota su tiempo limite (ver `shared.deadline`)."""
+    def __init__(self, detail: str = "La peticion supero su tiempo limite"):
+        self.message = detail
+        super().__init__(self.message)
+
+class RequestCancelledException(DeadlineExceededException):
+    """Se lanza cuando el cliente se desconecta antes de recibir la respuesta."""
+    def __init__(self, detail: str = "El cliente cancelo la peticion"):
+        super().__init__(detail)
@@ -0,0 +1,188 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+from fastapi import HTTPException, Request, Response, status
+from pydantic import TypeAdapter
+
+from shared.cache import get_cache
+from shared.config import get_settings
+
+""" Respuestas condicionales (ETag / Last-Modified / 304) y politicas de Cache-Control por ruta """
+
+# Politicas por defecto; `HTTP_CACHE_POLICIES` (JSON) las reemplaza por nombre de ruta
+DEFAULT_CACHE_POLICIES = {
+    "products.list": "public, max-age=30, stale-while-revalidate=120",
+    "products.detail": "public, max-age=60, stale-while-revalidate=300",
+    "categories.list": "public, max-age=300, stale-while-revalidate=3600",
+    "categories.detail": "public, max-age=300, stale-while-revalidate=3600",
+    "users.detail": "private, no-cache",
+}
+
+
+def cache_policy(route: str) -> str:
+    """ Valor de `Cache-Control` configurado para `route` """
+    overrides = get_settings().http_cache_policies or {}
+    return overrides.get(route, DEFAULT_CACHE_POLICIES.get(route, "no-cache"))
+
+
+def strong_etag(*parts) -> str:
+    """
+        ETag fuerte a partir de identificadores y versiones de fila.
+
+        Dos respuestas con las mismas partes son identicas byte a byte, asi que
+        el ETag se calcula sin cargar ni serializar las entidades.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def version_etag(kind: str, versions: Iterable, *parts) -> str:
+    """ ETag de una coleccion: `kind`, parametros de la consulta y pares (id, version) """
+    return strong_etag(kind, *parts, tuple((str(entity_id), version) for entity_id, version in versions))
+
+
+def is_conditional(request: Request) -> bool:
+    """ True si la peticion trae validadores; si no, no vale la pena consultar versiones antes """
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """ Comparacion debil de `If-None-Match` (RFC 9110, 13.1.2) """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified: Optional[datetime]) -> bool:
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def validator_headers(etag: str, route: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_policy(route)}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(
+    request: Request,
+    etag: str,
+    route: str,
+    last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """
+        Respuesta 304 si los validadores de la peticion coinciden, o None.
+
+        `If-None-Match` tiene prioridad; `If-Modified-Since` solo se evalua si no
+        viene (RFC 9110, 13.2.2).
+
+        Args:
+            request (Request): Peticion con las cabeceras condicionales.
+            etag (str): ETag actual del recurso.
+            route (str): Nombre de la politica de cache de la ruta.
+            last_modified (datetime, optional): Ultima modificacion del recurso.
+
+        Returns:
+            Optional[Response]: 304 sin cuerpo, o None si hay que responder completo.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        matched = etag_matches(if_none_match, etag)
+    else:
+        matched = _not_modified_since(request.headers.get("if-modified-since"), last_modified)
+    if not matched:
+        return None
+    return Response(status_code=304, headers=validator_headers(etag, route, last_modified))
+
+
+def set_validators(response: Response, etag: str, route: str, last_modified: Optional[datetime] = None) -> None:
+    """ Agrega ETag, Cache-Control y Last-Modified a una respuesta completa """
+    response.headers.update(validator_headers(etag, route, last_modified))
+
+
+@lru_cache(maxsize=None)
+def _adapter(response_type) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def cached_body(etag: str) -> Optional[bytes]:
+    """
+        Cuerpo JSON ya serializado de la respuesta con `etag`, si esta en la cache.
+
+        Un ETag fuerte identifica el cuerpo byte a byte, asi que la entrada nunca
+        queda vieja y la comparten todos los workers con `CACHE_BACKEND=shared`.
+    """
+    cache = get_cache()
+    return None if cache is None else cache.get(f"body:{etag}")
+
+
+def store_body(etag: str, response_type, value: Any) -> bytes:
+    """ Serializa `value` como `response_type` (igual que `response_model`) y lo guarda bajo `etag` """
+    adapter = _adapter(response_type)
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    cache = get_cache()
+    if cache is not None:
+        cache.set(f"body:{etag}", body)
+    return body
+
+
+def json_response(body: bytes, etag: str, route: str, last_modified: Optional[datetime] = None) -> Response:
+    """ Respuesta completa con un cuerpo JSON ya serializado y sus validadores """
+    return Response(
+        content=body, media_type="application/json", headers=validator_headers(etag, route, last_modified)
+    )
+
+
+def precondition_failed(etag: str) -> HTTPException:
+    """ Error 412 con el ETag actual, para que el cliente vuelva a leer el recurso """
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="El recurso fue modificado; vuelva a obtenerlo y reintente",
+        headers={"ETag": etag}
+    )
+
+
+def check_if_match(request: Request, etag: str) -> bool:
+    """
+        Evalua `If-Match` antes de modificar un recurso (RFC 9110, 13.1.1).
+
+        El prefijo `W/` se ignora: `CompressionMiddleware` debilita el ETag al
+        comprimir, pero la version de la fila detras de el es la misma.
+
+        Args:
+            request (Request): Peticion de escritura.
+            etag (str): ETag actual del recurso.
+
+        Returns:
+            bool: True si la peticion trae `If-Match` y coincide; la escritura debe
+                condicionarse a la version leida. False si no trae la cabecera.
+
+        Raises:
+            HTTPException: 412 si `If-Match` no coincide con `etag`.
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return False
+    if not etag_matches(if_match, etag):
+        raise precondition_failed(etag)
+    return True
@@ -0,0 +1,357 @@
+import asyncio
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+""" Invalidacion de caches en memoria entre workers (LISTEN/NOTIFY de PostgreSQL) """
+
+# Claves de `Session.info`: invalidaciones pendientes de la transaccion y buses
+# que ya las enviaron con `pg_notify` dentro de ella
+PENDING_KEY = "invalidations"
+NOTIFIED_KEY = "invalidations_notified"
+
+# Mas IDs que esto en un mensaje se envian como "todo el tipo" (NOTIFY admite ~8000 bytes)
+MAX_PAYLOAD_IDS = 100
+
+# `ids` None significa "todas las entidades del tipo"
+Handler = Callable[[Optional[FrozenSet[str]]], None]
+
+
+class InvalidationChannel(ABC):
+    """
+        Transporte de mensajes de invalidacion entre workers.
+
+        `receive` lanza `ConnectionError` si se pierde la conexion; el listener
+        reconecta y mientras tanto los caches vuelven a su TTL.
+    """
+
+    # True si los mensajes viajan con `pg_notify` dentro de la transaccion que
+    # escribe (se entregan solo si confirma); si no, se envian tras el commit
+    in_transaction = False
+
+    @abstractmethod
+    async def connect(self) -> None:
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+    @abstractmethod
+    async def receive(self) -> str:
+        ...
+
+    def send(self, payload: str) -> None:
+        raise NotImplementedError
+
+
+class PostgresChannel(InvalidationChannel):
+    """
+        Canal sobre `LISTEN`/`NOTIFY` con una conexion psycopg2 dedicada.
+
+        La conexion se vigila con `loop.add_reader`, asi que escuchar no ocupa
+        un hilo. Sin mensajes durante `keepalive` segundos se hace un `SELECT 1`
+        en un hilo para detectar conexiones caidas.
+    """
+
+    in_transaction = True
+
+    def __init__(self, dsn: str, channel: str, keepalive: float = 30.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.keepalive = keepalive
+        self._conn = None
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def connect(self) -> None:
+        import psycopg2
+        from psycopg2 import sql
+
+        def open_connection():
+            conn = psycopg2.connect(self.dsn)
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+            return conn
+
+        self._conn = await asyncio.to_thread(open_connection)
+        self._queue = asyncio.Queue()
+        asyncio.get_running_loop().add_reader(self._conn.fileno(), self._on_readable)
+
+    def _on_readable(self) -> None:
+        try:
+            self._conn.poll()
+        except Exception as e:
+            asyncio.get_running_loop().remove_reader(self._conn.fileno())
+            self._queue.put_nowait(ConnectionError(str(e)))
+            return
+        self._drain()
+
+    def _drain(self) -> None:
+        while self._conn.notifies:
+            self._queue.put_nowait(self._conn.notifies.pop(0).payload)
+
+    async def receive(self) -> str:
+        while True:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), self.keepalive)
+            except asyncio.TimeoutError:
+                # El SELECT 1 bloquea hasta que responde el servidor: fuera del loop
+                await asyncio.to_thread(self._ping)
+                # Las notificaciones leidas junto con la respuesta del ping no
+                # vuelven a marcar el socket como legible
+                self._drain()
+                continue
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+    def _ping(self) -> None:
+        try:
+            with self._conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Exception as e:
+            raise ConnectionError(str(e)) from e
+
+    async def close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._conn.fileno())
+        except (ValueError, OSError):
+            pass
+        self._conn.close()
+        self._conn = None
+
+
+class LocalHub:
+    """ Reemplazo en memoria del canal de PostgreSQL: reparte cada mensaje a todos los canales conectados """
+
+    def __init__(self):
+        self.channels: List["LocalChannel"] = []
+
+    def broadcast(self, payload: str) -> None:
+        for channel in list(self.channels):
+            channel.deliver(payload)
+
+
+class LocalChannel(InvalidationChannel):
+    """ Canal de un worker sobre un `LocalHub` (pruebas y desarrollo con un solo proceso) """
+
+    def __init__(self, hub: LocalHub):
+        self.hub = hub
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def connect(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self.hub.channels.append(self)
+
+    async def close(self) -> None:
+        if self in self.hub.channels:
+            self.hub.channels.remove(self)
+
+    def send(self, payload: str) -> None:
+        self.hub.broadcast(payload)
+
+    def deliver(self, item) -> None:
+        # El commit que publica puede correr en otro hilo
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    def disconnect(self) -> None:
+        """ Simula la caida de la conexion """
+        self.hub.channels.remove(self)
+        self.deliver(ConnectionError("canal desconectado"))
+
+    async def receive(self) -> str:
+        item = await self._queue.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+class InvalidationBus:
+    """
+        Reparte invalidaciones de entidades a los caches en memoria del worker y a los demas workers.
+
+        Los repositorios llaman a `publish` antes de confirmar. Al confirmar, el
+        worker que escribio invalida sus propios caches y el mensaje sale hacia
+        los demas: con PostgreSQL, un `pg_notify` dentro de la misma transaccion
+        (si hace rollback no se envia nada). Los mensajes de una transaccion se
+        agrupan por tipo de entidad y llevan el origen para no reaplicarse.
+
+        Los caches se suscriben por tipo de entidad (`subscribe`) y al estado de
+        la conexion (`on_state`): mientras no hay listener conectado no llegan
+        invalidaciones ajenas y deben volver a su TTL corto.
+    """
+
+    def __init__(self, max_payload_ids: int = MAX_PAYLOAD_IDS):
+        self.origin = uuid.uuid4().hex[:12]
+        self.max_payload_ids = max_payload_ids
+        self.notify_channel: Optional[str] = None
+        self.channel: Optional[InvalidationChannel] = None
+        self.connected = False
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._state_handlers: List[Callable[[bool], None]] = []
+
+    def subscribe(self, entity: str, handler: Handler) -> Callable[[], None]:
+        """ Registra `handler` para un tipo de entidad; devuelve la funcion que lo desuscribe """
+        self._handlers.setdefault(entity, []).append(handler)
+        return lambda: self._handlers[entity].remove(handler)
+
+    def on_state(self, handler: Callable[[bool], None]) -> None:
+        """ Registra `handler(connected)`, llamado ahora y cada vez que el listener conecta o se desconecta """
+        self._state_handlers.append(handler)
+        handler(self.connected)
+
+    def publish(self, session: Session, entity: str, ids: Iterable) -> None:
+        """
+            Registra que la transaccion de `session` modifica entidades de `entity`.
+
+            No envia nada hasta el commit; un rollback descarta lo pendiente.
+
+            Args:
+                session (Session): Sesion con la transaccion que escribe.
+                entity (str): Tipo de entidad (`product`, `user`, ...).
+                ids (Iterable): IDs modificados.
+        """
+        pending = session.info.setdefault(PENDING_KEY, {}).setdefault(self, {})
+        pending.setdefault(entity, set()).update(str(entity_id) for entity_id in ids)
+
+    def evict(self, entity: str, ids: Optional[Iterable[str]]) -> None:
+        """ Invalida localmente `ids` de `entity` (o todo el tipo si `ids` es None) """
+        frozen = None if ids is None else frozenset(ids)
+        for handler in list(self._handlers.get(entity, ())):
+            try:
+                handler(frozen)
+            except Exception as e:
+                logger.error(f"Error invalidando cache de {entity}: {str(e)}")
+
+    def evict_all(self) -> None:
+        for entity in list(self._handlers):
+            self.evict(entity, None)
+
+    def set_connected(self, connected: bool) -> None:
+        if connected == self.connected:
+            return
+        self.connected = connected
+        if connected:
+            # Lo que cambio mientras no escuchabamos no llego: se descarta todo
+            self.evict_all()
+        for handler in list(self._state_handlers):
+            handler(connected)
+
+    def payloads(self, changes: Dict[str, Set[str]]) -> List[str]:
+        """ Un mensaje JSON por tipo de entidad; demasiados IDs se envian como `null` (todo el tipo) """
+        messages = []
+        for entity, ids in changes.items():
+            listed = sorted(ids) if len(ids) <= self.max_payload_ids else None
+            messages.append(json.dumps({"o": self.origin, "e": entity, "ids": listed}, separators=(",", ":")))
+        return messages
+
+    def receive(self, payload: str, batch: Dict[str, Optional[Set[str]]]) -> None:
+        """ Suma un mensaje recibido a `batch` (ignora los propios y los mal formados) """
+        try:
+            message = json.loads(payload)
+            origin, entity, ids = message["o"], message["e"], message["ids"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Mensaje de invalidacion invalido")
+            return
+        if origin == self.origin:
+            return
+        if ids is None or (entity in batch and batch[entity] is None):
+            batch[entity] = None
+        else:
+            batch.setdefault(entity, set()).update(ids)
+
+    def apply(self, batch: Dict[str, Optional[Set[str]]]) -> None:
+        for entity, ids in batch.items():
+            self.evict(entity, ids)
+
+
+invalidation_bus = InvalidationBus()
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session) -> None:
+    for bus, changes in session.info.get(PENDING_KEY, {}).items():
+        if not changes or bus.notify_channel is None:
+            continue
+        if session.get_bind().dialect.name != "postgresql":
+            continue
+        for payload in bus.payloads(changes):
+            session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": bus.notify_channel, "payload": payload}
+            )
+        session.info.setdefault(NOTIFIED_KEY, set()).add(bus)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    notified = session.info.pop(NOTIFIED_KEY, set())
+    if not pending:
+        return
+    for bus, changes in pending.items():
+        for entity, ids in changes.items():
+            bus.evict(entity, ids)
+        if bus not in notified and bus.channel is not None and not bus.channel.in_transaction:
+            for payload in bus.payloads(changes):
+                bus.channel.send(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session) -> None:
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(NOTIFIED_KEY, None)
+
+
+async def run_invalidation_listener(
+    bus: InvalidationBus,
+    channel: InvalidationChannel,
+    coalesce_seconds: float = 0.05,
+    reconnect_seconds: float = 5.0
+) -> None:
+    """
+        Tarea de fondo que aplica las invalidaciones publicadas por otros workers.
+
+        Los mensajes que llegan dentro de `coalesce_seconds` desde el primero se
+        agrupan (IDs unidos por tipo) y se aplican juntos, asi una rafaga de
+        escrituras cuesta una invalidacion por cache. Si la conexion se cae, el
+        bus pasa a desconectado (los caches usan su TTL) y se reintenta cada
+        `reconnect_seconds`.
+    """
+    bus.channel = channel
+    while True:
+        try:
+            await channel.connect()
+            bus.set_connected(True)
+            logger.info("Escuchando invalidaciones de cache")
+            while True:
+                batch: Dict[str, Optional[Set[str]]] = {}
+                bus.receive(await channel.receive(), batch)
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + coalesce_seconds
+                while (remaining := deadline - loop.time()) > 0:
+                    try:
+                        bus.receive(await asyncio.wait_for(channel.receive(), remaining), batch)
+                    except asyncio.TimeoutError:
+                        break
+                bus.apply(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Listener de invalidaciones desconectado: {str(e)}")
+        finally:
+            bus.set_connected(False)
+            await channel.close()
+        await asyncio.sleep(reconnect_seconds)
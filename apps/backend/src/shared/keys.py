@@ -0,0 +1,377 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Dict, Optional
+
+import orjson
+from jose.exceptions import ExpiredSignatureError, JWTError
+
+""" Llaves JWT parseadas una sola vez y verificacion sin estado entre nodos """
+
+# `cryptography` solo se importa cuando se usa un algoritmo asimetrico:
+# con HS256 el arranque no paga ese costo
+
+HMAC_ALGORITHMS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+ASYMMETRIC_ALGORITHMS = {"ES256", "EdDSA"}
+
+# Numero maximo de cabeceras distintas que se recuerdan ya resueltas a su llave
+MAX_CACHED_HEADERS = 64
+
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def b64url_decode(data: str) -> bytes:
+    padding = -len(data) % 4
+    return base64.urlsafe_b64decode(data + "=" * padding)
+
+
+class VerificationKey:
+    """ Llave publica (o secreto HMAC) lista para verificar firmas de un algoritmo """
+
+    def __init__(self, algorithm: str, key, kid: Optional[str] = None):
+        self.algorithm = algorithm
+        self.key = key
+        self.kid = kid
+
+    def verify(self, signing_input: bytes, signature: bytes) -> bool:
+        if self.algorithm in HMAC_ALGORITHMS:
+            expected = hmac.new(self.key, signing_input, HMAC_ALGORITHMS[self.algorithm]).digest()
+            return hmac.compare_digest(expected, signature)
+
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
+        try:
+            if self.algorithm == "ES256":
+                if len(signature) != 64:
+                    return False
+                r = int.from_bytes(signature[:32], "big")
+                s = int.from_bytes(signature[32:], "big")
+                self.key.verify(encode_dss_signature(r, s), signing_input, ec.ECDSA(hashes.SHA256()))
+                return True
+
+            if self.algorithm == "EdDSA":
+                self.key.verify(signature, signing_input)
+                return True
+        except InvalidSignature:
+            return False
+
+        return False
+
+    def to_jwk(self) -> dict:
+        """
+            Exporta la llave publica en formato JWK.
+
+            Returns:
+                dict: Representacion JWK de la llave publica.
+
+            Raises:
+                ValueError: Si la llave es un secreto HMAC (no se publica).
+        """
+        from cryptography.hazmat.primitives import serialization
+
+        if self.algorithm == "ES256":
+            numbers = self.key.public_numbers()
+            jwk = {
+                "kty": "EC",
+                "crv": "P-256",
+                "x": b64url_encode(numbers.x.to_bytes(32, "big")),
+                "y": b64url_encode(numbers.y.to_bytes(32, "big")),
+            }
+        elif self.algorithm == "EdDSA":
+            raw = self.key.public_bytes(
+                encoding=serialization.Encoding.Raw,
+                format=serialization.PublicFormat.Raw
+            )
+            jwk = {"kty": "OKP", "crv": "Ed25519", "x": b64url_encode(raw)}
+        else:
+            raise ValueError("Las llaves HMAC no se pueden publicar en un JWKS")
+
+        jwk.update({"alg": self.algorithm, "use": "sig"})
+        if self.kid:
+            jwk["kid"] = self.kid
+        return jwk
+
+    @classmethod
+    def from_jwk(cls, jwk: dict) -> "VerificationKey":
+        """
+            Construye una llave de verificacion a partir de un JWK publico.
+
+            Args:
+                jwk (dict): Entrada del documento JWKS.
+
+            Returns:
+                VerificationKey: Llave lista para verificar.
+
+            Raises:
+                ValueError: Si el tipo de llave o la curva no estan soportados.
+        """
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+        kty = jwk.get("kty")
+        crv = jwk.get("crv")
+
+        if kty == "EC" and crv == "P-256":
+            numbers = ec.EllipticCurvePublicNumbers(
+                int.from_bytes(b64url_decode(jwk["x"]), "big"),
+                int.from_bytes(b64url_decode(jwk["y"]), "big"),
+                ec.SECP256R1()
+            )
+            return cls("ES256", numbers.public_key(), jwk.get("kid"))
+
+        if kty == "OKP" and crv == "Ed25519":
+            key = ed25519.Ed25519PublicKey.from_public_bytes(b64url_decode(jwk["x"]))
+            return cls("EdDSA", key, jwk.get("kid"))
+
+        raise ValueError(f"Tipo de llave no soportado en JWKS: kty={kty}, crv={crv}")
+
+
+class KeyRing:
+    """
+        Conjunto de llaves JWT construido una sola vez al arrancar.
+
+        Los nodos que firman tienen la llave privada activa; los nodos de borde
+        solo necesitan el documento JWKS con las llaves publicas. La rotacion se
+        hace publicando la nueva llave en el JWKS con otro `kid` y cambiando la
+        llave activa: los tokens firmados con la llave anterior se siguen
+        verificando mientras su `kid` permanezca en el documento.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        signing_key=None,
+        kid: Optional[str] = None,
+        verification_keys: Optional[Dict[Optional[str], VerificationKey]] = None
+    ):
+        if algorithm not in HMAC_ALGORITHMS and algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Algoritmo JWT no soportado: {algorithm}")
+
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.kid = kid
+        self.verification_keys = dict(verification_keys or {})
+
+        header = {"alg": algorithm, "typ": "JWT"}
+        if kid:
+            header["kid"] = kid
+        # La cabecera es constante para la llave activa: se serializa una vez
+        self._header_segment = b64url_encode(orjson.dumps(header))
+        self._resolved_headers: Dict[str, VerificationKey] = {}
+
+    @classmethod
+    def from_settings(cls, settings) -> "KeyRing":
+        """
+            Construye el llavero a partir de la configuracion.
+
+            Args:
+                settings (Settings): Configuracion de la aplicacion.
+
+            Returns:
+                KeyRing: Llavero con las llaves ya parseadas.
+        """
+        algorithm = settings.algorithm
+
+        if algorithm in HMAC_ALGORITHMS:
+            secret = settings.secret_key.encode("utf-8")
+            return cls(
+                algorithm,
+                signing_key=secret,
+                verification_keys={None: VerificationKey(algorithm, secret)}
+            )
+
+        verification_keys = {}
+        if settings.jwt_jwks_path:
+            with open(settings.jwt_jwks_path, "rb") as jwks_file:
+                verification_keys = load_jwks(json.load(jwks_file))
+
+        signing_key = None
+        if settings.jwt_private_key_path:
+            from cryptography.hazmat.primitives import serialization
+
+            with open(settings.jwt_private_key_path, "rb") as key_file:
+                signing_key = serialization.load_pem_private_key(key_file.read(), password=None)
+
+        return cls.from_keys(
+            algorithm,
+            signing_key=signing_key,
+            kid=settings.jwt_key_id,
+            verification_keys=verification_keys
+        )
+
+    @classmethod
+    def from_keys(
+        cls,
+        algorithm: str,
+        signing_key=None,
+        kid: Optional[str] = None,
+        verification_keys: Optional[Dict[Optional[str], VerificationKey]] = None
+    ) -> "KeyRing":
+        """
+            Construye un llavero asimetrico, agregando la llave publica de la llave activa.
+
+            Args:
+                algorithm (str): ES256 o EdDSA.
+                signing_key: Llave privada de `cryptography` (opcional en nodos de borde).
+                kid (str, optional): Identificador de la llave activa.
+                verification_keys (dict, optional): Llaves publicas por `kid`.
+
+            Returns:
+                KeyRing: Llavero listo para firmar y/o verificar.
+        """
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Algoritmo asimetrico no soportado: {algorithm}")
+
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+        if signing_key is not None:
+            expected_type = ec.EllipticCurvePrivateKey if algorithm == "ES256" else ed25519.Ed25519PrivateKey
+            if not isinstance(signing_key, expected_type):
+                raise ValueError(f"La llave privada no corresponde al algoritmo {algorithm}")
+
+        keys = dict(verification_keys or {})
+        if signing_key is not None and kid not in keys:
+            keys[kid] = VerificationKey(algorithm, signing_key.public_key(), kid)
+
+        return cls(algorithm, signing_key=signing_key, kid=kid, verification_keys=keys)
+
+    def sign(self, claims: dict) -> str:
+        """
+            Firma los claims y devuelve el JWT compacto.
+
+            Args:
+                claims (dict): Claims serializables a JSON.
+
+            Returns:
+                str: Token JWT firmado.
+
+            Raises:
+                JWTError: Si este nodo no tiene llave de firma.
+        """
+        if self.signing_key is None:
+            raise JWTError("Este nodo no tiene llave de firma configurada")
+
+        signing_input = f"{self._header_segment}.{b64url_encode(orjson.dumps(claims))}"
+        data = signing_input.encode("ascii")
+
+        if self.algorithm in HMAC_ALGORITHMS:
+            signature = hmac.new(self.signing_key, data, HMAC_ALGORITHMS[self.algorithm]).digest()
+        elif self.algorithm == "ES256":
+            from cryptography.hazmat.primitives import hashes
+            from cryptography.hazmat.primitives.asymmetric import ec
+            from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
+            r, s = decode_dss_signature(self.signing_key.sign(data, ec.ECDSA(hashes.SHA256())))
+            signature = r.to_bytes(32, "big") + s.to_bytes(32, "big")
+        else:
+            signature = self.signing_key.sign(data)
+
+        return f"{signing_input}.{b64url_encode(signature)}"
+
+    def verify(self, token: str) -> dict:
+        """
+            Verifica la firma y la expiracion de un token.
+
+            Args:
+                token (str): JWT compacto.
+
+            Returns:
+                dict: Claims del token.
+
+            Raises:
+                ExpiredSignatureError: Si el token ya expiro.
+                JWTError: Si el token esta malformado o la firma no es valida.
+        """
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+        except (ValueError, AttributeError):
+            raise JWTError("Token malformado")
+
+        key = self._resolved_headers.get(header_segment)
+        if key is None:
+            key = self._resolve_header(header_segment)
+
+        try:
+            signature = b64url_decode(signature_segment)
+        except ValueError:
+            raise JWTError("Firma malformada")
+
+        try:
+            signing_input = f"{header_segment}.{payload_segment}".encode("ascii")
+        except UnicodeEncodeError:
+            raise JWTError("Token malformado")
+        if not key.verify(signing_input, signature):
+            raise JWTError("Firma invalida")
+
+        try:
+            claims = orjson.loads(b64url_decode(payload_segment))
+        except (ValueError, orjson.JSONDecodeError):
+            raise JWTError("Payload malformado")
+
+        if not isinstance(claims, dict):
+            raise JWTError("Payload malformado")
+
+        exp = claims.get("exp")
+        if exp is not None and exp < time.time():
+            raise ExpiredSignatureError("El token ha expirado")
+
+        return claims
+
+    def _resolve_header(self, header_segment: str) -> VerificationKey:
+        try:
+            header = orjson.loads(b64url_decode(header_segment))
+        except (ValueError, orjson.JSONDecodeError):
+            raise JWTError("Cabecera malformada")
+
+        if not isinstance(header, dict):
+            raise JWTError("Cabecera malformada")
+
+        key = self.verification_keys.get(header.get("kid"))
+        if key is None:
+            raise JWTError(f"Llave desconocida: {header.get('kid')}")
+
+        # Evita la confusion de algoritmos: la llave decide el algoritmo, no el token
+        if header.get("alg") != key.algorithm:
+            raise JWTError("Algoritmo no permitido para esta llave")
+
+        if len(self._resolved_headers) < MAX_CACHED_HEADERS:
+            self._resolved_headers[header_segment] = key
+        return key
+
+    def jwks(self) -> dict:
+        """
+            Documento JWKS con las llaves publicas de verificacion.
+
+            Returns:
+                dict: Documento {"keys": [...]} (vacio si se usa HMAC).
+        """
+        if self.algorithm in HMAC_ALGORITHMS:
+            return {"keys": []}
+        return {"keys": [key.to_jwk() for key in self.verification_keys.values()]}
+
+
+def load_jwks(document: dict) -> Dict[Optional[str], VerificationKey]:
+    """
+        Parsea un documento JWKS local.
+
+        Args:
+            document (dict): Documento {"keys": [...]}.
+
+        Returns:
+            dict: Llaves de verificacion indexadas por `kid`.
+    """
+    keys = {}
+    for jwk in document.get("keys", []):
+        key = VerificationKey.from_jwk(jwk)
+        keys[key.kid] = key
+    return keys
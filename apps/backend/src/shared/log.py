@@ -0,0 +1,171 @@
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import orjson
+
+""" Logging estructurado con formateo diferido para los caminos calientes """
+
+# Cada cuantos eventos `info_sampled` se emite uno (1 = todos)
+_sample_every = 100
+
+# Listener activo de `configure_logging` (para poder detenerlo en el shutdown)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+_RESERVED_FIELDS = {"ts", "level", "logger", "event"}
+
+
+class StructuredLogger:
+    """
+        Envoltura de `logging.Logger` que recibe un evento y campos en lugar de un f-string.
+
+        Si el nivel esta deshabilitado no se crea el registro ni se formatea nada:
+        los campos viajan en el `LogRecord` y solo el formatter del listener (en su
+        propio hilo) los serializa.
+
+        Uso:
+            logger = get_logger(__name__)
+            logger.debug("Producto encontrado", product_id=product.id)
+            logger.info_sampled("Buscando producto por ID", product_id=id)
+    """
+
+    __slots__ = ("_logger", "_counters", "_lock")
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._logger.name
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event: str, /, **fields) -> None:
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger._log(logging.DEBUG, event, (), extra={"fields": fields}, stacklevel=2)
+
+    def info(self, event: str, /, **fields) -> None:
+        if self._logger.isEnabledFor(logging.INFO):
+            self._logger._log(logging.INFO, event, (), extra={"fields": fields}, stacklevel=2)
+
+    def info_sampled(self, event: str, /, **fields) -> None:
+        """ Emite uno de cada N eventos iguales (N configurable en `configure_logging`) """
+        if not self._logger.isEnabledFor(logging.INFO):
+            return
+
+        every = _sample_every
+        if every > 1:
+            with self._lock:
+                count = self._counters.get(event, 0) + 1
+                self._counters[event] = count
+            if count % every != 1:
+                return
+            fields["sampled_every"] = every
+
+        self._logger._log(logging.INFO, event, (), extra={"fields": fields}, stacklevel=2)
+
+    def warning(self, event: str, /, **fields) -> None:
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._logger._log(logging.WARNING, event, (), extra={"fields": fields}, stacklevel=2)
+
+    def error(self, event: str, /, exc_info=None, **fields) -> None:
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._logger._log(logging.ERROR, event, (), exc_info=exc_info, extra={"fields": fields}, stacklevel=2)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(logging.getLogger(name))
+
+
+class StructuredFormatter(logging.Formatter):
+    """ Serializa el evento y sus campos como JSON (una linea) o como `clave=valor` """
+
+    def __init__(self, json_output: bool = True):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        # Registros de loggers que no son estructurados (librerias, `logging` directo)
+        event = record.getMessage() if record.args else str(record.msg)
+
+        if self.json_output:
+            document = {
+                "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+                "level": record.levelname,
+                "logger": record.name,
+                "event": event,
+            }
+            for key, value in fields.items():
+                document[f"field_{key}" if key in _RESERVED_FIELDS else key] = value
+            if record.exc_info:
+                document["exc_info"] = self.formatException(record.exc_info)
+            return orjson.dumps(document, default=str).decode("utf-8")
+
+        line = f"{self.formatTime(record)} {record.levelname} {record.name}: {event}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+        `QueueHandler` que no formatea en el hilo que emite.
+
+        El `QueueHandler` estandar llama a `format()` en `prepare()`, es decir, en el
+        event loop. Aqui el registro se encola tal cual y el listener lo formatea.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(level: str = "INFO", json_output: bool = True, sample_every: int = 100, stream=None) -> None:
+    """
+        Configura el logger raiz con un handler de cola no bloqueante.
+
+        El event loop solo encola registros; un hilo del `QueueListener` los formatea
+        y escribe. Llamar de nuevo reemplaza la configuracion anterior.
+
+        Args:
+            level (str): Nivel del logger raiz.
+            json_output (bool): JSON por linea (produccion) o `clave=valor` (desarrollo).
+            sample_every (int): Para `info_sampled`, emitir uno de cada N eventos.
+            stream: Destino de los logs (stderr por defecto).
+    """
+    global _listener, _sample_every
+
+    stop_logging()
+    _sample_every = max(1, sample_every)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(StructuredFormatter(json_output))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """ Vacia la cola y detiene el hilo del listener """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+""" Metricas en proceso por ruta, expuestas en formato de texto de Prometheus """
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PASSWORD_HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.75, 1.0, 2.0)
+
+
+class Histogram:
+    """ Histograma acumulativo con buckets fijos (semantica `le` de Prometheus) """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestStats:
+    """ Estadisticas de una peticion en curso (consultas SQL y su tiempo) """
+
+    __slots__ = ("queries", "db_time", "fingerprints", "scope")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.queries = 0
+        self.db_time = 0.0
+        # Ejecuciones por huella de consulta; lo llena `shared.profiler` solo si esta activo
+        self.fingerprints: Optional[Dict[str, int]] = None
+        self.scope = scope
+
+    @property
+    def route(self) -> Optional[str]:
+        """ Plantilla de la ruta ya resuelta por el router (None antes del enrutamiento) """
+        if self.scope is None:
+            return None
+        route = self.scope.get("route")
+        return getattr(route, "path", None)
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class RouteMetrics:
+    """ Metricas acumuladas de una ruta (metodo + plantilla de ruta) """
+
+    __slots__ = ("latency", "request_size", "response_size", "queries", "db_time", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.statuses: Dict[int, int] = {}
+
+
+class MetricsRegistry:
+    """ Registro de metricas del proceso """
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.loop_lag = 0.0
+        self.loop_lag_max = 0.0
+        # Hash de contraseñas: se registra desde hilos, de ahi el lock
+        self.password_hashing: Dict[str, Histogram] = {}
+        self.password_hash_cost = 0
+        self.password_rehashes = 0
+        self._password_lock = threading.Lock()
+
+    def record_request(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        duration: float,
+        request_size: int,
+        response_size: int,
+        stats: RequestStats
+    ) -> None:
+        key = (method, route)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteMetrics()
+
+        metrics.latency.observe(duration)
+        metrics.request_size.observe(request_size)
+        metrics.response_size.observe(response_size)
+        metrics.queries.observe(stats.queries)
+        metrics.db_time.observe(stats.db_time)
+        metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+
+    def record_password_hash(self, operation: str, duration: float) -> None:
+        """ Registra cuanto tardo un hash (`hash`) o una verificacion (`verify`) de contraseña """
+        with self._password_lock:
+            histogram = self.password_hashing.get(operation)
+            if histogram is None:
+                histogram = self.password_hashing[operation] = Histogram(PASSWORD_HASH_BUCKETS)
+            histogram.observe(duration)
+
+    def reset(self) -> None:
+        self.routes.clear()
+        self.loop_lag = 0.0
+        self.loop_lag_max = 0.0
+        with self._password_lock:
+            self.password_hashing.clear()
+        self.password_rehashes = 0
+
+    def render_prometheus(self) -> str:
+        """
+            Serializa las metricas en formato de texto de Prometheus (version 0.0.4).
+
+            Returns:
+                str: Cuerpo para el endpoint de metricas.
+        """
+        lines = []
+        histograms = (
+            ("http_request_duration_seconds", "Latencia de las peticiones HTTP", "latency"),
+            ("http_request_size_bytes", "Tamano del cuerpo de la peticion", "request_size"),
+            ("http_response_size_bytes", "Tamano del cuerpo de la respuesta", "response_size"),
+            ("http_request_db_queries", "Consultas SQL por peticion", "queries"),
+            ("http_request_db_duration_seconds", "Tiempo total en SQL por peticion", "db_time"),
+        )
+
+        for name, help_text, attribute in histograms:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), metrics in self.routes.items():
+                histogram = getattr(metrics, attribute)
+                labels = f'method="{method}",route="{escape_label(route)}"'
+                for bound, total in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {total}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        lines.append("# HELP http_responses_total Respuestas por codigo de estado")
+        lines.append("# TYPE http_responses_total counter")
+        for (method, route), metrics in self.routes.items():
+            for status_code, count in sorted(metrics.statuses.items()):
+                lines.append(
+                    f'http_responses_total{{method="{method}",route="{escape_label(route)}",status="{status_code}"}} {count}'
+                )
+
+        lines.append("# HELP event_loop_lag_seconds Retraso del event loop en la ultima medicion")
+        lines.append("# TYPE event_loop_lag_seconds gauge")
+        lines.append(f"event_loop_lag_seconds {self.loop_lag}")
+        lines.append("# HELP event_loop_lag_max_seconds Retraso maximo observado del event loop")
+        lines.append("# TYPE event_loop_lag_max_seconds gauge")
+        lines.append(f"event_loop_lag_max_seconds {self.loop_lag_max}")
+
+        lines.append("# HELP password_hash_duration_seconds Tiempo de hash y verificacion de contraseñas")
+        lines.append("# TYPE password_hash_duration_seconds histogram")
+        with self._password_lock:
+            for operation, histogram in sorted(self.password_hashing.items()):
+                labels = f'operation="{operation}"'
+                for bound, total in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f'password_hash_duration_seconds_bucket{{{labels},le="{le}"}} {total}')
+                lines.append(f"password_hash_duration_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"password_hash_duration_seconds_count{{{labels}}} {histogram.count}")
+        lines.append("# HELP password_hash_cost Costo calibrado del hash (rondas de bcrypt o time_cost de argon2)")
+        lines.append("# TYPE password_hash_cost gauge")
+        lines.append(f"password_hash_cost {self.password_hash_cost}")
+        lines.append("# HELP password_rehashes_total Hashes actualizados al costo calibrado tras un login")
+        lines.append("# TYPE password_rehashes_total counter")
+        lines.append(f"password_rehashes_total {self.password_rehashes}")
+
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics_registry = MetricsRegistry()
+
+
+""" Instrumentacion del engine: cuenta consultas y tiempo SQL de la peticion actual """
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - context._metrics_start
+
+
+def instrument_engine(engine) -> None:
+    """ Registra los eventos de SQLAlchemy que alimentan `RequestStats` (idempotente) """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5, registry: MetricsRegistry = metrics_registry) -> None:
+    """
+        Tarea de fondo que mide cuanto tarda el event loop en despertar un `sleep`.
+
+        Un retraso alto indica codigo bloqueante dentro de funciones `async`.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        registry.loop_lag = lag
+        if lag > registry.loop_lag_max:
+            registry.loop_lag_max = lag
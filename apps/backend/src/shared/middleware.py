@@ -0,0 +1,402 @@
+import asyncio
+import gzip
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from shared.metrics import RequestStats, current_request_stats, metrics_registry
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+""" Middlewares ASGI de la aplicacion """
+
+
+class InstrumentationMiddleware:
+    """
+        Middleware ASGI de instrumentacion por peticion.
+
+        Registra por plantilla de ruta (`/users/{user_id}`, no la URL concreta) la
+        latencia, el tamano de peticion y respuesta, y el numero y tiempo de las
+        consultas SQL ejecutadas (via los eventos del engine, ver
+        `shared.metrics.instrument_engine`). Agrega la cabecera `Server-Timing`.
+
+        Es ASGI puro (no `BaseHTTPMiddleware`) para no crear tareas ni copiar el
+        cuerpo de la respuesta.
+    """
+
+    def __init__(self, app, registry=metrics_registry, server_timing: bool = True):
+        self.app = app
+        self.registry = registry
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        sizes = [0, 0]
+        status = [500]
+        server_timing = self.server_timing
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes[0] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                status[0] = message["status"]
+                if server_timing:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    value = (
+                        f'app;dur={elapsed_ms:.2f}, '
+                        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"'
+                    )
+                    message["headers"] = list(message.get("headers", ())) + [
+                        (b"server-timing", value.encode("latin-1"))
+                    ]
+            elif message_type == "http.response.body":
+                sizes[1] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            route = scope.get("route")
+            self.registry.record_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status[0],
+                time.perf_counter() - start,
+                sizes[0],
+                sizes[1],
+                stats
+            )
+
+
+# ==================== COMPRESION ==================== #
+
+class _Encoder:
+    """ Compresor de un `Content-Encoding`: de una vez (`compress`) o por trozos (`stream`) """
+
+    def __init__(self, name: str, compress, stream):
+        self.name = name
+        self.compress = compress
+        self.stream = stream
+
+
+class _ZlibStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encoders(gzip_level: int = 6, brotli_quality: int = 5, zstd_level: int = 3) -> Dict[str, _Encoder]:
+    """
+        Codificaciones disponibles en orden de preferencia (zstd y brotli solo si estan instalados).
+
+        zstd va primero: comprime parecido a brotli con una fraccion de la CPU
+        (ver `benchmarks/bench_compression.py`).
+    """
+    encoders = {}
+    if zstandard is not None:
+        encoders["zstd"] = _Encoder(
+            "zstd",
+            lambda data: zstandard.ZstdCompressor(level=zstd_level).compress(data),
+            lambda: _ZstdStream(zstd_level),
+        )
+    if brotli is not None:
+        encoders["br"] = _Encoder(
+            "br",
+            lambda data: brotli.compress(data, quality=brotli_quality),
+            lambda: brotli.Compressor(quality=brotli_quality),
+        )
+    encoders["gzip"] = _Encoder(
+        "gzip",
+        lambda data: gzip.compress(data, compresslevel=gzip_level, mtime=0),
+        lambda: _ZlibStream(gzip_level),
+    )
+    return encoders
+
+
+def negotiate_encoding(accept_encoding: str, encoders: Dict[str, _Encoder]) -> Optional[str]:
+    """
+        Elige la codificacion segun `Accept-Encoding` (valores q incluidos).
+
+        Entre las aceptadas con el mismo q gana la primera de `encoders`.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for name in encoders:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+class CompressedBodyCache:
+    """
+        Cuerpos ya comprimidos indexados por (ETag, codificacion, tamaño).
+
+        Un ETag fuerte identifica el cuerpo byte a byte, asi que la misma
+        respuesta nunca se comprime dos veces. LRU acotado por bytes.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Tuple, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+compressed_body_cache = CompressedBodyCache()
+
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+class CompressionMiddleware:
+    """
+        Middleware ASGI de compresion de respuestas (brotli, zstd o gzip).
+
+        Solo comprime tipos de contenido de la lista permitida y cuerpos de al
+        menos `minimum_size` bytes. Los cuerpos completos de `offload_size` bytes
+        o mas se comprimen en un hilo para no bloquear el event loop. Si la
+        respuesta trae un ETag fuerte, el resultado se guarda en `cache` y las
+        siguientes respuestas con el mismo ETag no vuelven a comprimirse; el
+        ETag se envia como debil (`W/`), porque el cuerpo codificado no es el
+        mismo byte a byte.
+
+        Las respuestas en streaming se comprimen trozo a trozo. Los 304 llevan
+        el mismo ETag debil y el mismo `Vary` que la respuesta comprimida que validan.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        offload_size: int = 64 * 1024,
+        compressible_types=DEFAULT_COMPRESSIBLE_TYPES,
+        encoders: Optional[Dict[str, _Encoder]] = None,
+        cache: Optional[CompressedBodyCache] = compressed_body_cache
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.compressible_types = tuple(compressible_types)
+        self.encoders = encoders if encoders is not None else available_encoders()
+        self.cache = cache
+
+    @classmethod
+    def from_settings(cls, app) -> "CompressionMiddleware":
+        """ Construye el middleware con `shared.config` (al armar la pila, no al importar) """
+        from shared.config import get_settings
+
+        settings = get_settings()
+        compressed_body_cache.max_bytes = settings.compression_cache_bytes
+        return cls(
+            app,
+            minimum_size=settings.compression_min_size,
+            offload_size=settings.compression_offload_size,
+            encoders=available_encoders(gzip_level=settings.compression_gzip_level),
+        )
+
+    def _compressible(self, headers: Dict[bytes, bytes]) -> bool:
+        if b"content-encoding" in headers:
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip().lower()
+        return content_type.startswith(self.compressible_types)
+
+    def _not_modified_headers(self, headers, if_none_match: bytes) -> list:
+        """
+            Cabeceras de un 304 iguales a las de la respuesta que valida.
+
+            El 304 no trae cuerpo para saber si esa respuesta se comprimio: el
+            ETag se debilita si el cliente lo envio debil en `If-None-Match`,
+            que es como lo recibio de la respuesta comprimida.
+        """
+        rewritten = []
+        for name, value in headers:
+            if name == b"etag" and not value.startswith(b"W/") and b"W/" + value in if_none_match:
+                value = b"W/" + value
+            rewritten.append((name, value))
+        rewritten.append((b"vary", b"Accept-Encoding"))
+        return rewritten
+
+    async def _compress(self, encoder: _Encoder, body: bytes, etag: Optional[bytes]) -> bytes:
+        key = None
+        if self.cache is not None and etag and not etag.startswith(b"W/"):
+            key = (etag, encoder.name, len(body))
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        if len(body) >= self.offload_size:
+            compressed = await asyncio.to_thread(encoder.compress, body)
+        else:
+            compressed = encoder.compress(body)
+
+        if key is not None:
+            self.cache.put(key, compressed)
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        if_none_match = b""
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+            elif name == b"if-none-match":
+                if_none_match = value
+        encoding = negotiate_encoding(accept, self.encoders)
+
+        start_message = None
+        stream = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, stream
+            message_type = message["type"]
+
+            if message_type == "http.response.start":
+                headers = dict(message.get("headers", ()))
+                status = message["status"]
+                if status == 304:
+                    # El 304 valida la respuesta comprimida: mismo ETag debil y mismo Vary
+                    message["headers"] = self._not_modified_headers(message.get("headers", ()), if_none_match)
+                    await send(message)
+                    start_message = False
+                    return
+                if status < 200 or status == 204 or not self._compressible(headers):
+                    await send(message)
+                    start_message = False
+                    return
+                # Se decide con el primer trozo del cuerpo (tamaño y si hay mas)
+                start_message = message
+                return
+
+            if message_type != "http.response.body" or start_message is False:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is not None:
+                chunk = stream.process(body) if body else b""
+                if not more_body:
+                    chunk += stream.finish()
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            headers = list(start_message.get("headers", ()))
+            headers.append((b"vary", b"Accept-Encoding"))
+
+            if encoding is None or (not more_body and len(body) < self.minimum_size):
+                start_message["headers"] = headers
+                await send(start_message)
+                start_message = False
+                await send(message)
+                return
+
+            encoder = self.encoders[encoding]
+            etag = dict(headers).get(b"etag")
+            headers = [(name, value) for name, value in headers if name not in (b"content-length", b"etag")]
+            headers.append((b"content-encoding", encoding.encode()))
+            if etag:
+                headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+
+            if not more_body:
+                compressed = await self._compress(encoder, body, etag)
+                headers.append((b"content-length", str(len(compressed)).encode()))
+                start_message["headers"] = headers
+                await send(start_message)
+                start_message = False
+                await send({"type": "http.response.body", "body": compressed, "more_body": False})
+                return
+
+            stream = encoder.stream()
+            start_message["headers"] = headers
+            await send(start_message)
+            await send({"type": "http.response.body", "body": stream.process(body), "more_body": True})
+
+        await self.app(scope, receive, send_wrapper)
+
@@ -0,0 +1,137 @@
+import logging
+import time
+from typing import Callable
+
+from passlib.context import CryptContext
+
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+logger = logging.getLogger(__name__)
+
+""" Costo del hash de contraseñas calibrado al arrancar segun un presupuesto de latencia """
+
+SAMPLE_PASSWORD = "calibracion-del-hash"
+
+
+def _best_time(hash_once: Callable[[], object], samples: int) -> float:
+    # El minimo de varias muestras descarta interrupciones del planificador
+    best = float("inf")
+    for _ in range(samples):
+        start = time.perf_counter()
+        hash_once()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate_bcrypt_rounds(
+    target_seconds: float,
+    min_rounds: int,
+    max_rounds: int,
+    sample_rounds: int = 8,
+    samples: int = 3
+) -> int:
+    """
+        Rondas de bcrypt mas altas cuyo hash tarda como mucho `target_seconds` en este nodo.
+
+        Cada ronda duplica el costo, asi que basta medir un costo bajo y
+        extrapolar: calibrar tarda unos pocos hashes baratos.
+
+        Args:
+            target_seconds (float): Presupuesto de latencia por hash.
+            min_rounds (int): Piso de seguridad (se usa aunque exceda el presupuesto).
+            max_rounds (int): Techo.
+            sample_rounds (int): Costo medido.
+            samples (int): Mediciones (se toma la mas rapida).
+
+        Returns:
+            int: Rondas entre `min_rounds` y `max_rounds`.
+    """
+    from passlib.hash import bcrypt
+
+    handler = bcrypt.using(rounds=sample_rounds)
+    sample = _best_time(lambda: handler.hash(SAMPLE_PASSWORD), samples)
+    rounds = sample_rounds
+    while rounds < max_rounds and sample * 2 ** (rounds + 1 - sample_rounds) <= target_seconds:
+        rounds += 1
+    return max(min_rounds, min(rounds, max_rounds))
+
+
+def calibrate_argon2_time_cost(
+    target_seconds: float,
+    memory_kib: int,
+    min_time_cost: int,
+    max_time_cost: int,
+    samples: int = 3
+) -> int:
+    """
+        `time_cost` de argon2id (con `memory_kib` fijo) mas alto dentro de `target_seconds`.
+
+        El tiempo crece linealmente con `time_cost`: se mide con 1 y se escala.
+    """
+    from passlib.hash import argon2 as argon2_hash
+
+    handler = argon2_hash.using(time_cost=1, memory_cost=memory_kib, parallelism=1)
+    sample = _best_time(lambda: handler.hash(SAMPLE_PASSWORD), samples)
+    time_cost = int(target_seconds // sample) if sample > 0 else max_time_cost
+    return max(min_time_cost, min(time_cost, max_time_cost))
+
+
+def build_password_context(settings) -> CryptContext:
+    """
+        Contexto de passlib con el costo calibrado para este nodo (o fijo si se configura).
+
+        `PASSWORD_HASH_SCHEME` elige `bcrypt`, `argon2` o `auto` (argon2 si
+        `argon2-cffi` esta instalado). Con argon2, los hashes bcrypt existentes
+        se siguen verificando y quedan marcados para rehash.
+
+        Solo los hashes con menos costo que el calibrado quedan marcados para
+        rehash (`needs_update`). Los de mas costo se conservan: en una flota
+        con nodos de distinta potencia, uno chico no baja los hashes que subio
+        uno grande, y no se reescriben entre si en cada login.
+
+        Raises:
+            ValueError: Si el esquema es desconocido o argon2 no esta disponible.
+    """
+    scheme = settings.password_hash_scheme
+    if scheme == "auto":
+        scheme = "argon2" if argon2 is not None else "bcrypt"
+    target = settings.password_hash_target_ms / 1000
+
+    if scheme == "bcrypt":
+        rounds = settings.password_hash_rounds or calibrate_bcrypt_rounds(
+            target, settings.password_hash_min_rounds, settings.password_hash_max_rounds
+        )
+        logger.info(f"Hash de contraseñas: bcrypt con {rounds} rondas (objetivo {settings.password_hash_target_ms} ms)")
+        return CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+        )
+    if scheme == "argon2":
+        if argon2 is None:
+            raise ValueError("PASSWORD_HASH_SCHEME=argon2 requiere argon2-cffi")
+        time_cost = settings.password_hash_rounds or calibrate_argon2_time_cost(
+            target, settings.password_argon2_memory_kib, 2, settings.password_hash_max_rounds
+        )
+        logger.info(
+            f"Hash de contraseñas: argon2id con time_cost={time_cost} y "
+            f"{settings.password_argon2_memory_kib} KiB (objetivo {settings.password_hash_target_ms} ms)"
+        )
+        return CryptContext(
+            schemes=["argon2", "bcrypt"],
+            deprecated="auto",
+            argon2__time_cost=time_cost,
+            argon2__memory_cost=settings.password_argon2_memory_kib,
+            argon2__parallelism=1,
+            argon2__min_rounds=time_cost,
+        )
+    raise ValueError(f"Esquema de hash de contraseñas desconocido: {scheme}")
+
+
+def hash_cost(context: CryptContext) -> int:
+    """ Rondas (bcrypt) o `time_cost` (argon2) con que `context` hashea """
+    return context.handler().default_rounds
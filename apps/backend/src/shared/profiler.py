@@ -0,0 +1,241 @@
+import heapq
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List
+
+from sqlalchemy import event
+
+from shared.metrics import current_request_stats
+
+logger = logging.getLogger(__name__)
+
+""" Log de consultas lentas y detector de N+1 enganchados a los eventos del engine """
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"%\(\w+\)s|%s|\?|:\w+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Directorio de `src/`: solo los frames de la aplicacion se reportan como origen
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_MAX_CALL_SITE_FRAMES = 5
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+        Normaliza una sentencia SQL para agrupar las que solo difieren en valores.
+
+        Reemplaza literales y parametros por `?`, colapsa listas `IN (?, ?, ...)`
+        y espacios. El resultado se cachea: el engine repite las mismas sentencias.
+
+        Args:
+            statement (str): SQL tal como lo envia SQLAlchemy.
+
+        Returns:
+            str: Huella normalizada.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _BIND_PARAM.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """ Describe los parametros por tipo, sin valores (no se filtran datos a los logs) """
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameter_shape(parameters[0]) if parameters else None
+        return {"rows": len(parameters), "row": first}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def call_site(limit: int = _MAX_CALL_SITE_FRAMES) -> List[str]:
+    """ Frames de la aplicacion (no de SQLAlchemy ni librerias) que originaron la consulta """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < limit:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_ROOT) and not filename.endswith("profiler.py"):
+            relative = os.path.relpath(filename, _APP_ROOT)
+            frames.append(f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return frames
+
+
+class QueryStats:
+    """ Estadisticas acumuladas de una huella de consulta lenta """
+
+    __slots__ = ("fingerprint", "count", "total_time", "max_time", "parameters", "call_site")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.parameters = None
+        self.call_site: List[str] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total_time * 1000, 3),
+            "max_ms": round(self.max_time * 1000, 3),
+            "avg_ms": round(self.total_time / self.count * 1000, 3) if self.count else 0.0,
+            "parameters": self.parameters,
+            "call_site": self.call_site,
+        }
+
+
+class NPlusOneStats:
+    """ Peticiones donde una misma huella se ejecuto mas de N veces """
+
+    __slots__ = ("fingerprint", "route", "occurrences", "max_executions", "call_site")
+
+    def __init__(self, fingerprint: str, route: str):
+        self.fingerprint = fingerprint
+        self.route = route
+        self.occurrences = 0
+        self.max_executions = 0
+        self.call_site: List[str] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "route": self.route,
+            "occurrences": self.occurrences,
+            "max_executions": self.max_executions,
+            "call_site": self.call_site,
+        }
+
+
+class QueryProfiler:
+    """
+        Perfilador de consultas basado en eventos del engine.
+
+        - Consultas que superan `slow_threshold_ms`: se registran en el log con su
+          huella, la forma de sus parametros y el lugar de la aplicacion que las llamo.
+        - N+1: si en una misma peticion una huella se ejecuta mas de `n_plus_one_threshold`
+          veces, se marca la peticion (una vez por huella y peticion).
+
+        El costo para consultas normales es medir el tiempo y, dentro de una peticion,
+        contar la huella (cacheada por sentencia).
+    """
+
+    def __init__(self, slow_threshold_ms: float = 200, n_plus_one_threshold: int = 10, max_entries: int = 500):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_entries = max_entries
+        self.slow_queries: Dict[str, QueryStats] = {}
+        self.n_plus_one: Dict[tuple, NPlusOneStats] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, slow_threshold_ms: float, n_plus_one_threshold: int) -> None:
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    def record(self, statement: str, parameters, executemany: bool, elapsed: float) -> None:
+        stats = current_request_stats.get()
+
+        if elapsed >= self.slow_threshold:
+            self._record_slow(statement, parameters, executemany, elapsed)
+
+        if stats is not None:
+            key = fingerprint(statement)
+            counts = stats.fingerprints
+            if counts is None:
+                counts = stats.fingerprints = {}
+            executions = counts.get(key, 0) + 1
+            counts[key] = executions
+            if executions > self.n_plus_one_threshold:
+                self._record_n_plus_one(key, stats, executions)
+
+    def _record_slow(self, statement: str, parameters, executemany: bool, elapsed: float) -> None:
+        key = fingerprint(statement)
+        site = call_site()
+        with self._lock:
+            entry = self.slow_queries.get(key)
+            if entry is None:
+                if len(self.slow_queries) >= self.max_entries:
+                    return
+                entry = self.slow_queries[key] = QueryStats(key)
+            entry.count += 1
+            entry.total_time += elapsed
+            if elapsed >= entry.max_time:
+                entry.max_time = elapsed
+                entry.parameters = parameter_shape(parameters, executemany)
+                entry.call_site = site
+
+        logger.warning(
+            "Consulta lenta (%.1f ms): %s | origen: %s",
+            elapsed * 1000, key, " <- ".join(site) or "desconocido"
+        )
+
+    def _record_n_plus_one(self, key: str, stats, executions: int) -> None:
+        route = stats.route or "desconocida"
+        first_time = executions == self.n_plus_one_threshold + 1
+        with self._lock:
+            entry = self.n_plus_one.get((route, key))
+            if entry is None:
+                if len(self.n_plus_one) >= self.max_entries:
+                    return
+                entry = self.n_plus_one[(route, key)] = NPlusOneStats(key, route)
+            if first_time:
+                entry.occurrences += 1
+                entry.call_site = call_site()
+            if executions > entry.max_executions:
+                entry.max_executions = executions
+
+        if first_time:
+            logger.warning(
+                "Posible N+1 en %s: la consulta se ejecuto mas de %d veces: %s",
+                route, self.n_plus_one_threshold, key
+            )
+
+    def top_slow(self, limit: int = 10) -> List[dict]:
+        with self._lock:
+            entries = heapq.nlargest(limit, self.slow_queries.values(), key=lambda entry: entry.total_time)
+            return [entry.to_dict() for entry in entries]
+
+    def top_n_plus_one(self, limit: int = 10) -> List[dict]:
+        with self._lock:
+            entries = heapq.nlargest(
+                limit,
+                self.n_plus_one.values(),
+                key=lambda entry: (entry.occurrences, entry.max_executions)
+            )
+            return [entry.to_dict() for entry in entries]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.slow_queries.clear()
+            self.n_plus_one.clear()
+
+
+query_profiler = QueryProfiler()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._profiler_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    query_profiler.record(statement, parameters, executemany, time.perf_counter() - context._profiler_start)
+
+
+def install_query_profiler(engine) -> None:
+    """ Engancha `query_profiler` a los eventos del engine (idempotente) """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,211 @@
+import asyncio
+import functools
+import inspect
+import itertools
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+""" Enrutamiento de lecturas a replicas de la base de datos """
+
+# Claves de `Session.info` usadas por el enrutamiento
+READ_ONLY_KEY = "read_only"
+STICKY_KEY = "sticky_key"
+WROTE_KEY = "wrote"
+
+
+class ReplicaSet:
+    """
+        Replicas de lectura con seleccion por menor carga y chequeo de salud.
+
+        La carga de cada replica es el numero de conexiones prestadas por su pool
+        (eventos `checkout`/`checkin`). Una replica que falla el chequeo de salud
+        deja de recibir lecturas hasta que vuelve a responder.
+
+        Tambien recuerda quien escribio recientemente: durante `sticky_seconds`
+        despues de una escritura, las lecturas de esa misma clave (el usuario)
+        van al primario para que vea sus propios cambios aunque la replica
+        tenga retraso.
+    """
+
+    def __init__(self, engines: List, sticky_seconds: float = 5.0, clock=time.monotonic):
+        self.engines = list(engines)
+        self.sticky_seconds = sticky_seconds
+        self._clock = clock
+        self._in_use: Dict[int, int] = {id(engine): 0 for engine in self.engines}
+        self._healthy: Dict[int, bool] = {id(engine): True for engine in self.engines}
+        self._sticky: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+
+        for engine in self.engines:
+            event.listen(engine, "checkout", functools.partial(self._on_checkout, id(engine)))
+            event.listen(engine, "checkin", functools.partial(self._on_checkin, id(engine)))
+
+    def _on_checkout(self, key, *args) -> None:
+        with self._lock:
+            self._in_use[key] += 1
+
+    def _on_checkin(self, key, *args) -> None:
+        with self._lock:
+            self._in_use[key] = max(0, self._in_use[key] - 1)
+
+    def choose(self):
+        """
+            Elige la replica sana con menos conexiones en uso.
+
+            Returns:
+                Engine: Replica elegida, o None si no hay ninguna sana.
+        """
+        healthy = [engine for engine in self.engines if self._healthy[id(engine)]]
+        if not healthy:
+            return None
+
+        least = min(self._in_use[id(engine)] for engine in healthy)
+        candidates = [engine for engine in healthy if self._in_use[id(engine)] == least]
+        # Reparte los empates para no cargar siempre la primera
+        return candidates[next(self._round_robin) % len(candidates)]
+
+    def mark_write(self, key: Optional[str]) -> None:
+        """ Fija las lecturas de `key` al primario durante la ventana de lectura-de-escrituras """
+        if not key or self.sticky_seconds <= 0:
+            return
+
+        now = self._clock()
+        with self._lock:
+            self._sticky[key] = now + self.sticky_seconds
+            if len(self._sticky) > 10_000:
+                self._sticky = {k: until for k, until in self._sticky.items() if until > now}
+
+    def is_sticky(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        until = self._sticky.get(key)
+        return until is not None and until > self._clock()
+
+    def set_healthy(self, engine, healthy: bool) -> None:
+        if self._healthy[id(engine)] != healthy:
+            logger.warning(f"Replica {engine.url.render_as_string(hide_password=True)} {'recuperada' if healthy else 'fuera de servicio'}")
+        self._healthy[id(engine)] = healthy
+
+    def check_health(self) -> None:
+        """ Ejecuta `SELECT 1` en cada replica y actualiza su estado """
+        for engine in self.engines:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                self.set_healthy(engine, True)
+            except Exception:
+                self.set_healthy(engine, False)
+
+    def dispose(self) -> None:
+        for engine in self.engines:
+            engine.dispose()
+
+
+class RoutingSession(Session):
+    """
+        Sesion que envia a una replica las lecturas marcadas con `read_only`.
+
+        Todo lo demas (escrituras, flush, lecturas no marcadas) usa el engine
+        primario enlazado a la sesion. Despues de un flush o de un INSERT/UPDATE/
+        DELETE ejecutado directamente la sesion no vuelve a leer de replicas, y
+        al confirmar marca su `sticky_key` en el `ReplicaSet`.
+    """
+
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replicas = self.replicas
+        if (
+            replicas is not None
+            and self.info.get(READ_ONLY_KEY)
+            and not self._flushing
+            and not self.info.get(WROTE_KEY)
+            and not replicas.is_sticky(self.info.get(STICKY_KEY))
+        ):
+            replica = replicas.choose()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context) -> None:
+    session.info[WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _after_dml(orm_execute_state) -> None:
+    # Un `UPDATE ... RETURNING` ejecutado con `session.execute` no pasa por el flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session) -> None:
+    if session.info.get(WROTE_KEY) and session.replicas is not None:
+        session.replicas.mark_write(session.info.get(STICKY_KEY))
+
+
+def read_only(method):
+    """
+        Marca un metodo de repositorio como solo lectura: sus consultas pueden ir a una replica.
+
+        El repositorio debe tener la sesion en `self.db`.
+    """
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            previous = self.db.info.get(READ_ONLY_KEY)
+            self.db.info[READ_ONLY_KEY] = True
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                self.db.info[READ_ONLY_KEY] = previous
+        return wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        previous = self.db.info.get(READ_ONLY_KEY)
+        self.db.info[READ_ONLY_KEY] = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.db.info[READ_ONLY_KEY] = previous
+    return wrapper
+
+
+@lru_cache(maxsize=None)
+def get_replica_set() -> Optional[ReplicaSet]:
+    """ Construye las replicas de `DATABASE_REPLICA_URLS` (None si no hay ninguna) """
+    from sqlalchemy import create_engine
+    from shared.config import get_settings
+    from shared.database import connect_args
+
+    settings = get_settings()
+    urls = [url.strip() for url in (settings.database_replica_urls or "").split(",") if url.strip()]
+    if not urls:
+        return None
+
+    engines = [
+        create_engine(url, echo=settings.debug, pool_pre_ping=True, connect_args=connect_args(url))
+        for url in urls
+    ]
+    return ReplicaSet(engines, sticky_seconds=settings.read_your_writes_seconds)
+
+
+async def run_replica_health_checks(replicas: ReplicaSet, interval: float) -> None:
+    """ Tarea de fondo que revisa la salud de las replicas cada `interval` segundos """
+    while True:
+        await asyncio.to_thread(replicas.check_health)
+        await asyncio.sleep(interval)
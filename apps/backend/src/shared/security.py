@@ -1,47 +1,94 @@
-from passlib.context import CryptContext
-from jose import jwt , JWTError
-from datetime import datetime , timedelta
-from shared.config import settings
+from jose import JWTError
+from datetime import timedelta
+from functools import lru_cache
+import hashlib
+import secrets
+from typing import Tuple
+import time
+from shared.config import get_settings
+from shared.keys import KeyRing
+from shared.metrics import metrics_registry
 from fastapi import HTTPException,status
 from auth.schemas import TokenPayload
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """ Construye el contexto de passlib la primera vez que se necesita, calibrando el costo del hash """
+    from shared.passwords import build_password_context, hash_cost
+    
+    context = build_password_context(get_settings())
+    metrics_registry.password_hash_cost = hash_cost(context)
+    return context
 
 """ Esta es una funcion para hashear las contraseñas """
 
 def hash_password(password: str) -> str:
-    """ Devuelve la contraseña hasheada """
-    return pwd_context.hash(password)
+    """ Devuelve la contraseña hasheada (lento a proposito: llamarla fuera del event loop) """
+    context = get_pwd_context()
+    start = time.perf_counter()
+    hashed = context.hash(password)
+    metrics_registry.record_password_hash("hash", time.perf_counter() - start)
+    return hashed
 
 """ Esta funcion nos ayuda a verificar la contraseña """
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """ Verifica si la contraseña es correcta comparandola con la contraseña hasheada """
-    return pwd_context.verify(plain_password,hashed_password)
+    context = get_pwd_context()
+    start = time.perf_counter()
+    valid = context.verify(plain_password, hashed_password)
+    metrics_registry.record_password_hash("verify", time.perf_counter() - start)
+    return valid
+
+def verify_password_status(plain_password: str, hashed_password: str) -> Tuple[bool, bool]:
+    """
+        Verifica la contraseña e informa si su hash quedo por debajo del costo calibrado.
+
+        `needs_update` solo lee el encabezado del hash (esquema y rondas), asi que
+        no agrega otro hash al login; el rehash lo hace quien llama, en segundo plano.
+
+        Returns:
+            Tuple[bool, bool]: (contraseña valida, hash para actualizar).
+    """
+    valid = verify_password(plain_password, hashed_password)
+    return valid, valid and get_pwd_context().needs_update(hashed_password)
+
+""" Llavero JWT: se construye una sola vez y se reutiliza en cada firma/verificacion """
+
+@lru_cache(maxsize=None)
+def get_key_ring() -> KeyRing:
+    """ Devuelve el llavero construido desde la configuracion (parseado una sola vez) """
+    return KeyRing.from_settings(get_settings())
 
 """ Esta funcion es para crear un token """
 
 def create_access_token(payload: TokenPayload, expires_delta: timedelta = None):
-    to_encode = payload.dict(exclude_unset=True)
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
-    to_encode.update({"exp":expire})
-    encoded_jwt = jwt.encode(to_encode , settings.secret_key, algorithm= settings.algorithm)
-    return encoded_jwt
+    to_encode = payload.model_dump(exclude_unset=True)
+    expire = expires_delta or timedelta(minutes=get_settings().access_token_expire_minutes)
+    to_encode["exp"] = int(time.time() + expire.total_seconds())
+    return get_key_ring().sign(to_encode)
+
+""" Refresh tokens: valores opacos; en la base de datos solo se guarda su hash """
+
+def generate_refresh_token() -> str:
+    """ Genera un refresh token aleatorio """
+    return secrets.token_urlsafe(48)
+
+def hash_refresh_token(token: str) -> str:
+    """ Devuelve el hash SHA-256 (hex) del refresh token """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 """ Esta funcion es para verificar que el token coincida con la del usuario """
 
 def verify_token(token: str) -> TokenPayload:
     try:
-        payload = jwt.decode(
-            token,
-            settings.secret_key,
-            algorithms=[settings.algorithm]
-        )
+        payload = get_key_ring().verify(token)
         
         if "sub" not in payload:
             raise JWTError("Campo 'sub' faltando en el token")
         
-        token_data = TokenPayload(**payload)
+        # La firma ya garantiza que los claims los emitimos nosotros: no se re-validan
+        token_data = TokenPayload.model_construct(**payload)
         
         return token_data
         
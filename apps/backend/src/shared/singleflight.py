@@ -0,0 +1,143 @@
+import asyncio
+import contextvars
+import math
+import random
+import time
+from collections import OrderedDict, namedtuple
+from typing import Awaitable, Callable, Dict, Hashable
+
+""" Coalescencia de consultas identicas (single-flight) con cache corta y refresco anticipado """
+
+_Entry = namedtuple("_Entry", "value delta expires_at")
+
+
+class SingleFlight:
+    """
+        Comparte una sola ejecucion entre llamadas concurrentes con la misma clave.
+
+        Mientras una carga esta en curso, las demas llamadas con la misma clave
+        esperan su resultado en lugar de repetir la consulta. El resultado se
+        guarda `ttl` segundos (LRU acotado por cantidad de entradas):
+
+        - Refresco anticipado probabilistico (XFetch): antes de vencer, cada
+          acierto puede decidir refrescar con una probabilidad que crece al
+          acercarse el vencimiento y con lo que tardo la ultima carga (`delta`),
+          asi las entradas populares se renuevan antes de vencer y no todas a
+          la vez.
+        - Servir vencido mientras se revalida: durante `stale` segundos tras el
+          vencimiento, la llamada que refresca espera la consulta y las demas
+          reciben el valor anterior sin esperar.
+
+        Con `ttl=0` solo se coalescen las cargas en curso. `invalidate` descarta
+        la cache y evita que las cargas ya iniciadas guarden su resultado.
+        Se usa desde el event loop; no es seguro entre hilos.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 2.0,
+        stale: float = 10.0,
+        beta: float = 1.0,
+        max_entries: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+        rand: Callable[[], float] = random.random
+    ):
+        self.ttl = ttl
+        self.stale = stale
+        self.beta = beta
+        self.max_entries = max_entries
+        self._clock = clock
+        self._rand = rand
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.loads = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "SingleFlight":
+        return cls(
+            ttl=settings.query_cache_ttl_seconds,
+            stale=settings.query_cache_stale_seconds,
+            beta=settings.query_cache_beta,
+            max_entries=settings.query_cache_max_entries,
+        )
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable]):
+        """
+            Devuelve el valor de `key`, cargandolo con `load` a lo sumo una vez a la vez.
+
+            Args:
+                key (Hashable): Consulta normalizada (nombre y argumentos).
+                load (Callable): Corrutina sin argumentos que consulta la base de datos.
+
+            Returns:
+                El valor en cache, el de la carga en curso o el de una carga nueva.
+
+            Raises:
+                Exception: La excepcion de `load`, para todas las llamadas que la esperaban.
+        """
+        now = self._clock()
+        entry = self._entries.get(key)
+        flight = self._flights.get(key)
+
+        if entry is not None:
+            if flight is not None and now < entry.expires_at + self.stale:
+                # Otra llamada ya esta refrescando
+                if now < entry.expires_at:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                return entry.value
+            if now < entry.expires_at and not self._refresh_early(entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+
+        if flight is None:
+            flight = self._start(key, load)
+        else:
+            self.coalesced += 1
+        # Si esta llamada se cancela, la carga sigue para las demas
+        return await asyncio.shield(flight)
+
+    def invalidate(self) -> None:
+        """ Descarta los valores guardados (despues de una escritura) """
+        self._generation += 1
+        self._entries.clear()
+
+    def _refresh_early(self, entry: _Entry, now: float) -> bool:
+        if self.beta <= 0:
+            return False
+        return now - entry.delta * self.beta * math.log(1.0 - self._rand()) >= entry.expires_at
+
+    def _start(self, key: Hashable, load: Callable[[], Awaitable]) -> asyncio.Future:
+        generation = self._generation
+        self.loads += 1
+
+        async def run():
+            start = self._clock()
+            try:
+                value = await load()
+                if generation == self._generation and self.ttl + self.stale > 0:
+                    self._store(key, value, self._clock() - start)
+                return value
+            finally:
+                self._flights.pop(key, None)
+
+        # Contexto vacio: la carga es de todas las llamadas, no de la primera. Con
+        # una copia del suyo heredaria su tiempo limite (`shared.deadline`) y su
+        # desconexion cancelaria la consulta de todas
+        flight = contextvars.Context().run(asyncio.ensure_future, run())
+        # Evita el aviso de excepcion no recuperada si todas las llamadas se cancelaron
+        flight.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._flights[key] = flight
+        return flight
+
+    def _store(self, key: Hashable, value, delta: float) -> None:
+        self._entries[key] = _Entry(value, delta, self._clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
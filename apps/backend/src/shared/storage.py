@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Tuple
+
+from shared.config import get_settings
+
+""" Almacenamiento de objetos (imagenes de productos) """
+
+# S3 y compatibles exigen partes de al menos 5 MiB (salvo la ultima)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class ObjectStore(ABC):
+    """
+        Interfaz minima de un almacenamiento de objetos estilo S3.
+
+        Los archivos grandes se suben por partes (`create_multipart_upload`,
+        `upload_part`, `complete_multipart_upload`) para poder enviar varias
+        partes en paralelo sin tener el archivo completo en memoria.
+    """
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def put_file(self, key: str, path: str, content_type: str) -> None:
+        pass
+
+    @abstractmethod
+    async def create_multipart_upload(self, key: str, content_type: str) -> str:
+        pass
+
+    @abstractmethod
+    async def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        pass
+
+    @abstractmethod
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        pass
+
+    @abstractmethod
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def public_url(self, key: str) -> str:
+        pass
+
+
+class LocalObjectStore(ObjectStore):
+    """
+        Almacenamiento en el sistema de archivos local, para desarrollo, pruebas y benchmarks.
+
+        Las partes de una subida viven en `<root>/.uploads/<upload_id>/` hasta
+        que se completa; el objeto final se publica con `os.replace`, de modo que
+        un lector nunca ve un objeto a medio escribir.
+    """
+
+    def __init__(self, root: str, base_url: str = "/media"):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(os.path.join(self.root, ".uploads"), exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Clave de objeto invalida: {key}")
+        return path
+
+    def _upload_dir(self, upload_id: str) -> str:
+        return os.path.join(self.root, ".uploads", upload_id)
+
+    def _publish(self, key: str, write) -> None:
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temporary = f"{target}.{uuid.uuid4().hex}.tmp"
+        try:
+            write(temporary)
+            os.replace(temporary, target)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self._path(key))
+
+    async def put_file(self, key: str, path: str, content_type: str) -> None:
+        await asyncio.to_thread(self._publish, key, lambda temporary: shutil.copyfile(path, temporary))
+
+    async def create_multipart_upload(self, key: str, content_type: str) -> str:
+        upload_id = uuid.uuid4().hex
+        await asyncio.to_thread(os.makedirs, self._upload_dir(upload_id))
+        return upload_id
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        def write() -> str:
+            with open(os.path.join(self._upload_dir(upload_id), str(part_number)), "wb") as handle:
+                handle.write(data)
+            return hashlib.md5(data).hexdigest()
+
+        return await asyncio.to_thread(write)
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        def concatenate(temporary: str) -> None:
+            with open(temporary, "wb") as output:
+                for part_number, _ in sorted(parts):
+                    with open(os.path.join(self._upload_dir(upload_id), str(part_number)), "rb") as part:
+                        shutil.copyfileobj(part, output)
+
+        def complete() -> None:
+            self._publish(key, concatenate)
+            shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+        await asyncio.to_thread(complete)
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        await asyncio.to_thread(shutil.rmtree, self._upload_dir(upload_id), True)
+
+    def public_url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+async def upload_file(
+    store: ObjectStore,
+    key: str,
+    path: str,
+    content_type: str,
+    part_size: int = MIN_PART_SIZE,
+    concurrency: int = 4,
+    inflight: asyncio.Semaphore = None
+) -> None:
+    """
+        Sube un archivo local, por partes concurrentes si supera `part_size`.
+
+        Cada parte se lee del disco justo antes de enviarse, asi que la memoria
+        usada es a lo sumo `concurrency * part_size` por archivo; `inflight`
+        permite acotar ademas el total de partes en vuelo entre subidas.
+
+        Args:
+            store (ObjectStore): Destino.
+            key (str): Clave del objeto.
+            path (str): Archivo local.
+            content_type (str): Tipo MIME del objeto.
+            part_size (int): Tamaño de cada parte.
+            concurrency (int): Partes en paralelo para este archivo.
+            inflight (asyncio.Semaphore, optional): Limite global de partes en vuelo.
+    """
+    size = os.path.getsize(path)
+    if size <= part_size:
+        await store.put_file(key, path, content_type)
+        return
+
+    upload_id = await store.create_multipart_upload(key, content_type)
+    local_limit = asyncio.Semaphore(concurrency)
+
+    def read_part(offset: int) -> bytes:
+        with open(path, "rb") as handle:
+            return os.pread(handle.fileno(), part_size, offset)
+
+    async def send(part_number: int, offset: int) -> Tuple[int, str]:
+        async with local_limit:
+            if inflight is not None:
+                async with inflight:
+                    data = await asyncio.to_thread(read_part, offset)
+                    return part_number, await store.upload_part(key, upload_id, part_number, data)
+            data = await asyncio.to_thread(read_part, offset)
+            return part_number, await store.upload_part(key, upload_id, part_number, data)
+
+    try:
+        parts = await asyncio.gather(*(
+            send(part_number, offset)
+            for part_number, offset in enumerate(range(0, size, part_size), start=1)
+        ))
+        await store.complete_multipart_upload(key, upload_id, list(parts))
+    except BaseException:
+        await store.abort_multipart_upload(key, upload_id)
+        raise
+
+
+@lru_cache(maxsize=None)
+def get_object_store() -> ObjectStore:
+    """ Almacenamiento configurado; se construye la primera vez que se pide """
+    settings = get_settings()
+    if settings.object_store_backend == "local":
+        return LocalObjectStore(settings.object_store_path, settings.object_store_public_url)
+    raise ValueError(f"Backend de almacenamiento desconocido: {settings.object_store_backend}")
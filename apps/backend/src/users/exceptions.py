@@ -60,3 +60,10 @@ class UserDeletionNotAllowedException(AppBaseException):
         else:
             self.message = f"No se puede eliminar el usuario {user_id}"
         super().__init__(self.message)
+
+class UserVersionConflictException(AppBaseException):
+    """Se lanza cuando el usuario cambió desde la versión que se leyó."""
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.message = f"El usuario con ID {user_id} fue modificado por otra petición"
+        super().__init__(self.message)
@@ -12,5 +12,5 @@ class UserInterface(ABC):
     async def get_by_id(self, id:int) -> Optional[User]:
         pass
     @abstractmethod
-    async def update_user(self,user_data:User,update_data:dict) -> User:
+    async def update_user(self,user_data:User,update_data:dict,expected_version:Optional[int] = None) -> User:
         pass
\ No newline at end of file
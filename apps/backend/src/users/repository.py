@@ -1,13 +1,21 @@
 from fastapi import HTTPException, status
 from users.interface import UserInterface
 from sqlalchemy.orm import Session
+from sqlalchemy import update
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from auth.models import User
 from shared.exceptions import DatabaseException
+from shared.database import apply_returned_row
+from shared.invalidation import invalidation_bus
+from users.exceptions import UserVersionConflictException
 from typing import Optional, List
-import logging
+from shared.log import get_logger
+from shared.replicas import read_only
 
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
+
+# Campos que un usuario puede cambiar de su propio perfil
+PROFILE_FIELDS = frozenset({"email", "name", "direction", "phone"})
 
 class UserRepository(UserInterface):
     def __init__(self,db:Session):
@@ -28,16 +36,17 @@ class UserRepository(UserInterface):
                 DatabaseException: Si ocurre un error al buscar el usuario.
         """
         try:
-            user = self.db.query(User).filter(User.id == id).first()
+            # Busca primero en el mapa de identidad: el servicio relee por id antes de escribir
+            user = self.db.get(User, id)
             
             if user:
-                logger.debug(f"Usuario encontrado exitosamente: {user.id}")
+                logger.debug("Usuario encontrado", user_id=user.id)
             else:
-                logger.debug(f"Usuario con ID {id} no encontrado")          
+                logger.debug("Usuario no encontrado", user_id=id)          
             return user
             
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD buscando usuario por ID {id}: {str(e)}")
+            logger.error("Error de BD buscando usuario por ID", user_id=id, error=str(e))
             raise DatabaseException(f"Error al buscar usuario con ID {id}")
             
         
@@ -46,6 +55,10 @@ class UserRepository(UserInterface):
         """
             Obtiene un usuario por su correo electrónico.
 
+            Lee de la primaria (no usa `read_only`): el login la usa justo
+            despues de registrarse o de cambiar la contraseña, y una replica
+            atrasada devolveria el usuario sin esos cambios.
+
             Args:
                 email (str): Correo electrónico del usuario.
 
@@ -59,47 +72,73 @@ class UserRepository(UserInterface):
             user = self.db.query(User).filter(User.email == email).first()
             
             if user:
-                logger.debug(f"Usuario encontrado por email: {user.email}")
+                logger.debug("Usuario encontrado por email", user_id=user.id)
             else:
-                logger.debug(f"Usuario con email {email} no encontrado")
+                logger.debug("Usuario con email no encontrado")
                 
             return user
             
         except SQLAlchemyError as e:
-            logger.error(f"Error de BD buscando usuario por email {email}: {str(e)}")
+            logger.error("Error de BD buscando usuario por email", error=str(e))
             raise DatabaseException(f"Error al buscar usuario con email {email}")
             
-    async def update_user(self, user: User,  update_data:dict) -> User:
+    async def update_user(
+        self,
+        user: User,
+        update_data: dict,
+        expected_version: Optional[int] = None,
+        allowed_fields: frozenset = PROFILE_FIELDS
+    ) -> User:
         """
-        Actualiza la información del usuario.
+        Actualiza la información del usuario con un único `UPDATE ... RETURNING`.
+        
+            La versión se incrementa en la misma sentencia; con `expected_version`
+            la fila solo se modifica si sigue en esa versión (bloqueo optimista).
         
             Args:
                 user_data (User): Objeto usuario actual.
                 update_data (Dict): Un diccionario con informacion que se actualizo
+                expected_version (int, optional): Versión que el cliente leyó.
+                allowed_fields (frozenset): Campos que se pueden modificar.
             
             Returns:
                 User: Usuario actualizado.
 
             Raises:
+                UserVersionConflictException: Si el usuario ya no está en `expected_version`.
                 DatabaseException: Si ocurre un error al actualizar el usuario.
         """
+        values = {
+            field: value for field, value in update_data.items()
+            if field in allowed_fields and field in User.__table__.c and value is not None
+        }
+        statement = (
+            update(User)
+            .where(User.id == user.id)
+            .values(**values, version=User.version + 1)
+            .returning(*User.__table__.c)
+            .execution_options(synchronize_session=False)
+        )
+        if expected_version is not None:
+            statement = statement.where(User.version == expected_version)
 
         try:
-            allowed_fields = {"email", "name", "direction", "phone"}
-            
-            for field, value in update_data.items():
-                if field in allowed_fields and hasattr(user, field) and value is not None:
-                    setattr(user, field, value)
-            
+            row = self.db.execute(statement).first()
+            if row is None:
+                self.db.rollback()
+                logger.info("Conflicto de versión actualizando usuario", user_id=user.id,
+                            expected_version=expected_version)
+                raise UserVersionConflictException(user.id)
+            invalidation_bus.publish(self.db, "user", [user.id])
             self.db.commit()
-            self.db.refresh(user)
+            apply_returned_row(user, row)
             
-            logger.info(f"Usuario actualizado exitosamente: {user.id}")
+            logger.info("Usuario actualizado exitosamente", user_id=user.id, version=user.version)
             return user
             
         except IntegrityError as e:
             self.db.rollback()
-            logger.error(f"Error de integridad actualizando usuario {user.id}: {str(e)}")
+            logger.error("Error de integridad actualizando usuario", user_id=user.id, error=str(e))
             
             error_msg = str(e).lower()
             if "email" in error_msg:
@@ -111,7 +150,7 @@ class UserRepository(UserInterface):
                 
         except SQLAlchemyError as e:
             self.db.rollback()
-            logger.error(f"Error de BD actualizando usuario {user.id}: {str(e)}")
+            logger.error("Error de BD actualizando usuario", user_id=user.id, error=str(e))
             raise DatabaseException(f"Error al actualizar usuario {user.id}")
             
     async def delete_user(self,user:User)-> bool:
@@ -129,15 +168,17 @@ class UserRepository(UserInterface):
         """
         try:
             self.db.delete(user)
+            invalidation_bus.publish(self.db, "user", [user.id])
             self.db.commit()
-            logger.info(f"Usuario eliminado exitosamente: {user.id}")
+            logger.info("Usuario eliminado exitosamente", user_id=user.id)
             return True
             
         except SQLAlchemyError as e:
             self.db.rollback()
-            logger.error(f"Error eliminando usuario {user.id}: {str(e)}")
+            logger.error("Error eliminando usuario", user_id=user.id, error=str(e))
             raise DatabaseException(f"Error al eliminar usuario {user.id}")
         
+    @read_only
     def list_users(self, skip: int = 0, limit: int = 10, search: Optional[str] = None) -> List[User]:
         """
             Lista usuarios con paginación y búsqueda opcional.
@@ -168,9 +209,9 @@ class UserRepository(UserInterface):
             # Aplicar paginación
             users = query.offset(skip).limit(limit).all()
             
-            logger.debug(f"Listando usuarios: skip={skip}, limit={limit}, found={len(users)}")
+            logger.debug("Listando usuarios", skip=skip, limit=limit, found=len(users))
             return users
             
         except SQLAlchemyError as e:
-            logger.error(f"Error listando usuarios: {str(e)}")
+            logger.error("Error listando usuarios", error=str(e))
             raise DatabaseException("Error al obtener la lista de usuarios")
\ No newline at end of file
@@ -8,21 +8,34 @@ incluyendo gestión de perfiles, operaciones administrativas y autenticación.
 # Importaciones de esquemas y tipos de usuarios
 from users.schemas import UserResponse, UserUpdate, UserListResponse
 from typing import Optional
+from uuid import UUID
 
 # Importaciones de excepciones personalizadas
 from users.exceptions import *
 from shared.exceptions import UserNotFoundException
 
 # Importaciones de FastAPI y dependencias
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, Request, Response, status, Depends, Query
 
 # Importaciones de autenticación y modelos
 from auth.models import User
-from auth.dependencies import get_current_user
+from auth.dependencies import get_current_user, require_permissions
+from auth.permissions import Permission
+from auth.schemas import TokenPayload
 
 # Importaciones de servicios de usuarios
 from users.service import UserService, get_user_service
 
+# Validadores HTTP (ETag / If-Match)
+from shared.http_cache import (
+    cached_body,
+    check_if_match,
+    json_response,
+    precondition_failed,
+    store_body,
+    strong_etag,
+)
+
 import logging 
 
 # Configuración del logger para este módulo
@@ -31,6 +44,70 @@ logger = logging.getLogger(__name__)
 # Configuración del router con etiquetas para documentación automática
 router = APIRouter(tags=["User"])
 
+def _user_etag(user: User) -> str:
+    """ ETag del perfil: cambia con cada escritura porque incluye la version de la fila """
+    return strong_etag("user", user.id, user.version)
+
+def _user_response(user: User) -> Response:
+    """ Perfil serializado, desde la cache de cuerpos si ya se serializo esta version """
+    etag = _user_etag(user)
+    body = cached_body(etag)
+    if body is None:
+        body = store_body(etag, UserResponse, user)
+    return json_response(body, etag, "users.detail")
+
+async def _update_if_match(
+    request: Request,
+    response: Response,
+    user_service: UserService,
+    user_id: UUID,
+    update
+) -> User:
+    """
+    Ejecuta una actualización condicionada a `If-Match` y agrega el nuevo ETag.
+    
+    Si la petición trae `If-Match`, se compara con la versión actual del usuario
+    y `update` recibe esa versión: el `UPDATE` solo se aplica si nadie escribió
+    entre la lectura y la escritura. Sin la cabecera, `update` recibe None.
+    
+    Args:
+        request (Request): Petición con la cabecera `If-Match`
+        response (Response): Respuesta a la que se agrega el nuevo ETag
+        user_service (UserService): Servicio de usuarios
+        user_id (UUID): ID del usuario a modificar
+        update: Corrutina que recibe la versión esperada y devuelve el usuario actualizado
+    
+    Returns:
+        User: Usuario actualizado
+        
+    Raises:
+        400: Si el rol no es válido
+        404: Si el usuario no existe
+        409: Si el usuario ya está en el estado solicitado
+        412: Si `If-Match` no coincide o el usuario cambió durante la escritura
+        422: Si los datos no son válidos
+    """
+    try:
+        user = await user_service.get_by_id(user_id)
+        expected_version = user.version if check_if_match(request, _user_etag(user)) else None
+        updated = await update(expected_version)
+    except UserNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+    except UserVersionConflictException:
+        # El rollback expiró el usuario: el ETag se calcula con la versión actual
+        raise precondition_failed(_user_etag(user))
+    except (UserAlreadyActiveException, UserAlreadyInactiveException) as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.message)
+    except InvalidUserRoleException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    except UserProfileIncompleteException as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.message)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    
+    response.headers["ETag"] = _user_etag(updated)
+    return updated
+
 # ==================== ENDPOINTS USUARIOS ==================== #
 
 @router.get("/me", response_model=UserResponse, status_code=status.HTTP_200_OK)
@@ -43,6 +120,7 @@ async def get_current_user_profile(
     
     Este endpoint permite a cualquier usuario autenticado obtener su propia información
     de perfil, incluyendo datos personales, configuraciones y estado de la cuenta.
+    La respuesta trae un `ETag` para usar en `If-Match` al actualizar el perfil.
     
     Args:
         current_user (User): Usuario autenticado obtenido del token JWT
@@ -73,11 +151,13 @@ async def get_current_user_profile(
     
     # Obtener información completa del usuario desde la base de datos
     user = await user_service.get_by_id(current_user.id)
-    return user 
+    return _user_response(user)
 
 @router.put("/me", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def update_current_user_profile(
     user_data: UserUpdate,
+    request: Request,
+    response: Response,
     user_service: UserService = Depends(get_user_service),
     current_user: User = Depends(get_current_user)
 ):
@@ -85,10 +165,13 @@ async def update_current_user_profile(
     Actualiza el perfil del usuario autenticado actualmente.
     
     Permite a un usuario modificar su información personal como nombre, email,
-    teléfono, dirección y otros datos del perfil.
+    teléfono, dirección y otros datos del perfil. Con `If-Match` (el ETag de
+    `GET /me`) el cambio solo se aplica si el perfil no cambió desde entonces.
     
     Args:
         user_data (UserUpdate): Datos a actualizar del usuario
+        request (Request): Petición con la cabecera `If-Match`
+        response (Response): Respuesta a la que se agrega el nuevo ETag
         user_service (UserService): Servicio de usuarios inyectado por dependencia
         current_user (User): Usuario autenticado obtenido del token JWT
     
@@ -98,11 +181,13 @@ async def update_current_user_profile(
     Raises:
         400: Si los datos proporcionados son inválidos
         401: Si el token es inválido o ha expirado
+        412: Si `If-Match` no coincide con la versión actual
         422: Si hay errores de validación en los datos
     
     Example:
         PUT /users/me
         Authorization: Bearer <token>
+        If-Match: "5d2a..."
         
         Body:
         {
@@ -114,8 +199,10 @@ async def update_current_user_profile(
     logger.info(f"Actualizando perfil del usuario: {current_user.id}")
     
     # Validar y actualizar los datos del usuario
-    update_user = await user_service.update_profile(current_user.id, user_data)
-    return update_user
+    return await _update_if_match(
+        request, response, user_service, current_user.id,
+        lambda version: user_service.update_profile(current_user.id, user_data.dict(), version)
+    )
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_current_user_account(
@@ -156,8 +243,8 @@ async def delete_current_user_account(
 
 @router.get("/{user_id}", response_model=UserResponse, status_code=status.HTTP_200_OK)
 async def get_by_id(
-    user_id: int,
-    current_user: User = Depends(get_current_user),
+    user_id: UUID,
+    admin: TokenPayload = Depends(require_permissions(Permission.USERS_READ)),
     user_service: UserService = Depends(get_user_service)
 ):
     """
@@ -167,8 +254,8 @@ async def get_by_id(
     completa de cualquier usuario del sistema.
     
     Args:
-        user_id (int): ID del usuario a consultar
-        current_user (User): Usuario autenticado (debe ser administrador)
+        user_id (UUID): ID del usuario a consultar
+        admin (TokenPayload): Claims del token (requiere el permiso USERS_READ)
         user_service (UserService): Servicio de usuarios inyectado por dependencia
     
     Returns:
@@ -183,21 +270,18 @@ async def get_by_id(
         GET /users/123
         Authorization: Bearer <admin_token>
     """
-    # Verificar que el usuario actual tiene permisos de administrador
-    await user_service.check_admin_permission(current_user.id)
-    
-    logger.info(f"Admin {current_user.id} accediendo a un usuario por id")
+    logger.info(f"Admin {admin.sub} accediendo a un usuario por id")
     
     # Obtener el usuario solicitado por ID
     user = await user_service.get_by_id(id=user_id)
-    return user
+    return _user_response(user)
 
 @router.get("/users", response_model=UserListResponse, status_code=status.HTTP_200_OK)
 async def list_users(
     skip: int = Query(0, ge=0, description="Numero de registros maximos a saltar"),
     limit: int = Query(10, ge=1, le=100, description="Numero meximo de registros"),
     search: Optional[str] = Query(None, description="Buscar por email o por nombre"),
-    current_user: User = Depends(get_current_user),
+    admin: TokenPayload = Depends(require_permissions(Permission.USERS_READ)),
     user_service: UserService = Depends(get_user_service)
 ):
     """
@@ -210,7 +294,7 @@ async def list_users(
         skip (int): Número de registros a saltar para paginación (default: 0)
         limit (int): Número máximo de registros a retornar (default: 10, max: 100)
         search (str, optional): Término de búsqueda para filtrar por email o nombre
-        current_user (User): Usuario autenticado (debe ser administrador)
+        admin (TokenPayload): Claims del token (requiere el permiso USERS_READ)
         user_service (UserService): Servicio de usuarios inyectado por dependencia
     
     Returns:
@@ -233,10 +317,7 @@ async def list_users(
             "limit": 10
         }
     """
-    # Verificar permisos de administrador
-    await user_service.check_admin_permission(current_user.id)
-    
-    logger.info(f"Admin {current_user.id} listando usuarios - skip{skip}, limit{limit}")
+    logger.info(f"Admin {admin.sub} listando usuarios - skip{skip}, limit{limit}")
     
     # Obtener lista paginada de usuarios
     users = await user_service.list_users(skip=skip, limit=limit, search=search)
@@ -244,9 +325,11 @@ async def list_users(
 
 @router.put("/{user_id}", response_model=UserResponse, status_code=status.HTTP_200_OK)
 async def update_user_by_id(
-    user_id: int,
+    user_id: UUID,
     user_data: UserUpdate,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    admin: TokenPayload = Depends(require_permissions(Permission.USERS_WRITE)),
     user_service: UserService = Depends(get_user_service)
 ):
     """
@@ -256,9 +339,11 @@ async def update_user_by_id(
     del sistema, incluyendo datos personales y configuraciones.
     
     Args:
-        user_id (int): ID del usuario a actualizar
+        user_id (UUID): ID del usuario a actualizar
         user_data (UserUpdate): Datos a actualizar del usuario
-        current_user (User): Usuario autenticado (debe ser administrador)
+        request (Request): Petición con la cabecera `If-Match` opcional
+        response (Response): Respuesta a la que se agrega el nuevo ETag
+        admin (TokenPayload): Claims del token (requiere el permiso USERS_WRITE)
         user_service (UserService): Servicio de usuarios inyectado por dependencia
     
     Returns:
@@ -268,6 +353,7 @@ async def update_user_by_id(
         401: Si no está autenticado
         403: Si no tiene permisos de administrador
         404: Si el usuario no existe
+        412: Si `If-Match` no coincide con la versión actual
         422: Si hay errores de validación en los datos
     
     Example:
@@ -280,20 +366,21 @@ async def update_user_by_id(
             "email": "updated@example.com"
         }
     """
-    # Verificar permisos de administrador
-    await user_service.check_admin_permission(current_user.id)
-    
-    logger.info(f"Admin {current_user.id} actualizando un usuario")
+    logger.info(f"Admin {admin.sub} actualizando un usuario")
     
     # Actualizar el perfil del usuario especificado
-    user_updated = await user_service.update_profile(user_id=user_id, profile_data=user_data.dict())
-    return user_updated
+    return await _update_if_match(
+        request, response, user_service, user_id,
+        lambda version: user_service.update_profile(user_id=user_id, profile_data=user_data.dict(), expected_version=version)
+    )
 
-@router.patch("/{user_id}/role", response_model=UserUpdate, status_code=status.HTTP_201_CREATED)
+@router.patch("/{user_id}/role", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def change_user_role(
-    user_id: int,
+    user_id: UUID,
     new_role: str,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    admin: TokenPayload = Depends(require_permissions(Permission.USERS_ROLES)),
     user_service: UserService = Depends(get_user_service)
 ):
     """
@@ -303,44 +390,48 @@ async def change_user_role(
     del sistema, como cambiar de usuario normal a administrador o viceversa.
     
     Args:
-        user_id (int): ID del usuario al que se le cambiará el rol
+        user_id (UUID): ID del usuario al que se le cambiará el rol
         new_role (str): Nuevo rol a asignar (ej: "admin", "user", "moderator")
-        current_user (User): Usuario autenticado (debe ser administrador)
+        request (Request): Petición con la cabecera `If-Match` opcional
+        response (Response): Respuesta a la que se agrega el nuevo ETag
+        admin (TokenPayload): Claims del token (requiere el permiso USERS_ROLES)
         user_service (UserService): Servicio de usuarios inyectado por dependencia
     
     Returns:
-        UserUpdate: Datos actualizados del usuario con el nuevo rol
+        UserResponse: Datos actualizados del usuario con el nuevo rol
         
     Raises:
         401: Si no está autenticado
         403: Si no tiene permisos de administrador
         404: Si el usuario no existe
+        412: Si `If-Match` no coincide con la versión actual
         400: Si el rol especificado no es válido
     
     Example:
         PATCH /users/123/role?new_role=admin
         Authorization: Bearer <admin_token>
     """
-    # Verificar permisos de administrador
-    await user_service.check_admin_permission(current_user.id)
-    
     # Verificar que el rol solicitado existe y es válido
-    exist_role = await user_service.verify_role_change(new_role)
+    exist_role = user_service.verify_role_change(new_role)
     
-    logger.info(f"Admin {current_user.id} cambiando rol a un usuario")
+    logger.info(f"Admin {admin.sub} cambiando rol a un usuario")
     
     # Si el rol no existe, registrar el error y continuar con la validación del servicio
     if exist_role:
         logger.info(f"Cambio de rol no permitido, ese rol no existe")
 
     # Actualizar el rol del usuario
-    update_user = await user_service.change_user_role(user_id=user_id, new_role=new_role)
-    return update_user
+    return await _update_if_match(
+        request, response, user_service, user_id,
+        lambda version: user_service.change_user_role(user_id=user_id, new_role=new_role, expected_version=version)
+    )
 
 @router.patch("/{user_id}/activate", response_model=UserResponse, status_code=status.HTTP_200_OK)
 async def activate_user(
-    user_id: int,
-    current_user: User = Depends(get_current_user),
+    user_id: UUID,
+    request: Request,
+    response: Response,
+    admin: TokenPayload = Depends(require_permissions(Permission.USERS_WRITE)),
     user_service: UserService = Depends(get_user_service)
 ):
     """
@@ -350,8 +441,10 @@ async def activate_user(
     haber sido desactivadas por motivos administrativos o de seguridad.
     
     Args:
-        user_id (int): ID del usuario a activar
-        current_user (User): Usuario autenticado (debe ser administrador)
+        user_id (UUID): ID del usuario a activar
+        request (Request): Petición con la cabecera `If-Match` opcional
+        response (Response): Respuesta a la que se agrega el nuevo ETag
+        admin (TokenPayload): Claims del token (requiere el permiso USERS_WRITE)
         user_service (UserService): Servicio de usuarios inyectado por dependencia
     
     Returns:
@@ -361,6 +454,7 @@ async def activate_user(
         401: Si no está autenticado
         403: Si no tiene permisos de administrador
         404: Si el usuario no existe
+        412: Si `If-Match` no coincide con la versión actual
         409: Si el usuario ya está activo
     
     Example:
@@ -374,19 +468,20 @@ async def activate_user(
             ...
         }
     """
-    # Verificar permisos de administrador
-    await user_service.check_admin_permission(current_user.id)
-    
-    logger.info(f"Admin {current_user.id} activando cuenta")
+    logger.info(f"Admin {admin.sub} activando cuenta")
     
     # Activar la cuenta del usuario especificado
-    activated_user = await user_service.activate_user(user_id=user_id)
-    return activated_user
+    return await _update_if_match(
+        request, response, user_service, user_id,
+        lambda version: user_service.activate_user(user_id=user_id, expected_version=version)
+    )
 
 @router.patch("/{user_id}/desactivate", response_model=UserResponse, status_code=status.HTTP_200_OK)
 async def desactivate_user(
-    user_id: int,
-    current_user: User = Depends(get_current_user),
+    user_id: UUID,
+    request: Request,
+    response: Response,
+    admin: TokenPayload = Depends(require_permissions(Permission.USERS_WRITE)),
     user_service: UserService = Depends(get_user_service)
 ):
     """
@@ -397,8 +492,10 @@ async def desactivate_user(
     no podrán acceder al sistema hasta ser reactivados.
     
     Args:
-        user_id (int): ID del usuario a desactivar
-        current_user (User): Usuario autenticado (debe ser administrador)
+        user_id (UUID): ID del usuario a desactivar
+        request (Request): Petición con la cabecera `If-Match` opcional
+        response (Response): Respuesta a la que se agrega el nuevo ETag
+        admin (TokenPayload): Claims del token (requiere el permiso USERS_WRITE)
         user_service (UserService): Servicio de usuarios inyectado por dependencia
     
     Returns:
@@ -408,6 +505,7 @@ async def desactivate_user(
         401: Si no está autenticado
         403: Si no tiene permisos de administrador
         404: Si el usuario no existe
+        412: Si `If-Match` no coincide con la versión actual
         409: Si el usuario ya está desactivado
         400: Si se intenta desactivar un administrador
     
@@ -422,11 +520,10 @@ async def desactivate_user(
             ...
         }
     """
-    # Verificar permisos de administrador
-    await user_service.check_admin_permission(current_user.id)
-    
-    logger.info(f"Admin {current_user.id} desactivando cuenta")
+    logger.info(f"Admin {admin.sub} desactivando cuenta")
     
     # Desactivar la cuenta del usuario especificado
-    desactivated_user = await user_service.deactivate_user(user_id=user_id)
-    return desactivated_user
\ No newline at end of file
+    return await _update_if_match(
+        request, response, user_service, user_id,
+        lambda version: user_service.deactivate_user(user_id=user_id, expected_version=version)
+    )
\ No newline at end of file
@@ -1,9 +1,11 @@
 from typing import List, Optional
+from uuid import UUID
 from fastapi import Depends
 from auth.models import User
 from shared.database import get_db
 from auth.schemas import UserRegister, UserLogin
-from users.repository import UserRepository
+from auth.revocation import token_versions
+from users.repository import UserRepository, PROFILE_FIELDS
 from users.exceptions import *
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
@@ -15,8 +17,20 @@ class UserService:
         self.user_repo = user_repo
         self.logger = logging.getLogger(__name__)
         
-    def update_profile(self,user_id:int , profile_data:dict):
-        user = self.get_by_id(user_id)
+    async def update_profile(self,user_id:UUID , profile_data:dict, expected_version: Optional[int] = None) -> User:
+        """
+            Actualiza los datos del perfil de un usuario.
+
+        Args:
+            user_id (UUID): ID del usuario.
+            profile_data (dict): Campos del perfil a actualizar.
+            expected_version (int, optional): Versión validada con `If-Match`.
+
+        Raises:
+            UserProfileIncompleteException: Si faltan email, nombre o dirección.
+            UserVersionConflictException: Si el usuario cambió desde `expected_version`.
+        """
+        user = await self.get_by_id(user_id)
         
         if not profile_data:
             raise ValueError("No se proporcionaron datos para actualizar")
@@ -42,17 +56,17 @@ class UserService:
         )
     
         try:
-            return self.user_repo.update_user(user,profile_data)
+            return await self.user_repo.update_user(user, profile_data, expected_version, PROFILE_FIELDS)
         except DatabaseException:
             raise
     
-    def get_by_id(self, id: int) -> User:
+    async def get_by_id(self, id: UUID) -> User:
 
-        if not isinstance(id, int) or id <= 0:
-            raise ValueError("El ID debe ser un entero positivo")
+        if not isinstance(id, UUID):
+            raise ValueError("El ID debe ser un UUID")
         
         try:
-            user = self.user_repo.get_by_id(id)
+            user = await self.user_repo.get_by_id(id)
             
             if user is None:
                 raise UserNotFoundException(user_id=id)
@@ -92,7 +106,7 @@ class UserService:
         
         return self.user_repo.list_users(skip, limit, search)
     
-    def check_admin_permission(self,user_id:int) -> None:
+    async def check_admin_permission(self,user_id:UUID) -> None:
         """
             Verifica si un usuiario tiene permisos de administrador
             
@@ -102,7 +116,7 @@ class UserService:
         Raises:
             InsufficientPermissionsException: Si no es admin.
         """
-        user = self.get_by_id(user_id)
+        user = await self.get_by_id(user_id)
         
         if user.role != "admin":
             raise InsufficientPermissionsException(
@@ -110,9 +124,9 @@ class UserService:
                 required_permission="administrador"
             )
             
-    def change_user_role(self, user_id: int, new_role: str) -> User:
+    async def change_user_role(self, user_id: UUID, new_role: str, expected_version: Optional[int] = None) -> User:
         """
-        Cambia el rol de un usuario.
+        Cambia el rol de un usuario e incrementa su version de token.
         
         NUEVO MÉTODO para cambio de roles.
         """
@@ -121,36 +135,48 @@ class UserService:
         if new_role not in valid_roles:
             raise InvalidUserRoleException(new_role, valid_roles)
         
-        user = self.get_by_id(user_id)
+        user = await self.get_by_id(user_id)
         
-        update_data = {"role": new_role}
-        return self.user_repo.update_user(user, update_data)
+        # Los tokens emitidos con el rol anterior dejan de servir (ver `auth.revocation.TokenVersions`)
+        update_data = {"role": new_role, "token_version": User.token_version + 1}
+        updated = await self.user_repo.update_user(user, update_data, expected_version, frozenset({"role", "token_version"}))
+        token_versions.set(str(updated.id), updated.token_version)
+        return updated
     
-    def activate_user(self, user_id: int) -> User:
+    async def activate_user(self, user_id: UUID, expected_version: Optional[int] = None) -> User:
         """
         Activa un usuario.
         
         """
-        user = self.get_by_id(user_id)
+        user = await self.get_by_id(user_id)
         
         if user.is_active:
             raise UserAlreadyActiveException(user_id)
         
-        update_data = {"is_active": True}
-        return self.user_repo.update_user(user, update_data)
+        update_data = {"is_active": True, "token_version": User.token_version + 1}
+        updated = await self.user_repo.update_user(user, update_data, expected_version, frozenset({"is_active", "token_version"}))
+        token_versions.set(str(updated.id), updated.token_version)
+        return updated
 
-    def deactivate_user(self, user_id: int) -> User:
+    async def deactivate_user(self, user_id: UUID, expected_version: Optional[int] = None) -> User:
         """
         Desactiva un usuario.
+
+        Las rutas de administracion autorizan con los claims del token, sin
+        leer al usuario: incrementar su version de token invalida los access
+        tokens que ya tenia.
         """
-        user = self.get_by_id(user_id)
+        user = await self.get_by_id(user_id)
         
         if not user.is_active:
             raise UserAlreadyInactiveException(user_id)
         
-        update_data = {"is_active": False}
-        return self.user_repo.update_user(user, update_data)
+        update_data = {"is_active": False, "token_version": User.token_version + 1}
+        updated = await self.user_repo.update_user(user, update_data, expected_version, frozenset({"is_active", "token_version"}))
+        token_versions.set(str(updated.id), updated.token_version)
+        return updated
     
+    @staticmethod
     def verify_role_change(user_role:str):
         permit_role = ["admin","role"]
         
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from passlib.hash import bcrypt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth.models import Base, User
+from auth.repository import UserAuthRepository
+from auth.service import UserAuthService, _rehash_tasks
+from shared.config import get_settings
+from shared.deadline import Deadline, current_deadline, install_deadline_guard
+from shared.metrics import metrics_registry
+from shared.passwords import build_password_context, calibrate_bcrypt_rounds
+from shared.security import get_pwd_context, verify_password_status
+
+PASSWORD = "ClaveSegura1"
+
+
+def test_calibration_stays_within_bounds():
+    assert calibrate_bcrypt_rounds(0.0001, min_rounds=10, max_rounds=16, sample_rounds=4, samples=1) == 10
+    assert calibrate_bcrypt_rounds(3600, min_rounds=10, max_rounds=16, sample_rounds=4, samples=1) == 16
+
+
+def test_fixed_rounds_and_unknown_scheme():
+    settings = get_settings().model_copy(update={"password_hash_scheme": "bcrypt", "password_hash_rounds": 5})
+    context = build_password_context(settings)
+    assert context.handler().default_rounds == 5
+    assert context.needs_update(bcrypt.using(rounds=4).hash(PASSWORD))
+    assert not context.needs_update(context.hash(PASSWORD))
+    # Un hash mas costoso (de un nodo con mas CPU) no se baja al costo de este nodo
+    assert not context.needs_update(bcrypt.using(rounds=7).hash(PASSWORD))
+
+    with pytest.raises(ValueError):
+        build_password_context(settings.model_copy(update={"password_hash_scheme": "md5"}))
+
+
+async def test_login_rehashes_weak_hash_in_background(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'users.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    weak_hash = bcrypt.using(rounds=4).hash(PASSWORD)
+    with session_factory() as db:
+        db.add(User(name="Ana", email="ana@example.com", password=weak_hash))
+        db.commit()
+
+    metrics_registry.reset()
+    install_deadline_guard(engine)
+    deadline = Deadline(30)
+    token = current_deadline.set(deadline)
+    db = session_factory()
+    try:
+        service = UserAuthService(UserAuthRepository(db), session_factory=session_factory)
+        user = await service.authenticate_user("ana@example.com", PASSWORD)
+        assert user.password == weak_hash
+        # El login ya respondio y su cliente se fue: el rehash no depende de esa peticion
+        deadline.cancel()
+        await asyncio.gather(*_rehash_tasks)
+    finally:
+        db.close()
+        current_deadline.reset(token)
+
+    with session_factory() as db:
+        stored = db.query(User).one()
+    assert stored.version == 1
+    assert verify_password_status(PASSWORD, stored.password) == (True, False)
+    assert bcrypt.from_string(stored.password).rounds == get_pwd_context().handler().default_rounds
+    assert metrics_registry.password_rehashes == 1
+    assert 'password_hash_duration_seconds_count{operation="verify"}' in metrics_registry.render_prometheus()
+    engine.dispose()
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from auth.models import User
+from auth.permissions import ROLE_PERMISSIONS, Permission, has_permissions, permissions_for
+from auth.repository import UserAuthRepository
+from auth.revocation import DELETED_VERSION, RevocationList, TokenVersions, run_revocation_sync
+from auth.service import UserAuthService
+from main import app
+from shared.database import get_db
+from shared.invalidation import invalidation_bus
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        User(email="jefe@example.com", password="x", name="Jefe", role="admin"),
+        User(email="ana@example.com", password="x", name="Ana", role="admin"),
+        User(email="luis@example.com", password="x", name="Luis", role="client"),
+    ])
+    db.commit()
+    app.dependency_overrides[get_db] = lambda: db
+    yield db
+    app.dependency_overrides.clear()
+
+
+def user(db, name: str) -> User:
+    return db.query(User).filter(User.name == name).one()
+
+
+def bearer(db, name: str) -> dict:
+    token, _ = UserAuthService(UserAuthRepository(db))._create_access_token(user(db, name))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_roles_compile_to_bitsets():
+    assert ROLE_PERMISSIONS["client"] == 0
+    assert has_permissions(permissions_for("admin"), Permission.USERS_ROLES | Permission.CATALOG_WRITE)
+    # Las rutas de administracion exigian `role == "admin"`: los moderadores no suman permisos
+    assert permissions_for("moderator") == 0
+    assert permissions_for("desconocido") == 0
+
+
+def test_admin_check_needs_no_user_query(db):
+    client = TestClient(app)
+    headers, luis_id = bearer(db, "Jefe"), user(db, "Luis").id
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    response = client.get(f"/{luis_id}", headers=headers)
+
+    assert response.status_code == 200
+    # Solo la lectura del usuario consultado: el permiso sale del token
+    assert len(statements) == 1
+    assert client.get(f"/{user(db, 'Jefe').id}", headers=bearer(db, "Luis")).status_code == 403
+
+
+def test_role_change_forces_reauthentication(db):
+    client = TestClient(app)
+    ana_id = user(db, "Ana").id
+    old_headers = bearer(db, "Ana")
+    assert client.get(f"/{ana_id}", headers=old_headers).status_code == 200
+
+    demoted = client.patch(f"/{ana_id}/role", params={"new_role": "user"}, headers=bearer(db, "Jefe"))
+    assert demoted.status_code == 201
+
+    stale = client.get(f"/{ana_id}", headers=old_headers)
+    assert stale.status_code == 401
+    # Un token nuevo lleva la version y los permisos del rol actual
+    db.expire_all()
+    assert client.get(f"/{ana_id}", headers=bearer(db, "Ana")).status_code == 403
+
+    # Otro worker lo aprende de la base de datos en la siguiente sincronizacion
+    versions = TokenVersions()
+    assert versions.sync(db, timedelta(minutes=30)) == 1
+    assert versions.is_stale(str(ana_id), 1)
+    assert not versions.is_stale(str(ana_id), 2)
+
+
+def test_deactivated_admin_loses_access_immediately(db):
+    client = TestClient(app)
+    ana_id = user(db, "Ana").id
+    ana_headers = bearer(db, "Ana")
+    assert client.get(f"/{ana_id}", headers=ana_headers).status_code == 200
+
+    deactivated = client.patch(f"/{ana_id}/desactivate", headers=bearer(db, "Jefe"))
+    assert deactivated.status_code == 200
+
+    assert client.get(f"/{user(db, 'Luis').id}", headers=ana_headers).status_code == 401
+
+
+def test_local_token_versions_expire_with_the_token_lifetime(db):
+    now = [1000.0]
+    versions = TokenVersions(clock=lambda: now[0])
+    lifetime = timedelta(minutes=30)
+    # Usuario que la consulta no devuelve (p. ej. un cambio de otro worker aun no visible)
+    versions.set("ausente", 3)
+
+    versions.sync(db, lifetime)
+    assert versions.is_stale("ausente", 2)
+
+    now[0] += (lifetime + timedelta(minutes=1)).total_seconds()
+    versions.sync(db, lifetime)
+    assert not versions.is_stale("ausente", 2)
+    assert versions._versions == {} and versions._set_at == {}
+
+
+async def test_user_invalidations_reach_token_versions_before_the_next_sync(db):
+    versions = TokenVersions()
+    factory = sessionmaker(bind=db.get_bind())
+    sync = asyncio.create_task(run_revocation_sync(factory, 3600, versions, RevocationList(capacity=100)))
+    await asyncio.sleep(0.05)
+
+    ana, luis = user(db, "Ana"), user(db, "Luis")
+    ana.token_version = 2
+    invalidation_bus.publish(db, "user", [ana.id])
+    db.delete(luis)
+    invalidation_bus.publish(db, "user", [luis.id])
+    db.commit()
+    await asyncio.sleep(0.05)
+    sync.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await sync
+
+    assert versions.is_stale(str(ana.id), 1)
+    assert not versions.is_stale(str(ana.id), 2)
+    assert versions.is_stale(str(luis.id), DELETED_VERSION - 1)
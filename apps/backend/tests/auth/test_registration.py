@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from auth.exceptions import WeakPasswordException
+from auth.models import Base, User
+from auth.repository import UserAuthRepository
+from auth.schemas import UserRegister
+from auth.service import UserAuthService
+from shared.security import verify_password
+from users.exceptions import EmailAlreadyExistsException
+
+PASSWORD = "ClaveSegura1"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Archivo y no memoria: cada registro usa su propia conexion, como en produccion
+    engine = create_engine(f"sqlite:///{tmp_path / 'users.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def register(engine, email: str, password: str = PASSWORD):
+    session = sessionmaker(bind=engine)()
+    try:
+        service = UserAuthService(UserAuthRepository(session))
+        return asyncio.run(service.create_user(UserRegister(name="Ana", email=email, password=password)))
+    finally:
+        session.close()
+
+
+def test_registration_is_a_single_insert(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    user = register(engine, "ana@example.com")
+
+    assert [statement.split()[0] for statement in statements] == ["INSERT"]
+    assert "ON CONFLICT" in statements[0]
+    assert user.email == "ana@example.com"
+    assert verify_password(PASSWORD, user.password)
+
+
+def test_concurrent_duplicates_are_rejected_without_integrity_errors(engine, caplog):
+    attempts = 6
+
+    def attempt(_):
+        try:
+            return register(engine, "ana@example.com")
+        except EmailAlreadyExistsException as e:
+            return e
+
+    with caplog.at_level(logging.INFO), ThreadPoolExecutor(attempts) as pool:
+        results = list(pool.map(attempt, range(attempts)))
+
+    assert sum(isinstance(result, User) for result in results) == 1
+    assert sum(isinstance(result, EmailAlreadyExistsException) for result in results) == attempts - 1
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+    assert sessionmaker(bind=engine)().query(User).count() == 1
+
+
+@pytest.mark.parametrize("password", ["clavesegura1", "ClaveSegura", "clavesegura"])
+def test_weak_passwords_are_rejected_before_hashing(engine, password):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    with pytest.raises(WeakPasswordException):
+        register(engine, "ana@example.com", password)
+    assert statements == []
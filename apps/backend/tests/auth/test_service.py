@@ -0,0 +1,157 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from auth.exceptions import InvalidRefreshTokenException
+from auth.models import Base, RevokedToken, User
+from auth.repository import UserAuthRepository
+from auth.revocation import RevocationList
+from auth.service import UserAuthService
+from shared.bloom import BloomFilter
+from shared.security import hash_refresh_token, verify_token
+
+
+@pytest.fixture
+def user(db):
+    user = User(name="Ana", email="ana@example.com", password="x", role="client")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def service(db):
+    return UserAuthService(UserAuthRepository(db))
+
+
+async def test_login_issues_short_lived_access_and_refresh_token(service, user):
+    tokens = await service.issue_tokens(user)
+
+    payload = verify_token(tokens["access_token"])
+    assert payload.sub == str(user.id)
+    assert payload.jti
+    assert tokens["expires_in"] == 30 * 60
+    assert tokens["refresh_token"]
+
+
+async def test_refresh_rotates_and_detects_reuse(service, user):
+    first = await service.issue_tokens(user)
+
+    second = await service.refresh_tokens(first["refresh_token"])
+    assert second["refresh_token"] != first["refresh_token"]
+
+    # Reusar el token ya rotado revoca toda la familia, incluido el token nuevo
+    with pytest.raises(InvalidRefreshTokenException):
+        await service.refresh_tokens(first["refresh_token"])
+    with pytest.raises(InvalidRefreshTokenException):
+        await service.refresh_tokens(second["refresh_token"])
+
+
+class InterleavedRepository(UserAuthRepository):
+    """ Repositorio que espera a que todas las peticiones lean el token antes de rotarlo """
+
+    def __init__(self, db, barrier: asyncio.Barrier):
+        super().__init__(db)
+        self.barrier = barrier
+
+    async def get_refresh_token(self, token_hash: str):
+        stored = await super().get_refresh_token(token_hash)
+        await self.barrier.wait()
+        return stored
+
+
+async def test_concurrent_refresh_of_the_same_token_is_reuse(tmp_path, user, db):
+    first = await UserAuthService(UserAuthRepository(db)).issue_tokens(user)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'refresh.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as setup:
+        setup.add(User(id=user.id, name="Ana", email="ana@example.com", password="x", role="client"))
+        setup.commit()
+        await UserAuthRepository(setup).create_refresh_token(
+            user.id, hash_refresh_token(first["refresh_token"]), uuid.uuid4(), datetime.utcnow() + timedelta(days=1)
+        )
+
+    barrier = asyncio.Barrier(2)
+    sessions = [Session(), Session()]
+    results = await asyncio.gather(
+        *(UserAuthService(InterleavedRepository(s, barrier)).refresh_tokens(first["refresh_token"]) for s in sessions),
+        return_exceptions=True
+    )
+
+    # Ambas leyeron el token sin revocar, pero solo una puede rotarlo
+    rejected = [r for r in results if isinstance(r, InvalidRefreshTokenException)]
+    rotated = [r for r in results if isinstance(r, dict)]
+    assert len(rejected) == 1 and len(rotated) == 1
+    assert "reutilización" in rejected[0].message
+    # La familia queda revocada, incluido el token que emitio la ganadora
+    with pytest.raises(InvalidRefreshTokenException):
+        await UserAuthService(UserAuthRepository(sessions[0])).refresh_tokens(rotated[0]["refresh_token"])
+
+    for s in sessions:
+        s.close()
+    engine.dispose()
+
+
+async def test_logout_revokes_access_token(service, user, db):
+    tokens = await service.issue_tokens(user)
+    payload = verify_token(tokens["access_token"])
+
+    await service.logout(payload, tokens["refresh_token"])
+
+    assert db.query(RevokedToken).filter(RevokedToken.jti == payload.jti).first() is not None
+    with pytest.raises(InvalidRefreshTokenException):
+        await service.refresh_tokens(tokens["refresh_token"])
+
+
+def test_revocation_list_only_queries_db_on_filter_hits(db):
+    db.add(RevokedToken(jti="revoked", expires_at=datetime.utcnow() + timedelta(minutes=5)))
+    db.add(RevokedToken(jti="expired", expires_at=datetime.utcnow() - timedelta(minutes=5)))
+    db.commit()
+
+    revocations = RevocationList(capacity=1000)
+    assert revocations.sync(db) == 1
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert not revocations.is_revoked("valid", db)
+    assert not revocations.is_revoked(None, db)
+    assert statements == []
+
+    assert revocations.is_revoked("revoked", db)
+    assert revocations.is_revoked("revoked", db)
+    assert len(statements) == 1
+
+
+def test_revocation_list_incremental_sync(db):
+    revocations = RevocationList(capacity=1000)
+    revocations.sync(db)
+
+    db.add(RevokedToken(jti="late", expires_at=datetime.utcnow() + timedelta(minutes=5)))
+    db.commit()
+
+    assert revocations.sync(db) == 1
+    assert revocations.is_revoked("late", db)
+
+    # Las filas del solapamiento se releen pero no se vuelven a contar
+    count = revocations._filter.count
+    revocations.sync(db)
+    revocations.sync(db)
+    assert revocations._filter.count == count
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives < 300
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from categories.exceptions import CategoryCycleException
+from categories.models import Category, CategoryClosure
+from categories.repository import CategoryRepository
+from categories.service import CategoryService, get_category_service
+from categories.tree import CategoryTreeCache
+from main import app
+from products.catalog import CatalogSnapshot
+from products.models import Product
+from products.repository import ProductRepository
+from products.service import ProductService
+from shared.invalidation import invalidation_bus
+
+
+@pytest.fixture
+def db(db):
+    # Alimentos > Bebidas > Cafe, y Limpieza aparte
+    food = Category(name="Alimentos")
+    drinks = Category(name="Bebidas", parent=food)
+    coffee = Category(name="Cafe", parent=drinks)
+    cleaning = Category(name="Limpieza")
+    db.add_all([food, drinks, coffee, cleaning])
+    db.flush()
+    db.add_all([
+        Product(name="Arroz", price=100, stock=1, category_id=food.id),
+        Product(name="Jugo", price=200, stock=1, category_id=drinks.id),
+        Product(name="Cafe molido", price=300, stock=1, category_id=coffee.id),
+        Product(name="Cafe viejo", price=400, stock=1, category_id=coffee.id, is_active=False),
+        Product(name="Jabon", price=500, stock=1, category_id=cleaning.id),
+    ])
+    db.commit()
+    CategoryRepository(db).rebuild_hierarchy()
+    db.info["categories"] = {c.name: c.id for c in (food, drinks, coffee, cleaning)}
+    return db
+
+
+def counts(db) -> dict:
+    db.expire_all()
+    return {category.name: category.active_product_count for category in db.query(Category)}
+
+
+async def test_browsing_a_parent_includes_all_descendants(db):
+    food = db.info["categories"]["Alimentos"]
+    snapshot = CatalogSnapshot()
+    snapshot.refresh(db)
+
+    for catalog in (None, snapshot):
+        page = await ProductService(ProductRepository(db), catalog).get_products_by_price_range(category_id=food)
+        assert [item.name for item in page["items"]] == ["Arroz", "Jugo", "Cafe molido"]
+
+
+async def test_product_writes_maintain_subtree_counts(db):
+    ids = db.info["categories"]
+    repository = ProductRepository(db)
+    assert counts(db) == {"Alimentos": 3, "Bebidas": 2, "Cafe": 1, "Limpieza": 1}
+
+    product = await repository.create(Product(name="Espresso", price=350, stock=1, category_id=ids["Cafe"]))
+    assert counts(db) == {"Alimentos": 4, "Bebidas": 3, "Cafe": 2, "Limpieza": 1}
+
+    await repository.update(product, {"category_id": ids["Limpieza"]})
+    assert counts(db) == {"Alimentos": 3, "Bebidas": 2, "Cafe": 1, "Limpieza": 2}
+
+    await repository.update(product, {"is_active": False, "price": 1})
+    assert counts(db) == {"Alimentos": 3, "Bebidas": 2, "Cafe": 1, "Limpieza": 1}
+
+    await repository.delete(db.query(Product).filter(Product.name == "Jugo").one())
+    assert counts(db) == {"Alimentos": 2, "Bebidas": 1, "Cafe": 1, "Limpieza": 1}
+
+    # Los conteos incrementales coinciden con recalcularlos desde cero
+    incremental = counts(db)
+    CategoryRepository(db).rebuild_hierarchy()
+    assert counts(db) == incremental
+
+
+async def test_move_rewrites_closure_and_counts(db):
+    ids = db.info["categories"]
+    service = CategoryService(CategoryRepository(db))
+
+    await service.move(ids["Bebidas"], ids["Limpieza"])
+
+    assert counts(db) == {"Alimentos": 1, "Bebidas": 2, "Cafe": 1, "Limpieza": 3}
+    ancestors = {row.ancestor_id: row.depth for row in
+                 db.query(CategoryClosure).filter(CategoryClosure.descendant_id == ids["Cafe"])}
+    assert ancestors == {ids["Cafe"]: 0, ids["Bebidas"]: 1, ids["Limpieza"]: 2}
+
+    with pytest.raises(CategoryCycleException):
+        await service.move(ids["Limpieza"], ids["Cafe"])
+
+
+async def test_move_rechecks_cycle_and_rereads_count_in_its_transaction(engine, db):
+    ids = db.info["categories"]
+    repository = CategoryRepository(db)
+    drinks = await repository.get_for_write(ids["Bebidas"])
+
+    # Un alta concurrente deja viejo el conteo del objeto ya cargado
+    other = sessionmaker(bind=engine)()
+    await ProductRepository(other).create(Product(name="Te", price=10, stock=1, category_id=ids["Cafe"]))
+    other.close()
+
+    # La validacion del servicio no basta: el repositorio revisa el ciclo con el bloqueo tomado
+    with pytest.raises(CategoryCycleException):
+        await repository.move(drinks, ids["Cafe"])
+
+    await repository.move(drinks, ids["Limpieza"])
+
+    assert counts(db) == {"Alimentos": 1, "Bebidas": 3, "Cafe": 2, "Limpieza": 4}
+
+
+def test_tree_endpoint_is_cached_until_a_change(db):
+    ids = db.info["categories"]
+    tree_cache = CategoryTreeCache(ttl=60)
+    unsubscribe = invalidation_bus.subscribe("category", tree_cache.invalidate)
+    app.dependency_overrides[get_category_service] = lambda: CategoryService(CategoryRepository(db), tree_cache)
+    client = TestClient(app)
+    try:
+        first = client.get("/categories/tree")
+        assert first.status_code == 200
+        food, cleaning = first.json()
+        assert (food["name"], food["active_product_count"]) == ("Alimentos", 3)
+        assert food["children"][0]["children"][0]["name"] == "Cafe"
+
+        revalidated = client.get("/categories/tree", headers={"If-None-Match": first.headers["etag"]})
+        assert revalidated.status_code == 304
+        assert tree_cache.loads == 1
+
+        # Un alta de producto invalida el arbol via el bus, sin esperar el TTL
+        asyncio.run(ProductRepository(db).create(Product(name="Te", price=10, stock=1, category_id=ids["Bebidas"])))
+
+        changed = client.get("/categories/tree", headers={"If-None-Match": first.headers["etag"]})
+        assert changed.status_code == 200
+        assert changed.json()[0]["active_product_count"] == 4
+        assert tree_cache.loads == 2
+    finally:
+        app.dependency_overrides.clear()
+        unsubscribe()
@@ -0,0 +1,51 @@
+import os
+
+# Valores por defecto para poder importar `shared.config.Settings` sin un .env
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("POSTGRESQL_USER", "postgres")
+os.environ.setdefault("POSTGRESQL_PASSWORD", "postgres")
+os.environ.setdefault("POSTGRESQL_SERVER", "localhost")
+os.environ.setdefault("POSTGRESQL_PORT", "5432")
+os.environ.setdefault("POSTGRESQL_NAME", "ecommerce_test")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_API_KEY", "test")
+os.environ.setdefault("SUPABASE_BUCKET_NAME", "test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+# Sin cache de consultas entre pruebas: cada prueba usa su propia base
+os.environ.setdefault("QUERY_CACHE_TTL_SECONDS", "0")
+os.environ.setdefault("QUERY_CACHE_STALE_SECONDS", "0")
+
+# Sin control de admision en la app: las pruebas de rafagas (coalescencia) superan
+# a proposito el limite de peticiones en curso; `tests/shared/test_admission.py` lo prueba aparte
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from shared.database import Base
+
+
+@pytest.fixture
+def engine():
+    """ Base SQLite en memoria con todas las tablas; una conexion compartida entre hilos """
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    """ Sesion sobre `engine`; los modulos que necesitan datos la redefinen como `db(db)` y siembran encima """
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
@@ -0,0 +1,105 @@
+import pytest
+
+from categories.models import Category
+from products import catalog
+from products.catalog import CatalogSnapshot
+from products.models import Product
+from products.repository import ProductRepository
+from products.service import ProductService
+
+PRODUCTS = [
+    ("Cafe molido", 300, 4),
+    ("Te verde", 100, 0),
+    ("Cafe en grano", 500, 10),
+    ("Chocolate", 300, 2),
+    ("Galletas", 50, 7),
+]
+
+
+@pytest.fixture
+def db(db):
+    category = Category(name="Despensa")
+    db.add(category)
+    db.flush()
+    for name, price, stock in PRODUCTS:
+        db.add(Product(name=name, price=price, stock=stock, category_id=category.id))
+    db.add(Product(name="Inactivo", price=200, stock=3, is_active=False, category_id=category.id))
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def snapshot(db):
+    snapshot = CatalogSnapshot()
+    snapshot.refresh(db)
+    return snapshot
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"sort": "price_asc"},
+    {"sort": "price_desc"},
+    {"min_price": 100, "max_price": 300, "sort": "price_asc"},
+    {"in_stock": True, "sort": "price_asc"},
+    {"in_stock": False},
+    {"search": "CAFE", "sort": "price_desc"},
+])
+def test_snapshot_matches_database(db, snapshot, filters):
+    from_db = ProductRepository(db).list_products(0, 100, active_only=True, **filters)
+    from_snapshot = snapshot.query(0, 100, **filters)
+
+    expected = [product.id for product in from_db]
+    actual = [item.id for item in from_snapshot]
+    # Sin `sort` el orden no esta garantizado en ninguno de los dos caminos
+    if "sort" not in filters:
+        expected, actual = sorted(expected), sorted(actual)
+    assert actual == expected
+
+
+def test_pagination_over_price_index(snapshot):
+    first = snapshot.query(0, 2, sort="price_asc")
+    second = snapshot.query(2, 2, sort="price_asc")
+
+    assert [item.price for item in first + second] == [50, 100, 300, 300]
+
+
+def test_delta_refresh_applies_updates_and_deactivations(db, snapshot, monkeypatch):
+    monkeypatch.setattr(catalog, "REBUILD_EVERY", 1000)
+    cheap = db.query(Product).filter(Product.name == "Galletas").one()
+    tea = db.query(Product).filter(Product.name == "Te verde").one()
+    cheap.price = 900
+    tea.is_active = False
+    db.commit()
+
+    snapshot.refresh(db)
+
+    assert [item.name for item in snapshot.query(0, 10, sort="price_desc")][:1] == ["Galletas"]
+    assert "Te verde" not in [item.name for item in snapshot.query(0, 10)]
+    assert len(snapshot) == 4
+
+
+def test_delta_refresh_drops_deleted_products_from_invalidations(db, snapshot, monkeypatch):
+    monkeypatch.setattr(catalog, "REBUILD_EVERY", 1000)
+    coffee = db.query(Product).filter(Product.name == "Cafe en grano").one()
+    db.delete(coffee)
+    db.commit()
+
+    # El borrado no deja fila con `updated_at` que leer: llega por el bus
+    snapshot.invalidate([str(coffee.id)])
+    snapshot.refresh(db)
+
+    assert "Cafe en grano" not in [item.name for item in snapshot.query(0, 10)]
+    assert [item.price for item in snapshot.query(0, 10, sort="price_desc")][:1] == [300]
+    assert len(snapshot) == 4
+
+
+async def test_service_falls_back_to_database_when_stale(db, snapshot):
+    service = ProductService(ProductRepository(db), snapshot, catalog_max_staleness=30)
+    db.query(Product).filter(Product.name == "Galletas").update({"name": "Galletas de avena"})
+    db.commit()
+
+    # Fresco: responde la copia en memoria (todavia con el nombre viejo)
+    assert "Galletas" in [item.name for item in await service.browse_products(limit=10)]
+
+    snapshot.refreshed_at -= 60
+    assert "Galletas de avena" in [product.name for product in await service.browse_products(limit=10)]
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from categories.models import Category
+from main import app
+from products.models import Product
+from products.repository import ProductRepository
+from products.schemas import ProductUpdate
+from products.service import ProductService, get_product_service
+from shared.deadline import Deadline, current_deadline, install_deadline_guard
+from shared.invalidation import invalidation_bus
+from shared.singleflight import SingleFlight
+
+
+@pytest.fixture
+def db(db):
+    category = Category(name="Bebidas")
+    db.add(category)
+    db.flush()
+    for index in range(20):
+        db.add(Product(name=f"Cafe {index}", price=100 + index, stock=index, category_id=category.id))
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def statements(engine):
+    """ Sentencias SQL ejecutadas; cada una tarda un poco para que las peticiones se solapen """
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+        time.sleep(0.05)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+async def test_500_concurrent_identical_requests_run_one_query(db, statements):
+    # Las que llegan durante la consulta se suman a ella; las que llegan despues usan la cache
+    flight = SingleFlight(ttl=60, stale=0, beta=0)
+    app.dependency_overrides[get_product_service] = lambda: ProductService(ProductRepository(db), None, 30, flight)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                client.get("/products", params={"limit": 10, "sort": "price_desc"}) for _ in range(500)
+            ))
+    finally:
+        app.dependency_overrides.clear()
+
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    assert responses[0].json()[0]["name"] == "Cafe 19"
+    assert len(statements) == 1
+    assert flight.coalesced > 0
+    assert flight.coalesced + flight.hits == 499
+
+
+async def test_normalized_arguments_share_the_query(db, statements):
+    service = ProductService(ProductRepository(db), queries=SingleFlight(ttl=0, stale=0))
+
+    counts = await asyncio.gather(*(
+        service.count_products(search) for search in ["cafe", " Cafe ", "CAFE"] * 10
+    ))
+
+    assert counts == [20] * 30
+    assert len(statements) == 1
+
+
+async def test_shared_read_outlives_the_leader_session(engine, db, statements):
+    flight = SingleFlight(ttl=0, stale=0)
+    opened = []
+
+    def session_factory():
+        session = sessionmaker(bind=engine)()
+        opened.append(session)
+        return session
+
+    leader = ProductService(ProductRepository(db), queries=flight, session_factory=session_factory)
+    follower_db = sessionmaker(bind=engine)()
+    follower = ProductService(ProductRepository(follower_db), queries=flight, session_factory=session_factory)
+
+    leading = asyncio.create_task(leader.count_products())
+    await asyncio.sleep(0.01)
+    following = asyncio.create_task(follower.count_products())
+    await asyncio.sleep(0.01)
+    # El cliente del lider se desconecta y `get_db` cierra su sesion con la consulta en curso
+    leading.cancel()
+    db.close()
+
+    assert await following == 20
+    assert len(statements) == 1
+    assert len(opened) == 1 and opened[0] is not db
+    follower_db.close()
+
+
+async def test_leader_deadline_does_not_reach_the_shared_read(engine, db, statements):
+    install_deadline_guard(engine)
+    service = ProductService(ProductRepository(db), queries=SingleFlight(ttl=0, stale=0))
+    deadline = Deadline(30)
+
+    async def leader():
+        current_deadline.set(deadline)
+        return await service.count_products()
+
+    leading = asyncio.create_task(leader())
+    await asyncio.sleep(0.01)
+    following = asyncio.create_task(service.count_products())
+    await asyncio.sleep(0.01)
+    # El cliente del lider se desconecta: su cancelacion no alcanza la consulta compartida
+    deadline.cancel()
+    leading.cancel()
+
+    assert await following == 20
+    assert len(statements) == 1
+
+
+async def test_writes_invalidate_shared_reads(db):
+    flight = SingleFlight(ttl=60, stale=0)
+    unsubscribe = invalidation_bus.subscribe("product", lambda ids: flight.invalidate())
+    service = ProductService(ProductRepository(db), queries=flight)
+    try:
+        assert [item.name for item in await service.get_most_expensive(1)] == ["Cafe 19"]
+
+        product = db.query(Product).filter(Product.name == "Cafe 0").one()
+        await service.update(product, ProductUpdate(price=1000))
+
+        assert [item.name for item in await service.get_most_expensive(1)] == ["Cafe 0"]
+    finally:
+        unsubscribe()
@@ -0,0 +1,138 @@
+import fastapi.routing
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from categories.models import Category
+from main import app
+from products.models import Product
+from shared.database import Base, get_db
+from shared.http_cache import etag_matches
+
+
+@pytest.fixture
+def db(db):
+    category = Category(name="Bebidas")
+    db.add(category)
+    db.flush()
+    for index, name in enumerate(["Cafe molido", "Te verde", "Cafe en grano"]):
+        db.add(Product(name=name, price=100 + index, stock=index, category_id=category.id))
+    db.commit()
+
+    app.dependency_overrides[get_db] = lambda: db
+    yield db
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+@pytest.fixture
+def work(monkeypatch):
+    """ Cuenta entidades ORM cargadas y respuestas serializadas por FastAPI """
+    counts = {"loads": 0, "serialized": 0}
+
+    def on_load(target, context):
+        counts["loads"] += 1
+
+    serialize = fastapi.routing.serialize_response
+
+    async def counting_serialize(*args, **kwargs):
+        counts["serialized"] += 1
+        return await serialize(*args, **kwargs)
+
+    event.listen(Base, "load", on_load, propagate=True)
+    monkeypatch.setattr(fastapi.routing, "serialize_response", counting_serialize)
+    yield counts
+    event.remove(Base, "load", on_load)
+
+
+@pytest.fixture(params=["products", "detail", "categories"])
+def url(request, db):
+    product = db.query(Product).filter(Product.name == "Te verde").one()
+    return {
+        "products": "/products?limit=10&sort=price_asc",
+        "detail": f"/products/{product.id}",
+        "categories": "/categories",
+    }[request.param]
+
+
+def test_full_response_carries_validators(client, url):
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+    assert "stale-while-revalidate" in response.headers["cache-control"]
+
+
+def test_matching_etag_skips_orm_load_and_serialization(client, url, work):
+    etag = client.get(url).headers["etag"]
+    work.update(loads=0, serialized=0)
+
+    response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert work == {"loads": 0, "serialized": 0}
+
+
+@pytest.mark.parametrize("kind", ["detail", "categories"])
+def test_repeated_read_is_served_from_body_cache(client, db, work, kind):
+    product = db.query(Product).filter(Product.name == "Te verde").one()
+    url = f"/products/{product.id}" if kind == "detail" else "/categories"
+    first = client.get(url)
+    work.update(loads=0)
+
+    second = client.get(url)
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert work["loads"] == 0
+
+
+def test_update_changes_product_etag(client, db):
+    product = db.query(Product).filter(Product.name == "Te verde").one()
+    etag = client.get(f"/products/{product.id}").headers["etag"]
+
+    product.price = 999
+    db.commit()
+    response = client.get(f"/products/{product.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["price"] == 999
+    assert response.headers["etag"] != etag
+
+
+def test_category_rename_changes_product_detail_etag(client, db):
+    product = db.query(Product).filter(Product.name == "Te verde").one()
+    etag = client.get(f"/products/{product.id}").headers["etag"]
+
+    product.category.name = "Infusiones"
+    db.commit()
+    response = client.get(f"/products/{product.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["category_name"] == "Infusiones"
+
+
+def test_if_modified_since(client, db):
+    product = db.query(Product).filter(Product.name == "Te verde").one()
+    last_modified = client.get(f"/products/{product.id}").headers["last-modified"]
+
+    assert client.get(f"/products/{product.id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abd"', False),
+    ("", False),
+])
+def test_etag_matching(header, expected):
+    assert etag_matches(header, '"abc"') is expected
@@ -0,0 +1,152 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from auth.dependencies import get_admin_required
+from categories.models import Category
+from main import app
+from products import images
+from products.images import ImagePipeline, ReceivedImage, get_image_pipeline, shutdown_image_pipeline
+from products.models import Product
+from shared.config import get_settings
+from shared.database import get_db
+from shared.storage import LocalObjectStore, upload_file
+
+
+def jpeg_bytes(size=(900, 600), color=(200, 80, 40)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalObjectStore(str(tmp_path / "store"), "/media")
+
+
+@pytest.fixture
+def pipeline(store):
+    # Un pool de hilos basta para probar; en la app es un pool de procesos
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        yield ImagePipeline(store, pool, part_size=64 * 1024)
+
+
+@pytest.fixture
+def product_and_client(pipeline, db):
+    category = Category(name="Bebidas")
+    db.add(category)
+    db.flush()
+    product = Product(name="Cafe molido", price=100, stock=3, category_id=category.id)
+    db.add(product)
+    db.commit()
+
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_admin_required] = lambda: None
+    app.dependency_overrides[get_image_pipeline] = lambda: pipeline
+    yield product, TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def upload(client, product, content: bytes):
+    return client.put(f"/products/{product.id}/image", files={"file": ("foto.jpg", content, "image/jpeg")})
+
+
+def test_upload_stores_variants_and_sets_image_url(product_and_client, store):
+    product, client = product_and_client
+
+    response = upload(client, product, jpeg_bytes())
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["deduplicated"] is False
+    assert product.image_url == body["image_url"]
+    assert body["thumbnail_url"].startswith("/media/products/")
+    thumbnail = os.path.join(store.root, body["thumbnail_url"].removeprefix("/media/"))
+    with Image.open(thumbnail) as image:
+        assert image.format == "WEBP"
+        assert max(image.size) == 320
+
+
+def test_repeated_upload_is_deduplicated(product_and_client):
+    product, client = product_and_client
+    content = jpeg_bytes()
+
+    first = upload(client, product, content).json()
+    second = upload(client, product, content).json()
+
+    assert second["deduplicated"] is True
+    assert second["image_url"] == first["image_url"]
+
+
+def test_rejects_files_that_are_not_images(product_and_client):
+    product, client = product_and_client
+
+    response = upload(client, product, b"%PDF-1.7 esto no es una imagen")
+
+    assert response.status_code == 422
+
+
+def test_rejects_files_over_the_limit(product_and_client, monkeypatch):
+    product, client = product_and_client
+    monkeypatch.setattr(get_settings(), "upload_max_bytes", 1024)
+
+    assert upload(client, product, jpeg_bytes(size=(1200, 1200))).status_code == 413
+
+
+async def test_concurrent_uploads_of_the_same_image_are_processed_once(pipeline, tmp_path):
+    calls = []
+    process = pipeline._process
+
+    async def counting_process(received, keys):
+        calls.append(received.sha256)
+        await process(received, keys)
+
+    pipeline._process = counting_process
+    path = tmp_path / "original"
+    path.write_bytes(jpeg_bytes())
+    received = ReceivedImage(str(path), "a" * 64, path.stat().st_size, "image/jpeg", "jpg")
+
+    results = await asyncio.gather(pipeline.store_image(received), pipeline.store_image(received))
+
+    assert sorted(results) == [False, True]
+    assert len(calls) == 1
+
+
+async def test_multipart_upload_reassembles_parts_in_order(store, tmp_path):
+    source = tmp_path / "source"
+    source.write_bytes(os.urandom(300_000))
+
+    await upload_file(store, "objetos/archivo", str(source), "application/octet-stream",
+                      part_size=64 * 1024, concurrency=3)
+
+    with open(os.path.join(store.root, "objetos/archivo"), "rb") as handle:
+        assert handle.read() == source.read_bytes()
+    assert os.listdir(os.path.join(store.root, ".uploads")) == []
+
+
+def test_concurrent_first_uploads_create_a_single_pool(monkeypatch):
+    created = []
+
+    class SlowPool(ThreadPoolExecutor):
+        def __init__(self, max_workers=None, mp_context=None):
+            created.append(self)
+            # Ensancha la ventana en la que otro hilo veria el pipeline sin crear
+            time.sleep(0.05)
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(images, "ProcessPoolExecutor", SlowPool)
+    monkeypatch.setattr(images, "get_object_store", lambda: None)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as threads:
+            pipelines = list(threads.map(lambda _: get_image_pipeline(), range(4)))
+    finally:
+        shutdown_image_pipeline()
+
+    assert len(created) == 1
+    assert all(pipeline is pipelines[0] for pipeline in pipelines)
@@ -0,0 +1,120 @@
+import uuid
+
+import pytest
+
+from categories.models import Category
+from products.catalog import CatalogSnapshot
+from products.models import Product
+from products.pricing import decode_cursor, encode_cursor, histogram_buckets
+from products.repository import ProductRepository
+from products.service import ProductService
+
+# Varios precios repetidos para que el orden dependa del desempate por id
+PRICES = [100, 250, 250, 250, 400, 999, 1000, 1000, 1500, 2500, 2500, 4000]
+
+
+@pytest.fixture
+def db(db):
+    food, drinks = Category(name="Comida"), Category(name="Bebidas")
+    db.add_all([food, drinks])
+    db.flush()
+    for i, price in enumerate(PRICES):
+        db.add(Product(
+            name=f"Producto {i}", price=price, stock=i % 3,
+            category_id=food.id if i % 2 else drinks.id
+        ))
+    db.add(Product(name="Inactivo", price=250, stock=5, is_active=False, category_id=food.id))
+    db.commit()
+    db.info["categories"] = (food.id, drinks.id)
+    return db
+
+
+@pytest.fixture
+def snapshot(db):
+    snapshot = CatalogSnapshot()
+    snapshot.refresh(db)
+    return snapshot
+
+
+def filter_cases(db):
+    food, _ = db.info["categories"]
+    return [
+        {},
+        {"min_price": 250, "max_price": 2500},
+        {"category_id": food},
+        {"in_stock": True, "min_price": 200},
+        {"category_id": food, "in_stock": False},
+    ]
+
+
+def active_by_price(db):
+    return (db.query(Product)
+            .filter(Product.is_active == True)  # noqa: E712
+            .order_by(Product.price, Product.id)
+            .all())
+
+
+def matches(product, min_price=None, max_price=None, category_id=None, in_stock=None):
+    return (
+        (min_price is None or product.price >= min_price)
+        and (max_price is None or product.price <= max_price)
+        and (category_id is None or product.category_id == category_id)
+        and (in_stock is None or (product.stock > 0) == in_stock)
+    )
+
+
+async def collect_pages(service, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page = await service.get_products_by_price_range(limit=limit, cursor=cursor, **filters)
+        pages.append([item.id for item in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def test_keyset_pages_match_between_snapshot_and_database(db, snapshot):
+    from_snapshot = ProductService(ProductRepository(db), snapshot)
+    from_database = ProductService(ProductRepository(db), None)
+
+    for filters in filter_cases(db):
+        expected = [product.id for product in active_by_price(db) if matches(product, **filters)]
+        snapshot_pages = await collect_pages(from_snapshot, 2, **filters)
+        database_pages = await collect_pages(from_database, 2, **filters)
+
+        assert snapshot_pages == database_pages
+        assert [product_id for page in database_pages for product_id in page] == expected
+
+
+async def test_histogram_matches_between_snapshot_and_database(db, snapshot):
+    from_snapshot = ProductService(ProductRepository(db), snapshot)
+    from_database = ProductService(ProductRepository(db), None)
+
+    for filters in filter_cases(db):
+        assert (await from_snapshot.price_histogram(1000, **filters)
+                == await from_database.price_histogram(1000, **filters))
+
+    assert await from_database.price_histogram(1000) == [
+        {"min_price": 0, "max_price": 1000, "count": 6},
+        {"min_price": 1000, "max_price": 2000, "count": 3},
+        {"min_price": 2000, "max_price": 3000, "count": 2},
+        {"min_price": 4000, "max_price": 5000, "count": 1},
+    ]
+
+
+def test_cursor_round_trip(db):
+    product = db.query(Product).first()
+    assert decode_cursor(encode_cursor(product.price, product.id)) == (product.price, product.id)
+
+
+@pytest.mark.parametrize("cursor", ["", "no-es-un-cursor", encode_cursor(1, uuid.uuid4())[:-3]])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_histogram_buckets_skip_empty_and_sort():
+    assert histogram_buckets({3: 2, 0: 1, 1: 0}, 500) == [
+        {"min_price": 0, "max_price": 500, "count": 1},
+        {"min_price": 1500, "max_price": 2000, "count": 2},
+    ]
@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from categories.models import Category
+from main import app
+from products.models import Product
+from shared.database import Base, get_db
+
+
+@pytest.fixture
+def client():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    category = Category(name="Bebidas")
+    session.add(category)
+    session.flush()
+    for index, name in enumerate(["Cafe molido", "Te verde", "Cafe en grano"]):
+        session.add(Product(name=name, price=100 + index, stock=index, category_id=category.id))
+    session.commit()
+
+    app.dependency_overrides[get_db] = lambda: session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    session.close()
+    engine.dispose()
+
+
+def test_list_products_paginates(client):
+    response = client.get("/products", params={"limit": 2})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+def test_list_products_searches_by_name(client):
+    response = client.get("/products", params={"search": "cafe"})
+
+    assert sorted(product["name"] for product in response.json()) == ["Cafe en grano", "Cafe molido"]
+
+
+def test_list_products_validates_limit(client):
+    assert client.get("/products", params={"limit": 500}).status_code == 422
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from categories.models import Category
+from main import app
+from products.models import Product
+from products.repository import ProductRepository
+from products.stock_feed import StockFeed, StockSubscriber, run_stock_feed, serve_stock_subscriber
+
+
+class FakeWebSocket:
+    """ Conexion en memoria: `inbox` simula lo que envia el cliente; None lo desconecta """
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+        self.sent = []
+
+    async def receive_json(self):
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect(1000)
+        return message
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        pass
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def products(session_factory):
+    session = session_factory()
+    category = Category(name="Bebidas")
+    session.add(category)
+    session.flush()
+    products = [Product(name=f"Cafe {index}", price=100, stock=10, category_id=category.id) for index in range(2)]
+    session.add_all(products)
+    session.commit()
+    ids = [product.id for product in products]
+    session.close()
+    return ids
+
+
+async def wait_until(condition, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_slow_subscriber_keeps_only_latest_value():
+    feed = StockFeed()
+    subscriber = StockSubscriber()
+    feed.subscribe(subscriber, ["a", "b"])
+
+    feed.publish({"a": 5})
+    feed.publish({"a": 4, "b": 1})
+    feed.publish({"a": 4})
+
+    assert subscriber.pending == {"a": 4, "b": 1}
+    assert subscriber.dropped == 1
+    assert feed.updates == 3
+
+
+def test_unsubscribe_drops_empty_topics():
+    feed = StockFeed()
+    first, second = StockSubscriber(), StockSubscriber()
+    feed.subscribe(first, ["a"])
+    feed.subscribe(second, ["a", "b"])
+
+    feed.unsubscribe(second)
+
+    assert feed.topics == {"a": {first}}
+
+
+async def test_stock_writes_are_coalesced_per_tick(session_factory, products):
+    feed = StockFeed()
+    task = asyncio.create_task(run_stock_feed(session_factory, 0.05, feed))
+    websocket = FakeWebSocket()
+    serving = asyncio.create_task(serve_stock_subscriber(websocket, 10, 1.0, feed))
+    product_id, other_id = (str(product_id) for product_id in products)
+    try:
+        await wait_until(lambda: feed.running)
+        await websocket.inbox.put({"subscribe": [product_id, other_id]})
+        await wait_until(lambda: websocket.sent)
+        assert websocket.sent == [{"stock": {product_id: 10, other_id: 10}}]
+
+        db = session_factory()
+        repository = ProductRepository(db)
+        product = db.get(Product, products[0])
+        for stock in (9, 8, 7):
+            await repository.update_stock(product, stock)
+        db.close()
+        await wait_until(lambda: len(websocket.sent) > 1)
+        await asyncio.sleep(0.1)
+
+        assert websocket.sent[1:] == [{"stock": {product_id: 7}}]
+    finally:
+        await websocket.inbox.put(None)
+        await serving
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert feed.topics == {}
+
+
+async def test_invalid_and_unknown_products_are_reported(session_factory, products):
+    feed = StockFeed()
+    feed.bind(asyncio.get_running_loop(), session_factory)
+    websocket = FakeWebSocket()
+    serving = asyncio.create_task(serve_stock_subscriber(websocket, 1, 1.0, feed))
+    unknown = "00000000-0000-0000-0000-000000000000"
+
+    await websocket.inbox.put({"subscribe": ["no-es-un-id"]})
+    await websocket.inbox.put({"subscribe": [unknown]})
+    await websocket.inbox.put({"subscribe": [str(products[0]), str(products[1])]})
+    await wait_until(lambda: sum(len(message.get("errors", [])) for message in websocket.sent) >= 3)
+    await websocket.inbox.put(None)
+    await serving
+
+    errors = [error for message in websocket.sent for error in message.get("errors", [])]
+    assert any("invalido" in error for error in errors)
+    assert any(unknown in error for error in errors)
+    assert any("Maximo 1" in error for error in errors)
+
+
+def test_endpoint_refuses_when_feed_is_not_running():
+    with pytest.raises(WebSocketDisconnect) as error:
+        with TestClient(app).websocket_connect("/products/stock/ws"):
+            pass
+
+    assert error.value.code == 1013
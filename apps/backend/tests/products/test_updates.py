@@ -0,0 +1,116 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from auth.dependencies import get_admin_required
+from categories.models import Category
+from main import app
+from products.exceptions import ProductVersionConflictException
+from products.models import Product
+from products.repository import ProductRepository
+from shared.database import Base, get_db
+from shared.replicas import STICKY_KEY, ReplicaSet, RoutingSession
+
+
+@pytest.fixture
+def db(db):
+    category = Category(name="Bebidas")
+    db.add(category)
+    db.flush()
+    db.add(Product(name="Cafe molido", price=100, stock=3, category_id=category.id))
+    db.commit()
+
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_admin_required] = lambda: type("Admin", (), {"id": "admin"})()
+    yield db
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+@pytest.fixture
+def product(db):
+    return db.query(Product).one()
+
+
+def test_update_with_matching_if_match_returns_new_etag(client, product):
+    etag = client.get(f"/products/{product.id}").headers["etag"]
+
+    response = client.put(f"/products/{product.id}", json={"price": 250}, headers={"If-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["price"] == 250
+    assert response.headers["etag"] != etag
+    assert response.headers["etag"] == client.get(f"/products/{product.id}").headers["etag"]
+
+
+def test_stale_if_match_is_rejected_without_writing(client, product):
+    etag = client.get(f"/products/{product.id}").headers["etag"]
+    assert client.put(f"/products/{product.id}", json={"price": 250}, headers={"If-Match": etag}).status_code == 200
+
+    # Segundo administrador con la version que leyo antes del primer cambio
+    response = client.put(f"/products/{product.id}", json={"price": 300}, headers={"If-Match": etag})
+
+    assert response.status_code == 412
+    assert response.headers["etag"] == client.get(f"/products/{product.id}").headers["etag"]
+    assert client.get(f"/products/{product.id}").json()["price"] == 250
+
+
+def test_update_without_if_match_is_unconditional(client, product):
+    assert client.put(f"/products/{product.id}", json={"stock": 9}).status_code == 200
+
+
+async def test_concurrent_writer_wins_and_the_other_conflicts(engine, db, product):
+    other = sessionmaker(bind=engine)()
+    other_product = other.get(Product, product.id)
+    await ProductRepository(other).update(other_product, {"price": 400}, expected_version=1)
+    other.close()
+
+    with pytest.raises(ProductVersionConflictException):
+        await ProductRepository(db).update(product, {"price": 500}, expected_version=1)
+
+    assert product.price == 400
+    assert product.version == 2
+
+
+async def test_update_is_a_single_statement(engine, db, product):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        updated = await ProductRepository(db).update(product, {"name": "Cafe en grano"}, expected_version=1)
+        assert (updated.name, updated.version) == ("Cafe en grano", 2)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert statements == ["UPDATE"]
+
+
+async def test_update_pins_the_writer_to_the_primary(engine, product):
+    # La replica esta vacia: una lectura que la use no encuentra el producto
+    replica = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(replica)
+    replicas = ReplicaSet([replica], sticky_seconds=5)
+    factory = sessionmaker(class_=RoutingSession, bind=engine, replicas=replicas)
+
+    def session_for(key):
+        session = factory()
+        session.info[STICKY_KEY] = key
+        return session
+
+    writer = session_for("admin")
+    await ProductRepository(writer).update(writer.get(Product, product.id), {"price": 250}, expected_version=1)
+
+    # El UPDATE ... RETURNING no pasa por el flush, pero igual cuenta como escritura
+    assert (await ProductRepository(writer).get_detail(product.id)).price == 250
+    assert (await ProductRepository(session_for("admin")).get_detail(product.id)).price == 250
+    assert await ProductRepository(session_for("otro")).get_detail(product.id) is None
+    replica.dispose()
@@ -0,0 +1,122 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from shared.admission import AdmissionController, AdmissionMiddleware
+from shared.metrics import MetricsRegistry
+
+
+def make_app(**options):
+    registry = MetricsRegistry()
+    controller = AdmissionController(max_in_flight=10, max_loop_lag=0.25, registry=registry, **options)
+
+    app = FastAPI()
+
+    @app.get("/products")
+    def browse():
+        return {"items": []}
+
+    @app.put("/products/1")
+    def update():
+        return {"id": 1}
+
+    @app.post("/auth/login")
+    def login():
+        return {"access_token": "x"}
+
+    @app.get("/metrics")
+    def metrics():
+        return {}
+
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    return TestClient(app), controller, registry
+
+
+def statuses(client) -> tuple:
+    return (
+        client.get("/products").status_code,
+        client.put("/products/1").status_code,
+        client.post("/auth/login").status_code,
+    )
+
+
+def test_routes_are_classified_by_prefix():
+    controller = AdmissionController()
+
+    assert controller.classify("POST", "/auth/login") == "critical"
+    assert controller.classify("GET", "/products") == "low"
+    assert controller.classify("PUT", "/products/1") == "normal"
+    assert controller.classify("GET", "/me") == "normal"
+
+
+def test_loop_lag_sheds_by_priority():
+    client, controller, registry = make_app()
+    assert statuses(client) == (200, 200, 200)
+
+    registry.loop_lag = 0.15
+    assert statuses(client) == (503, 200, 200)
+
+    registry.loop_lag = 0.2
+    assert statuses(client) == (503, 503, 200)
+
+    registry.loop_lag = 1.4
+    rejected = client.post("/auth/login")
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "2"
+    # Las rutas operativas siguen respondiendo para poder diagnosticar
+    assert client.get("/metrics").status_code == 200
+
+    assert controller.shed == {"critical": 1, "normal": 1, "low": 2}
+    assert controller.in_flight == 0
+    assert 'admission_requests_total{priority="low",decision="shed"} 2' in controller.render_prometheus()
+
+
+def test_in_flight_requests_raise_pressure():
+    client, controller, _ = make_app()
+
+    controller.in_flight = 6
+    assert statuses(client) == (503, 200, 200)
+    assert controller.in_flight == 6
+    assert controller.state()["shedding"] == ["low"]
+
+
+def test_saturated_pool_sheds_even_critical_routes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool, pool_size=2, max_overflow=0)
+    client, controller, _ = make_app()
+    controller.watch_pool(engine.pool)
+
+    first = engine.connect()
+    assert controller.pool_saturation() == 0.5
+    assert statuses(client) == (503, 200, 200)
+
+    second = engine.connect()
+    assert statuses(client) == (503, 503, 503)
+
+    first.close()
+    second.close()
+    assert statuses(client) == (200, 200, 200)
+    engine.dispose()
+
+
+def test_background_connections_and_unbounded_pools(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool, pool_size=3, max_overflow=2)
+    controller = AdmissionController(registry=MetricsRegistry(), pool_reserved=1)
+    controller.watch_pool(engine.pool)
+
+    # La conexion de una tarea de fondo no es carga
+    background = engine.connect()
+    assert controller.pool_saturation() == 0.0
+    requests = [engine.connect() for _ in range(2)]
+    assert controller.pool_saturation() == 0.5
+
+    unbounded = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool, pool_size=1, max_overflow=-1)
+    controller.watch_pool(unbounded.pool)
+    extra = [unbounded.connect() for _ in range(3)]
+    assert controller.pool_saturation() == 0.0
+    assert controller.pressure() < 0.5
+
+    for connection in [background, *requests, *extra]:
+        connection.close()
+    engine.dispose()
+    unbounded.dispose()
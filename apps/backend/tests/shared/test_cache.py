@@ -0,0 +1,84 @@
+import multiprocessing
+import time
+
+import pytest
+
+from shared.cache import LocalCache, SharedMemoryCache
+
+
+@pytest.fixture
+def shared(tmp_path):
+    caches = []
+
+    def open_cache(**kwargs):
+        kwargs.setdefault("size_bytes", 64 * 1024)
+        kwargs.setdefault("slot_size", 256)
+        cache = SharedMemoryCache(str(tmp_path / "cache"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield open_cache
+    for cache in caches:
+        cache.close()
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(max_bytes=25)
+    cache.set("a", b"x" * 9)
+    cache.set("b", b"x" * 9)
+    cache.get("a")
+    cache.set("c", b"x" * 9)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"x" * 9
+    assert cache.size <= 25
+
+
+def test_shared_cache_round_trip_and_expiry(shared):
+    cache = shared()
+    cache.set("k", b"value")
+    cache.set("short", b"value", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("k") == b"value"
+    assert cache.get("short") is None
+    cache.delete("k")
+    assert cache.get("k") is None
+
+
+def test_shared_cache_rejects_values_larger_than_a_slot(shared):
+    cache = shared()
+
+    assert cache.set("big", b"x" * 1024) is False
+    assert cache.get("big") is None
+
+
+def test_clock_gives_read_entries_a_second_chance(shared):
+    # Un solo conjunto de 4 vias
+    cache = shared(size_bytes=4 * 256, ways=4)
+    for index in range(4):
+        cache.set(f"k{index}", b"v")
+    cache.get("k0")
+
+    cache.set("k4", b"v")
+
+    assert cache.get("k0") == b"v"
+    assert cache.get("k1") is None
+    assert cache.evictions == 1
+
+
+def _write_from_child(path: str) -> None:
+    cache = SharedMemoryCache(path, size_bytes=64 * 1024, slot_size=256)
+    cache.set("from-child", b"hola")
+    cache.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="requiere fork")
+def test_workers_share_the_segment(shared, tmp_path):
+    cache = shared()
+    child = multiprocessing.get_context("fork").Process(target=_write_from_child, args=(str(tmp_path / "cache"),))
+    child.start()
+    child.join(10)
+
+    assert child.exitcode == 0
+    assert cache.get("from-child") == b"hola"
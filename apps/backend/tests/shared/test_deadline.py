@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import StaticPool
+
+from shared.deadline import Deadline, DeadlineMiddleware, current_deadline, install_deadline_guard, within_deadline
+from shared.exceptions import AppBaseException, DeadlineExceededException, RequestCancelledException
+
+# Cuenta hasta 10^8 en SQLite: varios segundos si nadie la interrumpe
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) SELECT count(*) FROM n"
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    install_deadline_guard(engine)
+    yield engine
+    engine.dispose()
+
+
+def run_with_deadline(engine, deadline: Deadline, statement=SLOW_QUERY):
+    token = current_deadline.set(deadline)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(statement).scalar()
+    finally:
+        current_deadline.reset(token)
+
+
+def test_slow_statement_is_interrupted_at_the_deadline(engine):
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceededException):
+        run_with_deadline(engine, Deadline(0.05))
+    assert time.perf_counter() - start < 1
+
+    # La conexion queda sana para la siguiente peticion y sin tiempo limite
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+async def test_expired_deadline_sends_no_statement(engine):
+    statements = []
+    event.listen(engine, "after_cursor_execute", lambda *args: statements.append(args[2]))
+    deadline = Deadline(0.001)
+    time.sleep(0.01)
+
+    with pytest.raises(DeadlineExceededException):
+        run_with_deadline(engine, deadline, text("SELECT 1"))
+    assert statements == []
+
+    called = []
+
+    async def outbound():
+        called.append(True)
+
+    token = current_deadline.set(deadline)
+    try:
+        with pytest.raises(DeadlineExceededException):
+            await within_deadline(outbound())
+    finally:
+        current_deadline.reset(token)
+    assert called == []
+
+
+def test_middleware_maps_deadline_to_504(engine):
+    app = FastAPI()
+
+    @app.get("/products/search")
+    def search():
+        with engine.connect() as conn:
+            return {"count": conn.execute(SLOW_QUERY).scalar()}
+
+    @app.get("/search")
+    def slow_search():
+        return search()
+
+    @app.get("/fast")
+    def fast():
+        with engine.connect() as conn:
+            return {"one": conn.execute(text("SELECT 1")).scalar()}
+
+    app.add_middleware(DeadlineMiddleware, default_timeout=5.0, route_timeouts={"/products": 0.05})
+    client = TestClient(app)
+
+    assert client.get("/products/search").status_code == 504
+    # La cabecera no alarga el limite de la ruta
+    assert client.get("/products/search", headers={"X-Request-Timeout-Ms": "60000"}).status_code == 504
+    response = client.get("/fast", headers={"X-Request-Timeout-Ms": "50"})
+    assert response.status_code == 200
+    # La cabecera del cliente manda sobre el limite por defecto de la ruta
+    timed_out = client.get("/search", headers={"X-Request-Timeout-Ms": "50"})
+    assert timed_out.status_code == 504
+    assert "50 ms" in timed_out.json()["detail"]
+
+
+async def test_app_handler_maps_deadline_to_504():
+    from main import app, custom_exception_handler
+
+    assert app.exception_handlers[AppBaseException] is custom_exception_handler
+    response = await custom_exception_handler(None, DeadlineExceededException())
+    assert response.status_code == 504
+    with pytest.raises(RequestCancelledException):
+        await custom_exception_handler(None, RequestCancelledException())
+
+
+async def test_client_disconnect_cancels_the_query(engine):
+    seen = {}
+
+    async def endpoint(scope, receive, send):
+        seen["deadline"] = current_deadline.get()
+        await asyncio.to_thread(run_with_deadline, engine, seen["deadline"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = DeadlineMiddleware(endpoint, default_timeout=30.0)
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    start = time.perf_counter()
+    await middleware({"type": "http", "method": "GET", "path": "/products", "headers": []}, receive, send)
+
+    assert time.perf_counter() - start < 1
+    assert seen["deadline"].cancelled
+    assert sent == []
+
+
+async def test_deadline_restarts_once_the_body_is_read():
+    seen = {}
+
+    async def endpoint(scope, receive, send):
+        while (await receive()).get("more_body", False):
+            pass
+        seen["remaining"] = current_deadline.get().remaining()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = DeadlineMiddleware(endpoint, default_timeout=0.1)
+    chunks = [
+        {"type": "http.request", "body": b"b", "more_body": False},
+        {"type": "http.request", "body": b"a", "more_body": True},
+    ]
+
+    async def receive():
+        if chunks:
+            # Una subida lenta: el cuerpo tarda mas que el tiempo limite
+            await asyncio.sleep(0.1)
+            return chunks.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "PUT", "path": "/products/1/image", "headers": [(b"content-length", b"2")]}
+    await middleware(scope, receive, send)
+
+    assert seen["remaining"] > 0.05
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from shared.invalidation import InvalidationBus, LocalChannel, LocalHub, run_invalidation_listener
+
+
+@pytest.fixture
+def session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def recorder(bus: InvalidationBus, entity: str = "product"):
+    calls = []
+    bus.subscribe(entity, calls.append)
+    return calls
+
+
+async def wait_until(condition, timeout: float = 1.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.005)
+
+
+def test_commit_evicts_locally_and_rollback_discards(session):
+    bus = InvalidationBus()
+    calls = recorder(bus)
+
+    bus.publish(session, "product", ["a"])
+    session.rollback()
+    assert calls == []
+
+    bus.publish(session, "product", ["a"])
+    bus.publish(session, "product", ["b"])
+    session.commit()
+    assert calls == [frozenset({"a", "b"})]
+
+
+async def test_remote_burst_is_coalesced(session):
+    hub = LocalHub()
+    writer, reader = InvalidationBus(), InvalidationBus()
+    calls = recorder(reader)
+    own = recorder(writer)
+    tasks = [
+        asyncio.create_task(run_invalidation_listener(bus, LocalChannel(hub), coalesce_seconds=0.05))
+        for bus in (writer, reader)
+    ]
+    try:
+        await wait_until(lambda: writer.connected and reader.connected)
+        calls.clear()
+        own.clear()
+
+        for product_id in ["a", "b", "c"]:
+            writer.publish(session, "product", [product_id])
+            session.commit()
+        await wait_until(lambda: calls)
+        await asyncio.sleep(0.1)
+
+        assert calls == [frozenset({"a", "b", "c"})]
+        # El worker que escribe invalida al confirmar y no reaplica su propio mensaje
+        assert own == [frozenset({"a"}), frozenset({"b"}), frozenset({"c"})]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def test_disconnect_falls_back_and_reconnect_evicts_all():
+    bus = InvalidationBus()
+    channel = LocalChannel(LocalHub())
+    states = []
+    bus.on_state(states.append)
+    calls = recorder(bus)
+    task = asyncio.create_task(run_invalidation_listener(bus, channel, reconnect_seconds=0.01))
+    try:
+        await wait_until(lambda: bus.connected)
+        channel.disconnect()
+        await wait_until(lambda: len(states) >= 4)
+
+        assert states == [False, True, False, True]
+        # Cada conexion descarta todo lo cacheado: pudo haber escrituras sin aviso
+        assert calls == [None, None]
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def test_large_batches_invalidate_whole_entity():
+    bus = InvalidationBus(max_payload_ids=2)
+
+    small, = bus.payloads({"product": {"a", "b"}})
+    large, = bus.payloads({"product": {"a", "b", "c"}})
+
+    assert json.loads(small)["ids"] == ["a", "b"]
+    assert json.loads(large)["ids"] is None
@@ -0,0 +1,79 @@
+import io
+import json
+import logging
+
+import pytest
+
+from shared import log
+from shared.log import DeferredQueueHandler, StructuredFormatter, configure_logging, get_logger, stop_logging
+
+
+class CountingValue:
+    """ Valor que cuenta cuantas veces se convierte a texto """
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "valor"
+
+
+@pytest.fixture
+def stream():
+    output = io.StringIO()
+    configure_logging("INFO", json_output=True, sample_every=10, stream=output)
+    yield output
+    stop_logging()
+    logging.getLogger().handlers = [
+        handler for handler in logging.getLogger().handlers if not isinstance(handler, DeferredQueueHandler)
+    ]
+
+
+def read_events(stream):
+    stop_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_disabled_level_does_not_create_records(stream, monkeypatch):
+    created = []
+    monkeypatch.setattr(logging.Logger, "makeRecord", lambda *args, **kwargs: created.append(args))
+    value = CountingValue()
+
+    get_logger("tests.disabled").debug("Evento de depuracion", value=value)
+
+    assert created == []
+    assert value.formatted == 0
+
+
+def test_fields_are_serialized_by_the_listener(stream):
+    get_logger("tests.fields").info("Producto creado exitosamente", product_id=7, event="colision")
+
+    [event] = read_events(stream)
+    assert event["event"] == "Producto creado exitosamente"
+    assert event["product_id"] == 7
+    assert event["field_event"] == "colision"
+    assert event["level"] == "INFO"
+
+
+def test_info_sampled_emits_one_of_every_n(stream):
+    logger = get_logger("tests.sampled")
+    for product_id in range(25):
+        logger.info_sampled("Buscando producto por ID", product_id=product_id)
+
+    events = read_events(stream)
+    assert [event["product_id"] for event in events] == [0, 10, 20]
+    assert all(event["sampled_every"] == 10 for event in events)
+
+
+def test_queue_handler_does_not_format_on_the_emitting_thread():
+    handler = DeferredQueueHandler(log.queue.SimpleQueue())
+    value = CountingValue()
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "evento", (), None)
+    record.fields = {"value": value}
+
+    handler.emit(record)
+
+    assert value.formatted == 0
+    assert "valor" in StructuredFormatter(json_output=False).format(record)
+    assert value.formatted == 1
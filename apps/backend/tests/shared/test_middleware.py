@@ -0,0 +1,182 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from shared.metrics import MetricsRegistry, instrument_engine
+from shared.middleware import InstrumentationMiddleware
+
+
+def make_app():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    registry = MetricsRegistry()
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    app.add_middleware(InstrumentationMiddleware, registry=registry)
+    return app, registry
+
+
+def test_records_route_template_sizes_and_queries():
+    app, registry = make_app()
+    client = TestClient(app)
+
+    for item_id in (1, 2):
+        response = client.get(f"/items/{item_id}")
+        assert response.status_code == 200
+
+    metrics = registry.routes[("GET", "/items/{item_id}")]
+    assert metrics.latency.count == 2
+    assert metrics.queries.sum == 6
+    assert metrics.response_size.sum == len(b'{"id":1}') * 2
+    assert metrics.statuses == {200: 2}
+
+    assert 'desc="3 queries"' in response.headers["server-timing"]
+
+
+def test_unmatched_routes_share_one_label():
+    app, registry = make_app()
+    client = TestClient(app)
+
+    client.get("/nope/1")
+    client.get("/nope/2")
+
+    assert registry.routes[("GET", "unmatched")].statuses == {404: 2}
+
+
+def test_prometheus_rendering():
+    app, registry = make_app()
+    TestClient(app).get("/items/1")
+
+    body = registry.render_prometheus()
+
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/items/{item_id}",le="+Inf"} 1' in body
+    assert 'http_request_db_queries_sum{method="GET",route="/items/{item_id}"} 3' in body
+    assert "event_loop_lag_seconds" in body
+
+
+# ==================== COMPRESION ==================== #
+
+import asyncio
+import gzip
+
+from fastapi.responses import Response, StreamingResponse
+
+from shared.middleware import CompressedBodyCache, CompressionMiddleware, _Encoder, available_encoders
+
+
+def make_compression_app(**options):
+    app = FastAPI()
+    calls = []
+    gzip_encoder = available_encoders()["gzip"]
+
+    def compress(data):
+        try:
+            asyncio.get_running_loop()
+            calls.append("loop")
+        except RuntimeError:
+            calls.append("thread")
+        return gzip_encoder.compress(data)
+
+    @app.get("/items")
+    def items(count: int = 100):
+        return [{"id": index, "name": f"Producto {index}"} for index in range(count)]
+
+    @app.get("/versioned")
+    def versioned():
+        return Response('{"items": "' + "x" * 5000 + '"}', media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/not-modified")
+    def not_modified():
+        return Response(status_code=304, headers={"ETag": '"v1"'})
+
+    @app.get("/png")
+    def png():
+        return Response(b"\x89PNG" + bytes(5000), media_type="image/png")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"linea {index}\n" for index in range(2000)), media_type="text/plain")
+
+    options.setdefault("encoders", {"gzip": _Encoder("gzip", compress, gzip_encoder.stream)})
+    options.setdefault("cache", CompressedBodyCache())
+    app.add_middleware(CompressionMiddleware, **options)
+    return TestClient(app), calls, options["cache"]
+
+
+def test_compresses_large_json_and_skips_small_bodies():
+    client, calls, _ = make_compression_app()
+
+    large = client.get("/items", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/items", params={"count": 1}, headers={"Accept-Encoding": "gzip"})
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["vary"] == "Accept-Encoding"
+    assert int(large.headers["content-length"]) < len(large.content)
+    assert len(large.json()) == 100
+    assert "content-encoding" not in small.headers
+
+
+def test_respects_accept_encoding_and_content_type_allowlist():
+    client, calls, _ = make_compression_app()
+
+    assert "content-encoding" not in client.get("/items", headers={"Accept-Encoding": "gzip;q=0"}).headers
+    assert "content-encoding" not in client.get("/items", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/png", headers={"Accept-Encoding": "gzip"}).headers
+    assert calls == []
+
+
+def test_large_bodies_are_compressed_off_the_event_loop():
+    client, calls, _ = make_compression_app(offload_size=2048)
+
+    client.get("/items", params={"count": 50}, headers={"Accept-Encoding": "gzip"})
+    client.get("/items", params={"count": 500}, headers={"Accept-Encoding": "gzip"})
+
+    assert calls == ["loop", "thread"]
+
+
+def test_bodies_with_strong_etag_are_compressed_once():
+    client, calls, cache = make_compression_app()
+
+    first = client.get("/versioned", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/versioned", headers={"Accept-Encoding": "gzip"})
+
+    assert first.content == second.content
+    assert first.headers["etag"] == 'W/"v1"'
+    assert len(calls) == 1
+    assert cache.hits == 1
+
+
+def test_not_modified_matches_the_compressed_response_headers():
+    client, calls, _ = make_compression_app()
+
+    compressed = client.get("/versioned", headers={"Accept-Encoding": "gzip"})
+    not_modified = client.get(
+        "/not-modified", headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]}
+    )
+    uncompressed = client.get("/not-modified", headers={"Accept-Encoding": "gzip", "If-None-Match": '"v1"'})
+
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == 'W/"v1"'
+    assert not_modified.headers["vary"] == "Accept-Encoding"
+    # Valida una respuesta sin comprimir: el ETag sigue fuerte
+    assert uncompressed.headers["etag"] == '"v1"'
+    assert uncompressed.headers["vary"] == "Accept-Encoding"
+
+
+def test_streaming_responses_are_compressed_by_chunks():
+    client, _, _ = make_compression_app()
+
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.splitlines()[-1] == "linea 1999"
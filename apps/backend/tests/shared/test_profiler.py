@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from shared import profiler
+from shared.middleware import InstrumentationMiddleware
+from shared.metrics import MetricsRegistry
+from shared.profiler import fingerprint, install_query_profiler, parameter_shape
+
+
+def test_fingerprint_normalizes_literals_and_binds():
+    a = fingerprint("SELECT * FROM products WHERE id = %(id_1)s AND name = 'x'  LIMIT 10")
+    b = fingerprint("SELECT *   FROM products WHERE id = %(id_1)s AND name = 'other' LIMIT 20")
+
+    assert a == b == "SELECT * FROM products WHERE id = ? AND name = ? LIMIT ?"
+    assert fingerprint("SELECT 1 FROM t WHERE id IN (?, ?, ?)") == "SELECT ? FROM t WHERE id IN (...)"
+
+
+def test_parameter_shape_hides_values():
+    assert parameter_shape({"email": "a@b.com", "limit": 3}) == {"email": "str", "limit": "int"}
+    assert parameter_shape([(1,), (2,)], executemany=True)["rows"] == 2
+
+
+def make_profiled_app(monkeypatch, slow_threshold_ms, n_plus_one_threshold):
+    query_profiler = profiler.QueryProfiler(slow_threshold_ms, n_plus_one_threshold)
+    monkeypatch.setattr(profiler, "query_profiler", query_profiler)
+
+    engine = create_engine("sqlite://")
+    install_query_profiler(engine)
+
+    app = FastAPI()
+
+    @app.get("/orders/{order_id}")
+    def read_order(order_id: int):
+        with engine.connect() as conn:
+            for line in range(5):
+                conn.execute(text("SELECT :line"), {"line": line})
+        return {"id": order_id}
+
+    app.add_middleware(InstrumentationMiddleware, registry=MetricsRegistry())
+    return TestClient(app), query_profiler
+
+
+def test_slow_queries_capture_call_site(monkeypatch):
+    client, query_profiler = make_profiled_app(monkeypatch, slow_threshold_ms=0, n_plus_one_threshold=100)
+
+    client.get("/orders/1")
+
+    [entry] = query_profiler.top_slow()
+    assert entry["fingerprint"] == "SELECT ?"
+    assert entry["count"] == 5
+    assert entry["parameters"] == ["int"]
+    # Las pruebas viven fuera de src/, por eso el origen no incluye frames de la app
+    assert isinstance(entry["call_site"], list)
+
+
+def test_n_plus_one_flagged_once_per_request(monkeypatch):
+    client, query_profiler = make_profiled_app(monkeypatch, slow_threshold_ms=10_000, n_plus_one_threshold=3)
+
+    client.get("/orders/1")
+    client.get("/orders/2")
+
+    [entry] = query_profiler.top_n_plus_one()
+    assert entry["route"] == "/orders/{order_id}"
+    assert entry["occurrences"] == 2
+    assert entry["max_executions"] == 5
+    assert query_profiler.top_slow() == []
@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from auth.models import User
+from shared.database import Base
+from shared.replicas import STICKY_KEY, ReplicaSet, RoutingSession
+from users.repository import UserRepository
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_engine(name):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add(User(name=name, email=f"{name}@example.com", password="x"))
+        session.commit()
+    return engine
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def setup(clock):
+    # Cada engine tiene un usuario distinto para saber de donde salio cada lectura
+    primary = make_engine("primary")
+    replica = make_engine("replica")
+    replicas = ReplicaSet([replica], sticky_seconds=5, clock=clock)
+    factory = sessionmaker(class_=RoutingSession, bind=primary, replicas=replicas)
+    return factory, replicas, replica
+
+
+def names(users):
+    return [user.name for user in users]
+
+
+def test_read_only_methods_use_replica_and_others_use_primary(setup):
+    factory, _, _ = setup
+    session = factory()
+    repo = UserRepository(session)
+
+    assert names(repo.list_users()) == ["replica"]
+    # Las consultas no marcadas como solo lectura van al primario
+    assert session.query(User).first().name == "primary"
+
+
+async def test_credential_lookup_reads_from_primary(setup):
+    factory, _, _ = setup
+    # Registrado en la primaria y aun no replicado
+    with factory() as writer:
+        writer.add(User(name="nuevo", email="nuevo@example.com", password="x"))
+        writer.commit()
+
+    user = await UserRepository(factory()).get_by_email("nuevo@example.com")
+    assert user is not None and user.name == "nuevo"
+
+
+def test_unhealthy_replica_falls_back_to_primary(setup):
+    factory, replicas, replica = setup
+    replicas.set_healthy(replica, False)
+
+    assert names(UserRepository(factory()).list_users()) == ["primary"]
+
+
+def test_reads_stick_to_primary_after_own_write(setup, clock):
+    factory, _, _ = setup
+
+    writer = factory()
+    writer.info[STICKY_KEY] = "user-1"
+    writer.add(User(name="nuevo", email="nuevo@example.com", password="x"))
+    writer.commit()
+    # La misma sesion ya no lee de replicas
+    assert "nuevo" in names(UserRepository(writer).list_users())
+
+    same_user = factory()
+    same_user.info[STICKY_KEY] = "user-1"
+    other_user = factory()
+    other_user.info[STICKY_KEY] = "user-2"
+    assert "nuevo" in names(UserRepository(same_user).list_users())
+    assert names(UserRepository(other_user).list_users()) == ["replica"]
+
+    clock.now += 6
+    later = factory()
+    later.info[STICKY_KEY] = "user-1"
+    assert names(UserRepository(later).list_users()) == ["replica"]
+
+
+def test_least_loaded_replica_is_chosen():
+    first, second = make_engine("a"), make_engine("b")
+    replicas = ReplicaSet([first, second])
+
+    with first.connect():
+        assert replicas.choose() is second
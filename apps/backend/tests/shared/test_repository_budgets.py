@@ -0,0 +1,21 @@
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARK = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks", "bench_repositories.py"
+)
+
+
+def test_repositories_stay_within_statement_row_and_allocation_budgets():
+    result = subprocess.run(
+        [sys.executable, BENCHMARK, "--iterations", "5", "--check"],
+        env=dict(os.environ),
+        capture_output=True,
+        text=True
+    )
+
+    report = json.loads(result.stdout)
+    assert report["failures"] == [], report["failures"]
+    assert result.returncode == 0
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jose.exceptions import ExpiredSignatureError, JWTError
+
+from shared.keys import KeyRing, VerificationKey, load_jwks
+
+
+def make_key_ring(algorithm, kid="k1"):
+    if algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    return KeyRing.from_keys(algorithm, signing_key=private_key, kid=kid)
+
+
+@pytest.mark.parametrize("algorithm", ["ES256", "EdDSA"])
+def test_sign_and_verify_roundtrip(algorithm):
+    ring = make_key_ring(algorithm)
+    token = ring.sign({"sub": "42", "email": "a@b.com", "role": "client", "exp": int(time.time()) + 60})
+
+    claims = ring.verify(token)
+
+    assert claims["sub"] == "42"
+    assert claims["role"] == "client"
+
+
+def test_hmac_roundtrip():
+    ring = KeyRing(
+        "HS256",
+        signing_key=b"secret",
+        verification_keys={None: VerificationKey("HS256", b"secret")}
+    )
+
+    token = ring.sign({"sub": "1"})
+
+    assert ring.verify(token)["sub"] == "1"
+    assert ring.jwks() == {"keys": []}
+
+
+def test_verify_token_returns_payload_without_revalidation():
+    from auth.schemas import TokenPayload
+    from shared.security import create_access_token, verify_token
+
+    token = create_access_token(TokenPayload(sub="5", email="a@b.com", role="admin"))
+    payload = verify_token(token)
+
+    assert isinstance(payload, TokenPayload)
+    assert payload.sub == "5"
+    assert payload.role == "admin"
+
+
+@pytest.mark.parametrize("algorithm", ["ES256", "EdDSA"])
+def test_edge_node_verifies_with_public_jwks_only(algorithm):
+    signer = make_key_ring(algorithm)
+    edge = KeyRing.from_keys(algorithm, verification_keys=load_jwks(signer.jwks()))
+
+    token = signer.sign({"sub": "7"})
+
+    assert edge.verify(token)["sub"] == "7"
+    with pytest.raises(JWTError):
+        edge.sign({"sub": "7"})
+
+
+def test_rotation_keeps_old_kid_valid():
+    old = make_key_ring("EdDSA", kid="2025-01")
+    new_private = ed25519.Ed25519PrivateKey.generate()
+    rotated = KeyRing.from_keys(
+        "EdDSA",
+        signing_key=new_private,
+        kid="2025-02",
+        verification_keys=load_jwks(old.jwks())
+    )
+
+    old_token = old.sign({"sub": "1"})
+    new_token = rotated.sign({"sub": "2"})
+
+    assert rotated.verify(old_token)["sub"] == "1"
+    assert rotated.verify(new_token)["sub"] == "2"
+    assert {key["kid"] for key in rotated.jwks()["keys"]} == {"2025-01", "2025-02"}
+
+
+def test_unknown_kid_and_tampering_are_rejected():
+    ring = make_key_ring("ES256")
+    stranger = make_key_ring("ES256", kid="other")
+    token = ring.sign({"sub": "1"})
+
+    with pytest.raises(JWTError):
+        ring.verify(stranger.sign({"sub": "1"}))
+
+    header, payload, signature = token.split(".")
+    forged_payload = KeyRing("HS256", signing_key=b"x").sign({"sub": "admin"}).split(".")[1]
+    with pytest.raises(JWTError):
+        ring.verify(f"{header}.{forged_payload}.{signature}")
+
+
+def test_non_ascii_token_is_unauthorized():
+    from fastapi import HTTPException
+    from auth.schemas import TokenPayload
+    from shared.security import create_access_token, get_key_ring, verify_token
+
+    header, _, signature = create_access_token(TokenPayload(sub="5", email="a@b.com", role="admin")).split(".")
+    token = f"{header}.ñandú.{signature}"
+
+    with pytest.raises(JWTError):
+        get_key_ring().verify(token)
+    with pytest.raises(HTTPException) as error:
+        verify_token(token)
+    assert error.value.status_code == 401
+
+
+def test_algorithm_confusion_is_rejected():
+    ring = make_key_ring("EdDSA")
+    token = ring.sign({"sub": "1"})
+    _, payload, signature = token.split(".")
+    es_header = make_key_ring("ES256").sign({}).split(".")[0]
+
+    with pytest.raises(JWTError):
+        ring.verify(f"{es_header}.{payload}.{signature}")
+
+
+def test_expired_token_is_rejected():
+    ring = make_key_ring("EdDSA")
+    token = ring.sign({"sub": "1", "exp": int(time.time()) - 1})
+
+    with pytest.raises(ExpiredSignatureError):
+        ring.verify(token)
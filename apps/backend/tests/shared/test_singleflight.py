@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from shared.deadline import Deadline, current_deadline
+from shared.singleflight import SingleFlight
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def loader(calls, value="v", delay=0.01):
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return load
+
+
+async def test_concurrent_calls_share_one_load():
+    flight = SingleFlight(ttl=0, stale=0)
+    calls = []
+
+    results = await asyncio.gather(*(flight.do("k", loader(calls)) for _ in range(100)))
+
+    assert results == ["v"] * 100
+    assert calls == ["v"]
+    assert flight.coalesced == 99
+
+
+async def test_expired_entry_is_served_stale_while_one_caller_refreshes():
+    clock = Clock()
+    flight = SingleFlight(ttl=1, stale=10, beta=0, clock=clock)
+    await flight.do("k", loader([], "old"))
+
+    clock.now = 5
+    calls = []
+    refresher = asyncio.ensure_future(flight.do("k", loader(calls, "new")))
+    await asyncio.sleep(0)
+    stale = await flight.do("k", loader(calls, "other"))
+
+    assert stale == "old"
+    assert await refresher == "new"
+    assert calls == ["new"]
+    assert await flight.do("k", loader(calls, "other")) == "new"
+
+
+async def test_probabilistic_early_refresh_before_expiry():
+    clock = Clock()
+    draws = iter([0.0, 0.9999])
+    flight = SingleFlight(ttl=10, stale=0, beta=1, clock=clock, rand=lambda: next(draws))
+    await flight.do("k", loader([], "old", delay=0))
+    flight._entries["k"] = flight._entries["k"]._replace(delta=1.0)
+
+    clock.now = 9.5
+    calls = []
+    # Lejos del vencimiento relativo a `delta`: no refresca
+    assert await flight.do("k", loader(calls, "new", delay=0)) == "old"
+    # Una extraccion cercana a 1 adelanta el vencimiento y refresca
+    assert await flight.do("k", loader(calls, "new", delay=0)) == "new"
+    assert calls == ["new"]
+
+
+async def test_invalidate_discards_results_of_loads_in_flight():
+    flight = SingleFlight(ttl=60, stale=0)
+    pending = asyncio.ensure_future(flight.do("k", loader([], "old")))
+    await asyncio.sleep(0)
+
+    flight.invalidate()
+    assert await pending == "old"
+
+    calls = []
+    assert await flight.do("k", loader(calls, "new")) == "new"
+    assert calls == ["new"]
+
+
+async def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight(ttl=60, stale=0)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db caida")
+
+    results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert await flight.do("k", loader([], "ok")) == "ok"
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_load():
+    flight = SingleFlight(ttl=0, stale=0)
+    first = asyncio.ensure_future(flight.do("k", loader([], "v")))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(flight.do("k", loader([], "x")))
+    await asyncio.sleep(0)
+
+    first.cancel()
+
+    assert await second == "v"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+async def test_load_runs_outside_the_callers_context():
+    flight = SingleFlight(ttl=0, stale=0)
+    seen = []
+
+    async def load():
+        seen.append(current_deadline.get())
+        return "v"
+
+    token = current_deadline.set(Deadline(30))
+    try:
+        assert await flight.do("k", load) == "v"
+    finally:
+        current_deadline.reset(token)
+    assert seen == [None]
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+
+# Presupuesto de arranque en frio (import de `main`), ajustable en CI lentos
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", 3000))
+
+DEFERRED_MODULES = ("passlib.context", "psycopg2", "cryptography")
+
+
+def import_main():
+    script = (
+        "import sys, main\n"
+        "from shared.config import get_settings\n"
+        "from shared.database import get_engine\n"
+        "print(get_settings.cache_info().currsize, get_engine.cache_info().currsize)\n"
+        "print(' '.join(sorted(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=SRC_DIR,
+        env=dict(os.environ),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "self [us]" not in line:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            timings[name.strip()] = int(cumulative_us)
+
+    built, modules = result.stdout.splitlines()
+    return timings, built.split(), set(modules.split())
+
+
+def test_importing_main_is_lazy_and_within_budget():
+    timings, built, modules = import_main()
+
+    # Configuracion y engine se construyen en el lifespan, no al importar
+    assert built == ["0", "0"]
+
+    leaked = [name for name in DEFERRED_MODULES if name in modules]
+    assert leaked == []
+
+    assert timings["main"] / 1000 <= COLD_START_BUDGET_MS
@@ -0,0 +1,69 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from auth.dependencies import get_current_user, get_token_payload
+from auth.models import User
+from auth.permissions import permissions_for
+from auth.schemas import TokenPayload
+from main import app
+from shared.database import get_db
+
+PROFILE = {"name": "Ana Torres", "email": "ana@example.com", "direction": "Calle 10 # 20-30"}
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        User(email="admin@example.com", password="x", name="Admin", role="admin"),
+        User(email="ana@example.com", password="x", name="Ana", direction="Calle 1 # 2-3"),
+    ])
+    db.commit()
+
+    admin = db.query(User).filter(User.role == "admin").one()
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: admin
+    app.dependency_overrides[get_token_payload] = lambda: TokenPayload(
+        sub=str(admin.id), email=admin.email, role=admin.role, perms=permissions_for(admin.role)
+    )
+    yield db
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+@pytest.fixture
+def user(db):
+    return db.query(User).filter(User.email == "ana@example.com").one()
+
+
+def test_profile_read_carries_private_etag(client):
+    response = client.get("/me")
+
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_second_admin_with_stale_etag_gets_412(client, user):
+    etag = client.get(f"/{user.id}").headers["etag"]
+
+    first = client.put(f"/{user.id}", json={**PROFILE, "name": "Ana Maria"}, headers={"If-Match": etag})
+    second = client.put(f"/{user.id}", json={**PROFILE, "name": "Ana Lucia"}, headers={"If-Match": etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 412
+    assert second.headers["etag"] == first.headers["etag"]
+    assert client.get(f"/{user.id}").json()["name"] == "Ana Maria"
+
+
+def test_status_change_honours_if_match(client, user):
+    etag = client.get(f"/{user.id}").headers["etag"]
+
+    response = client.patch(f"/{user.id}/desactivate", headers={"If-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["is_active"] is False
+    assert client.patch(f"/{user.id}/activate", headers={"If-Match": etag}).status_code == 412